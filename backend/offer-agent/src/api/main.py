@@ -6,6 +6,7 @@ before sending to ERP.
 """
 import os
 import re
+import time
 from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import AsyncGenerator
@@ -15,7 +16,11 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
 from src.api.routes import offers_router, health_router
+from src.api.services.context_store import get_workflow_context_store
+from src.api.services.job_service import get_offer_job_service
 from src.api.services.pending_store import get_pending_store
+from src.api.services.warmup import get_warmup_service
+from src.health import get_health_monitor
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -82,17 +87,41 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     logger.info("Starting ERP-Agent REST API")
     logger.info("=" * 60)
 
-    # Initialize the pending store (loads from file backup)
+    # Open the pending store and start its TTL cleanup / compaction task
     store = get_pending_store()
-    logger.info(f"Loaded {store.count()} pending offers from backup")
+    logger.info(f"Pending offer store has {store.count()} offers")
+    store.start_maintenance()
+
+    # Workflow contexts of offers awaiting review: expire old ones, spill idle ones
+    contexts = get_workflow_context_store()
+    contexts.start_maintenance()
 
     erp_type = os.getenv("ERP_TYPE", "csv")
     logger.info(f"ERP Type: {erp_type}")
 
+    # Offer creation runs as background jobs on this process's worker pool
+    jobs = get_offer_job_service()
+    await jobs.start()
+
+    # Probe dependencies in the background; /health serves the cached results
+    health_monitor = get_health_monitor()
+    health_monitor.start()
+
+    # Load the matching stack in the background; /ready turns 200 when done
+    warmup = get_warmup_service()
+    warmup.start()
+    warmup.record_startup()
+    logger.info(f"Startup finished in {warmup.stats()['startup_seconds']}s (warm-up: {warmup.status})")
+
     yield
 
     # Cleanup on shutdown
     logger.info("Shutting down ERP-Agent REST API")
+    await warmup.stop()
+    await health_monitor.stop()
+    await jobs.stop()
+    await contexts.stop_maintenance()
+    await store.stop_maintenance()
 
 
 # Create FastAPI app
@@ -127,8 +156,11 @@ async def cors_middleware(request: Request, call_next):
                 }
             )
 
-    # Process the request
+    # Process the request (the first offer API request is timed for cold-start reporting)
+    started = time.perf_counter()
     response = await call_next(request)
+    if "/api/" in request.url.path:
+        get_warmup_service().record_request(request.url.path, time.perf_counter() - started)
 
     # Add CORS headers if origin is allowed
     if origin and origin_matches_pattern(origin, allowed_origins):
@@ -166,7 +198,10 @@ async def offer_agent_root():
         "version": "1.0.0",
         "endpoints": {
             "health": f"{API_PREFIX}/health",
+            "ready": f"{API_PREFIX}/ready",
             "create_offer": f"{API_PREFIX}/api/offers/create",
+            "offer_job": f"{API_PREFIX}/api/offers/jobs/{{job_id}}",
+            "offer_job_events": f"{API_PREFIX}/api/offers/jobs/{{job_id}}/events",
             "pending_offers": f"{API_PREFIX}/api/offers/pending",
             "offer_status": f"{API_PREFIX}/api/offers/status"
         }
@@ -1,13 +1,16 @@
 """
 API Pydantic models for request/response validation.
 """
-from .requests import CreateOfferRequest, SendToERPRequest, AttachmentData
+from .requests import CreateOfferRequest, BulkCreateOfferRequest, SendToERPRequest, AttachmentData
 from .responses import (
     OrderLineResponse,
     PendingOfferResponse,
     OffersListResponse,
     OfferStatusResponse,
     CreateOfferResponse,
+    BulkCreateOfferResponse,
+    OfferJobEvent,
+    OfferJobResponse,
     SendOfferResponse,
     DeleteOfferResponse,
     HealthResponse,
@@ -15,6 +18,7 @@ from .responses import (
 
 __all__ = [
     "CreateOfferRequest",
+    "BulkCreateOfferRequest",
     "SendToERPRequest",
     "AttachmentData",
     "OrderLineResponse",
@@ -22,6 +26,9 @@ __all__ = [
     "OffersListResponse",
     "OfferStatusResponse",
     "CreateOfferResponse",
+    "BulkCreateOfferResponse",
+    "OfferJobEvent",
+    "OfferJobResponse",
     "SendOfferResponse",
     "DeleteOfferResponse",
     "HealthResponse",
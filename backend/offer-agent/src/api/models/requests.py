@@ -21,6 +21,10 @@ class CreateOfferRequest(BaseModel):
         default_factory=list,
         description="List of attachments with base64 encoded data"
     )
+    request_id: Optional[str] = Field(
+        None,
+        description="Client request ID; retrying with the same ID and content resumes from completed steps"
+    )
 
     class Config:
         json_schema_extra = {
@@ -33,6 +37,15 @@ class CreateOfferRequest(BaseModel):
         }
 
 
+class BulkCreateOfferRequest(BaseModel):
+    """Request model for creating many offers in one batch."""
+    requests: List[CreateOfferRequest] = Field(..., min_length=1, max_length=500)
+    batch_id: Optional[str] = Field(
+        None,
+        description="Client batch ID; resubmitting the same ID returns the existing batch"
+    )
+
+
 class SendToERPRequest(BaseModel):
     """Request model for sending an approved offer to ERP."""
     line_ids: List[str] = Field(
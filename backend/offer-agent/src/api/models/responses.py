@@ -1,7 +1,7 @@
 """
 Response models for the API endpoints.
 """
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 from pydantic import BaseModel, Field
 
@@ -41,6 +41,7 @@ class OffersListResponse(BaseModel):
     """List of pending offers."""
     offers: List[PendingOfferResponse]
     total_count: int
+    next_cursor: Optional[str] = Field(None, description="Pass as cursor to get the next page; None on the last page")
 
 
 class OfferStatusResponse(BaseModel):
@@ -51,6 +52,7 @@ class OfferStatusResponse(BaseModel):
     processing_count: int
     sent_count: int
     failed_count: int
+    next_cursor: Optional[str] = Field(None, description="Pass as cursor to get the next page; None on the last page")
 
 
 class CreateOfferResponse(BaseModel):
@@ -61,6 +63,51 @@ class CreateOfferResponse(BaseModel):
     message: str
     errors: List[str] = Field(default_factory=list)
     warnings: List[str] = Field(default_factory=list)
+    job_id: Optional[str] = Field(None, description="Background job processing the request")
+    status: Optional[str] = Field(None, description="Job status: queued, running, completed, failed")
+
+
+class OfferJobEvent(BaseModel):
+    """Progress event of an offer job."""
+    seq: int
+    event: str = Field(..., description="queued, started, step_started, step_completed, completed, failed")
+    step: Optional[str] = None
+    timestamp: datetime
+    data: Dict[str, Any] = Field(default_factory=dict)
+
+
+class OfferJobResponse(BaseModel):
+    """State of a background offer creation job."""
+    job_id: str
+    status: str = Field(..., description="queued, running, completed, failed")
+    created_at: datetime
+    updated_at: datetime
+    current_step: Optional[str] = None
+    completed_steps: List[str] = Field(default_factory=list)
+    matches: List[Dict[str, Any]] = Field(
+        default_factory=list,
+        description="Product matches known so far (available before the offer is finished)"
+    )
+    result: Optional[CreateOfferResponse] = None
+    events: List[OfferJobEvent] = Field(default_factory=list)
+
+
+class BulkCreateOfferResponse(BaseModel):
+    """Per-request results of a bulk offer submission."""
+    batch_id: str
+    status: str = Field(..., description="queued, running, completed (every job finished)")
+    total: int
+    completed: int = 0
+    failed: int = 0
+    customer_groups: Dict[str, int] = Field(
+        default_factory=dict,
+        description="Requests per customer (sender domain); a group shares lookups and pricing"
+    )
+    shared_lookups: Dict[str, Dict[str, int]] = Field(
+        default_factory=dict,
+        description="Distinct and shared lookups per kind, once the batch has finished"
+    )
+    results: List[CreateOfferResponse] = Field(default_factory=list, description="One result per request, in request order")
 
 
 class SendOfferResponse(BaseModel):
@@ -85,3 +132,6 @@ class HealthResponse(BaseModel):
     timestamp: datetime
     erp_type: str
     pending_offers_count: int
+    workflow_contexts: Optional[Dict[str, Any]] = None
+    warmup: Optional[Dict[str, Any]] = None
+    dependencies: Optional[Dict[str, Any]] = None
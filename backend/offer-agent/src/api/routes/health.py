@@ -4,9 +4,13 @@ Health check endpoint for Fargate and load balancer.
 import os
 from datetime import datetime
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
 
 from src.api.models.responses import HealthResponse
+from src.api.services.context_store import get_workflow_context_store
 from src.api.services.pending_store import get_pending_store
+from src.api.services.warmup import get_warmup_service
+from src.health import STATE_DEGRADED, STATE_UNHEALTHY, get_health_monitor
 
 router = APIRouter(tags=["health"])
 
@@ -19,13 +23,37 @@ async def health_check() -> HealthResponse:
     Health check endpoint.
 
     Returns service status for Fargate health checks and load balancer.
+    Dependency states come from the background health monitor's cache, so
+    polling this endpoint never touches Lemonsoft, the database or S3.
+    The response is 200 while the process is alive; status is "degraded"
+    when a critical dependency is degraded or unhealthy.
     """
     store = get_pending_store()
+    dependencies = get_health_monitor().snapshot()
 
     return HealthResponse(
-        status="healthy",
+        status="degraded" if dependencies['status'] in (STATE_DEGRADED, STATE_UNHEALTHY) else "healthy",
         version=VERSION,
         timestamp=datetime.utcnow(),
         erp_type=os.getenv("ERP_TYPE", "csv"),
-        pending_offers_count=store.count()
+        pending_offers_count=store.count(),
+        workflow_contexts=get_workflow_context_store().stats(),
+        warmup=get_warmup_service().stats(),
+        dependencies=dependencies
+    )
+
+
+@router.get("/ready")
+async def readiness_check() -> JSONResponse:
+    """
+    Readiness check endpoint.
+
+    Returns 503 until the warm-up has loaded the matching stack, so the load
+    balancer only routes offer requests to tasks that can serve them quickly.
+    /health stays 200 meanwhile (liveness).
+    """
+    warmup = get_warmup_service()
+    return JSONResponse(
+        status_code=200 if warmup.ready else 503,
+        content=warmup.stats()
     )
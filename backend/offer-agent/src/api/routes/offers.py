@@ -1,17 +1,23 @@
 """
 Offer CRUD endpoints for the REST API.
 """
-from fastapi import APIRouter, HTTPException, Depends
+from typing import Optional
 
-from src.api.models.requests import CreateOfferRequest, SendToERPRequest
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Response
+from fastapi.responses import StreamingResponse
+
+from src.api.models.requests import BulkCreateOfferRequest, CreateOfferRequest, SendToERPRequest
 from src.api.models.responses import (
     PendingOfferResponse,
     OffersListResponse,
     OfferStatusResponse,
     CreateOfferResponse,
+    BulkCreateOfferResponse,
+    OfferJobResponse,
     SendOfferResponse,
     DeleteOfferResponse,
 )
+from src.api.services.job_service import OfferJobService, get_offer_job_service
 from src.api.services.offer_service import OfferService, get_offer_service
 
 router = APIRouter(prefix="/api/offers", tags=["offers"])
@@ -22,72 +28,211 @@ def get_service() -> OfferService:
     return get_offer_service()
 
 
+def get_job_service() -> OfferJobService:
+    """Dependency to get the offer job service."""
+    return get_offer_job_service()
+
+
 @router.post("/create", response_model=CreateOfferResponse)
 async def create_offer(
     request: CreateOfferRequest,
-    service: OfferService = Depends(get_service)
+    response: Response,
+    wait: bool = Query(False, description="Run the workflow inside the request (legacy behaviour)"),
+    service: OfferService = Depends(get_service),
+    jobs: OfferJobService = Depends(get_job_service)
 ) -> CreateOfferResponse:
     """
     Create a new offer from form data.
 
-    Processes the request through AI to extract products, match to catalog,
-    and calculate pricing. The offer is queued for review before sending to ERP.
+    Queues the request as a background job and returns its job ID at once
+    (202). The job extracts products, matches them to the catalog and
+    calculates pricing; the offer is then queued for review before sending
+    to ERP. Follow progress via /jobs/{job_id} or /jobs/{job_id}/events.
+    Resending the same request_id returns the existing job.
 
     Args:
         request: CreateOfferRequest with sender, subject, body, attachments
+        wait: Block until the offer is created instead of queuing a job
+
+    Returns:
+        CreateOfferResponse with the job ID (or the offer ID when wait=true)
+    """
+    if wait:
+        return await service.create_offer(request)
+
+    job = await jobs.submit(request)
+    response.status_code = 202
+    result = job.to_response(include_events=False).result
+    return CreateOfferResponse(
+        success=job.status != "failed",
+        offer_id=result.offer_id if result else None,
+        offer_number=result.offer_number if result else None,
+        message=result.message if result else "Offer request queued for processing",
+        errors=result.errors if result else [],
+        warnings=result.warnings if result else [],
+        job_id=job.job_id,
+        status=job.status
+    )
+
+
+@router.post("/bulk", response_model=BulkCreateOfferResponse)
+async def create_offers_bulk(
+    request: BulkCreateOfferRequest,
+    response: Response,
+    wait: bool = Query(False, description="Wait until every offer in the batch is finished"),
+    timeout: float = Query(600, gt=0, le=3600, description="Longest wait in seconds when wait=true"),
+    jobs: OfferJobService = Depends(get_job_service)
+) -> BulkCreateOfferResponse:
+    """
+    Create many offers in one batch.
+
+    Each request becomes a background job; requests are grouped by customer
+    and the batch shares customer lookups, pricing queries and product term
+    matches, so a term that appears in many requests is matched once.
+    Returns 202 with one job per request; follow them via /jobs/{job_id}
+    or fetch all results from /bulk/{batch_id}.
+
+    Args:
+        request: BulkCreateOfferRequest with the offer requests
+        wait: Block until every job has finished (or the timeout passes)
 
     Returns:
-        CreateOfferResponse with offer ID if successful
+        BulkCreateOfferResponse with per-request results in request order
+    """
+    batch_id, _ = await jobs.submit_bulk(request.requests, batch_id=request.batch_id)
+    if wait:
+        return await jobs.wait_for_batch(batch_id, timeout=timeout)
+    response.status_code = 202
+    return await jobs.get_batch(batch_id)
+
+
+@router.get("/bulk/{batch_id}", response_model=BulkCreateOfferResponse)
+async def get_offer_batch(
+    batch_id: str,
+    jobs: OfferJobService = Depends(get_job_service)
+) -> BulkCreateOfferResponse:
+    """
+    Get the per-request results of a bulk batch.
+
+    Raises:
+        HTTPException 404 if batch not found
     """
-    return await service.create_offer(request)
+    batch = await jobs.get_batch(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch
+
+
+@router.get("/jobs/{job_id}", response_model=OfferJobResponse)
+async def get_offer_job(
+    job_id: str,
+    jobs: OfferJobService = Depends(get_job_service)
+) -> OfferJobResponse:
+    """
+    Get the state of an offer creation job.
+
+    Includes completed steps, product matches found so far, the progress
+    events and, once finished, the CreateOfferResponse.
+
+    Raises:
+        HTTPException 404 if job not found
+    """
+    job = await jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_response()
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_offer_job_events(
+    job_id: str,
+    after: int = Query(0, description="Only events with a higher sequence number"),
+    last_event_id: Optional[str] = Header(None),
+    jobs: OfferJobService = Depends(get_job_service)
+) -> StreamingResponse:
+    """
+    Server-sent event stream of an offer job's progress.
+
+    Replays past events, then streams new ones until the job completes or
+    fails. Reconnecting clients resume via the Last-Event-ID header.
+
+    Raises:
+        HTTPException 404 if job not found
+    """
+    if not await jobs.get(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    if last_event_id and last_event_id.isdigit():
+        after = max(after, int(last_event_id))
+    return StreamingResponse(
+        jobs.stream_events(job_id, after=after),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.get("/pending", response_model=OffersListResponse)
 async def list_pending_offers(
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Page size (omit for all offers)"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
     service: OfferService = Depends(get_service)
 ) -> OffersListResponse:
     """
-    List all offers awaiting review.
+    List offers awaiting review, newest first.
 
-    Returns only offers with status "pending".
+    Returns only offers with status "pending": all of them, or one page at
+    a time when a limit is given.
 
     Returns:
-        OffersListResponse with list of pending offers
+        OffersListResponse with the pending offers (or one page of them), the
+        total number of pending offers and the cursor of the next page
+
+    Raises:
+        HTTPException 400 if the cursor is invalid
     """
-    offers = await service.get_pending_offers()
+    try:
+        offers, next_cursor = await service.list_offers(status="pending", limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    counts = await service.count_offers_by_status()
     return OffersListResponse(
         offers=offers,
-        total_count=len(offers)
+        total_count=counts["pending"],
+        next_cursor=next_cursor
     )
 
 
 @router.get("/status", response_model=OfferStatusResponse)
 async def get_offers_status(
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Page size (omit for all offers)"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
     service: OfferService = Depends(get_service)
 ) -> OfferStatusResponse:
     """
-    Get all offers with their status.
+    Get offers with their status.
 
-    Returns all offers regardless of status with counts by status.
+    Returns offers regardless of status, newest first, with counts by
+    status over the whole store. With a limit, one page at a time.
 
     Returns:
         OfferStatusResponse with offers and status counts
-    """
-    offers = await service.get_all_offers()
 
-    # Count by status
-    pending = sum(1 for o in offers if o.status == "pending")
-    processing = sum(1 for o in offers if o.status == "processing")
-    sent = sum(1 for o in offers if o.status == "sent")
-    failed = sum(1 for o in offers if o.status == "failed")
+    Raises:
+        HTTPException 400 if the cursor is invalid
+    """
+    try:
+        offers, next_cursor = await service.list_offers(limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    counts = await service.count_offers_by_status()
 
     return OfferStatusResponse(
         offers=offers,
-        total_count=len(offers),
-        pending_count=pending,
-        processing_count=processing,
-        sent_count=sent,
-        failed_count=failed
+        total_count=sum(counts.values()),
+        pending_count=counts["pending"],
+        processing_count=counts["processing"],
+        sent_count=counts["sent"],
+        failed_count=counts["failed"],
+        next_cursor=next_cursor
     )
 
 
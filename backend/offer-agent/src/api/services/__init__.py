@@ -2,11 +2,20 @@
 API services for business logic and storage.
 """
 from .pending_store import PendingOfferStore, get_pending_store
+from .context_store import WorkflowContextStore, get_workflow_context_store
 from .offer_service import OfferService, get_offer_service
+from .job_service import OfferJobService, get_offer_job_service
+from .warmup import WarmupService, get_warmup_service
 
 __all__ = [
     "PendingOfferStore",
     "get_pending_store",
+    "WorkflowContextStore",
+    "get_workflow_context_store",
     "OfferService",
     "get_offer_service",
+    "OfferJobService",
+    "get_offer_job_service",
+    "WarmupService",
+    "get_warmup_service",
 ]
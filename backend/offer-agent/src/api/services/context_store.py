@@ -0,0 +1,326 @@
+"""
+Bounded store for workflow contexts of offers awaiting review.
+
+A WorkflowContext holds the email body, attachment data and match results,
+so keeping every reviewed offer's context in a dict made the API process
+grow without limit. WorkflowContextStore keeps recently used contexts in an
+LRU bounded by count and approximate size, spills older ones to disk as
+compressed pickles and reloads them transparently on access. Contexts
+expire after a TTL.
+
+Spill files are written and read only by this service (same trust model as
+the workflow checkpoints). If a context cannot be spilled it is dropped;
+OfferService can still rebuild it from the workflow checkpoints.
+"""
+import asyncio
+import os
+import pickle
+import resource
+import time
+import zlib
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Optional
+
+from src.utils.logger import get_logger
+
+
+SPILL_SUFFIX = ".ctx.z"
+
+
+def current_rss_bytes() -> int:
+    """Resident set size of this process (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@dataclass
+class _Entry:
+    context: Any
+    size: int
+    stored_at: float
+    last_access: float
+
+
+@dataclass
+class _SpilledEntry:
+    path: Path
+    size: int
+    stored_at: float
+
+
+class WorkflowContextStore:
+    """
+    LRU of workflow contexts with spill-to-disk and expiry.
+
+    Sync methods are safe to call from any thread; the async wrappers run
+    them in a worker thread because spills and reloads touch the disk.
+    """
+
+    def __init__(
+        self,
+        max_items: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        spill_dir: Optional[str] = None,
+        ttl_seconds: Optional[float] = None,
+        idle_spill_seconds: Optional[float] = None,
+        compression_level: int = 6
+    ):
+        """
+        Initialize the store.
+
+        Args:
+            max_items: Contexts kept in memory (CONTEXT_STORE_MAX_ITEMS, default 200)
+            max_bytes: Approximate memory budget (CONTEXT_STORE_MAX_MB, default 256 MB)
+            spill_dir: Directory for spilled contexts (CONTEXT_SPILL_DIR or
+                /app/data/workflow_contexts). Spilling is disabled if it cannot be created.
+            ttl_seconds: Contexts older than this are dropped (CONTEXT_TTL_HOURS, default 168)
+            idle_spill_seconds: Contexts not used for this long are spilled by
+                expire() even under budget (CONTEXT_IDLE_SPILL_SECONDS, default 1800)
+            compression_level: zlib level for spill files
+        """
+        self.logger = get_logger(__name__)
+        self._lock = Lock()
+        self.max_items = max_items or int(os.getenv("CONTEXT_STORE_MAX_ITEMS", "200"))
+        self.max_bytes = max_bytes or int(float(os.getenv("CONTEXT_STORE_MAX_MB", "256")) * 1024 * 1024)
+        self.ttl_seconds = ttl_seconds or float(os.getenv("CONTEXT_TTL_HOURS", "168")) * 3600
+        self.idle_spill_seconds = idle_spill_seconds or float(os.getenv("CONTEXT_IDLE_SPILL_SECONDS", "1800"))
+        self.compression_level = compression_level
+
+        self._memory: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._memory_bytes = 0
+        self._spilled: Dict[str, _SpilledEntry] = {}
+        self._stats: Dict[str, int] = defaultdict(int)
+
+        self.spill_dir: Optional[Path] = Path(
+            spill_dir or os.getenv("CONTEXT_SPILL_DIR", "/app/data/workflow_contexts")
+        )
+        try:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            # Spill files from a previous process have no index entry; checkpoints cover them
+            for stale in self.spill_dir.glob(f"*{SPILL_SUFFIX}"):
+                stale.unlink()
+        except OSError as e:
+            self.logger.warning(f"Context spilling disabled, cannot use {self.spill_dir}: {e}")
+            self.spill_dir = None
+
+        self._maintenance_task: Optional[asyncio.Task] = None
+
+    # ==================== SYNC API ====================
+
+    def put(self, key: str, context: Any) -> None:
+        """Store a context, spilling least recently used ones beyond the bounds."""
+        try:
+            size = len(pickle.dumps(context, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception as e:
+            self.logger.warning(f"Cannot size context {key}, it will not be spilled: {e}")
+            size = 0
+        now = time.time()
+        with self._lock:
+            self._remove_locked(key)
+            self._memory[key] = _Entry(context, size, now, now)
+            self._memory_bytes += size
+            self._stats['puts'] += 1
+            self._enforce_bounds_locked()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Context by key, reloading it from disk if it was spilled; None if unknown or expired."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry.stored_at > self.ttl_seconds:
+                    self._remove_locked(key)
+                    self._stats['expired'] += 1
+                    self._stats['misses'] += 1
+                    return None
+                entry.last_access = now
+                self._memory.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry.context
+
+            spilled = self._spilled.pop(key, None)
+            if spilled is None or now - spilled.stored_at > self.ttl_seconds:
+                if spilled is not None:
+                    self._delete_file(spilled.path)
+                    self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None
+
+            try:
+                with open(spilled.path, "rb") as f:
+                    context = pickle.loads(zlib.decompress(f.read()))
+            except Exception as e:
+                self.logger.warning(f"Failed to reload spilled context {key}: {e}")
+                self._delete_file(spilled.path)
+                self._stats['reload_errors'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._delete_file(spilled.path)
+            self._stats['reloads'] += 1
+
+            self._memory[key] = _Entry(context, spilled.size, spilled.stored_at, now)
+            self._memory_bytes += spilled.size
+            self._enforce_bounds_locked(keep=key)
+            return context
+
+    def pop(self, key: str) -> None:
+        """Forget a context (offer sent or deleted)."""
+        with self._lock:
+            self._remove_locked(key)
+
+    def expire(self) -> Dict[str, int]:
+        """Drop contexts past the TTL and spill ones idle longer than idle_spill_seconds."""
+        now = time.time()
+        expired = idle = 0
+        with self._lock:
+            for key in [k for k, e in self._memory.items() if now - e.stored_at > self.ttl_seconds]:
+                self._remove_locked(key)
+                expired += 1
+            for key in [k for k, e in self._spilled.items() if now - e.stored_at > self.ttl_seconds]:
+                self._remove_locked(key)
+                expired += 1
+            for key in [k for k, e in self._memory.items() if now - e.last_access > self.idle_spill_seconds]:
+                self._spill_locked(key)
+                idle += 1
+            self._stats['expired'] += expired
+        return {'expired': expired, 'idle_spilled': idle}
+
+    def stats(self) -> Dict[str, Any]:
+        """Sizes, hit/spill/eviction counters and process RSS."""
+        with self._lock:
+            snapshot: Dict[str, Any] = dict(self._stats)
+            snapshot.update({
+                'memory_items': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'spilled_items': len(self._spilled),
+                'spilled_bytes': sum(entry.size for entry in self._spilled.values()),
+                'max_items': self.max_items,
+                'max_bytes': self.max_bytes,
+            })
+        snapshot['rss_bytes'] = current_rss_bytes()
+        return snapshot
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._memory or key in self._spilled
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._memory) + len(self._spilled)
+
+    # ==================== ASYNC WRAPPERS ====================
+
+    async def put_async(self, key: str, context: Any) -> None:
+        await asyncio.to_thread(self.put, key, context)
+
+    async def get_async(self, key: str) -> Optional[Any]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def pop_async(self, key: str) -> None:
+        await asyncio.to_thread(self.pop, key)
+
+    async def expire_async(self) -> Dict[str, int]:
+        return await asyncio.to_thread(self.expire)
+
+    # ==================== MAINTENANCE ====================
+
+    def start_maintenance(self, interval_seconds: Optional[float] = None) -> None:
+        """Start the background expiry / idle spill task (call from the event loop)."""
+        if self._maintenance_task is None or self._maintenance_task.done():
+            interval = interval_seconds or float(os.getenv("CONTEXT_STORE_MAINTENANCE_SECONDS", "300"))
+            self._maintenance_task = asyncio.create_task(self._maintenance_loop(interval))
+
+    async def stop_maintenance(self) -> None:
+        """Stop the background maintenance task."""
+        task, self._maintenance_task = self._maintenance_task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _maintenance_loop(self, interval_seconds: float) -> None:
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await self.expire_async()
+            except Exception as e:
+                self.logger.warning(f"Workflow context store maintenance failed: {e}")
+
+    # ==================== INTERNALS (lock held) ====================
+
+    def _enforce_bounds_locked(self, keep: Optional[str] = None) -> None:
+        while self._memory and (len(self._memory) > self.max_items or self._memory_bytes > self.max_bytes):
+            oldest = next(iter(self._memory))
+            if oldest == keep:
+                if len(self._memory) == 1:
+                    break
+                self._memory.move_to_end(oldest)
+                continue
+            self._spill_locked(oldest)
+
+    def _spill_locked(self, key: str) -> None:
+        entry = self._memory.pop(key)
+        self._memory_bytes -= entry.size
+        if self.spill_dir is None:
+            self._stats['dropped'] += 1
+            return
+        path = self.spill_dir / f"{self._safe_name(key)}{SPILL_SUFFIX}"
+        try:
+            data = zlib.compress(pickle.dumps(entry.context, protocol=pickle.HIGHEST_PROTOCOL), self.compression_level)
+            tmp = path.with_suffix(".tmp")
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except Exception as e:
+            self.logger.warning(f"Failed to spill context {key}, dropping it: {e}")
+            self._stats['dropped'] += 1
+            return
+        self._spilled[key] = _SpilledEntry(path, entry.size, entry.stored_at)
+        self._stats['spills'] += 1
+        self._stats['spilled_disk_bytes'] += len(data)
+
+    def _remove_locked(self, key: str) -> None:
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= entry.size
+        spilled = self._spilled.pop(key, None)
+        if spilled is not None:
+            self._delete_file(spilled.path)
+
+    @staticmethod
+    def _safe_name(key: str) -> str:
+        return ''.join(c if c.isalnum() or c in '-_' else '_' for c in str(key))[:128]
+
+    def _delete_file(self, path: Path) -> None:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.logger.warning(f"Failed to delete spilled context {path}: {e}")
+
+
+# Global singleton instance
+_store_instance: Optional[WorkflowContextStore] = None
+_store_lock = Lock()
+
+
+def get_workflow_context_store() -> WorkflowContextStore:
+    """
+    Get the global WorkflowContextStore instance.
+
+    Returns:
+        The singleton WorkflowContextStore instance
+    """
+    global _store_instance
+
+    with _store_lock:
+        if _store_instance is None:
+            _store_instance = WorkflowContextStore()
+        return _store_instance
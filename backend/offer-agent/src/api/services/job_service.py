@@ -0,0 +1,601 @@
+"""
+Background offer jobs for the REST API.
+
+Offer creation takes minutes, so POST /api/offers/create no longer runs the
+workflow inside the HTTP request: it queues a job on a worker pool and
+returns the job ID. Clients poll GET /api/offers/jobs/{id} or follow the
+server-sent event stream, which publishes step-level progress (including
+product matches as soon as extraction finishes). Finished job states are
+kept in SQLite so results can be fetched after a restart.
+
+A request_id sent by the client becomes the job ID, so a retried POST
+returns the existing job instead of paying for the LLM calls again.
+
+Bulk submissions (POST /api/offers/bulk) queue one job per request, grouped
+by customer, and run them inside a shared BatchScope: customer lookups,
+Lemonsoft pricing queries and product term matches are done once per batch
+and reused by every request that needs them.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from src.api.models.requests import CreateOfferRequest
+from src.api.models.responses import BulkCreateOfferResponse, CreateOfferResponse, OfferJobEvent, OfferJobResponse
+from src.api.services.offer_service import OfferService, get_offer_service
+from src.core.workflow import WorkflowContext, WorkflowStep
+from src.email_processing.attachment_store import release_attachments
+from src.health import STATE_UNHEALTHY, get_health_monitor, intake_dependencies
+from src.scheduler.batch_scope import BatchScope, use_batch_scope
+from src.scheduler.job_queue import PersistentPriorityQueue
+from src.scheduler.priority import parse_express_customers
+from src.scheduler.worker_pool import OfferWorkerPool
+from src.utils.logger import get_logger
+
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+TERMINAL_STATUSES = (JOB_COMPLETED, JOB_FAILED)
+
+
+@dataclass
+class OfferJobRecord:
+    """In-memory state of one offer job."""
+    job_id: str
+    status: str = JOB_QUEUED
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    current_step: Optional[str] = None
+    completed_steps: List[str] = field(default_factory=list)
+    matches: List[Dict[str, Any]] = field(default_factory=list)
+    result: Optional[Dict[str, Any]] = None
+    events: List[Dict[str, Any]] = field(default_factory=list)
+    next_seq: int = 1
+    batch_id: Optional[str] = None
+    changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.job_id,
+            'status': self.status,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+            'current_step': self.current_step,
+            'completed_steps': self.completed_steps,
+            'matches': self.matches,
+            'result': self.result,
+            'events': self.events,
+            'next_seq': self.next_seq,
+            'batch_id': self.batch_id,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "OfferJobRecord":
+        return cls(**{key: value for key, value in data.items() if key != 'changed'})
+
+    def to_response(self, include_events: bool = True) -> OfferJobResponse:
+        return OfferJobResponse(
+            job_id=self.job_id,
+            status=self.status,
+            created_at=datetime.utcfromtimestamp(self.created_at),
+            updated_at=datetime.utcfromtimestamp(self.updated_at),
+            current_step=self.current_step,
+            completed_steps=list(self.completed_steps),
+            matches=list(self.matches),
+            result=CreateOfferResponse(**self.result) if self.result else None,
+            events=[_event_model(event) for event in self.events] if include_events else [],
+        )
+
+
+def _event_model(event: Dict[str, Any]) -> OfferJobEvent:
+    return OfferJobEvent(**{**event, 'timestamp': datetime.utcfromtimestamp(event['timestamp'])})
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """One server-sent event; the sequence number doubles as the SSE id for Last-Event-ID."""
+    payload = json.dumps({**event, 'timestamp': datetime.utcfromtimestamp(event['timestamp']).isoformat()})
+    return f"id: {event['seq']}\nevent: {event['event']}\ndata: {payload}\n\n"
+
+
+def customer_group(sender: str) -> str:
+    """Customer key for bulk grouping: the sender's email domain."""
+    address = sender.split('<')[-1].rstrip('>').strip().lower()
+    return address.rsplit('@', 1)[-1] if '@' in address else address
+
+
+def match_rows(products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Compact view of extracted/matched product dicts for progress events."""
+    rows = []
+    for item in products:
+        rows.append({
+            'term': item.get('unclear_term') or item.get('original_term') or item.get('product_name', ''),
+            'product_code': item.get('matched_product_code', item.get('product_code', '')),
+            'product_name': item.get('matched_product_name', item.get('product_name', '')),
+            'quantity': item.get('quantity'),
+            'confidence': item.get('confidence_score', item.get('ai_confidence')),
+        })
+    return rows
+
+
+class OfferJobService:
+    """
+    Queues offer creation requests and tracks their progress.
+
+    Jobs run on an OfferWorkerPool backed by the persistent priority queue,
+    so queued work survives a restart; job states and results are kept in
+    the same SQLite file.
+    """
+
+    def __init__(
+        self,
+        offer_service: Optional[OfferService] = None,
+        db_path: Optional[str] = None,
+        num_workers: Optional[int] = None,
+        max_events: int = 200,
+        max_cached_jobs: int = 500,
+        retention_seconds: float = 7 * 86400
+    ):
+        """
+        Initialize the service.
+
+        Args:
+            offer_service: OfferService that runs the workflow (defaults to global singleton)
+            db_path: SQLite file for the queue and job states. Defaults to
+                OFFER_JOBS_PATH or /app/data/offer_jobs.db; ":memory:" for tests.
+            num_workers: Concurrent offer jobs (defaults to API_OFFER_WORKERS or 2)
+            max_events: Progress events kept per job
+            max_cached_jobs: Finished jobs kept in memory (older ones are read from SQLite)
+            retention_seconds: Finished jobs older than this are purged on start
+        """
+        self.logger = get_logger(__name__)
+        self.offer_service = offer_service or get_offer_service()
+        self.max_events = max_events
+        self.max_cached_jobs = max_cached_jobs
+        self.retention_seconds = retention_seconds
+
+        path = db_path or os.getenv("OFFER_JOBS_PATH", "/app/data/offer_jobs.db")
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db_lock = Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS offer_job_states (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                state TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS offer_batches (
+                batch_id TEXT PRIMARY KEY,
+                created_at REAL NOT NULL,
+                state TEXT NOT NULL
+            )
+        """)
+
+        # The queue keeps its own connection to the same file
+        self.queue = PersistentPriorityQueue(db_path=path)
+        self.pool = OfferWorkerPool(
+            queue=self.queue,
+            handler=self._run_job,
+            num_workers=num_workers or int(os.getenv("API_OFFER_WORKERS", "2")),
+            express_customers=parse_express_customers(),
+            # Jobs stay queued while the ERP is down instead of failing one by one
+            pause_check=lambda: get_health_monitor().should_pause(intake_dependencies(), states=(STATE_UNHEALTHY,)),
+        )
+        self._jobs: "OrderedDict[str, OfferJobRecord]" = OrderedDict()
+        # Shared lookups of bulk batches that still have unfinished jobs
+        self._scopes: Dict[str, BatchScope] = {}
+        self._batch_pending: Dict[str, set] = {}
+
+    # ==================== LIFECYCLE ====================
+
+    async def start(self) -> None:
+        """Start the workers; jobs interrupted by a restart are queued again."""
+        unfinished = await asyncio.to_thread(self._load_unfinished)
+        for state in unfinished:
+            record = OfferJobRecord.from_dict(state)
+            record.status = JOB_QUEUED
+            record.current_step = None
+            self._remember(record)
+            self._publish(record, "queued", data={'recovered': True})
+        if unfinished:
+            self.logger.info(f"Recovered {len(unfinished)} unfinished offer jobs")
+        await self.pool.start()
+
+    async def stop(self) -> None:
+        """Stop the workers; running jobs are re-queued for the next start."""
+        await self.pool.stop()
+
+    def _load_unfinished(self) -> List[Dict[str, Any]]:
+        """Purge expired finished jobs and return the states of unfinished ones."""
+        with self._db_lock:
+            self._conn.execute(
+                "DELETE FROM offer_job_states WHERE status IN (?, ?) AND updated_at < ?",
+                (JOB_COMPLETED, JOB_FAILED, time.time() - self.retention_seconds)
+            )
+            rows = self._conn.execute(
+                "SELECT state FROM offer_job_states WHERE status NOT IN (?, ?)",
+                (JOB_COMPLETED, JOB_FAILED)
+            ).fetchall()
+            self._conn.execute(
+                "DELETE FROM offer_batches WHERE created_at < ?", (time.time() - self.retention_seconds,)
+            )
+        self.queue.purge_finished(self.retention_seconds)
+        return [json.loads(state) for (state,) in rows]
+
+    # ==================== PUBLIC API ====================
+
+    async def submit(self, request: CreateOfferRequest, batch_id: Optional[str] = None) -> OfferJobRecord:
+        """
+        Queue an offer creation request.
+
+        Args:
+            request: The offer request
+            batch_id: Bulk batch the request belongs to
+
+        Returns:
+            The new job, or the existing one if request_id was seen before
+        """
+        job_id = request.request_id or str(uuid.uuid4())
+        existing = await self.get(job_id)
+        if existing is not None:
+            self.logger.info(f"Offer job {job_id} already exists ({existing.status}), not queuing again")
+            self._batch_pending.get(batch_id, set()).discard(job_id)
+            return existing
+
+        email_data = self.offer_service.convert_request_to_email_data(request)
+        email_data['request_id'] = request.request_id
+        email_data['job_id'] = job_id
+        email_data['batch_id'] = batch_id
+
+        record = OfferJobRecord(job_id=job_id, batch_id=batch_id)
+        self._remember(record)
+        self._publish(record, "queued", data={'batch_id': batch_id} if batch_id else None)
+        await asyncio.to_thread(self._save, record)
+        await self.pool.submit(email_data, job_id=job_id)
+        return record
+
+    async def submit_bulk(
+        self,
+        requests: List[CreateOfferRequest],
+        batch_id: Optional[str] = None
+    ) -> Tuple[str, List[OfferJobRecord]]:
+        """
+        Queue many offer requests as one batch.
+
+        Requests are grouped by customer and queued group by group; while the
+        batch has unfinished jobs they share customer lookups, pricing queries
+        and product term matches through the batch's BatchScope.
+
+        Args:
+            requests: Offer requests
+            batch_id: Client batch ID; resubmitting it returns the existing batch
+
+        Returns:
+            (batch_id, jobs in request order)
+        """
+        batch_id = batch_id or str(uuid.uuid4())
+        state = await asyncio.to_thread(self._load_batch, batch_id)
+        if state is not None:
+            self.logger.info(f"Offer batch {batch_id} already exists, not queuing again")
+            return batch_id, [await self.get(job_id) or OfferJobRecord(job_id=job_id) for job_id in state['job_ids']]
+
+        # Without a client request_id the job ID is derived from the batch, so a retry is idempotent too
+        requests = [
+            request if request.request_id else request.model_copy(update={'request_id': f"{batch_id}-{index}"})
+            for index, request in enumerate(requests)
+        ]
+        groups: "OrderedDict[str, List[int]]" = OrderedDict()
+        for index, request in enumerate(requests):
+            groups.setdefault(customer_group(request.sender), []).append(index)
+
+        state = {
+            'batch_id': batch_id,
+            'job_ids': [request.request_id for request in requests],
+            'customer_groups': {group: len(indices) for group, indices in groups.items()},
+            'shared_lookups': {},
+        }
+        await asyncio.to_thread(self._save_batch, batch_id, state)
+        self._scopes[batch_id] = BatchScope(batch_id)
+        self._batch_pending[batch_id] = set(state['job_ids'])
+
+        records: Dict[int, OfferJobRecord] = {}
+        for indices in groups.values():
+            for index in indices:
+                records[index] = await self.submit(requests[index], batch_id=batch_id)
+        self.logger.info(
+            f"Queued offer batch {batch_id}: {len(requests)} requests from {len(groups)} customers"
+        )
+        if not self._batch_pending.get(batch_id):
+            self._finish_batch(batch_id)
+        return batch_id, [records[index] for index in range(len(requests))]
+
+    async def get_batch(self, batch_id: str) -> Optional[BulkCreateOfferResponse]:
+        """Per-request results of a bulk batch."""
+        state = await asyncio.to_thread(self._load_batch, batch_id)
+        if state is None:
+            return None
+        records = [await self.get(job_id) for job_id in state['job_ids']]
+        return self._batch_response(state, records)
+
+    async def wait_for_batch(self, batch_id: str, timeout: Optional[float] = None) -> Optional[BulkCreateOfferResponse]:
+        """Wait until every job of the batch has finished (or the timeout passes)."""
+        state = await asyncio.to_thread(self._load_batch, batch_id)
+        if state is None:
+            return None
+
+        async def wait_all() -> None:
+            for job_id in state['job_ids']:
+                record = await self.get(job_id)
+                while record is not None and record.status not in TERMINAL_STATUSES:
+                    await record.changed.wait()
+
+        try:
+            await asyncio.wait_for(wait_all(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        return await self.get_batch(batch_id)
+
+    async def get(self, job_id: str) -> Optional[OfferJobRecord]:
+        """Job state from memory, falling back to SQLite for older jobs."""
+        record = self._jobs.get(job_id)
+        if record is not None:
+            return record
+        state = await asyncio.to_thread(self._load, job_id)
+        if state is None:
+            return None
+        record = OfferJobRecord.from_dict(state)
+        self._remember(record)
+        return record
+
+    async def stream_events(
+        self,
+        job_id: str,
+        after: int = 0,
+        heartbeat_seconds: float = 15.0
+    ) -> AsyncIterator[str]:
+        """
+        Server-sent events for a job: events after `after`, then new ones until the job finishes.
+
+        Comment lines are sent while idle so proxies keep the connection open.
+        """
+        record = await self.get(job_id)
+        if record is None:
+            return
+        while True:
+            changed = record.changed
+            for event in record.events:
+                if event['seq'] > after:
+                    after = event['seq']
+                    yield format_sse(event)
+            if record.status in TERMINAL_STATUSES:
+                return
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=heartbeat_seconds)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+
+    def stats(self) -> Dict[str, Any]:
+        """Worker pool and job status counts."""
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM offer_job_states GROUP BY status"
+            ).fetchall()
+        return {'jobs': {status: count for status, count in rows}, 'pool': self.pool.stats()}
+
+    # ==================== WORKER ====================
+
+    async def _run_job(self, email_data: Dict[str, Any]) -> CreateOfferResponse:
+        job_id = email_data['job_id']
+        record = await self.get(job_id) or OfferJobRecord(job_id=job_id)
+        self._remember(record)
+        record.status = JOB_RUNNING
+        self._publish(record, "started")
+        await asyncio.to_thread(self._save, record)
+
+        def on_step_started(step: WorkflowStep, context: WorkflowContext) -> None:
+            record.current_step = step.value
+            self._publish(record, "step_started", step=step.value)
+
+        def on_step_completed(step: WorkflowStep, context: WorkflowContext) -> None:
+            if step.value not in record.completed_steps:
+                record.completed_steps.append(step.value)
+            data = self._step_summary(step, context)
+            if 'matches' in data:
+                record.matches = data['matches']
+            self._publish(record, "step_completed", step=step.value, data=data)
+
+        batch_id = email_data.get('batch_id')
+        try:
+            with use_batch_scope(self._scopes.get(batch_id)):
+                response = await self.offer_service.create_offer_from_email_data(
+                    email_data,
+                    # The job ID (the client request_id when given) keys its checkpoints,
+                    # so a requeued job resumes where it was interrupted
+                    request_id=job_id,
+                    on_step_started=on_step_started,
+                    on_step_completed=on_step_completed,
+                )
+        finally:
+            pending = self._batch_pending.get(batch_id)
+            if pending is not None:
+                pending.discard(job_id)
+                if not pending:
+                    self._finish_batch(batch_id)
+
+        # The job is done (a failed offer is not retried), so its attachment files can go
+        release_attachments(email_data)
+
+        record.status = JOB_COMPLETED if response.success else JOB_FAILED
+        record.current_step = None
+        record.result = response.model_dump()
+        self._publish(record, record.status, data={
+            'offer_id': response.offer_id,
+            'offer_number': response.offer_number,
+            'message': response.message,
+            'errors': response.errors,
+        })
+        await asyncio.to_thread(self._save, record)
+        return response
+
+    @staticmethod
+    def _step_summary(step: WorkflowStep, context: WorkflowContext) -> Dict[str, Any]:
+        """What a finished step found, for the progress stream."""
+        if step == WorkflowStep.EXTRACT_COMPANY:
+            return {'company_name': context.company_name, 'customer_number': context.customer_number}
+        if step == WorkflowStep.FIND_CUSTOMER and context.customer:
+            return {'customer_name': context.customer.name, 'customer_number': context.customer.customer_number}
+        if step == WorkflowStep.EXTRACT_PRODUCTS:
+            # Products are matched during extraction, so the UI can show them now
+            return {'products': len(context.extracted_products), 'matches': match_rows(context.extracted_products)}
+        if step == WorkflowStep.MATCH_PRODUCTS:
+            return {'products': len(context.matched_products)}
+        if step == WorkflowStep.CALCULATE_PRICING and context.pricing_result:
+            return {'total_amount': context.pricing_result.get('total_amount')}
+        if step == WorkflowStep.BUILD_OFFER and context.offer:
+            return {'lines': len(context.offer.lines)}
+        return {}
+
+    # ==================== BATCHES ====================
+
+    def _finish_batch(self, batch_id: str) -> None:
+        """Drop the shared lookups of a batch whose jobs have all finished."""
+        scope = self._scopes.pop(batch_id, None)
+        self._batch_pending.pop(batch_id, None)
+        if scope is None:
+            return
+        shared = scope.stats()
+        self.logger.info(f"Offer batch {batch_id} finished; shared lookups: {shared}")
+        state = self._load_batch(batch_id)
+        if state is not None:
+            state['shared_lookups'] = shared
+            self._save_batch(batch_id, state)
+
+    @staticmethod
+    def _batch_response(state: Dict[str, Any], records: List[Optional[OfferJobRecord]]) -> BulkCreateOfferResponse:
+        results = []
+        for job_id, record in zip(state['job_ids'], records):
+            result = record.to_response(include_events=False).result if record else None
+            status = record.status if record else JOB_FAILED
+            results.append(CreateOfferResponse(
+                success=status != JOB_FAILED,
+                offer_id=result.offer_id if result else None,
+                offer_number=result.offer_number if result else None,
+                message=result.message if result else f"Offer request {status}",
+                errors=result.errors if result else [],
+                warnings=result.warnings if result else [],
+                job_id=job_id,
+                status=status,
+            ))
+        statuses = [result.status for result in results]
+        if all(status in TERMINAL_STATUSES for status in statuses):
+            status = JOB_COMPLETED
+        elif all(status == JOB_QUEUED for status in statuses):
+            status = JOB_QUEUED
+        else:
+            status = JOB_RUNNING
+        return BulkCreateOfferResponse(
+            batch_id=state['batch_id'],
+            status=status,
+            total=len(results),
+            completed=statuses.count(JOB_COMPLETED),
+            failed=statuses.count(JOB_FAILED),
+            customer_groups=state.get('customer_groups', {}),
+            shared_lookups=state.get('shared_lookups', {}),
+            results=results,
+        )
+
+    def _save_batch(self, batch_id: str, state: Dict[str, Any]) -> None:
+        with self._db_lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO offer_batches (batch_id, created_at, state) VALUES (?, ?, ?)",
+                (batch_id, time.time(), json.dumps(state))
+            )
+
+    def _load_batch(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT state FROM offer_batches WHERE batch_id = ?", (batch_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    # ==================== STATE ====================
+
+    def _publish(
+        self,
+        record: OfferJobRecord,
+        event: str,
+        step: Optional[str] = None,
+        data: Optional[Dict[str, Any]] = None
+    ) -> None:
+        now = time.time()
+        record.events.append({
+            'seq': record.next_seq,
+            'event': event,
+            'step': step,
+            'timestamp': now,
+            'data': data or {},
+        })
+        record.next_seq += 1
+        if len(record.events) > self.max_events:
+            del record.events[:len(record.events) - self.max_events]
+        record.updated_at = now
+
+        # Wake every stream waiting on the previous event object
+        changed, record.changed = record.changed, asyncio.Event()
+        changed.set()
+
+    def _remember(self, record: OfferJobRecord) -> None:
+        self._jobs[record.job_id] = record
+        self._jobs.move_to_end(record.job_id)
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in TERMINAL_STATUSES]
+        for job_id in finished[:max(len(self._jobs) - self.max_cached_jobs, 0)]:
+            del self._jobs[job_id]
+
+    def _save(self, record: OfferJobRecord) -> None:
+        with self._db_lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO offer_job_states (job_id, status, updated_at, state) VALUES (?, ?, ?, ?)",
+                (record.job_id, record.status, record.updated_at, json.dumps(record.to_dict(), default=str))
+            )
+
+    def _load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT state FROM offer_job_states WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+# Global singleton instance
+_job_service_instance: Optional[OfferJobService] = None
+_job_service_lock = Lock()
+
+
+def get_offer_job_service() -> OfferJobService:
+    """
+    Get the global OfferJobService instance.
+
+    Returns:
+        The singleton OfferJobService instance
+    """
+    global _job_service_instance
+
+    with _job_service_lock:
+        if _job_service_instance is None:
+            _job_service_instance = OfferJobService()
+        return _job_service_instance
@@ -6,7 +6,7 @@ Bridges the API layer with the orchestrator and pending store.
 import base64
 import uuid
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
 from threading import Lock
 
 from src.api.models.requests import CreateOfferRequest, SendToERPRequest
@@ -17,11 +17,25 @@ from src.api.models.responses import (
     SendOfferResponse,
     DeleteOfferResponse,
 )
+from src.api.services.context_store import WorkflowContextStore, get_workflow_context_store
 from src.api.services.pending_store import PendingOfferStore, get_pending_store
-from src.core.orchestrator import OfferOrchestrator
+from src.core.checkpoint import CheckpointStore, get_checkpoint_store
+from src.core.dag_executor import StepCallback
 from src.core.workflow import WorkflowContext
+from src.email_processing.attachment_store import (
+    get_attachment_store,
+    new_owner,
+    release_attachments,
+    spooling_enabled,
+)
+from src.llm.rate_limiter import PRIORITY_INTERACTIVE, use_llm_priority
+from src.utils.exceptions import AttachmentSpoolError
 from src.utils.logger import get_logger
 
+if TYPE_CHECKING:
+    # Imported on first use (see _get_orchestrator): it loads the whole matching stack
+    from src.core.orchestrator import OfferOrchestrator
+
 
 class OfferService:
     """
@@ -37,7 +51,9 @@ class OfferService:
     def __init__(
         self,
         store: Optional[PendingOfferStore] = None,
-        orchestrator: Optional[OfferOrchestrator] = None
+        orchestrator: Optional["OfferOrchestrator"] = None,
+        checkpoints: Optional[CheckpointStore] = None,
+        contexts: Optional[WorkflowContextStore] = None
     ):
         """
         Initialize the service.
@@ -45,21 +61,32 @@ class OfferService:
         Args:
             store: PendingOfferStore instance (defaults to global singleton)
             orchestrator: OfferOrchestrator instance (defaults to new instance)
+            checkpoints: CheckpointStore instance (defaults to global singleton)
+            contexts: WorkflowContextStore instance (defaults to global singleton)
         """
         self.logger = get_logger(__name__)
         self._store = store or get_pending_store()
         self._orchestrator = orchestrator
+        self._orchestrator_lock = Lock()
+        self._checkpoints = checkpoints or get_checkpoint_store()
 
-        # Store workflow contexts for approved offers (keyed by offer_id)
-        self._contexts: Dict[str, WorkflowContext] = {}
-        self._context_lock = Lock()
+        # Workflow contexts of offers awaiting review (keyed by offer_id), bounded and spillable
+        self._contexts = contexts or get_workflow_context_store()
 
-    def _get_orchestrator(self) -> OfferOrchestrator:
+    def _get_orchestrator(self) -> "OfferOrchestrator":
         """Get or create orchestrator instance."""
         if self._orchestrator is None:
-            self._orchestrator = OfferOrchestrator()
+            # Warm-up creates it in a worker thread while requests may already arrive
+            with self._orchestrator_lock:
+                if self._orchestrator is None:
+                    from src.core.orchestrator import OfferOrchestrator
+                    self._orchestrator = OfferOrchestrator()
         return self._orchestrator
 
+    def warm_up(self) -> "OfferOrchestrator":
+        """Import and create the orchestrator ahead of the first request."""
+        return self._get_orchestrator()
+
     async def create_offer(self, request: CreateOfferRequest) -> CreateOfferResponse:
         """
         Create a new offer from form data.
@@ -73,15 +100,57 @@ class OfferService:
         Returns:
             CreateOfferResponse with success status and offer ID
         """
-        self.logger.info(f"Creating offer from: {request.sender}")
-
         try:
             # Convert request to email_data format expected by orchestrator
-            email_data = self._convert_request_to_email_data(request)
+            email_data = self.convert_request_to_email_data(request)
+        except Exception as e:
+            self.logger.error(f"Failed to create offer: {e}", exc_info=True)
+            return CreateOfferResponse(
+                success=False,
+                message=f"Failed to create offer: {str(e)}",
+                errors=[str(e)]
+            )
+        try:
+            return await self.create_offer_from_email_data(email_data, request_id=request.request_id)
+        finally:
+            release_attachments(email_data)
+
+    async def create_offer_from_email_data(
+        self,
+        email_data: Dict[str, Any],
+        request_id: Optional[str] = None,
+        on_step_started: Optional[StepCallback] = None,
+        on_step_completed: Optional[StepCallback] = None
+    ) -> CreateOfferResponse:
+        """
+        Create a new offer from already converted email data.
+
+        Used directly by background offer jobs, which convert the request
+        when it is queued.
 
-            # Process through orchestrator (stops before ERP creation)
+        Args:
+            email_data: Email data as built by convert_request_to_email_data
+            request_id: Client request ID (resumes from checkpoints on retry)
+            on_step_started: Progress hook called when a workflow step starts
+            on_step_completed: Progress hook called when a workflow step finishes
+
+        Returns:
+            CreateOfferResponse with success status and offer ID
+        """
+        customer_email = email_data.get("sender", "")
+        self.logger.info(f"Creating offer from: {customer_email}")
+
+        try:
+            # Process through orchestrator (stops before ERP creation).
+            # A user is waiting on this request, so its LLM calls go first.
             orchestrator = self._get_orchestrator()
-            result = await orchestrator.process_offer_request_for_review(email_data)
+            with use_llm_priority(PRIORITY_INTERACTIVE):
+                result = await orchestrator.process_offer_request_for_review(
+                    email_data,
+                    request_id=request_id,
+                    on_step_started=on_step_started,
+                    on_step_completed=on_step_completed
+                )
 
             if not result.success:
                 return CreateOfferResponse(
@@ -96,15 +165,19 @@ class OfferService:
             pending_offer = self._workflow_result_to_pending_offer(
                 offer_id=offer_id,
                 result=result,
-                customer_email=request.sender
+                customer_email=customer_email
             )
 
             # Store the pending offer
             await self._store.add(pending_offer)
 
             # Store the workflow context for later ERP submission
-            with self._context_lock:
-                self._contexts[offer_id] = result.context
+            if result.context:
+                await self._contexts.put_async(offer_id, result.context)
+
+            # Link the offer to its checkpoints so the context survives restarts
+            if result.context:
+                self._checkpoints.link(offer_id, result.context.metadata.get('checkpoint_key'))
 
             self.logger.info(f"Offer created: {offer_id} ({pending_offer.offer_number})")
 
@@ -142,6 +215,37 @@ class OfferService:
         """
         return await self._store.get_all()
 
+    async def list_offers(
+        self,
+        status: Optional[str] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[PendingOfferResponse], Optional[str]]:
+        """
+        Get one page of offers, newest first.
+
+        Args:
+            status: Only offers with this status (None = all)
+            limit: Page size
+            cursor: next_cursor of the previous page
+
+        Returns:
+            (offers, next_cursor)
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        return await self._store.list_page(status=status, limit=limit, cursor=cursor)
+
+    async def count_offers_by_status(self) -> Dict[str, int]:
+        """
+        Get offer counts per status.
+
+        Returns:
+            Dict of status -> count
+        """
+        return await self._store.count_by_status_async()
+
     async def get_offer(self, offer_id: str) -> Optional[PendingOfferResponse]:
         """
         Get a single offer by ID.
@@ -185,13 +289,18 @@ class OfferService:
             await self._store.update_status(offer_id, "processing")
 
             # Get the workflow context
-            with self._context_lock:
-                context = self._contexts.get(offer_id)
+            context: Optional[WorkflowContext] = await self._contexts.get_async(offer_id)
+
+            if not context:
+                # Context lost (e.g., after restart): rebuild it from workflow checkpoints
+                checkpoint_key = self._checkpoints.resolve(offer_id)
+                if checkpoint_key:
+                    context = self._get_orchestrator().restore_context(checkpoint_key)
+                    if context:
+                        self.logger.info(f"Restored context for offer {offer_id} from checkpoints")
 
             if not context:
-                self.logger.warning(f"No context found for offer {offer_id}, recreating minimal context")
-                # If context is lost (e.g., after restart), we can't send to ERP
-                # In production, you might want to re-process or store context in file
+                self.logger.warning(f"No context found for offer {offer_id}")
                 await self._store.update_status(offer_id, "failed")
                 return SendOfferResponse(
                     success=False,
@@ -220,8 +329,8 @@ class OfferService:
                 await self._store.update_status(offer_id, "sent")
 
                 # Clean up context
-                with self._context_lock:
-                    self._contexts.pop(offer_id, None)
+                await self._contexts.pop_async(offer_id)
+                self._checkpoints.unlink(offer_id)
 
                 return SendOfferResponse(
                     success=True,
@@ -268,9 +377,12 @@ class OfferService:
                     message=f"Offer not found: {offer_id}"
                 )
 
-            # Clean up context
-            with self._context_lock:
-                self._contexts.pop(offer_id, None)
+            # Clean up context and checkpoints
+            await self._contexts.pop_async(offer_id)
+            checkpoint_key = self._checkpoints.resolve(offer_id)
+            if checkpoint_key:
+                self._checkpoints.delete(checkpoint_key)
+            self._checkpoints.unlink(offer_id)
 
             return DeleteOfferResponse(
                 success=True,
@@ -284,7 +396,7 @@ class OfferService:
                 message=f"Failed to delete offer: {str(e)}"
             )
 
-    def _convert_request_to_email_data(self, request: CreateOfferRequest) -> Dict[str, Any]:
+    def convert_request_to_email_data(self, request: CreateOfferRequest) -> Dict[str, Any]:
         """
         Convert API request to email_data format for orchestrator.
 
@@ -294,27 +406,44 @@ class OfferService:
         Returns:
             Dict in email_data format
         """
-        # Convert attachments from base64
+        # Convert attachments from base64 (spooled to disk, see attachment_store)
+        store = get_attachment_store() if spooling_enabled() else None
+        owner = new_owner()
         attachments = []
         for att in request.attachments:
+            mime_type = att.mime_type or "application/octet-stream"
             try:
+                if store is not None:
+                    try:
+                        attachments.append(store.spool_base64(
+                            att.data, owner=owner, filename=att.filename, mime_type=mime_type,
+                            source="api", urlsafe=False
+                        ))
+                        continue
+                    except AttachmentSpoolError as e:
+                        if e.context.get('reason') != 'spool_full':
+                            raise
+                        self.logger.warning(f"{e}; keeping {att.filename} in memory")
                 decoded_data = base64.b64decode(att.data)
                 attachments.append({
                     "filename": att.filename,
                     "data": decoded_data,
-                    "mime_type": att.mime_type or "application/octet-stream",
+                    "mime_type": mime_type,
                     "source": "api"
                 })
             except Exception as e:
                 self.logger.warning(f"Failed to decode attachment {att.filename}: {e}")
 
-        return {
+        email_data = {
             "sender": request.sender,
             "subject": request.subject,
             "body": request.body,
             "attachments": attachments,
             "date": datetime.now().isoformat()
         }
+        if any(attachment.get("spooled") for attachment in attachments):
+            email_data["attachment_owner"] = owner
+        return email_data
 
     def _workflow_result_to_pending_offer(
         self,
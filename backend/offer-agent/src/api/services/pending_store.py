@@ -1,140 +1,295 @@
 """
-In-memory storage with JSON file backup for pending offers.
+SQLite-backed storage for pending offers.
 
-Provides simple, no-dependency storage that survives container restarts
-via JSON file persistence.
+Offers live in a WAL-mode SQLite database with indexes on status and
+creation time, so a write touches one row instead of rewriting every offer,
+and listings page through the index with an opaque cursor instead of
+loading and filtering the whole store. Expired offers are removed and the
+WAL is checkpointed by a background maintenance task.
+
+An existing JSON backup (the previous storage format) is imported on first
+start.
 """
+import asyncio
+import base64
 import json
 import os
-import asyncio
-from datetime import datetime, timedelta
+import sqlite3
+import time
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from threading import Lock
 
-from src.api.models.responses import PendingOfferResponse, OrderLineResponse
+from src.api.models.responses import PendingOfferResponse
 from src.utils.logger import get_logger
 
 
+OFFER_STATUSES = ("pending", "processing", "sent", "failed")
+
+
+def _timestamp(value: datetime) -> float:
+    """Epoch seconds; naive datetimes are UTC (created_at uses datetime.utcnow())."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def encode_cursor(created_at: float, offer_id: str) -> str:
+    """Opaque keyset cursor: position after the given (created_at, id)."""
+    return base64.urlsafe_b64encode(f"{created_at!r}|{offer_id}".encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    """Inverse of encode_cursor; raises ValueError for malformed cursors."""
+    try:
+        created_at, offer_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+        return float(created_at), offer_id
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
 class PendingOfferStore:
     """
-    In-memory store for pending offers with JSON file backup.
+    SQLite store for pending offers.
 
     Features:
-    - Thread-safe in-memory dict
-    - Auto-save to JSON file on changes
-    - Load from file on startup
-    - Auto-cleanup of offers older than 7 days
+    - One row per offer; status and created_at are indexed columns
+    - Keyset (cursor) pagination, newest first
+    - TTL cleanup and WAL compaction in the background
+    - Async methods run the SQLite work in a worker thread, so the event
+      loop never waits on disk I/O; sync methods are safe from any thread
     """
 
-    def __init__(self, backup_path: Optional[str] = None):
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        legacy_backup_path: Optional[str] = None,
+        ttl_days: Optional[float] = None
+    ):
         """
         Initialize the store.
 
         Args:
-            backup_path: Path to JSON backup file. Defaults to /app/data/pending_offers.json
+            db_path: SQLite file. Defaults to PENDING_OFFERS_DB_PATH or
+                /app/data/pending_offers.db; ":memory:" for tests/benchmarks.
+            legacy_backup_path: JSON backup of the old store, imported once if
+                present. Defaults to PENDING_OFFERS_PATH or /app/data/pending_offers.json
+            ttl_days: Offers older than this are removed (PENDING_OFFERS_TTL_DAYS, default 7)
         """
         self.logger = get_logger(__name__)
         self._lock = Lock()
-        self._offers: Dict[str, PendingOfferResponse] = {}
-
-        # Determine backup path
-        if backup_path:
-            self._backup_path = Path(backup_path)
-        else:
-            self._backup_path = Path(
-                os.getenv("PENDING_OFFERS_PATH", "/app/data/pending_offers.json")
+        if ttl_days is None:
+            ttl_days = float(os.getenv("PENDING_OFFERS_TTL_DAYS", "7"))
+        self.ttl_seconds = ttl_days * 86400
+
+        path = db_path or os.getenv("PENDING_OFFERS_DB_PATH", "/app/data/pending_offers.db")
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # Must be set before the first table exists to allow incremental vacuum
+        self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS pending_offers (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                data TEXT NOT NULL
             )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_pending_offers_status ON pending_offers (status, created_at, id)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_pending_offers_created ON pending_offers (created_at, id)"
+        )
 
-        # Ensure directory exists
-        self._backup_path.parent.mkdir(parents=True, exist_ok=True)
+        legacy_path = legacy_backup_path or os.getenv("PENDING_OFFERS_PATH", "/app/data/pending_offers.json")
+        self._import_legacy_backup(Path(legacy_path))
 
-        # Load from file if exists
-        self._load_from_file()
+        self.cleanup_expired()
+        self._maintenance_task: Optional[asyncio.Task] = None
 
-        # Cleanup old offers
-        self._cleanup_old_offers()
+        self.logger.info(f"PendingOfferStore initialized with {self.count()} offers")
 
-        self.logger.info(f"PendingOfferStore initialized with {len(self._offers)} offers")
+    # ==================== SERIALIZATION ====================
 
-    def _load_from_file(self) -> None:
-        """Load offers from JSON backup file."""
-        if not self._backup_path.exists():
-            self.logger.info(f"No backup file found at {self._backup_path}")
-            return
+    @staticmethod
+    def _encode(offer: PendingOfferResponse) -> Tuple[str, str, float, str]:
+        # status lives only in its column so status updates never rewrite the offer
+        data = offer.model_dump(mode="json", exclude={"status"})
+        return offer.id, offer.status, _timestamp(offer.created_at), json.dumps(data, separators=(",", ":"))
 
-        try:
-            with open(self._backup_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+    @staticmethod
+    def _decode(status: str, data: str) -> PendingOfferResponse:
+        return PendingOfferResponse(**json.loads(data), status=status)
 
-            offers_data = data.get("offers", {})
+    def _import_legacy_backup(self, legacy_path: Path) -> None:
+        """Import the JSON backup written by the previous store, then rename it."""
+        if not legacy_path.exists():
+            return
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                offers_data = json.load(f).get("offers", {})
+            rows = []
             for offer_id, offer_dict in offers_data.items():
                 try:
-                    # Parse datetime strings
                     if isinstance(offer_dict.get("created_at"), str):
                         offer_dict["created_at"] = datetime.fromisoformat(
                             offer_dict["created_at"].replace("Z", "+00:00")
                         )
-
-                    # Parse lines
-                    lines = [
-                        OrderLineResponse(**line) for line in offer_dict.get("lines", [])
-                    ]
-                    offer_dict["lines"] = lines
-
-                    self._offers[offer_id] = PendingOfferResponse(**offer_dict)
+                    rows.append(self._encode(PendingOfferResponse(**offer_dict)))
                 except Exception as e:
                     self.logger.warning(f"Failed to parse offer {offer_id}: {e}")
+            with self._lock:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO pending_offers (id, status, created_at, data) VALUES (?, ?, ?, ?)", rows
+                )
+                self._conn.execute("COMMIT")
+            legacy_path.rename(legacy_path.with_suffix(".json.imported"))
+            self.logger.info(f"Imported {len(rows)} offers from {legacy_path}")
+        except Exception as e:
+            self.logger.error(f"Failed to import backup file {legacy_path}: {e}")
 
-            self.logger.info(f"Loaded {len(self._offers)} offers from backup")
+    # ==================== SYNC API ====================
 
-        except Exception as e:
-            self.logger.error(f"Failed to load backup file: {e}")
+    def add_sync(self, offer: PendingOfferResponse) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pending_offers (id, status, created_at, data) VALUES (?, ?, ?, ?)",
+                self._encode(offer)
+            )
 
-    def _save_to_file(self) -> None:
-        """Save offers to JSON backup file."""
-        try:
-            # Convert to serializable format
-            offers_data = {}
-            for offer_id, offer in self._offers.items():
-                offer_dict = offer.model_dump()
-                # Convert datetime to ISO string
-                if isinstance(offer_dict.get("created_at"), datetime):
-                    offer_dict["created_at"] = offer_dict["created_at"].isoformat()
-                offers_data[offer_id] = offer_dict
-
-            data = {
-                "offers": offers_data,
-                "last_updated": datetime.utcnow().isoformat() + "Z"
-            }
-
-            # Write atomically by writing to temp file first
-            temp_path = self._backup_path.with_suffix(".tmp")
-            with open(temp_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2, default=str)
-
-            # Rename to actual path (atomic on most systems)
-            temp_path.rename(self._backup_path)
+    def add_many_sync(self, offers: List[PendingOfferResponse]) -> None:
+        """Insert offers in one transaction (imports, benchmarks)."""
+        rows = [self._encode(offer) for offer in offers]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO pending_offers (id, status, created_at, data) VALUES (?, ?, ?, ?)", rows
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def get_sync(self, offer_id: str) -> Optional[PendingOfferResponse]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, data FROM pending_offers WHERE id = ?", (offer_id,)
+            ).fetchone()
+        return self._decode(*row) if row else None
+
+    def list_page_sync(
+        self,
+        status: Optional[str] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[PendingOfferResponse], Optional[str]]:
+        """
+        One page of offers, newest first.
 
-        except Exception as e:
-            self.logger.error(f"Failed to save backup file: {e}")
+        Args:
+            status: Only offers with this status (None = all)
+            limit: Page size (None = everything after the cursor)
+            cursor: next_cursor of the previous page
+
+        Returns:
+            (offers, next_cursor); next_cursor is None on the last page
+        """
+        clauses, params = [], []
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        if cursor:
+            created_at, offer_id = decode_cursor(cursor)
+            clauses.append("(created_at < ? OR (created_at = ? AND id < ?))")
+            params.extend([created_at, created_at, offer_id])
+        sql = "SELECT id, status, created_at, data FROM pending_offers"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY created_at DESC, id DESC"
+        if limit is not None:
+            # One extra row tells whether another page exists
+            sql += " LIMIT ?"
+            params.append(limit + 1)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
 
-    def _cleanup_old_offers(self) -> None:
-        """Remove offers older than 7 days."""
-        cutoff = datetime.utcnow() - timedelta(days=7)
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][2], rows[-1][0])
+        return [self._decode(status_value, data) for _, status_value, _, data in rows], next_cursor
 
+    def update_sync(self, offer: PendingOfferResponse) -> bool:
+        offer_id, status, created_at, data = self._encode(offer)
         with self._lock:
-            old_count = len(self._offers)
-            self._offers = {
-                offer_id: offer
-                for offer_id, offer in self._offers.items()
-                if offer.created_at.replace(tzinfo=None) > cutoff
-            }
-            removed = old_count - len(self._offers)
-
-            if removed > 0:
-                self.logger.info(f"Cleaned up {removed} old offers")
-                self._save_to_file()
+            cursor = self._conn.execute(
+                "UPDATE pending_offers SET status = ?, created_at = ?, data = ? WHERE id = ?",
+                (status, created_at, data, offer_id)
+            )
+        return cursor.rowcount > 0
+
+    def update_status_sync(self, offer_id: str, status: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE pending_offers SET status = ? WHERE id = ?", (status, offer_id)
+            )
+        return cursor.rowcount > 0
+
+    def delete_sync(self, offer_id: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM pending_offers WHERE id = ?", (offer_id,))
+        return cursor.rowcount > 0
+
+    def count(self, status: Optional[str] = None) -> int:
+        """Number of offers (with the given status)."""
+        with self._lock:
+            if status is None:
+                return self._conn.execute("SELECT COUNT(*) FROM pending_offers").fetchone()[0]
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM pending_offers WHERE status = ?", (status,)
+            ).fetchone()[0]
+
+    def count_by_status(self) -> Dict[str, int]:
+        """Get counts by status."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM pending_offers GROUP BY status"
+            ).fetchall()
+        counts = {status: 0 for status in OFFER_STATUSES}
+        for status, count in rows:
+            key = status if status in counts else "pending"
+            counts[key] += count
+        return counts
+
+    def cleanup_expired(self) -> int:
+        """Remove offers older than the TTL."""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM pending_offers WHERE created_at < ?", (cutoff,))
+        if cursor.rowcount > 0:
+            self.logger.info(f"Cleaned up {cursor.rowcount} old offers")
+        return cursor.rowcount
+
+    def compact(self) -> None:
+        """Fold the WAL back into the database and release free pages."""
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._conn.execute("PRAGMA incremental_vacuum")
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    # ==================== ASYNC API ====================
 
     async def add(self, offer: PendingOfferResponse) -> None:
         """
@@ -143,9 +298,7 @@ class PendingOfferStore:
         Args:
             offer: The offer to add
         """
-        with self._lock:
-            self._offers[offer.id] = offer
-            self._save_to_file()
+        await asyncio.to_thread(self.add_sync, offer)
         self.logger.info(f"Added offer {offer.id} ({offer.offer_number})")
 
     async def get(self, offer_id: str) -> Optional[PendingOfferResponse]:
@@ -158,19 +311,26 @@ class PendingOfferStore:
         Returns:
             The offer if found, None otherwise
         """
-        with self._lock:
-            return self._offers.get(offer_id)
+        return await asyncio.to_thread(self.get_sync, offer_id)
+
+    async def list_page(
+        self,
+        status: Optional[str] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[PendingOfferResponse], Optional[str]]:
+        """Async list_page_sync: (offers newest first, next_cursor)."""
+        return await asyncio.to_thread(self.list_page_sync, status, limit, cursor)
 
     async def get_all(self) -> List[PendingOfferResponse]:
         """
-        Get all pending offers.
+        Get all offers.
 
         Returns:
             List of all offers sorted by created_at desc
         """
-        with self._lock:
-            offers = list(self._offers.values())
-        return sorted(offers, key=lambda o: o.created_at, reverse=True)
+        offers, _ = await self.list_page()
+        return offers
 
     async def get_pending(self) -> List[PendingOfferResponse]:
         """
@@ -179,9 +339,8 @@ class PendingOfferStore:
         Returns:
             List of pending offers sorted by created_at desc
         """
-        with self._lock:
-            offers = [o for o in self._offers.values() if o.status == "pending"]
-        return sorted(offers, key=lambda o: o.created_at, reverse=True)
+        offers, _ = await self.list_page(status="pending")
+        return offers
 
     async def update(self, offer: PendingOfferResponse) -> bool:
         """
@@ -193,13 +352,10 @@ class PendingOfferStore:
         Returns:
             True if updated, False if not found
         """
-        with self._lock:
-            if offer.id not in self._offers:
-                return False
-            self._offers[offer.id] = offer
-            self._save_to_file()
-        self.logger.info(f"Updated offer {offer.id}")
-        return True
+        updated = await asyncio.to_thread(self.update_sync, offer)
+        if updated:
+            self.logger.info(f"Updated offer {offer.id}")
+        return updated
 
     async def update_status(self, offer_id: str, status: str) -> bool:
         """
@@ -212,29 +368,10 @@ class PendingOfferStore:
         Returns:
             True if updated, False if not found
         """
-        with self._lock:
-            if offer_id not in self._offers:
-                return False
-
-            # Create updated offer with new status
-            old_offer = self._offers[offer_id]
-            updated_offer = PendingOfferResponse(
-                id=old_offer.id,
-                offer_number=old_offer.offer_number,
-                customer_name=old_offer.customer_name,
-                customer_email=old_offer.customer_email,
-                created_at=old_offer.created_at,
-                status=status,
-                total_amount=old_offer.total_amount,
-                lines=old_offer.lines,
-                warnings=old_offer.warnings,
-                errors=old_offer.errors,
-            )
-            self._offers[offer_id] = updated_offer
-            self._save_to_file()
-
-        self.logger.info(f"Updated offer {offer_id} status to {status}")
-        return True
+        updated = await asyncio.to_thread(self.update_status_sync, offer_id, status)
+        if updated:
+            self.logger.info(f"Updated offer {offer_id} status to {status}")
+        return updated
 
     async def delete(self, offer_id: str) -> bool:
         """
@@ -246,27 +383,40 @@ class PendingOfferStore:
         Returns:
             True if deleted, False if not found
         """
-        with self._lock:
-            if offer_id not in self._offers:
-                return False
-            del self._offers[offer_id]
-            self._save_to_file()
-        self.logger.info(f"Deleted offer {offer_id}")
-        return True
-
-    def count(self) -> int:
-        """Get total number of offers."""
-        with self._lock:
-            return len(self._offers)
-
-    def count_by_status(self) -> Dict[str, int]:
-        """Get counts by status."""
-        with self._lock:
-            counts = {"pending": 0, "processing": 0, "sent": 0, "failed": 0}
-            for offer in self._offers.values():
-                status = offer.status if offer.status in counts else "pending"
-                counts[status] += 1
-            return counts
+        deleted = await asyncio.to_thread(self.delete_sync, offer_id)
+        if deleted:
+            self.logger.info(f"Deleted offer {offer_id}")
+        return deleted
+
+    async def count_async(self, status: Optional[str] = None) -> int:
+        return await asyncio.to_thread(self.count, status)
+
+    async def count_by_status_async(self) -> Dict[str, int]:
+        return await asyncio.to_thread(self.count_by_status)
+
+    # ==================== MAINTENANCE ====================
+
+    def start_maintenance(self, interval_seconds: Optional[float] = None) -> None:
+        """Start the background TTL cleanup and compaction task (call from the event loop)."""
+        if self._maintenance_task is None or self._maintenance_task.done():
+            interval = interval_seconds or float(os.getenv("PENDING_OFFERS_MAINTENANCE_SECONDS", "3600"))
+            self._maintenance_task = asyncio.create_task(self._maintenance_loop(interval))
+
+    async def stop_maintenance(self) -> None:
+        """Stop the background maintenance task."""
+        task, self._maintenance_task = self._maintenance_task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _maintenance_loop(self, interval_seconds: float) -> None:
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await asyncio.to_thread(self.cleanup_expired)
+                await asyncio.to_thread(self.compact)
+            except Exception as e:
+                self.logger.warning(f"Pending offer store maintenance failed: {e}")
 
 
 # Global singleton instance
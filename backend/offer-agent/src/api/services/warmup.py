@@ -0,0 +1,237 @@
+"""
+Warm-up phase of the API process.
+
+The API module imports only what is needed to serve HTTP: the matching
+stack (pandas, numpy, LLM SDKs), the ERP repositories and the product
+catalogue are loaded by the first offer request that needs them. Without
+a warm-up that request pays for all of it. WarmupService loads them right
+after startup in a worker thread, step by step, while the server already
+answers health checks; GET /ready reports 503 until the critical steps
+have finished so the load balancer only routes traffic to warm tasks.
+
+OCR/PDF processing stays lazy: it is loaded by the first email with
+attachments.
+
+Timings of every step, plus process start-to-ready and first-request
+latency, are reported in /health and /ready.
+"""
+import asyncio
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional
+
+from src.utils.logger import get_logger
+
+
+WARMUP_PENDING = "pending"
+WARMUP_RUNNING = "running"
+WARMUP_READY = "ready"
+WARMUP_FAILED = "failed"
+WARMUP_DISABLED = "disabled"
+
+
+
+def process_start_time() -> float:
+    """When this process was started (epoch seconds), including interpreter start-up and imports."""
+    try:
+        with open('/proc/self/stat', 'rb') as f:
+            # Field 22 (after the parenthesised command name): start time in clock ticks since boot
+            start_ticks = int(f.read().rsplit(b')', 1)[1].split()[19])
+        with open('/proc/uptime', 'rb') as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - (uptime - start_ticks / os.sysconf('SC_CLK_TCK'))
+    except (OSError, ValueError, IndexError):
+        # No procfs: the time this module was imported
+        return time.time()
+
+
+PROCESS_STARTED = process_start_time()
+
+
+@dataclass
+class WarmupStep:
+    """One warm-up step and how it went."""
+    name: str
+    critical: bool = False
+    status: str = WARMUP_PENDING
+    seconds: Optional[float] = None
+    detail: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+
+class WarmupService:
+    """Runs the warm-up steps once and reports readiness."""
+
+    def __init__(self, enabled: Optional[bool] = None):
+        """
+        Args:
+            enabled: Run the warm-up at startup (defaults to WARMUP_ENABLED, true).
+                When disabled the process is ready immediately and loads lazily.
+        """
+        self.logger = get_logger(__name__)
+        self.enabled = enabled if enabled is not None else os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+        self._lock = Lock()
+        self._steps: List[WarmupStep] = []
+        self._runners: Dict[str, Callable[[], Optional[Dict[str, Any]]]] = {}
+        self._status = WARMUP_PENDING if self.enabled else WARMUP_DISABLED
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._startup_seconds: Optional[float] = None
+        self._first_request: Optional[Dict[str, Any]] = None
+
+        self._add_step("orchestrator", self._warm_orchestrator, critical=True)
+        self._add_step("reference_data", self._warm_reference_data)
+        self._add_step("matcher_resources", self._warm_matcher_resources)
+        self._add_step("llm_gateway", self._warm_llm_gateway)
+
+    def _add_step(self, name: str, run: Callable[[], Optional[Dict[str, Any]]], critical: bool = False) -> None:
+        self._steps.append(WarmupStep(name=name, critical=critical))
+        self._runners[name] = run
+
+    # Steps
+
+    def _warm_orchestrator(self) -> Dict[str, Any]:
+        # Imports the matching/LLM stack and connects the ERP repositories;
+        # the product matcher loads the catalogue and S3 learnings on the way
+        from src.api.services.offer_service import get_offer_service
+
+        orchestrator = get_offer_service().warm_up()
+        return {
+            'erp': orchestrator.factory.erp_name,
+            'ai_components': orchestrator.ai_analyzer is not None and orchestrator.product_matcher is not None,
+        }
+
+    def _warm_reference_data(self) -> Dict[str, Any]:
+        from src.core.reference_data import get_reference_data
+
+        registry = get_reference_data()
+        return {name: len(registry.rows(name)) for name in ('customers.csv', 'persons.csv', 'products.csv')}
+
+    def _warm_matcher_resources(self) -> Dict[str, Any]:
+        from src.product_matching import shared_resources
+
+        return shared_resources.warm_up()
+
+    def _warm_llm_gateway(self) -> Dict[str, Any]:
+        from src.llm.gateway import get_llm_gateway
+
+        gateway = get_llm_gateway()
+        return {'client': type(gateway.client).__name__, 'cache': type(gateway.cache).__name__}
+
+    # Running
+
+    def run(self) -> str:
+        """Run all steps in this thread; returns the final status."""
+        with self._lock:
+            if self._status != WARMUP_PENDING:
+                return self._status
+            self._status = WARMUP_RUNNING
+            self._started_at = time.time()
+
+        self.logger.info("🔥 Warming up: " + ", ".join(step.name for step in self._steps))
+        failed_critical = False
+        for step in self._steps:
+            step.status = WARMUP_RUNNING
+            started = time.perf_counter()
+            try:
+                step.detail = self._runners[step.name]() or {}
+                step.status = WARMUP_READY
+            except Exception as e:
+                step.status = WARMUP_FAILED
+                step.error = str(e)
+                failed_critical = failed_critical or step.critical
+                self.logger.warning(f"Warm-up step {step.name} failed: {e}")
+            step.seconds = round(time.perf_counter() - started, 3)
+            self.logger.info(f"Warm-up step {step.name}: {step.status} in {step.seconds:.2f}s")
+
+        with self._lock:
+            self._finished_at = time.time()
+            self._status = WARMUP_FAILED if failed_critical else WARMUP_READY
+        self.logger.info(
+            f"🔥 Warm-up {self._status} in {self._finished_at - self._started_at:.2f}s "
+            f"({self._finished_at - PROCESS_STARTED:.2f}s after process start)"
+        )
+        return self._status
+
+    def start(self) -> None:
+        """Run the warm-up in a worker thread without blocking startup."""
+        if not self.enabled or self._task is not None:
+            return
+        self._task = asyncio.create_task(asyncio.to_thread(self.run))
+
+    async def wait(self, timeout: Optional[float] = None) -> str:
+        """Wait for a started warm-up to finish; returns the status."""
+        if self._task is not None:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        return self.status
+
+    async def stop(self) -> None:
+        """Forget the warm-up task (the thread itself finishes its current step)."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+
+    # Reporting
+
+    def record_startup(self) -> None:
+        """Note that the server finished startup (lifespan reached yield)."""
+        if self._startup_seconds is None:
+            self._startup_seconds = round(time.time() - PROCESS_STARTED, 3)
+
+    def record_request(self, path: str, seconds: float) -> None:
+        """Note the latency of the first API request served by this process."""
+        if self._first_request is not None:
+            return
+        with self._lock:
+            if self._first_request is None:
+                self._first_request = {
+                    'path': path,
+                    'seconds': round(seconds, 3),
+                    'after_start_seconds': round(time.time() - PROCESS_STARTED, 3),
+                    'warmup_status': self._status,
+                }
+                self.logger.info(
+                    f"First request {path} took {seconds:.2f}s (warm-up {self._status})"
+                )
+
+    @property
+    def status(self) -> str:
+        return self._status
+
+    @property
+    def ready(self) -> bool:
+        """Whether the process should receive traffic (not while warming up or after a critical step failed)."""
+        return self._status in (WARMUP_READY, WARMUP_DISABLED)
+
+    def stats(self) -> Dict[str, Any]:
+        """Readiness, step timings and cold-start timings."""
+        steps = []
+        for step in self._steps:
+            steps.append({key: value for key, value in asdict(step).items() if value not in (None, {})})
+        return {
+            'status': self._status,
+            'ready': self.ready,
+            'startup_seconds': self._startup_seconds,
+            'warmup_seconds': round(self._finished_at - self._started_at, 3)
+            if self._finished_at and self._started_at else None,
+            'ready_after_start_seconds': round(self._finished_at - PROCESS_STARTED, 3)
+            if self._finished_at else None,
+            'first_request': self._first_request,
+            'steps': steps,
+        }
+
+
+_warmup: Optional[WarmupService] = None
+_warmup_lock = Lock()
+
+
+def get_warmup_service() -> WarmupService:
+    """Get the process-wide warm-up service."""
+    global _warmup
+    with _warmup_lock:
+        if _warmup is None:
+            _warmup = WarmupService()
+        return _warmup
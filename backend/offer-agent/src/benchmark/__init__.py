@@ -0,0 +1,38 @@
+"""
+Benchmark Module
+
+Record/replay of external round trips (LLM, Lemonsoft REST/SOAP/SQL,
+embeddings) and an offline benchmark of the offer workflow.
+"""
+
+from src.benchmark.recorder import (
+    KIND_EMBEDDING,
+    KIND_ERP_API,
+    KIND_ERP_HTTP,
+    KIND_ERP_SOAP,
+    KIND_ERP_SQL,
+    KIND_LLM,
+    MODE_OFF,
+    MODE_RECORD,
+    MODE_REPLAY,
+    InteractionRecorder,
+    ReplayMissError,
+    configure_interaction_recorder,
+    get_interaction_recorder,
+)
+
+__all__ = [
+    "InteractionRecorder",
+    "ReplayMissError",
+    "get_interaction_recorder",
+    "configure_interaction_recorder",
+    "MODE_OFF",
+    "MODE_RECORD",
+    "MODE_REPLAY",
+    "KIND_LLM",
+    "KIND_ERP_API",
+    "KIND_ERP_HTTP",
+    "KIND_ERP_SOAP",
+    "KIND_ERP_SQL",
+    "KIND_EMBEDDING",
+]
@@ -0,0 +1,219 @@
+"""
+Attachment Memory Benchmark
+
+Polls a synthetic corpus of emails with large PDF attachments from a fake
+Gmail server (see fake_gmail) and takes them through the attachment
+pipeline, once with attachments decoded into memory (ATTACHMENT_SPOOL_ENABLED=false)
+and once spooled to disk. Each run is a new process, so its peak RSS is its own.
+
+A run mirrors the service:
+
+- the mailbox is polled `--poll` emails at a time through
+  GmailServiceAccountProcessor, and every fetched email is put in a
+  PersistentPriorityQueue (which pickles its payload to SQLite)
+- `--workers` workers claim queued emails one at a time and hand each PDF to a
+  stand-in for the PDF processor: in-memory PDFs are copied to a temporary
+  file as before, spooled ones are used in place, and the bytes are read as
+  Mistral OCR does
+- a finished email's attachments are released
+
+Reported per mode: peak Python allocations (tracemalloc), peak RSS, wall
+time, the size the queue database grew to, and a digest of the attachment bytes the workers saw, which must match
+between modes.
+
+    python -m src.benchmark.attachment_memory --messages 12 --attachment-mb 30
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List
+
+from src.benchmark.fake_gmail import FakeGmailServer
+
+MODES = ('in_memory', 'spooled')
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _read_pdf(attachment: Dict[str, Any]) -> bytes:
+    """Stand-in for the PDF processor's file handling."""
+    from src.email_processing.attachment_store import attachment_bytes, attachment_path
+
+    if attachment_path(attachment):
+        return attachment_bytes(attachment)
+    data = attachment['data']
+    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_file:
+        temp_file.write(data)
+    try:
+        with open(temp_file.name, 'rb') as f:
+            return f.read()
+    finally:
+        os.unlink(temp_file.name)
+
+
+async def _probe(root_url: str, messages: int, poll: int, workers: int) -> Dict[str, Any]:
+    """One run in this process; the mode comes from ATTACHMENT_SPOOL_ENABLED."""
+    import httplib2
+
+    from src.benchmark.fake_gmail import build_service
+    from src.email_processing.attachment_store import get_attachment_store, release_attachments, spooling_enabled
+    from src.email_processing.gmail_fetcher import FETCH_MODE_BATCH, GmailFetcher
+    from src.email_processing.gmail_service_account_processor import GmailServiceAccountProcessor
+    from src.scheduler.job_queue import OfferJob, PersistentPriorityQueue
+
+    service = build_service(root_url)
+    processor = GmailServiceAccountProcessor()
+    processor.gmail_service = service
+    processor.fetcher = GmailFetcher(service, mode=FETCH_MODE_BATCH, http_factory=httplib2.Http)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    digests: Dict[str, str] = {}
+    queue_dir = tempfile.mkdtemp(prefix='attachment-queue-')
+    queue = PersistentPriorityQueue(os.path.join(queue_dir, 'queue.db'))
+    polling = True
+
+    async def worker() -> None:
+        while True:
+            job = await queue.claim_async()
+            if job is None:
+                if not polling:
+                    return
+                await asyncio.sleep(0.05)
+                continue
+            email_data = job.payload
+            for attachment in email_data['attachments']:
+                data = await asyncio.to_thread(_read_pdf, attachment)
+                digests[f"{email_data['id']}/{attachment['filename']}"] = hashlib.sha256(data).hexdigest()
+                del data
+            release_attachments(email_data)
+            await queue.complete_async(job.job_id)
+            del job, email_data
+
+    tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+    message_ids = await processor.fetcher.list_message_ids(query='is:unread', max_results=messages)
+    for start in range(0, len(message_ids), poll):
+        emails = await processor.get_emails_by_id(message_ids[start:start + poll])
+        for email_data in emails:
+            await queue.put_async(OfferJob(payload=email_data, job_id=email_data['id']))
+        del emails, email_data
+    polling = False
+    await asyncio.gather(*tasks)
+    queue_db_mb = round(sum(path.stat().st_size for path in Path(queue_dir).iterdir()) / (1024 * 1024), 1)
+    queue.close()
+    shutil.rmtree(queue_dir, ignore_errors=True)
+
+    _, peak_traced = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    digest = hashlib.sha256(json.dumps(digests, sort_keys=True).encode()).hexdigest()[:16]
+    return {
+        'mode': 'spooled' if spooling_enabled() else 'in_memory',
+        'seconds': round(time.perf_counter() - started, 2),
+        'attachments': len(digests),
+        'digest': digest,
+        'peak_traced_mb': round(peak_traced / (1024 * 1024), 1),
+        'peak_rss_mb': _peak_rss_mb(),
+        'queue_db_mb': queue_db_mb,
+        'spool': get_attachment_store().stats() if spooling_enabled() else None,
+    }
+
+
+def run_benchmark(
+    messages: int = 12,
+    attachments_per_message: int = 1,
+    attachment_mb: float = 30,
+    poll: int = 6,
+    workers: int = 2,
+    latency: float = 0.02,
+    timeout: float = 600
+) -> Dict[str, Any]:
+    """Serve the corpus and run one probe process per mode against it."""
+    server = FakeGmailServer(latency=latency, call_latency=0).start()
+    spool_dir = tempfile.mkdtemp(prefix='attachment-spool-')
+    try:
+        server.add_messages(
+            messages,
+            attachments_per_message=attachments_per_message,
+            attachment_bytes=int(attachment_mb * 1024 * 1024),
+        )
+        results: Dict[str, Any] = {
+            'messages': messages,
+            'attachments_per_message': attachments_per_message,
+            'attachment_mb': attachment_mb,
+            'poll': poll,
+            'workers': workers,
+        }
+        for mode in MODES:
+            env = dict(os.environ)
+            env['ATTACHMENT_SPOOL_ENABLED'] = 'true' if mode == 'spooled' else 'false'
+            env['ATTACHMENT_SPOOL_DIR'] = spool_dir
+            env['ATTACHMENT_MAX_MB'] = str(max(50, attachment_mb * 2))
+            command = [
+                sys.executable, "-m", "src.benchmark.attachment_memory", "--probe",
+                "--root-url", server.root_url,
+                "--messages", str(messages), "--poll", str(poll), "--workers", str(workers),
+            ]
+            completed = subprocess.run(command, capture_output=True, text=True, env=env, timeout=timeout)
+            if completed.returncode != 0:
+                raise RuntimeError(f"Probe failed: {completed.stderr.strip()[-2000:]}")
+            results[mode] = json.loads(completed.stdout.strip().splitlines()[-1])
+
+        results['spooled']['matches_in_memory'] = results['spooled']['digest'] == results['in_memory']['digest']
+        results['spool_files_left'] = sum(1 for path in Path(spool_dir).rglob('*') if path.is_file())
+        for key in ('peak_traced_mb', 'peak_rss_mb'):
+            results[f"{key.replace('_mb', '')}_reduction"] = round(
+                results['in_memory'][key] / max(results['spooled'][key], 1e-9), 1
+            )
+        return results
+    finally:
+        server.stop()
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare attachment memory use with and without disk spooling")
+    parser.add_argument("--messages", type=int, default=12)
+    parser.add_argument("--attachments", type=int, default=1, help="Attachments per message")
+    parser.add_argument("--attachment-mb", type=float, default=30)
+    parser.add_argument("--poll", type=int, default=6, help="Emails fetched per poll")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds per HTTP round trip")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--probe", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--root-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        print(json.dumps(asyncio.run(_probe(args.root_url, args.messages, args.poll, args.workers))))
+        return
+
+    result = run_benchmark(
+        messages=args.messages,
+        attachments_per_message=args.attachments,
+        attachment_mb=args.attachment_mb,
+        poll=args.poll,
+        workers=args.workers,
+        latency=args.latency,
+    )
+    report = json.dumps(result, indent=2)
+    print(report)
+    if args.output:
+        Path(args.output).write_text(report, encoding='utf-8')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Cold Start Benchmark
+
+Starts fresh API processes and measures, separately:
+
+- cold start: process start until src.api.main is imported and could serve
+  (interpreter start-up plus imports), and how many modules that loaded
+- warm-up: time spent in the warm-up phase, when enabled
+- first request: the first offer workflow run by the process, and a second
+  one for comparison with steady state
+
+Each trial is a new interpreter, so nothing is shared between trials. With a
+recorded corpus (see offer_benchmark) the requests are replayed offline:
+
+    python -m src.benchmark.cold_start --trials 5
+    python -m src.benchmark.cold_start --corpus data/bench/emails --fixtures data/bench/fixtures --trials 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from src.scheduler.metrics import LatencyWindow
+
+# Modules whose import the API process should defer until it warms up
+HEAVY_MODULES = ('pandas', 'numpy', 'openai', 'google.genai', 'mistralai', 'pyodbc', 'src.core.orchestrator')
+
+
+async def _run_request(orchestrator, email_data: Dict[str, Any], request_id: str) -> Dict[str, Any]:
+    from src.core.checkpoint import make_checkpoint_key
+
+    started = time.perf_counter()
+    result = await orchestrator.process_offer_request_for_review(email_data, request_id=request_id)
+    elapsed = time.perf_counter() - started
+    orchestrator.checkpoints.delete(make_checkpoint_key(email_data, request_id))
+    return {'seconds': round(elapsed, 3), 'success': result.success}
+
+
+def probe(warmup: bool, corpus_dir: Optional[str], fixture_dir: Optional[str]) -> Dict[str, Any]:
+    """One trial inside a fresh process (run via --probe)."""
+    started = time.perf_counter()
+    import src.api.main  # noqa: F401
+    import_seconds = time.perf_counter() - started
+
+    from src.api.services.warmup import WarmupService, process_start_time
+
+    report: Dict[str, Any] = {
+        'warmup': warmup,
+        'import_seconds': round(import_seconds, 3),
+        'cold_start_seconds': round(time.time() - process_start_time(), 3),
+        'modules_loaded': len(sys.modules),
+        'heavy_modules_loaded': [name for name in HEAVY_MODULES if name in sys.modules],
+    }
+
+    recorder = None
+    if fixture_dir:
+        from src.benchmark.recorder import MODE_REPLAY, configure_interaction_recorder
+        recorder = configure_interaction_recorder(mode=MODE_REPLAY, fixture_dir=fixture_dir)
+
+    if warmup:
+        service = WarmupService(enabled=True)
+        service.run()
+        stats = service.stats()
+        report['warmup_status'] = stats['status']
+        report['warmup_seconds'] = stats['warmup_seconds']
+        report['warmup_steps'] = {step['name']: step.get('seconds') for step in stats['steps']}
+
+    if corpus_dir:
+        from src.api.services.offer_service import get_offer_service
+        from src.benchmark.offer_benchmark import load_corpus
+
+        name, email_data = load_corpus(corpus_dir)[0]
+        run_id = int(time.time())
+
+        async def requests() -> None:
+            # The first request creates the orchestrator unless the warm-up already did
+            started = time.perf_counter()
+            orchestrator = get_offer_service().warm_up()
+            first = await _run_request(orchestrator, email_data, f"cold-{run_id}-{name}-1")
+            first['seconds'] = round(time.perf_counter() - started, 3)
+            report['first_request'] = first
+            if recorder is not None:
+                recorder.reset_replay()
+            report['second_request'] = await _run_request(orchestrator, email_data, f"cold-{run_id}-{name}-2")
+
+        asyncio.run(requests())
+
+    return report
+
+
+def run_trials(
+    trials: int = 5,
+    corpus_dir: Optional[str] = None,
+    fixture_dir: Optional[str] = None,
+    timeout: float = 600
+) -> Dict[str, Any]:
+    """Run trials with and without warm-up, each in a new process, and summarise them."""
+    env = dict(os.environ)
+    # Cache hits would make the first and second request incomparable
+    env.setdefault('LLM_CACHE_ENABLED', 'false')
+
+    results: Dict[str, Any] = {}
+    for warmup in (False, True):
+        reports: List[Dict[str, Any]] = []
+        for _ in range(trials):
+            command = [sys.executable, "-m", "src.benchmark.cold_start", "--probe"]
+            if warmup:
+                command.append("--warmup")
+            if corpus_dir:
+                command += ["--corpus", corpus_dir]
+            if fixture_dir:
+                command += ["--fixtures", fixture_dir]
+            completed = subprocess.run(command, capture_output=True, text=True, env=env, timeout=timeout)
+            if completed.returncode != 0:
+                raise RuntimeError(f"Probe failed: {completed.stderr.strip()[-2000:]}")
+            reports.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+        windows: Dict[str, LatencyWindow] = {}
+        for report in reports:
+            for key in ('import_seconds', 'cold_start_seconds', 'warmup_seconds'):
+                if report.get(key) is not None:
+                    windows.setdefault(key, LatencyWindow()).add(report[key])
+            for key in ('first_request', 'second_request'):
+                if key in report:
+                    windows.setdefault(f"{key}_seconds", LatencyWindow()).add(report[key]['seconds'])
+        results['with_warmup' if warmup else 'without_warmup'] = {
+            'trials': len(reports),
+            **{key: window.summary() for key, window in windows.items()},
+            'heavy_modules_loaded': reports[-1]['heavy_modules_loaded'] if reports else [],
+            'modules_loaded': reports[-1]['modules_loaded'] if reports else 0,
+            'last_trial': reports[-1] if reports else None,
+        }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure API cold start and first-request latency")
+    parser.add_argument("--trials", type=int, default=5)
+    parser.add_argument("--corpus", help="Directory of email JSON files; the first email is the test request")
+    parser.add_argument("--fixtures", help="Recorded fixtures to replay the requests from")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--probe", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--warmup", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        print(json.dumps(probe(args.warmup, args.corpus, args.fixtures), default=str))
+        return
+
+    result = run_trials(trials=args.trials, corpus_dir=args.corpus, fixture_dir=args.fixtures)
+    report = json.dumps(result, indent=2, default=str)
+    print(report)
+    if args.output:
+        Path(args.output).write_text(report, encoding='utf-8')
+
+
+if __name__ == "__main__":
+    main()
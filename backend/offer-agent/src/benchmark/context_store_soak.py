@@ -0,0 +1,148 @@
+"""
+Workflow Context Store Soak Test
+
+Pushes simulated offer requests through a WorkflowContextStore the way the
+API does: every request stores a context (email body, an attachment and
+matched lines), reviewers open random recent offers, and most offers are
+later sent or deleted while the rest are abandoned. RSS and store sizes are
+sampled along the way; a bounded store keeps RSS flat after warm-up instead
+of growing with the number of requests:
+
+    python -m src.benchmark.context_store_soak --requests 10000 --max-items 200 --max-mb 64
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from src.api.services.context_store import WorkflowContextStore, current_rss_bytes
+from src.scheduler.metrics import LatencyWindow
+
+
+def make_context(index: int, rng: random.Random, attachment_kb: int = 64, lines: int = 20) -> Dict[str, Any]:
+    """Synthetic stand-in for a WorkflowContext of similar size and shape."""
+    return {
+        'email_data': {
+            'sender': f"buyer{index % 500}@example.com",
+            'subject': f"Tarjouspyyntö {index}",
+            'body': "\n".join(f"{rng.randint(1, 100)} kpl tuote {rng.randint(1, 20000)}" for _ in range(lines)),
+            'attachments': [{
+                'filename': f"request_{index}.pdf",
+                'data': os.urandom(attachment_kb * 512) + bytes(attachment_kb * 512),
+            }],
+        },
+        'matched_products': [
+            {
+                'product_code': str(rng.randint(100000, 9999999)),
+                'product_name': f"Product {rng.randint(1, 20000)} DN{rng.choice((15, 20, 25, 50))}",
+                'quantity': rng.randint(1, 100),
+                'confidence': rng.uniform(0.5, 1.0),
+                'reasoning': "x" * rng.randint(200, 800),
+            }
+            for _ in range(lines)
+        ],
+        'metadata': {'request_id': f"req-{index}", 'checkpoint_key': f"req-{index}"},
+    }
+
+
+def run_soak(
+    requests: int = 10000,
+    max_items: int = 200,
+    max_mb: float = 64,
+    attachment_kb: int = 64,
+    review_rate: float = 0.5,
+    abandon_rate: float = 0.2,
+    sample_every: int = 500,
+    seed: int = 7
+) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory(prefix="context_store_soak_") as tmp:
+        store = WorkflowContextStore(
+            max_items=max_items,
+            max_bytes=int(max_mb * 1024 * 1024),
+            spill_dir=str(Path(tmp) / "spill"),
+        )
+        put, get = LatencyWindow(), LatencyWindow()
+        open_offers: List[str] = []
+        samples: List[Dict[str, Any]] = []
+        started = time.perf_counter()
+
+        for index in range(requests):
+            key = f"offer-{index}"
+            context = make_context(index, rng, attachment_kb=attachment_kb)
+            t0 = time.perf_counter()
+            store.put(key, context)
+            put.add((time.perf_counter() - t0) * 1000)
+            del context
+            open_offers.append(key)
+
+            # A reviewer opens a recent offer; older ones come back from disk
+            if open_offers and rng.random() < review_rate:
+                target = open_offers[-min(len(open_offers), int(rng.expovariate(1 / 100)) + 1)]
+                t0 = time.perf_counter()
+                store.get(target)
+                get.add((time.perf_counter() - t0) * 1000)
+
+            # Offers are sent or deleted after review; abandoned ones stay until TTL
+            if len(open_offers) > 300:
+                finished = open_offers.pop(rng.randrange(len(open_offers) - 100))
+                if rng.random() >= abandon_rate:
+                    store.pop(finished)
+
+            if (index + 1) % sample_every == 0:
+                gc.collect()
+                stats = store.stats()
+                samples.append({
+                    'requests': index + 1,
+                    'rss_mb': round(stats['rss_bytes'] / 1024 / 1024, 1),
+                    'memory_items': stats['memory_items'],
+                    'memory_mb': round(stats['memory_bytes'] / 1024 / 1024, 1),
+                    'spilled_items': stats['spilled_items'],
+                })
+
+        final = store.stats()
+        elapsed = time.perf_counter() - started
+
+    warm = samples[len(samples) // 4]['rss_mb'] if samples else 0
+    return {
+        'requests': requests,
+        'seconds': round(elapsed, 2),
+        'put_ms': put.summary(),
+        'get_ms': get.summary(),
+        'counters': {name: final.get(name, 0) for name in (
+            'hits', 'misses', 'spills', 'reloads', 'expired', 'dropped', 'reload_errors')},
+        'rss_after_warmup_mb': warm,
+        'rss_final_mb': samples[-1]['rss_mb'] if samples else 0,
+        'rss_growth_after_warmup_mb': round(samples[-1]['rss_mb'] - warm, 1) if samples else 0,
+        'samples': samples,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Soak test the bounded workflow context store")
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--max-items", type=int, default=200)
+    parser.add_argument("--max-mb", type=float, default=64)
+    parser.add_argument("--attachment-kb", type=int, default=64)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    result = run_soak(
+        requests=args.requests,
+        max_items=args.max_items,
+        max_mb=args.max_mb,
+        attachment_kb=args.attachment_kb,
+    )
+    report = json.dumps(result, indent=2)
+    print(report)
+    if args.output:
+        Path(args.output).write_text(report, encoding='utf-8')
+
+
+if __name__ == "__main__":
+    main()
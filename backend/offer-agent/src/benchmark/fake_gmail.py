@@ -0,0 +1,450 @@
+"""
+Fake Gmail API Server
+
+A local stand-in for the Gmail REST API, so the Gmail fetch path can be
+exercised and timed without a mailbox or credentials. It serves the calls
+the processor makes:
+
+- messages.list (is:unread and labelIds filters, paging)
+- messages.get (format=full, with field masks applied)
+- messages.attachments.get
+- messages.modify and messages.batchModify
+- labels.list and labels.create
+- getProfile
+- history.list (messageAdded / labelAdded / labelRemoved records; 404 for
+  start IDs older than expire_history())
+- batch requests (/batch), answered call by call
+
+Every HTTP request waits `latency` seconds, like a round trip to Google, and
+every API call inside it a further `call_latency`. Setting `throttle_every`
+answers every Nth call with 429, to exercise retries.
+
+    server = FakeGmailServer(latency=0.05)
+    server.add_messages(40, attachments_per_message=2)
+    server.start()
+    service = server.build_service()
+    ...
+    server.stop()
+"""
+import base64
+import json
+import random
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import compat32
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+API_PREFIX = "/gmail/v1/users/"
+# The discovery document's batchPath is "batch"; Google also serves the per-API path
+BATCH_PATHS = ("/batch", "/batch/gmail/v1")
+
+
+def parse_field_mask(mask: str) -> Dict[str, Any]:
+    """Parse a partial-response field mask ("a,b(c,d/e)") into a tree ({} = whole field)."""
+    tree: Dict[str, Any] = {}
+    stack = [tree]
+    name = ""
+
+    def add(target: Dict[str, Any], path: str) -> Dict[str, Any]:
+        node = target
+        for part in path.split('/'):
+            node = node.setdefault(part, {})
+        return node
+
+    for char in mask:
+        if char == '(':
+            stack.append(add(stack[-1], name.strip()))
+            name = ""
+        elif char == ')':
+            if name.strip():
+                add(stack[-1], name.strip())
+            name = ""
+            stack.pop()
+        elif char == ',':
+            if name.strip():
+                add(stack[-1], name.strip())
+            name = ""
+        else:
+            name += char
+    if name.strip():
+        add(stack[-1], name.strip())
+    return tree
+
+
+def apply_field_mask(value: Any, tree: Dict[str, Any]) -> Any:
+    """Keep only the masked fields; sub-selections apply to every element of lists."""
+    if not tree:
+        return value
+    if isinstance(value, list):
+        return [apply_field_mask(item, tree) for item in value]
+    if not isinstance(value, dict):
+        return value
+    return {key: apply_field_mask(value[key], sub) for key, sub in tree.items() if key in value}
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode('ascii')
+
+
+class FakeGmailServer:
+    """In-memory Gmail mailbox served over HTTP on localhost."""
+
+    def __init__(self, latency: float = 0.05, call_latency: float = 0.002, throttle_every: int = 0, seed: int = 7):
+        self.latency = latency
+        self.call_latency = call_latency
+        self.throttle_every = throttle_every
+        self.rng = random.Random(seed)
+        self.messages: Dict[str, Dict[str, Any]] = {}
+        self.attachments: Dict[Tuple[str, str], bytes] = {}
+        self.history: List[Dict[str, Any]] = []
+        self.labels: Dict[str, str] = {name: name for name in ('INBOX', 'UNREAD', 'SENT', 'DRAFT', 'SPAM', 'TRASH')}
+        self.history_id = 1000
+        self.oldest_history_id = 1000
+        self.lock = threading.Lock()
+        self.stats: Dict[str, int] = {'http_requests': 0, 'calls': 0, 'batches': 0, 'throttled': 0, 'bytes_sent': 0}
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    # Mailbox
+
+    def add_message(self, subject: str, body: str, attachments: Optional[List[Tuple[str, bytes]]] = None, unread: bool = True) -> str:
+        """Add a multipart message with optional (filename, data) attachments; returns its id."""
+        with self.lock:
+            message_id = f"{0x18c0000000000000 + len(self.messages):x}"
+            parts: List[Dict[str, Any]] = [{
+                'partId': '0',
+                'mimeType': 'text/plain',
+                'filename': '',
+                'headers': [{'name': 'Content-Type', 'value': 'text/plain; charset="UTF-8"'}],
+                'body': {'size': len(body.encode()), 'data': _b64(body.encode())},
+            }]
+            for index, (filename, data) in enumerate(attachments or [], start=1):
+                attachment_id = f"ANGjdJ{message_id}{index:02d}" + "x" * 40
+                self.attachments[(message_id, attachment_id)] = data
+                parts.append({
+                    'partId': str(index),
+                    'mimeType': 'application/pdf',
+                    'filename': filename,
+                    'headers': [
+                        {'name': 'Content-Type', 'value': f'application/pdf; name="{filename}"'},
+                        {'name': 'Content-Disposition', 'value': f'attachment; filename="{filename}"'},
+                    ],
+                    'body': {'attachmentId': attachment_id, 'size': len(data)},
+                })
+            headers = [
+                {'name': 'From', 'value': 'Buyer <buyer@example.com>'},
+                {'name': 'To', 'value': 'offers@example.com'},
+                {'name': 'Subject', 'value': subject},
+                {'name': 'Date', 'value': 'Mon, 5 Oct 2026 09:00:00 +0300'},
+                {'name': 'Message-ID', 'value': f'<{message_id}@example.com>'},
+            ] + [{'name': 'Received', 'value': f'from relay{i}.example.com by mx.google.com'} for i in range(8)]
+            self.messages[message_id] = {
+                'id': message_id,
+                'threadId': message_id,
+                'labelIds': ['INBOX', 'UNREAD'] if unread else ['INBOX'],
+                'snippet': body[:100],
+                'historyId': str(self._next_history_id()),
+                'internalDate': str(1790000000000 + len(self.messages) * 1000),
+                'sizeEstimate': len(body) + sum(len(data) for _, data in attachments or []),
+                'payload': {
+                    'partId': '',
+                    'mimeType': 'multipart/mixed',
+                    'filename': '',
+                    'headers': headers,
+                    'body': {'size': 0},
+                    'parts': parts,
+                },
+            }
+            message = self.messages[message_id]
+            self.history.append({
+                'id': message['historyId'],
+                'messages': [{'id': message_id, 'threadId': message_id}],
+                'messagesAdded': [{'message': {'id': message_id, 'threadId': message_id, 'labelIds': list(message['labelIds'])}}],
+            })
+            return message_id
+
+    def add_messages(self, count: int, attachments_per_message: int = 1, attachment_bytes: int = 200_000) -> List[str]:
+        """Add synthetic offer request emails with PDF-sized attachments."""
+        ids = []
+        for index in range(count):
+            body = f"Hei,\n\npyydämme tarjousta seuraavista tuotteista (pyyntö {index}):\n" + "\n".join(
+                f"- {self.rng.randint(1, 100)} kpl tuote {self.rng.randint(1000, 99999)} DN{self.rng.choice((15, 20, 25))}"
+                for _ in range(15)
+            )
+            attachments = [
+                (f"request-{index}-{n}.pdf", self.rng.randbytes(attachment_bytes))
+                for n in range(attachments_per_message)
+            ]
+            ids.append(self.add_message(f"Tarjouspyyntö {index}", body, attachments))
+        return ids
+
+    # API
+
+    def _list(self, query: Dict[str, List[str]]) -> Dict[str, Any]:
+        labels = set(query.get('labelIds', []))
+        if 'is:unread' in query.get('q', [''])[0]:
+            labels.add('UNREAD')
+        with self.lock:
+            ids = [
+                message_id for message_id, message in reversed(list(self.messages.items()))
+                if labels <= set(message['labelIds'])
+            ]
+        start = int(query.get('pageToken', ['0'])[0])
+        size = int(query.get('maxResults', ['100'])[0])
+        page = ids[start:start + size]
+        response: Dict[str, Any] = {
+            'messages': [{'id': message_id, 'threadId': message_id} for message_id in page],
+            'resultSizeEstimate': len(ids),
+        }
+        if start + size < len(ids):
+            response['nextPageToken'] = str(start + size)
+        if not page:
+            del response['messages']
+        return response
+
+    def _next_history_id(self) -> int:
+        self.history_id += 1
+        return self.history_id
+
+    def expire_history(self) -> None:
+        """Forget all history, as Gmail does after about a week: older start IDs get 404."""
+        with self.lock:
+            self.history.clear()
+            self.oldest_history_id = self.history_id
+
+    def _history(self, query: Dict[str, List[str]]) -> Tuple[int, Dict[str, Any]]:
+        start = int(query['startHistoryId'][0])
+        if start < self.oldest_history_id:
+            return 404, {'error': {'code': 404, 'message': 'Requested entity was not found.', 'status': 'NOT_FOUND'}}
+        types = set(query.get('historyTypes', [])) or {'messageAdded', 'labelAdded', 'labelRemoved'}
+        keys = {'messageAdded': 'messagesAdded', 'labelAdded': 'labelsAdded', 'labelRemoved': 'labelsRemoved'}
+        label = query.get('labelId', [None])[0]
+        with self.lock:
+            records = []
+            for record in self.history:
+                if int(record['id']) <= start:
+                    continue
+                entry = {'id': record['id'], 'messages': record['messages']}
+                for history_type in types:
+                    changes = [
+                        change for change in record.get(keys[history_type], [])
+                        if label is None or label in change['message'].get('labelIds', [])
+                    ]
+                    if changes:
+                        entry[keys[history_type]] = changes
+                if len(entry) > 2:
+                    records.append(entry)
+            history_id = self.history_id
+        offset = int(query.get('pageToken', ['0'])[0])
+        size = int(query.get('maxResults', ['100'])[0])
+        response: Dict[str, Any] = {'historyId': str(history_id)}
+        if records[offset:offset + size]:
+            response['history'] = records[offset:offset + size]
+        if offset + size < len(records):
+            response['nextPageToken'] = str(offset + size)
+        return 200, response
+
+    def _modify(self, message_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        with self.lock:
+            message = self.messages[message_id]
+            removed = [label for label in body.get('removeLabelIds', []) if label in message['labelIds']]
+            labels = [label for label in message['labelIds'] if label not in removed]
+            added = [label for label in body.get('addLabelIds', []) if label not in labels]
+            labels += added
+            message['labelIds'] = labels
+            history_id = str(self._next_history_id())
+            message['historyId'] = history_id
+            change = {'message': {'id': message_id, 'threadId': message['threadId'], 'labelIds': list(labels)}}
+            self.history.append({
+                'id': history_id,
+                'messages': [{'id': message_id, 'threadId': message['threadId']}],
+                'labelsAdded': [{**change, 'labelIds': added}] if added else [],
+                'labelsRemoved': [{**change, 'labelIds': removed}] if removed else [],
+            })
+            return {'id': message_id, 'threadId': message['threadId'], 'labelIds': labels}
+
+    def call(self, method: str, target: str, body: bytes = b"") -> Tuple[int, Dict[str, Any]]:
+        """Answer one API call; returns (status, JSON body)."""
+        if self.call_latency:
+            time.sleep(self.call_latency)
+        with self.lock:
+            self.stats['calls'] += 1
+            throttled = self.throttle_every and self.stats['calls'] % self.throttle_every == 0
+            if throttled:
+                self.stats['throttled'] += 1
+        if throttled:
+            return 429, {'error': {'code': 429, 'message': 'Too many concurrent requests for user', 'status': 'RESOURCE_EXHAUSTED'}}
+
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        if not url.path.startswith(API_PREFIX):
+            return 404, {'error': {'code': 404, 'message': f'Not found: {url.path}'}}
+        path = [unquote(part) for part in url.path[len(API_PREFIX):].split('/')]
+
+        try:
+            if path[1:] == ['profile'] and method == 'GET':
+                result: Dict[str, Any] = {
+                    'emailAddress': 'offers@example.com',
+                    'messagesTotal': len(self.messages),
+                    'threadsTotal': len(self.messages),
+                    'historyId': str(self.history_id),
+                }
+            elif path[1:] == ['history'] and method == 'GET':
+                status, result = self._history(query)
+                if status != 200:
+                    return status, result
+            elif path[1:] == ['messages'] and method == 'GET':
+                result = self._list(query)
+            elif len(path) == 3 and path[1] == 'messages' and method == 'GET':
+                with self.lock:
+                    result = json.loads(json.dumps(self.messages[path[2]]))
+            elif path[1:] == ['messages', 'batchModify'] and method == 'POST':
+                request = json.loads(body or b"{}")
+                if len(request.get('ids', [])) > 1000:
+                    return 400, {'error': {'code': 400, 'message': 'Too many ids: at most 1000 allowed'}}
+                for message_id in request.get('ids', []):
+                    self._modify(message_id, request)
+                return 204, {}
+            elif path[1:] == ['labels'] and method == 'GET':
+                with self.lock:
+                    result = {'labels': [
+                        {'id': label_id, 'name': name, 'type': 'system' if label_id == name else 'user'}
+                        for name, label_id in self.labels.items()
+                    ]}
+            elif path[1:] == ['labels'] and method == 'POST':
+                name = json.loads(body or b"{}")['name']
+                with self.lock:
+                    if name in self.labels:
+                        return 409, {'error': {'code': 409, 'message': 'Label name exists or conflicts'}}
+                    self.labels[name] = f"Label_{len(self.labels) + 1}"
+                    result = {'id': self.labels[name], 'name': name, 'type': 'user'}
+            elif len(path) == 4 and path[3] == 'modify' and method == 'POST':
+                result = self._modify(path[2], json.loads(body or b"{}"))
+            elif len(path) == 5 and path[3] == 'attachments' and method == 'GET':
+                data = self.attachments[(path[2], path[4])]
+                result = {'size': len(data), 'data': _b64(data), 'attachmentId': path[4]}
+            else:
+                return 404, {'error': {'code': 404, 'message': f'Not found: {method} {url.path}'}}
+        except KeyError:
+            return 404, {'error': {'code': 404, 'message': 'Requested entity was not found.'}}
+
+        if 'fields' in query:
+            result = apply_field_mask(result, parse_field_mask(query['fields'][0]))
+        return 200, result
+
+    def batch(self, content_type: str, body: bytes) -> Tuple[bytes, str]:
+        """Answer a multipart/mixed batch request; returns (body, content type)."""
+        with self.lock:
+            self.stats['batches'] += 1
+        envelope = BytesParser(policy=compat32).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode() + body
+        )
+        boundary = f"batch_{self.rng.getrandbits(64):x}"
+        chunks = []
+        for part in envelope.get_payload():
+            request = part.get_payload(decode=False)
+            if isinstance(request, str):
+                request = request.encode('utf-8')
+            head, _, inner_body = request.replace(b"\r\n", b"\n").partition(b"\n\n")
+            method, target, _ = head.split(b"\n", 1)[0].decode().split(" ", 2)
+            status, result = self.call(method, target, inner_body.strip())
+            content_id = (part.get('Content-ID') or '<>')[1:-1]
+            payload = json.dumps(result) if status != 204 else ""
+            reason = {200: 'OK', 204: 'No Content'}.get(status, 'Error')
+            chunks.append(
+                f"--{boundary}\r\n"
+                "Content-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} {reason}\r\n"
+                "Content-Type: application/json; charset=UTF-8\r\n\r\n"
+                f"{payload}\r\n"
+            )
+        chunks.append(f"--{boundary}--\r\n")
+        return "".join(chunks).encode('utf-8'), f"multipart/mixed; boundary={boundary}"
+
+    # HTTP
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _respond(self, status: int, body: bytes, content_type: str) -> None:
+                if status == 204:
+                    body = b""
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with server.lock:
+                    server.stats['bytes_sent'] += len(body)
+
+            def _handle(self, method: str) -> None:
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b""
+                with server.lock:
+                    server.stats['http_requests'] += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                if urlsplit(self.path).path in BATCH_PATHS and method == 'POST':
+                    payload, content_type = server.batch(self.headers.get('Content-Type', ''), body)
+                    self._respond(200, payload, content_type)
+                    return
+                status, result = server.call(method, self.path, body)
+                self._respond(status, json.dumps(result).encode('utf-8'), 'application/json; charset=UTF-8')
+
+            def do_GET(self):
+                self._handle('GET')
+
+            def do_POST(self):
+                self._handle('POST')
+
+        return Handler
+
+    @property
+    def root_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self) -> "FakeGmailServer":
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def reset_stats(self) -> None:
+        with self.lock:
+            for key in self.stats:
+                self.stats[key] = 0
+
+    def build_service(self, http: Any = None) -> Any:
+        """A googleapiclient Gmail resource pointed at this server (batch requests included)."""
+        return build_service(self.root_url, http=http)
+
+
+def build_service(root_url: str, http: Any = None) -> Any:
+    """A googleapiclient Gmail resource pointed at a fake server's root URL (e.g. from another process)."""
+    import httplib2
+    from googleapiclient.discovery import build_from_document
+    from googleapiclient.discovery_cache import get_static_doc
+
+    document = json.loads(get_static_doc('gmail', 'v1'))
+    # Batch URIs come from the discovery document's rootUrl, not client_options
+    document['rootUrl'] = root_url
+    document['mtlsRootUrl'] = root_url
+    return build_from_document(document, http=http or httplib2.Http())
@@ -0,0 +1,170 @@
+"""
+Gmail Fetch Benchmark
+
+Fetches the same unread emails from a local fake Gmail server (see
+fake_gmail) in three ways and compares wall time, HTTP round trips and
+bytes transferred:
+
+- serial: the previous fetch path, i.e. messages.list, then one
+  messages.get and one attachments.get after another, with no field masks
+- concurrent: GmailFetcher sending individual requests concurrently
+- batch: GmailFetcher with Gmail batch requests
+
+Each run checks that it got the same messages and attachment bytes as the
+serial one. `--throttle-every` makes the server answer every Nth call with
+429, to show the retry cost.
+
+    python -m src.benchmark.gmail_fetch_benchmark --messages 50 --latency 0.08
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+from src.benchmark.fake_gmail import FakeGmailServer
+from src.email_processing.gmail_fetcher import FETCH_MODE_BATCH, FETCH_MODE_CONCURRENT, GmailFetcher
+
+
+def _digest(emails: Dict[str, Dict[str, bytes]]) -> str:
+    """Hash of message IDs and their attachment bytes, to compare runs."""
+    digest = hashlib.sha256()
+    for message_id in sorted(emails):
+        digest.update(message_id.encode())
+        for attachment_id in sorted(emails[message_id]):
+            digest.update(emails[message_id][attachment_id])
+    return digest.hexdigest()[:16]
+
+
+def _attachment_ids(message: Dict[str, Any]):
+    stack = [message.get('payload', {})]
+    while stack:
+        part = stack.pop()
+        attachment_id = part.get('body', {}).get('attachmentId')
+        if attachment_id:
+            yield attachment_id, part['body'].get('size', 0)
+        stack.extend(part.get('parts', []))
+
+
+def fetch_serial(service: Any, max_results: int) -> Dict[str, Dict[str, bytes]]:
+    """The previous fetch path: one blocking call at a time, full responses."""
+    messages = service.users().messages()
+    response = messages.list(userId='me', q='is:unread', maxResults=max_results).execute()
+    emails: Dict[str, Dict[str, bytes]] = {}
+    for item in response.get('messages', []):
+        message = messages.get(userId='me', id=item['id'], format='full').execute()
+        emails[item['id']] = {}
+        for attachment_id, _ in _attachment_ids(message):
+            attachment = messages.attachments().get(userId='me', messageId=item['id'], id=attachment_id).execute()
+            emails[item['id']][attachment_id] = base64.urlsafe_b64decode(attachment['data'])
+    return emails
+
+
+async def fetch_with_fetcher(fetcher: GmailFetcher, max_results: int) -> Dict[str, Dict[str, bytes]]:
+    message_ids = await fetcher.list_message_ids(query='is:unread', max_results=max_results)
+    messages = await fetcher.get_messages(message_ids)
+    attachments = await fetcher.get_attachments(
+        (message_id, attachment_id, size)
+        for message_id, message in messages.items()
+        for attachment_id, size in _attachment_ids(message)
+    )
+    emails: Dict[str, Dict[str, bytes]] = {message_id: {} for message_id in messages}
+    for (message_id, attachment_id), attachment in attachments.items():
+        emails[message_id][attachment_id] = base64.urlsafe_b64decode(attachment['data'])
+    return emails
+
+
+def run_benchmark(
+    messages: int = 50,
+    attachments_per_message: int = 2,
+    attachment_bytes: int = 150_000,
+    latency: float = 0.05,
+    batch_size: int = 50,
+    concurrency: int = 4,
+    throttle_every: int = 0
+) -> Dict[str, Any]:
+    import httplib2
+
+    server = FakeGmailServer(latency=latency, throttle_every=0).start()
+    try:
+        server.add_messages(messages, attachments_per_message=attachments_per_message, attachment_bytes=attachment_bytes)
+        service = server.build_service()
+        results: Dict[str, Any] = {
+            'messages': messages,
+            'attachments_per_message': attachments_per_message,
+            'attachment_bytes': attachment_bytes,
+            'latency_seconds': latency,
+        }
+
+        server.reset_stats()
+        started = time.perf_counter()
+        expected = fetch_serial(service, messages)
+        results['serial'] = {
+            'seconds': round(time.perf_counter() - started, 3),
+            'emails': len(expected),
+            'digest': _digest(expected),
+            **server.stats,
+        }
+
+        for mode in (FETCH_MODE_CONCURRENT, FETCH_MODE_BATCH):
+            server.reset_stats()
+            server.throttle_every = throttle_every
+            fetcher = GmailFetcher(
+                service,
+                mode=mode,
+                batch_size=batch_size,
+                max_concurrency=concurrency,
+                http_factory=httplib2.Http,
+            )
+            started = time.perf_counter()
+            emails = asyncio.run(fetch_with_fetcher(fetcher, messages))
+            results[mode] = {
+                'seconds': round(time.perf_counter() - started, 3),
+                'emails': len(emails),
+                'digest': _digest(emails),
+                'matches_serial': _digest(emails) == results['serial']['digest'],
+                **server.stats,
+                'fetcher': fetcher.stats(),
+            }
+            server.throttle_every = 0
+
+        serial_seconds = results['serial']['seconds']
+        for mode in (FETCH_MODE_CONCURRENT, FETCH_MODE_BATCH):
+            results[mode]['speedup'] = round(serial_seconds / max(results[mode]['seconds'], 1e-9), 1)
+        return results
+    finally:
+        server.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark Gmail message fetching against a fake Gmail server")
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--attachments", type=int, default=2, help="Attachments per message")
+    parser.add_argument("--attachment-bytes", type=int, default=150_000)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per HTTP round trip")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--throttle-every", type=int, default=0, help="Answer every Nth call with 429")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    result = run_benchmark(
+        messages=args.messages,
+        attachments_per_message=args.attachments,
+        attachment_bytes=args.attachment_bytes,
+        latency=args.latency,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        throttle_every=args.throttle_every,
+    )
+    report = json.dumps(result, indent=2)
+    print(report)
+    if args.output:
+        Path(args.output).write_text(report, encoding='utf-8')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+LLM Hedging Check
+
+Sends the same workload through the LLM gateway twice - without and with
+request hedging - using a fake genai client whose latency is drawn from an
+injected distribution: a log-normal body plus a rare long tail, the shape of
+real provider queueing (most calls in seconds, a few at 30-60s), scaled down
+so the check runs in seconds. Reports p50/p95/p99 latency for both runs and
+the extra calls hedging cost.
+
+Usage:
+    python -m src.benchmark.llm_hedge_check --calls 400 --concurrency 20 --median 0.05 --tail-rate 0.05 --tail 0.5,1.0
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from src.llm.gateway import LLMGateway
+from src.llm.hedging import HedgePolicy
+from src.benchmark.llm_overlap_check import FakeGenaiClient, FakeResponse
+from src.llm.rate_limiter import RateLimiter
+from src.scheduler.metrics import LatencyWindow
+from src.utils.retry import RetryConfig
+
+
+class LatencyDistributionClient(FakeGenaiClient):
+    """Fake genai client with log-normal latency and an injected slow tail."""
+
+    def __init__(
+        self,
+        median: float = 0.05,
+        sigma: float = 0.3,
+        tail_rate: float = 0.05,
+        tail: Tuple[float, float] = (0.5, 1.0),
+        seed: Optional[int] = 7
+    ):
+        super().__init__(latency=median)
+        self.median = median
+        self.sigma = sigma
+        self.tail_rate = tail_rate
+        self.tail = tail
+        self._random = random.Random(seed)
+        self.cancelled = 0
+
+    def sample_latency(self) -> float:
+        if self._random.random() < self.tail_rate:
+            return self._random.uniform(*self.tail)
+        return self._random.lognormvariate(0, self.sigma) * self.median
+
+    async def _generate(self, model: str, contents: Any) -> FakeResponse:
+        self.calls += 1
+        self._active += 1
+        self.max_concurrency = max(self.max_concurrency, self._active)
+        try:
+            await asyncio.sleep(self.sample_latency())
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self._active -= 1
+        return FakeResponse(f"{model}: {contents}")
+
+
+async def _run(
+    hedging: bool,
+    calls: int,
+    concurrency: int,
+    client_kwargs: Dict[str, Any],
+    policy_kwargs: Dict[str, Any]
+) -> Dict[str, Any]:
+    client = LatencyDistributionClient(**client_kwargs)
+    gateway = LLMGateway(
+        client=client,
+        retry_config=RetryConfig(max_attempts=1, base_delay=0.01, jitter=True),
+        rate_limiter=RateLimiter(provider_limits={}),
+        hedge_policy=HedgePolicy(enabled=hedging, **policy_kwargs),
+    )
+    latency = LatencyWindow(max_samples=calls)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one_call(index: int) -> None:
+        async with semaphore:
+            started = time.monotonic()
+            await gateway.generate_content(
+                model="gemini-2.5-flash", contents=f"call {index}", label="hedge-check", hedge=True
+            )
+            latency.add(time.monotonic() - started)
+
+    started = time.monotonic()
+    await asyncio.gather(*(one_call(index) for index in range(calls)))
+    stats = gateway.stats()
+    return {
+        'hedging': hedging,
+        'wall_time_seconds': round(time.monotonic() - started, 3),
+        'p50': round(latency.percentile(50), 3),
+        'p95': round(latency.percentile(95), 3),
+        'p99': round(latency.percentile(99), 3),
+        'max': round(max(latency.samples), 3),
+        'provider_calls': client.calls,
+        'extra_calls_ratio': round(client.calls / calls - 1, 3),
+        'cancelled_calls': client.cancelled,
+        'hedges': stats.get('hedges', 0),
+        'hedge_wins': stats.get('hedge_wins', 0),
+        'hedges_over_budget': stats.get('hedges_over_budget', 0),
+        'hedge_delays': gateway.hedge_policy.stats()['delays'],
+    }
+
+
+async def run_hedge_check(
+    calls: int = 400,
+    concurrency: int = 20,
+    median: float = 0.05,
+    tail_rate: float = 0.05,
+    tail: Tuple[float, float] = (0.5, 1.0),
+    percentile: float = 95,
+    budget: float = 0.1
+) -> Dict[str, Any]:
+    """Same workload and latency distribution, without and with hedging."""
+    client_kwargs = {'median': median, 'tail_rate': tail_rate, 'tail': tail}
+    # Scaled-down delays: the real defaults are tuned for multi-second calls
+    policy_kwargs = {
+        'percentile': percentile,
+        'min_delay': median,
+        'initial_delay': tail[0],
+        'min_samples': 20,
+        'budget_ratio': budget,
+        'burst': 2,
+    }
+    baseline = await _run(False, calls, concurrency, client_kwargs, policy_kwargs)
+    hedged = await _run(True, calls, concurrency, client_kwargs, policy_kwargs)
+    return {
+        'calls': calls,
+        'distribution': {'median': median, 'tail_rate': tail_rate, 'tail': list(tail)},
+        'baseline': baseline,
+        'hedged': hedged,
+        'p99_reduction': round(1 - hedged['p99'] / baseline['p99'], 3) if baseline['p99'] else None,
+        'within_budget': hedged['hedges'] <= calls * budget + policy_kwargs['burst'],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure tail latency with and without LLM request hedging")
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--median", type=float, default=0.05, help="Median latency of the body (seconds)")
+    parser.add_argument("--tail-rate", type=float, default=0.05, help="Share of calls in the slow tail")
+    parser.add_argument("--tail", default="0.5,1.0", help="Slow tail latency range min,max (seconds)")
+    parser.add_argument("--percentile", type=float, default=95)
+    parser.add_argument("--budget", type=float, default=0.1, help="Hedges allowed per call")
+    args = parser.parse_args()
+
+    tail_min, tail_max = (float(value) for value in args.tail.split(','))
+    result = asyncio.run(run_hedge_check(
+        calls=args.calls,
+        concurrency=args.concurrency,
+        median=args.median,
+        tail_rate=args.tail_rate,
+        tail=(tail_min, tail_max),
+        percentile=args.percentile,
+        budget=args.budget,
+    ))
+    print(json.dumps(result, indent=2))
+    if result['hedged']['p99'] >= result['baseline']['p99']:
+        raise SystemExit("Hedging did not reduce p99 latency")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+LLM Gateway Overlap Check
+
+Runs several fake offers concurrently through the LLM gateway with a fake
+genai client whose calls take a fixed latency, and checks that the calls
+overlap (wall time close to one offer, not the sum of all offers). Also
+exercises the retry and fallback path with injected failures.
+
+Usage:
+    python -m src.benchmark.llm_overlap_check --offers 8 --calls-per-offer 3 --latency 0.2
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from src.llm.gateway import LLMGateway
+from src.utils.retry import RetryConfig
+
+
+class FakeResponse:
+    """Minimal generate_content response."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.candidates: List[Any] = []
+
+
+class _FakeModels:
+    def __init__(self, owner: "FakeGenaiClient"):
+        self._owner = owner
+
+    async def generate_content(self, model: str, contents: Any, config: Any = None) -> FakeResponse:
+        return await self._owner._generate(model, contents)
+
+
+class _FakeAio:
+    def __init__(self, owner: "FakeGenaiClient"):
+        self.models = _FakeModels(owner)
+
+
+class FakeGenaiClient:
+    """Stand-in for genai.Client exposing client.aio.models.generate_content."""
+
+    def __init__(self, latency: float = 0.2, failing_models: Optional[Set[str]] = None):
+        self.latency = latency
+        self.failing_models = set(failing_models or ())
+        self.aio = _FakeAio(self)
+        self.calls = 0
+        self.max_concurrency = 0
+        self._active = 0
+
+    async def _generate(self, model: str, contents: Any) -> FakeResponse:
+        self.calls += 1
+        self._active += 1
+        self.max_concurrency = max(self.max_concurrency, self._active)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self._active -= 1
+        if model in self.failing_models:
+            raise ConnectionError(f"503 service unavailable ({model})")
+        return FakeResponse(f"{model}: {contents}")
+
+
+async def _fake_offer(gateway: LLMGateway, client: FakeGenaiClient, index: int, calls: int) -> List[str]:
+    # Sequential LLM calls within one offer, as in extraction -> matching -> review
+    texts = []
+    for step in range(calls):
+        response = await gateway.generate_content(
+            model="gemini-2.5-flash",
+            contents=f"offer {index} step {step}",
+            client=client,
+            label=f"offer-{index}",
+        )
+        texts.append(response.text)
+    return texts
+
+
+async def run_overlap_check(offers: int = 8, calls_per_offer: int = 3, latency: float = 0.2) -> Dict[str, Any]:
+    """
+    Run concurrent fake offers and a fallback scenario.
+
+    Returns:
+        Dict with wall vs serial time, observed concurrency and fallback result
+    """
+    client = FakeGenaiClient(latency=latency)
+    gateway = LLMGateway(client=client, retry_config=RetryConfig(max_attempts=3, base_delay=0.01, jitter=True))
+
+    started = time.monotonic()
+    await asyncio.gather(*(_fake_offer(gateway, client, i, calls_per_offer) for i in range(offers)))
+    wall_time = time.monotonic() - started
+    serial_time = offers * calls_per_offer * latency
+
+    # Requested model always fails -> gateway must fall back after primary_model_failures
+    failing = FakeGenaiClient(latency=0.0, failing_models={"gemini-3-pro-preview"})
+    fallback_gateway = LLMGateway(
+        client=failing,
+        retry_config=RetryConfig(max_attempts=3, base_delay=0.01, jitter=True),
+        primary_model_failures=1,
+    )
+    fallback_response = await fallback_gateway.generate_content(model="gemini-3-pro-preview", contents="ping")
+
+    return {
+        'offers': offers,
+        'calls_per_offer': calls_per_offer,
+        'latency_seconds': latency,
+        'wall_time_seconds': round(wall_time, 3),
+        'serial_time_seconds': round(serial_time, 3),
+        'max_concurrent_calls': client.max_concurrency,
+        'overlapped': wall_time < serial_time / 2 and client.max_concurrency > 1,
+        'fallback_response': fallback_response.text,
+        'fallback_stats': fallback_gateway.stats(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check that LLM calls from concurrent offers overlap")
+    parser.add_argument("--offers", type=int, default=8)
+    parser.add_argument("--calls-per-offer", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    result = asyncio.run(run_overlap_check(args.offers, args.calls_per_offer, args.latency))
+    print(json.dumps(result, indent=2))
+    if not result['overlapped']:
+        raise SystemExit("LLM calls did not overlap")
+
+
+if __name__ == "__main__":
+    main()
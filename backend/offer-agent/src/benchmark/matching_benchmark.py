@@ -0,0 +1,141 @@
+"""
+Matching Benchmark
+
+Compares the single-agent batch matcher with sharded parallel matching on
+offers of different sizes and reports wall-clock time, LLM round trips and
+LLM tokens for each:
+
+    python -m src.benchmark.matching_benchmark --terms data/bench/terms.json --sizes 20,100,300 --mode record
+    python -m src.benchmark.matching_benchmark --terms data/bench/terms.json --sizes 20,100,300 --mode replay
+
+The terms file is a JSON list of term dicts (unclear_term, quantity, ...) or
+of plain strings, or a text file with one term per line. Smaller lists are
+repeated with a line number suffix to reach the requested size.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from src.benchmark.recorder import KIND_LLM, MODE_OFF, MODES, configure_interaction_recorder
+
+
+def load_terms(path: str) -> List[Dict[str, Any]]:
+    """Term dicts from a JSON list or a one-term-per-line text file."""
+    text = Path(path).read_text(encoding='utf-8')
+    if path.endswith('.json'):
+        items = json.loads(text)
+    else:
+        items = [line.strip() for line in text.splitlines() if line.strip()]
+    return [item if isinstance(item, dict) else {'unclear_term': item, 'quantity': '1'} for item in items]
+
+
+def offer_of_size(terms: List[Dict[str, Any]], size: int) -> List[Dict[str, Any]]:
+    """First size terms, repeating the list (with distinct names) when it is shorter."""
+    offer = []
+    for index in range(size):
+        term = dict(terms[index % len(terms)])
+        if index >= len(terms):
+            term['unclear_term'] = f"{term['unclear_term']} ({index // len(terms) + 1})"
+        offer.append(term)
+    return offer
+
+
+async def _measure(recorder, match, offer: List[Dict[str, Any]]) -> Dict[str, Any]:
+    before = recorder.stats().get(KIND_LLM, {})
+    started = time.monotonic()
+    results = await match(offer)
+    elapsed = time.monotonic() - started
+    after = recorder.stats().get(KIND_LLM, {})
+    return {
+        'seconds': round(elapsed, 3),
+        'llm_round_trips': after.get('round_trips', 0) - before.get('round_trips', 0),
+        'llm_tokens': after.get('tokens', 0) - before.get('tokens', 0),
+        'matched': sum(1 for row in results if str(row.get('matched_product_code')) != '9000'),
+        'results': len(results),
+    }
+
+
+async def run_benchmark(
+    terms_path: str,
+    sizes: List[int],
+    mode: str = MODE_OFF,
+    fixture_dir: Optional[str] = None,
+    shard_size: int = 20,
+    concurrency: int = 4,
+    clustering: str = "keyword"
+) -> Dict[str, Any]:
+    """Single agent vs sharded matching for each offer size."""
+    recorder = configure_interaction_recorder(mode=mode, fixture_dir=fixture_dir)
+
+    # Imported after the recorder is configured so clients pick it up
+    from src.erp.factory import get_erp_factory
+    from src.product_matching.product_matcher import ProductMatcher
+    from src.product_matching.sharded_matcher import ShardedMatcher
+
+    terms = load_terms(terms_path)
+    matcher = ProductMatcher(product_repository=get_erp_factory().create_product_repository())
+    sharded = ShardedMatcher(matcher, shard_size=shard_size, max_concurrency=concurrency, clustering=clustering)
+
+    report = []
+    try:
+        for size in sizes:
+            offer = offer_of_size(terms, size)
+            recorder.reset_replay()
+            single = await _measure(recorder, lambda batch: matcher.match_terms_batch(batch), offer)
+            parallel = await _measure(recorder, lambda batch: sharded.match_terms_batch(batch), offer)
+            parallel['shards'] = sharded.last_run.get('shards', 1) if size > shard_size else 1
+            report.append({
+                'lines': size,
+                'single_agent': single,
+                'sharded': parallel,
+                'speedup': round(single['seconds'] / parallel['seconds'], 2) if parallel['seconds'] else None,
+                'token_ratio': round(parallel['llm_tokens'] / single['llm_tokens'], 2) if single['llm_tokens'] else None,
+            })
+    finally:
+        await matcher.close()
+
+    return {
+        'mode': mode,
+        'shard_size': shard_size,
+        'concurrency': concurrency,
+        'clustering': clustering,
+        'sizes': report,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare single-agent and sharded product matching")
+    parser.add_argument("--terms", required=True, help="JSON list of terms or a text file with one term per line")
+    parser.add_argument("--sizes", default="20,100,300", help="Comma-separated offer sizes")
+    parser.add_argument("--mode", choices=MODES, default=MODE_OFF)
+    parser.add_argument("--fixtures", default=None, help="Fixture directory for record/replay")
+    parser.add_argument("--shard-size", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--clustering", choices=("keyword", "embedding"), default="keyword")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    # Cache hits would make the second run look free
+    os.environ['LLM_CACHE_ENABLED'] = 'false'
+
+    result = asyncio.run(run_benchmark(
+        terms_path=args.terms,
+        sizes=[int(size) for size in args.sizes.split(',') if size.strip()],
+        mode=args.mode,
+        fixture_dir=args.fixtures,
+        shard_size=args.shard_size,
+        concurrency=args.concurrency,
+        clustering=args.clustering,
+    ))
+    report = json.dumps(result, indent=2, default=str)
+    print(report)
+    if args.output:
+        Path(args.output).write_text(report, encoding='utf-8')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Offer Benchmark
+
+Runs OfferOrchestrator over a corpus of email JSON files and reports
+per-step p50/p95, external round trips, LLM tokens and seconds/tokens per
+matched line. Combined with the interaction recorder this gives a repeatable
+offline benchmark:
+
+    # 1. Record once against the real services
+    python -m src.benchmark.offer_benchmark --corpus data/bench/emails --fixtures data/bench/fixtures --mode record
+    # 2. Replay as often as needed, with recorded (or scaled/fixed) latency
+    python -m src.benchmark.offer_benchmark --corpus data/bench/emails --fixtures data/bench/fixtures --mode replay
+
+Each corpus file holds one email dict (sender, subject, body, attachments) or
+a list of them. Attachment bytes may be given base64-encoded as 'data_base64'.
+The review workflow (no ERP writes) is benchmarked unless --full is given.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.benchmark.recorder import MODE_REPLAY, MODES, configure_interaction_recorder
+from src.scheduler.metrics import LatencyWindow
+
+
+def load_corpus(corpus_dir: str) -> List[Tuple[str, Dict[str, Any]]]:
+    """Load (name, email_data) pairs from *.json files, sorted by file name."""
+    emails = []
+    for path in sorted(Path(corpus_dir).glob("*.json")):
+        data = json.loads(path.read_text(encoding='utf-8'))
+        items = data if isinstance(data, list) else [data]
+        for index, email in enumerate(items):
+            for attachment in email.get('attachments', []) or []:
+                if 'data_base64' in attachment:
+                    attachment['data'] = base64.b64decode(attachment.pop('data_base64'))
+            name = path.stem if len(items) == 1 else f"{path.stem}[{index}]"
+            emails.append((name, email))
+    return emails
+
+
+def _diff_round_trips(before: Dict[str, Dict[str, float]], after: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    diff = {}
+    for kind, counters in after.items():
+        previous = before.get(kind, {})
+        diff[kind] = {
+            name: counters.get(name, 0) - previous.get(name, 0)
+            for name in ('round_trips', 'tokens', 'seconds')
+        }
+    return diff
+
+
+def _matched_lines(context: Any) -> int:
+    """Lines matched to a real product (not the 9000 fallback)."""
+    products = getattr(context, 'matched_products', None) or []
+    return sum(1 for product in products if str(getattr(product, 'product_code', '')) != '9000')
+
+
+async def run_benchmark(
+    corpus_dir: str,
+    fixture_dir: str,
+    mode: str = MODE_REPLAY,
+    latency_scale: float = 1.0,
+    fixed_latency: Optional[float] = None,
+    repeat: int = 1,
+    full_workflow: bool = False
+) -> Dict[str, Any]:
+    """
+    Process every corpus email sequentially and aggregate timings.
+
+    Returns:
+        Dict with per-step latency summaries, per-offer results and
+        round-trip/token totals by kind
+    """
+    recorder = configure_interaction_recorder(
+        mode=mode,
+        fixture_dir=fixture_dir,
+        latency_scale=latency_scale,
+        fixed_latency=fixed_latency,
+    )
+
+    # Imported after the recorder is configured so clients pick it up
+    from src.core.checkpoint import make_checkpoint_key
+    from src.core.orchestrator import OfferOrchestrator
+
+    corpus = load_corpus(corpus_dir)
+    orchestrator = OfferOrchestrator()
+    run_id = int(time.time())
+
+    step_windows: Dict[str, LatencyWindow] = defaultdict(LatencyWindow)
+    total_window = LatencyWindow()
+    offers = []
+    total_matched = 0
+
+    for iteration in range(repeat):
+        recorder.reset_replay()
+        for name, email_data in corpus:
+            # Fresh request IDs so checkpoints from earlier runs are never resumed
+            request_id = f"bench-{run_id}-{iteration}-{name}"
+            before = recorder.stats()
+            started = time.monotonic()
+            if full_workflow:
+                result = await orchestrator.process_offer_request(email_data, request_id=request_id)
+            else:
+                result = await orchestrator.process_offer_request_for_review(email_data, request_id=request_id)
+            elapsed = time.monotonic() - started
+            orchestrator.checkpoints.delete(make_checkpoint_key(email_data, request_id))
+
+            total_window.add(elapsed)
+            context = getattr(result, 'context', None)
+            for report in (context.metadata.get('workflow_timing', []) if context else []):
+                for step, timing in report.get('steps', {}).items():
+                    step_windows[step].add(timing['duration'])
+
+            round_trips = _diff_round_trips(before, recorder.stats())
+            matched_lines = _matched_lines(context)
+            offers.append({
+                'email': name,
+                'iteration': iteration,
+                'success': result.success,
+                'seconds': round(elapsed, 3),
+                'matched_lines': matched_lines,
+                'errors': result.errors[:3],
+                'round_trips': round_trips,
+            })
+            total_matched += matched_lines
+
+    totals = recorder.stats()
+    processed = len(offers) or 1
+    return {
+        'mode': mode,
+        'offers': len(offers),
+        'succeeded': sum(1 for offer in offers if offer['success']),
+        'workflow': 'full' if full_workflow else 'review',
+        'latency_scale': latency_scale,
+        'fixed_latency_seconds': fixed_latency,
+        'offer_seconds': total_window.summary(),
+        'steps': {step: window.summary() for step, window in sorted(step_windows.items())},
+        'round_trips': totals,
+        'round_trips_per_offer': {
+            kind: round(counters.get('round_trips', 0) / processed, 2) for kind, counters in totals.items()
+        },
+        'llm_tokens': totals.get('llm', {}).get('tokens', 0),
+        'matched_lines': total_matched,
+        'seconds_per_matched_line': (
+            round(sum(offer['seconds'] for offer in offers) / total_matched, 3) if total_matched else None
+        ),
+        'llm_tokens_per_matched_line': (
+            round(totals.get('llm', {}).get('tokens', 0) / total_matched) if total_matched else None
+        ),
+        'per_offer': offers,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the offer workflow over a recorded email corpus")
+    parser.add_argument("--corpus", required=True, help="Directory of email JSON files")
+    parser.add_argument("--fixtures", required=True, help="Fixture directory to record to / replay from")
+    parser.add_argument("--mode", choices=MODES, default=MODE_REPLAY)
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiplier on recorded latency")
+    parser.add_argument("--fixed-latency", type=float, default=None, help="Serve every replayed call after N seconds")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--full", action="store_true", help="Include ERP offer creation and verification")
+    parser.add_argument("--llm-cache", action="store_true", help="Keep the LLM response cache enabled")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    if not args.llm_cache:
+        # Cache hits would skip the recorder and make runs incomparable
+        os.environ['LLM_CACHE_ENABLED'] = 'false'
+
+    result = asyncio.run(run_benchmark(
+        corpus_dir=args.corpus,
+        fixture_dir=args.fixtures,
+        mode=args.mode,
+        latency_scale=args.latency_scale,
+        fixed_latency=args.fixed_latency,
+        repeat=args.repeat,
+        full_workflow=args.full,
+    ))
+    report = json.dumps(result, indent=2, default=str)
+    print(report)
+    if args.output:
+        Path(args.output).write_text(report, encoding='utf-8')
+
+
+if __name__ == "__main__":
+    main()
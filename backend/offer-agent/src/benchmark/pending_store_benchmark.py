@@ -0,0 +1,152 @@
+"""
+Pending Offer Store Benchmark
+
+Fills a fresh PendingOfferStore with synthetic offers (10 lines each) and
+times the operations the API performs: add, get, status update, the first
+and deep pages of /api/offers/pending, status counts and compaction.
+For comparison it also times one full JSON rewrite of the same offers,
+which is what every write cost with the previous JSON-file store:
+
+    python -m src.benchmark.pending_store_benchmark --sizes 10000,100000
+"""
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from src.api.models.responses import OrderLineResponse, PendingOfferResponse
+from src.api.services.pending_store import PendingOfferStore
+from src.scheduler.metrics import LatencyWindow
+
+
+def make_offer(index: int, rng: random.Random, lines: int = 10) -> PendingOfferResponse:
+    """Synthetic offer created within the last six days."""
+    return PendingOfferResponse(
+        id=str(uuid.UUID(int=rng.getrandbits(128))),
+        offer_number=f"PENDING-{index:08d}",
+        customer_name=f"Customer {index % 500}",
+        customer_email=f"buyer{index % 500}@example.com",
+        created_at=datetime.utcnow() - timedelta(seconds=rng.uniform(0, 6 * 86400)),
+        status=rng.choice(("pending", "pending", "pending", "sent", "failed")),
+        total_amount=round(rng.uniform(100, 50000), 2),
+        lines=[
+            OrderLineResponse(
+                id=f"line-{i}",
+                product_code=str(rng.randint(100000, 9999999)),
+                product_name=f"Product {rng.randint(1, 20000)} DN{rng.choice((15, 20, 25, 50))}",
+                quantity=rng.randint(1, 100),
+                unit_price=round(rng.uniform(1, 500), 2),
+                total_price=round(rng.uniform(1, 5000), 2),
+                ai_confidence=rng.uniform(50, 100),
+                original_customer_term=f"customer term {i}",
+            )
+            for i in range(lines)
+        ],
+    )
+
+
+def _time(window: LatencyWindow, fn: Callable[[], Any]) -> Any:
+    """Call fn and add its duration in milliseconds to the window."""
+    started = time.perf_counter()
+    result = fn()
+    window.add((time.perf_counter() - started) * 1000)
+    return result
+
+
+async def benchmark_size(size: int, workdir: Path, samples: int = 200, seed: int = 7) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    offers = [make_offer(index, rng) for index in range(size)]
+    store = PendingOfferStore(
+        db_path=str(workdir / f"pending_{size}.db"),
+        legacy_backup_path=str(workdir / "none.json"),
+    )
+
+    started = time.perf_counter()
+    for start in range(0, size, 1000):
+        store.add_many_sync(offers[start:start + 1000])
+    bulk_load = time.perf_counter() - started
+
+    add, get, update, first_page, deep_page, counts = (LatencyWindow() for _ in range(6))
+    for index in range(samples):
+        offer = make_offer(size + index, rng)
+        _time(add, lambda: store.add_sync(offer))
+        target = rng.choice(offers).id
+        _time(get, lambda: store.get_sync(target))
+        _time(update, lambda: store.update_status_sync(target, rng.choice(("pending", "processing"))))
+
+    for _ in range(20):
+        _time(first_page, lambda: store.list_page_sync(status="pending", limit=100))
+        _time(counts, store.count_by_status)
+
+    # Walk 50 pages deep, timing each page fetch
+    cursor = None
+    for _ in range(50):
+        _, cursor = _time(deep_page, lambda: store.list_page_sync(status="pending", limit=100, cursor=cursor))
+        if cursor is None:
+            break
+
+    # The event loop only waits for the thread hop, not for SQLite
+    loop_started = time.perf_counter()
+    await asyncio.gather(*(store.get(rng.choice(offers).id) for _ in range(100)))
+    async_gets = time.perf_counter() - loop_started
+
+    started = time.perf_counter()
+    store.compact()
+    compact = time.perf_counter() - started
+
+    # What one add/update cost with the JSON-file store: serialize and write everything
+    started = time.perf_counter()
+    legacy = {'offers': {offer.id: offer.model_dump(mode="json") for offer in offers}}
+    with open(workdir / f"legacy_{size}.json", "w", encoding="utf-8") as f:
+        json.dump(legacy, f, indent=2, default=str)
+    legacy_write = time.perf_counter() - started
+
+    result = {
+        'records': size,
+        'bulk_load_seconds': round(bulk_load, 3),
+        'add_ms': add.summary(),
+        'get_ms': get.summary(),
+        'update_status_ms': update.summary(),
+        'first_page_ms': first_page.summary(),
+        'deep_pages_ms': deep_page.summary(),
+        'count_by_status_ms': counts.summary(),
+        'async_100_gets_seconds': round(async_gets, 3),
+        'compact_seconds': round(compact, 3),
+        'legacy_json_rewrite_seconds': round(legacy_write, 3),
+        'db_bytes': (workdir / f"pending_{size}.db").stat().st_size,
+    }
+    store.close()
+    return result
+
+
+async def run_benchmark(sizes: List[int], samples: int = 200) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix="pending_store_bench_") as tmp:
+        results = [await benchmark_size(size, Path(tmp), samples=samples) for size in sizes]
+    return {'sizes': results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the pending offer store")
+    parser.add_argument("--sizes", default="10000,100000", help="Comma-separated record counts")
+    parser.add_argument("--samples", type=int, default=200, help="Timed single-record operations per size")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    result = asyncio.run(run_benchmark(
+        sizes=[int(size) for size in args.sizes.split(',') if size.strip()],
+        samples=args.samples,
+    ))
+    report = json.dumps(result, indent=2)
+    print(report)
+    if args.output:
+        Path(args.output).write_text(report, encoding='utf-8')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,476 @@
+"""
+Interaction Recorder
+
+Record/replay of external round trips - LLM generate_content calls, Lemonsoft
+REST and SOAP requests, direct SQL queries and embedding requests - so the
+offer workflow can be benchmarked offline against a fixed corpus.
+
+Modes (INTERACTION_MODE):
+    off     Calls go straight through; round trips are still counted.
+    record  Calls go through and each request/response pair is written to
+            INTERACTION_FIXTURE_DIR/<kind>/<key>.json together with its latency.
+    replay  Responses are served from the fixtures after a simulated latency
+            (recorded latency * REPLAY_LATENCY_SCALE, or a fixed
+            REPLAY_LATENCY_SECONDS). A request without a fixture raises
+            ReplayMissError instead of reaching the network.
+
+Fixture keys are content hashes of the request, so the same prompt or query
+replays the same answer. When one request is sent several times with
+different answers (e.g. reading an offer before and after an update) the
+answers are kept in order and replayed in that order.
+"""
+import asyncio
+import base64
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from threading import Lock
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from src.utils.exceptions import BaseOfferAutomationError
+from src.utils.logger import get_logger
+
+
+MODE_OFF = "off"
+MODE_RECORD = "record"
+MODE_REPLAY = "replay"
+MODES = (MODE_OFF, MODE_RECORD, MODE_REPLAY)
+
+# Round-trip kinds
+KIND_LLM = "llm"
+KIND_ERP_API = "erp_api"
+KIND_ERP_HTTP = "erp_http"
+KIND_ERP_SOAP = "erp_soap"
+KIND_ERP_SQL = "erp_sql"
+KIND_EMBEDDING = "embedding"
+
+
+class ReplayMissError(BaseOfferAutomationError):
+    """Replay mode hit a request that was never recorded."""
+
+    def __init__(self, kind: str, key: str, label: str = ""):
+        super().__init__(
+            message=f"No recorded {kind} fixture for {label or 'request'} ({key[:12]})",
+            error_code="REPLAY_FIXTURE_MISSING",
+            context={'kind': kind, 'key': key, 'label': label},
+            recovery_suggestions=[
+                "Record the corpus again with INTERACTION_MODE=record",
+                "Check that prompts/queries did not change since recording",
+            ],
+        )
+
+
+# ----------------------------------------------------------------------
+# Payload encoding
+# ----------------------------------------------------------------------
+def to_json_value(value: Any) -> Any:
+    """JSON-safe form of ERP rows and responses, tagging types JSON lacks."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, Decimal):
+        return {'__decimal__': str(value)}
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, date):
+        return {'__date__': value.isoformat()}
+    if isinstance(value, (bytes, bytearray)):
+        return {'__bytes__': base64.b64encode(bytes(value)).decode('ascii')}
+    if isinstance(value, dict):
+        return {str(k): to_json_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json_value(v) for v in value]
+    return str(value)
+
+
+def from_json_value(value: Any) -> Any:
+    """Inverse of to_json_value."""
+    if isinstance(value, list):
+        return [from_json_value(v) for v in value]
+    if isinstance(value, dict):
+        if len(value) == 1:
+            tag, raw = next(iter(value.items()))
+            if tag == '__decimal__':
+                return Decimal(raw)
+            if tag == '__datetime__':
+                return datetime.fromisoformat(raw)
+            if tag == '__date__':
+                return date.fromisoformat(raw)
+            if tag == '__bytes__':
+                return base64.b64decode(raw)
+        return {k: from_json_value(v) for k, v in value.items()}
+    return value
+
+
+def encode_tuple_rows(rows: Any) -> Any:
+    """Encode pyodbc rows (tuple-like) for a fixture."""
+    return to_json_value([list(row) for row in rows])
+
+
+def decode_tuple_rows(data: Any) -> List[Tuple]:
+    return [tuple(row) for row in from_json_value(data)]
+
+
+def fixture_key(kind: str, request: Tuple[Any, ...]) -> str:
+    """Content hash identifying a request within its kind."""
+    # src.llm imports this module via the gateway, so import lazily
+    from src.llm.cache import make_cache_key
+    return make_cache_key(*request, namespace=kind)
+
+
+class RecordedResponse:
+    """Text-only stand-in for LLM responses that could not be fully serialized."""
+
+    def __init__(self, text: str = "", usage_metadata: Any = None):
+        self.text = text
+        self.candidates: List[Any] = []
+        self.usage_metadata = usage_metadata
+
+
+def encode_llm_response(response: Any) -> Dict[str, Any]:
+    """Encode genai responses and the OpenRouter/xAI wrappers used by ProductMatcher."""
+    from src.llm.cache import serialize_response
+    data = serialize_response(response)
+    if data is not None:
+        return {'format': 'genai', 'data': data}
+    raw = getattr(response, '_result', None)
+    if isinstance(raw, dict):
+        return {'format': 'openrouter', 'data': to_json_value(raw)}
+    return {'format': 'text', 'data': getattr(response, 'text', '') or ''}
+
+
+def decode_llm_response(payload: Dict[str, Any]) -> Any:
+    fmt = payload.get('format')
+    if fmt == 'genai':
+        from src.llm.cache import deserialize_response
+        return deserialize_response(payload['data'])
+    if fmt == 'openrouter':
+        from src.product_matching.product_matcher import OpenRouterGeminiResponse
+        return OpenRouterGeminiResponse(from_json_value(payload['data']))
+    return RecordedResponse(payload.get('data', ''))
+
+
+def llm_response_tokens(response: Any) -> int:
+    """Total tokens reported by a genai response or an OpenRouter usage dict."""
+    usage = getattr(response, 'usage_metadata', None)
+    if isinstance(usage, dict):
+        return int(usage.get('total_tokens') or usage.get('total_token_count') or 0)
+    return int(getattr(usage, 'total_token_count', 0) or 0)
+
+
+def encode_http_response(response: Any) -> Dict[str, Any]:
+    """Encode an httpx.Response (status, content type and body)."""
+    return {
+        'status_code': response.status_code,
+        'content_type': response.headers.get('content-type', ''),
+        'body': base64.b64encode(response.content).decode('ascii'),
+        'method': response.request.method if response.request else 'GET',
+        'url': str(response.request.url) if response.request else '',
+    }
+
+
+def decode_http_response(payload: Dict[str, Any]) -> Any:
+    import httpx
+    headers = {'content-type': payload['content_type']} if payload.get('content_type') else None
+    return httpx.Response(
+        payload['status_code'],
+        content=base64.b64decode(payload['body']),
+        headers=headers,
+        request=httpx.Request(payload.get('method', 'GET'), payload.get('url') or 'http://replay.invalid/'),
+    )
+
+
+def _describe_request(request: Tuple[Any, ...]) -> Any:
+    """Readable copy of the request stored next to the response for inspection."""
+    from src.llm.cache import _canonical
+    return _canonical(list(request))
+
+
+# ----------------------------------------------------------------------
+# Recorder
+# ----------------------------------------------------------------------
+class InteractionRecorder:
+    """
+    Wraps external calls for recording, replay and round-trip accounting.
+
+    Call sites hand over the request identity and a zero-argument callable
+    that performs the real call:
+        rows = recorder.call_sync(KIND_ERP_SQL, (query, params), run_query, label="lemonsoft_sql")
+        response = await recorder.call(KIND_LLM, (model, contents, config), send, ...)
+    """
+
+    def __init__(
+        self,
+        mode: Optional[str] = None,
+        fixture_dir: Optional[str] = None,
+        latency_scale: Optional[float] = None,
+        fixed_latency: Optional[float] = None
+    ):
+        """
+        Initialize the recorder.
+
+        Args:
+            mode: off / record / replay (INTERACTION_MODE, default off)
+            fixture_dir: Fixture root (INTERACTION_FIXTURE_DIR, default /app/data/fixtures)
+            latency_scale: Multiplier on recorded latency in replay (REPLAY_LATENCY_SCALE, default 1.0)
+            fixed_latency: Serve every replayed call after this many seconds
+                instead of the recorded latency (REPLAY_LATENCY_SECONDS)
+        """
+        self.logger = get_logger(__name__)
+        self.mode = (mode or os.getenv('INTERACTION_MODE', MODE_OFF)).lower()
+        if self.mode not in MODES:
+            self.logger.warning(f"Unknown INTERACTION_MODE '{self.mode}', recording disabled")
+            self.mode = MODE_OFF
+        self.fixture_dir = Path(fixture_dir or os.getenv('INTERACTION_FIXTURE_DIR', '/app/data/fixtures'))
+        self.latency_scale = latency_scale if latency_scale is not None else float(
+            os.getenv('REPLAY_LATENCY_SCALE', '1.0')
+        )
+        env_fixed = os.getenv('REPLAY_LATENCY_SECONDS')
+        self.fixed_latency = fixed_latency if fixed_latency is not None else (
+            float(env_fixed) if env_fixed else None
+        )
+
+        self._lock = Lock()
+        self._fixtures: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._recorded_keys = set()
+        self._replay_positions: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._stats: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == MODE_RECORD
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == MODE_REPLAY
+
+    # ------------------------------------------------------------------
+    # Call wrappers
+    # ------------------------------------------------------------------
+    async def call(
+        self,
+        kind: str,
+        request: Tuple[Any, ...],
+        func: Callable[[], Awaitable[Any]],
+        *,
+        label: str = "",
+        encode: Optional[Callable[[Any], Any]] = None,
+        decode: Optional[Callable[[Any], Any]] = None,
+        tokens: Optional[Callable[[Any], int]] = None
+    ) -> Any:
+        """Perform (or replay) one async round trip."""
+        if self.replaying:
+            key = fixture_key(kind, request)
+            entry = self._next_replay(kind, key, label)
+            await asyncio.sleep(self._replay_delay(entry))
+            return (decode or from_json_value)(entry['payload'])
+
+        started = time.monotonic()
+        result = await func()
+        latency = time.monotonic() - started
+        token_count = tokens(result) if tokens else 0
+        self._count(kind, label, latency, token_count)
+        if self.recording:
+            payload = (encode or to_json_value)(result)
+            await asyncio.to_thread(self._store, kind, request, label, payload, latency, token_count)
+        return result
+
+    def call_sync(
+        self,
+        kind: str,
+        request: Tuple[Any, ...],
+        func: Callable[[], Any],
+        *,
+        label: str = "",
+        encode: Optional[Callable[[Any], Any]] = None,
+        decode: Optional[Callable[[Any], Any]] = None,
+        tokens: Optional[Callable[[Any], int]] = None
+    ) -> Any:
+        """Perform (or replay) one blocking round trip; for calls already off the event loop."""
+        if self.replaying:
+            key = fixture_key(kind, request)
+            entry = self._next_replay(kind, key, label)
+            time.sleep(self._replay_delay(entry))
+            return (decode or from_json_value)(entry['payload'])
+
+        started = time.monotonic()
+        result = func()
+        latency = time.monotonic() - started
+        token_count = tokens(result) if tokens else 0
+        self._count(kind, label, latency, token_count)
+        if self.recording:
+            self._store(kind, request, label, (encode or to_json_value)(result), latency, token_count)
+        return result
+
+    async def stream(
+        self,
+        kind: str,
+        request: Tuple[Any, ...],
+        func: Callable[[], AsyncIterator[Any]],
+        *,
+        label: str = "",
+        tokens: Optional[Callable[[], int]] = None
+    ) -> AsyncIterator[Any]:
+        """
+        Perform (or replay) one streamed round trip of JSON-serializable items.
+
+        Items are recorded with their offset from the start of the stream and
+        replayed on the same (scaled) schedule, so consumers overlap with the
+        stream offline as they would live. tokens is read once the stream ends.
+        """
+        if self.replaying:
+            key = fixture_key(kind, request)
+            entry = self._next_replay(kind, key, label)
+            started = time.monotonic()
+            for offset, item in entry['payload']:
+                if self.fixed_latency is not None:
+                    due = self.fixed_latency
+                else:
+                    due = max(float(offset) * self.latency_scale, 0.0)
+                wait = due - (time.monotonic() - started)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                yield from_json_value(item)
+            return
+
+        started = time.monotonic()
+        collected = []
+        async for item in func():
+            collected.append([round(time.monotonic() - started, 4), to_json_value(item)])
+            yield item
+        latency = time.monotonic() - started
+        token_count = tokens() if tokens else 0
+        self._count(kind, label, latency, token_count)
+        if self.recording:
+            await asyncio.to_thread(self._store, kind, request, label, collected, latency, token_count)
+
+    # ------------------------------------------------------------------
+    # Fixtures
+    # ------------------------------------------------------------------
+    def _fixture_path(self, kind: str, key: str) -> Path:
+        return self.fixture_dir / kind / f"{key}.json"
+
+    def _store(
+        self,
+        kind: str,
+        request: Tuple[Any, ...],
+        label: str,
+        payload: Any,
+        latency: float,
+        token_count: int
+    ) -> None:
+        key = fixture_key(kind, request)
+        response = {
+            'payload': payload,
+            'latency_seconds': round(latency, 4),
+            'tokens': token_count,
+            'recorded_at': datetime.utcnow().isoformat(),
+        }
+        path = self._fixture_path(kind, key)
+        with self._lock:
+            fixture = self._fixtures.get((kind, key))
+            # First recording of a key in this process replaces older fixtures;
+            # later ones append so repeated requests replay in order
+            if fixture is None or (kind, key) not in self._recorded_keys:
+                fixture = {
+                    'kind': kind,
+                    'key': key,
+                    'label': label,
+                    'request': _describe_request(request),
+                    'responses': [],
+                }
+            fixture['responses'].append(response)
+            self._fixtures[(kind, key)] = fixture
+            self._recorded_keys.add((kind, key))
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(fixture, ensure_ascii=False, default=str), encoding='utf-8')
+            tmp_path.replace(path)
+
+    def _load(self, kind: str, key: str) -> Optional[Dict[str, Any]]:
+        fixture = self._fixtures.get((kind, key))
+        if fixture is not None:
+            return fixture
+        path = self._fixture_path(kind, key)
+        if not path.exists():
+            return None
+        try:
+            fixture = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Unreadable fixture {path}: {e}")
+            return None
+        self._fixtures[(kind, key)] = fixture
+        return fixture
+
+    def _next_replay(self, kind: str, key: str, label: str) -> Dict[str, Any]:
+        with self._lock:
+            fixture = self._load(kind, key)
+            if not fixture or not fixture.get('responses'):
+                self._stats[kind]['misses'] += 1
+                raise ReplayMissError(kind, key, label)
+            responses = fixture['responses']
+            position = self._replay_positions[(kind, key)]
+            self._replay_positions[(kind, key)] = position + 1
+            entry = responses[min(position, len(responses) - 1)]
+        self._count(kind, label or fixture.get('label', ''), self._replay_delay(entry), entry.get('tokens', 0))
+        return entry
+
+    def _replay_delay(self, entry: Dict[str, Any]) -> float:
+        if self.fixed_latency is not None:
+            return self.fixed_latency
+        return max(float(entry.get('latency_seconds', 0.0)) * self.latency_scale, 0.0)
+
+    # ------------------------------------------------------------------
+    # Stats
+    # ------------------------------------------------------------------
+    def _count(self, kind: str, label: str, seconds: float, token_count: int) -> None:
+        with self._lock:
+            stats = self._stats[kind]
+            stats['round_trips'] += 1
+            stats['seconds'] += seconds
+            stats['tokens'] += token_count or 0
+            if label:
+                self._stats[kind][f"round_trips.{label}"] += 1
+                self._stats[kind][f"tokens.{label}"] += token_count or 0
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Round trips, time spent and tokens per kind (and per label)."""
+        with self._lock:
+            return {
+                kind: {name: (round(value, 3) if isinstance(value, float) and not value.is_integer() else int(value))
+                       for name, value in counters.items()}
+                for kind, counters in self._stats.items()
+            }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def reset_replay(self) -> None:
+        """Start serving repeated requests from their first recorded answer again."""
+        with self._lock:
+            self._replay_positions.clear()
+
+
+_recorder: Optional[InteractionRecorder] = None
+_recorder_lock = Lock()
+
+
+def get_interaction_recorder() -> InteractionRecorder:
+    """Get the process-wide interaction recorder (configured from env)."""
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = InteractionRecorder()
+        return _recorder
+
+
+def configure_interaction_recorder(**kwargs: Any) -> InteractionRecorder:
+    """Replace the process-wide recorder, e.g. from a benchmark CLI."""
+    global _recorder
+    with _recorder_lock:
+        _recorder = InteractionRecorder(**kwargs)
+        return _recorder
@@ -0,0 +1,178 @@
+"""
+Routing Evaluation
+
+Offline evaluation of the model routing policies against the historical
+matches in training_dataset.csv (customer_term -> matched_product_code).
+For every policy the same sample of terms is matched in batches and the
+report gives accuracy (overall and per tier), seconds per line and LLM
+tokens split into fast-model and strong-model calls:
+
+    python -m src.benchmark.routing_eval --dataset training_dataset.csv --sample 200 --mode record --fixtures data/bench/routing
+    python -m src.benchmark.routing_eval --dataset training_dataset.csv --sample 200 --mode replay --fixtures data/bench/routing
+
+With --fast-price / --strong-price (USD per million tokens) the token counts
+are also converted to an estimated cost.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from src.benchmark.recorder import KIND_LLM, MODE_OFF, MODES, configure_interaction_recorder
+from src.scheduler.metrics import LatencyWindow
+
+
+FAST_LABEL = "product_matcher_fast"
+STRONG_LABEL = "product_matcher"
+
+
+def load_dataset(path: str, sample: int = 0, seed: int = 7) -> List[Dict[str, str]]:
+    """Distinct (customer_term, expected code) pairs, optionally a seeded random sample."""
+    rows = []
+    seen = set()
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            term = (row.get('customer_term') or '').strip()
+            code = (row.get('matched_product_code') or '').strip()
+            if not term or not code or term.lower() in seen:
+                continue
+            seen.add(term.lower())
+            rows.append({'term': term, 'expected': code, 'match_type': row.get('match_type', '')})
+    if sample and sample < len(rows):
+        rows = random.Random(seed).sample(rows, sample)
+    return rows
+
+
+async def evaluate_policy(
+    matcher,
+    policy_name: str,
+    rows: List[Dict[str, str]],
+    recorder,
+    batch_size: int = 20
+) -> Dict[str, Any]:
+    """Match every row with one routing policy and score the results."""
+    from src.product_matching.model_router import POLICIES, ModelRouter
+
+    matcher.model_router = ModelRouter(POLICIES[policy_name])
+    matcher.routing_enabled = policy_name != "strong_only"
+
+    before = recorder.stats().get(KIND_LLM, {})
+    per_line = LatencyWindow()
+    tiers: Dict[str, Dict[str, int]] = defaultdict(lambda: {'lines': 0, 'correct': 0})
+    started = time.monotonic()
+
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        batch_started = time.monotonic()
+        results = await matcher.match_terms_batch(
+            [{'unclear_term': row['term'], 'quantity': '1'} for row in batch]
+        )
+        per_line.add((time.monotonic() - batch_started) / len(batch))
+
+        chosen = {result['unclear_term']: str(result.get('matched_product_code', '')) for result in results}
+        for row in batch:
+            tier = matcher.matched_products.get(row['term'], {}).get('route_tier', 'strong')
+            tiers[tier]['lines'] += 1
+            tiers[tier]['correct'] += int(chosen.get(row['term']) == row['expected'])
+
+    after = recorder.stats().get(KIND_LLM, {})
+    correct = sum(tier['correct'] for tier in tiers.values())
+    return {
+        'policy': policy_name,
+        'lines': len(rows),
+        'accuracy': round(correct / len(rows), 3) if rows else None,
+        'tiers': {
+            name: {**counts, 'accuracy': round(counts['correct'] / counts['lines'], 3) if counts['lines'] else None}
+            for name, counts in sorted(tiers.items())
+        },
+        'seconds': round(time.monotonic() - started, 2),
+        'seconds_per_line': per_line.summary(),
+        'llm_round_trips': after.get('round_trips', 0) - before.get('round_trips', 0),
+        'fast_tokens': after.get(f'tokens.{FAST_LABEL}', 0) - before.get(f'tokens.{FAST_LABEL}', 0),
+        'strong_tokens': after.get(f'tokens.{STRONG_LABEL}', 0) - before.get(f'tokens.{STRONG_LABEL}', 0),
+        'router': matcher.model_router.stats(),
+    }
+
+
+async def run_evaluation(
+    dataset: str,
+    policies: List[str],
+    sample: int = 100,
+    mode: str = MODE_OFF,
+    fixture_dir: Optional[str] = None,
+    batch_size: int = 20,
+    fast_price: Optional[float] = None,
+    strong_price: Optional[float] = None
+) -> Dict[str, Any]:
+    recorder = configure_interaction_recorder(mode=mode, fixture_dir=fixture_dir)
+
+    # Imported after the recorder is configured so clients pick it up
+    from src.erp.factory import get_erp_factory
+    from src.product_matching.product_matcher import ProductMatcher
+
+    rows = load_dataset(dataset, sample=sample)
+    matcher = ProductMatcher(product_repository=get_erp_factory().create_product_repository())
+
+    results = []
+    try:
+        for policy_name in policies:
+            recorder.reset_replay()
+            result = await evaluate_policy(matcher, policy_name, rows, recorder, batch_size=batch_size)
+            if fast_price is not None and strong_price is not None:
+                result['estimated_cost_usd'] = round(
+                    (result['fast_tokens'] * fast_price + result['strong_tokens'] * strong_price) / 1_000_000, 4
+                )
+            results.append(result)
+    finally:
+        await matcher.close()
+
+    return {'dataset': dataset, 'lines': len(rows), 'mode': mode, 'policies': results}
+
+
+def main() -> None:
+    from src.product_matching.model_router import POLICIES
+
+    parser = argparse.ArgumentParser(description="Evaluate model routing policies on historical matches")
+    parser.add_argument("--dataset", default="training_dataset.csv")
+    parser.add_argument("--policies", default=",".join(POLICIES), help="Comma-separated policy names")
+    parser.add_argument("--sample", type=int, default=100, help="Random sample size (0 = all rows)")
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--mode", choices=MODES, default=MODE_OFF)
+    parser.add_argument("--fixtures", default=None, help="Fixture directory for record/replay")
+    parser.add_argument("--fast-price", type=float, default=None, help="USD per million fast-model tokens")
+    parser.add_argument("--strong-price", type=float, default=None, help="USD per million strong-model tokens")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    policies = [name.strip() for name in args.policies.split(',') if name.strip()]
+    unknown = [name for name in policies if name not in POLICIES]
+    if unknown:
+        parser.error(f"unknown policies: {', '.join(unknown)}")
+
+    # Cache hits would make later policies look free
+    os.environ['LLM_CACHE_ENABLED'] = 'false'
+
+    result = asyncio.run(run_evaluation(
+        dataset=args.dataset,
+        policies=policies,
+        sample=args.sample,
+        mode=args.mode,
+        fixture_dir=args.fixtures,
+        batch_size=args.batch_size,
+        fast_price=args.fast_price,
+        strong_price=args.strong_price,
+    ))
+    report = json.dumps(result, indent=2, default=str)
+    print(report)
+    if args.output:
+        Path(args.output).write_text(report, encoding='utf-8')
+
+
+if __name__ == "__main__":
+    main()
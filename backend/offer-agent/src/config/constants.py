@@ -53,6 +53,7 @@ class TechnicalConstants:
     # Database
     DEFAULT_QUERY_LIMIT: int = 100
     MAX_QUERY_LIMIT: int = 1000
+    SQL_IN_CLAUSE_BATCH_SIZE: int = 500  # stays well under SQL Server's 2100 parameter cap
 
 
 class ValidationConstants:
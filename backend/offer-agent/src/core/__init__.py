@@ -4,8 +4,10 @@ Core Workflow Module
 Contains the orchestrator and workflow definitions for offer creation.
 """
 
-from src.core.orchestrator import OfferOrchestrator
+from src.core.checkpoint import CheckpointStore, get_checkpoint_store
+from src.core.dag_executor import WorkflowExecutor, WorkflowTimingReport
 from src.core.workflow import (
+    StepSpec,
     WorkflowContext,
     WorkflowResult,
     WorkflowStep,
@@ -18,4 +20,18 @@ __all__ = [
     "WorkflowResult",
     "WorkflowStep",
     "WorkflowDefinition",
+    "StepSpec",
+    "WorkflowExecutor",
+    "WorkflowTimingReport",
+    "CheckpointStore",
+    "get_checkpoint_store",
 ]
+
+
+def __getattr__(name):
+    # The orchestrator pulls in the matching/LLM stack; import it on first use
+    # so that importing src.core.checkpoint or src.core.workflow stays cheap.
+    if name == "OfferOrchestrator":
+        from src.core.orchestrator import OfferOrchestrator
+        return OfferOrchestrator
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,270 @@
+"""
+Workflow Checkpoints
+
+Step-level persistence of WorkflowContext so a failed request can resume at
+the first incomplete step instead of re-running LLM extraction and matching.
+
+After each step completes, the step's declared outputs (WorkflowDefinition.
+STEP_SPECS) are pickled to a local directory keyed by request ID and a hash of
+the request input. Checkpoint files are written and read only by this service.
+"""
+import hashlib
+import os
+import pickle
+import time
+import uuid
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Iterable, Optional, Set
+
+from src.core.workflow import WorkflowContext, WorkflowDefinition, WorkflowStep
+from src.utils.logger import get_logger
+
+
+CHECKPOINT_SUFFIX = ".ckpt"
+
+
+def compute_input_hash(email_data: Dict[str, Any]) -> str:
+    """
+    Hash the parts of a request that determine workflow results.
+
+    Args:
+        email_data: Email data with sender, subject, body, attachments
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    for key in ('sender', 'subject', 'body'):
+        digest.update(key.encode())
+        digest.update(str(email_data.get(key, '') or '').encode('utf-8', errors='replace'))
+    for attachment in email_data.get('attachments', []) or []:
+        digest.update(str(attachment.get('filename', '')).encode('utf-8', errors='replace'))
+        data = attachment.get('data')
+        if isinstance(data, str):
+            data = data.encode('utf-8', errors='replace')
+        if data:
+            digest.update(hashlib.sha256(data).digest())
+        elif attachment.get('sha256'):
+            # Spooled attachment: same digest as hashing its bytes, without reading them
+            digest.update(bytes.fromhex(attachment['sha256']))
+    return digest.hexdigest()
+
+
+def make_checkpoint_key(email_data: Dict[str, Any], request_id: Optional[str] = None) -> str:
+    """
+    Build a checkpoint key from a request ID and the input hash.
+
+    Args:
+        email_data: Email data for the request
+        request_id: Stable request identifier (e.g. Gmail message ID or job ID);
+            defaults to the email's 'id' field. Without either, a random ID is
+            used: identical submissions must not share (or delete) each
+            other's checkpoints, so such a request cannot be resumed
+
+    Returns:
+        Filesystem-safe key
+    """
+    input_hash = compute_input_hash(email_data)[:24]
+    request_id = request_id or email_data.get('id') or f"req-{uuid.uuid4().hex}"
+    safe_id = ''.join(c if c.isalnum() or c in '-_' else '_' for c in str(request_id))[:64]
+    return f"{safe_id}-{input_hash}"
+
+
+class CheckpointStore:
+    """
+    Local store of per-step workflow outputs.
+
+    Layout:
+        <base_dir>/<key>/<step>.ckpt      pickled {'outputs': {...}, 'warnings': [...]}
+        <base_dir>/aliases/<alias>        text file containing a checkpoint key
+    """
+
+    def __init__(self, base_dir: Optional[str] = None, max_age_days: int = 7):
+        """
+        Initialize the store.
+
+        Args:
+            base_dir: Checkpoint directory. Defaults to WORKFLOW_CHECKPOINT_DIR
+                or /app/data/workflow_checkpoints
+            max_age_days: Checkpoints older than this are removed on startup
+        """
+        self.logger = get_logger(__name__)
+        self._lock = Lock()
+        self.base_dir = Path(
+            base_dir or os.getenv("WORKFLOW_CHECKPOINT_DIR", "/app/data/workflow_checkpoints")
+        )
+        self.max_age_seconds = max_age_days * 86400
+        self.enabled = os.getenv("WORKFLOW_CHECKPOINTS_ENABLED", "true").lower() == "true"
+
+        if self.enabled:
+            try:
+                (self.base_dir / "aliases").mkdir(parents=True, exist_ok=True)
+                self._cleanup_old_checkpoints()
+            except OSError as e:
+                self.logger.warning(f"Workflow checkpoints disabled, cannot use {self.base_dir}: {e}")
+                self.enabled = False
+
+    def save_step(self, key: str, step: WorkflowStep, context: WorkflowContext) -> None:
+        """
+        Persist the declared outputs of a completed step.
+
+        Failures are logged and ignored; checkpointing never fails a workflow.
+        """
+        if not self.enabled or not key:
+            return
+
+        spec = WorkflowDefinition.get_step_spec(step)
+        payload = {
+            'outputs': {name: getattr(context, name) for name in spec.outputs if hasattr(context, name)},
+            'warnings': list(context.warnings),
+            'saved_at': time.time(),
+        }
+
+        step_dir = self.base_dir / key
+        target = step_dir / f"{step.value}{CHECKPOINT_SUFFIX}"
+        tmp = target.with_suffix(".tmp")
+        try:
+            step_dir.mkdir(parents=True, exist_ok=True)
+            with open(tmp, "wb") as f:
+                pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, target)
+        except Exception as e:
+            self.logger.warning(f"Failed to checkpoint step {step.value} for {key}: {e}")
+
+    def restore(
+        self,
+        key: str,
+        context: WorkflowContext,
+        steps: Iterable[WorkflowStep]
+    ) -> Set[WorkflowStep]:
+        """
+        Load checkpointed outputs into the context.
+
+        A step counts as completed only if its checkpoint exists and all of its
+        dependencies within `steps` are completed too.
+
+        Args:
+            key: Checkpoint key
+            context: Context to populate
+            steps: Steps of the run being resumed, in definition order
+
+        Returns:
+            Set of steps that can be skipped
+        """
+        if not self.enabled or not key:
+            return set()
+
+        ordered = list(steps)
+        completed: Set[WorkflowStep] = set()
+        for step in ordered:
+            dependencies = WorkflowDefinition.get_dependencies(step, ordered)
+            if any(dep not in completed for dep in dependencies):
+                continue
+
+            payload = self._load_step(key, step)
+            if payload is None:
+                continue
+
+            for name, value in payload.get('outputs', {}).items():
+                setattr(context, name, value)
+            for warning in payload.get('warnings', []):
+                if warning not in context.warnings:
+                    context.warnings.append(warning)
+            completed.add(step)
+
+        if completed:
+            self.logger.info(
+                f"Resuming {key}: skipping completed steps {[s.value for s in ordered if s in completed]}"
+            )
+        return completed
+
+    def has_checkpoint(self, key: str) -> bool:
+        """Check whether any step has been checkpointed for a key."""
+        return self.enabled and bool(key) and (self.base_dir / key).is_dir()
+
+    def delete(self, key: str) -> None:
+        """Remove all checkpoints for a key."""
+        if not self.enabled or not key:
+            return
+        step_dir = self.base_dir / key
+        with self._lock:
+            try:
+                for path in step_dir.glob("*"):
+                    path.unlink(missing_ok=True)
+                step_dir.rmdir()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self.logger.warning(f"Failed to delete checkpoints for {key}: {e}")
+
+    def link(self, alias: str, key: str) -> None:
+        """Point an alias (e.g. a pending offer ID) at a checkpoint key."""
+        if not self.enabled or not alias or not key:
+            return
+        try:
+            (self.base_dir / "aliases" / alias).write_text(key, encoding="utf-8")
+        except OSError as e:
+            self.logger.warning(f"Failed to link checkpoint alias {alias}: {e}")
+
+    def resolve(self, alias: str) -> Optional[str]:
+        """Resolve an alias to its checkpoint key."""
+        if not self.enabled or not alias:
+            return None
+        try:
+            return (self.base_dir / "aliases" / alias).read_text(encoding="utf-8").strip() or None
+        except OSError:
+            return None
+
+    def unlink(self, alias: str) -> None:
+        """Remove an alias."""
+        if not self.enabled or not alias:
+            return
+        (self.base_dir / "aliases" / alias).unlink(missing_ok=True)
+
+    def _load_step(self, key: str, step: WorkflowStep) -> Optional[Dict[str, Any]]:
+        path = self.base_dir / key / f"{step.value}{CHECKPOINT_SUFFIX}"
+        if not path.exists():
+            return None
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except Exception as e:
+            self.logger.warning(f"Ignoring unreadable checkpoint {path}: {e}")
+            return None
+
+    def _cleanup_old_checkpoints(self) -> None:
+        """Remove checkpoint directories and aliases older than max age."""
+        cutoff = time.time() - self.max_age_seconds
+        removed = 0
+        for path in self.base_dir.iterdir():
+            if path.name == "aliases" or not path.is_dir():
+                continue
+            if path.stat().st_mtime < cutoff:
+                self.delete(path.name)
+                removed += 1
+        for alias in (self.base_dir / "aliases").iterdir():
+            if alias.stat().st_mtime < cutoff:
+                alias.unlink(missing_ok=True)
+        if removed:
+            self.logger.info(f"Cleaned up {removed} expired workflow checkpoints")
+
+
+# Global singleton instance
+_checkpoint_store: Optional[CheckpointStore] = None
+_checkpoint_lock = Lock()
+
+
+def get_checkpoint_store() -> CheckpointStore:
+    """
+    Get the global CheckpointStore instance.
+
+    Returns:
+        The singleton CheckpointStore instance
+    """
+    global _checkpoint_store
+
+    with _checkpoint_lock:
+        if _checkpoint_store is None:
+            _checkpoint_store = CheckpointStore()
+        return _checkpoint_store
@@ -0,0 +1,226 @@
+"""
+Workflow DAG Executor
+
+Runs workflow steps as a dependency graph derived from the declared step
+inputs/outputs in WorkflowDefinition.STEP_SPECS. Steps whose dependencies are
+satisfied run concurrently, each under its time budget if one is configured
+(STEP_TIMEOUT_<STEP>). After a run, a timing report with the critical path
+shows where the end-to-end latency went.
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from src.core.workflow import WorkflowContext, WorkflowDefinition, WorkflowStep
+from src.scheduler.stage_limits import StageLimiter, get_stage_limiter
+from src.utils.exceptions import WorkflowStepTimeoutError
+from src.utils.logger import get_logger
+
+
+StepHandler = Callable[[WorkflowContext], Awaitable[None]]
+StepCallback = Callable[[WorkflowStep, WorkflowContext], None]
+
+
+@dataclass
+class StepTiming:
+    """Wall-clock timing of one executed step (seconds from run start)."""
+    step: WorkflowStep
+    started: float
+    finished: float
+    status: str = "completed"
+
+    @property
+    def duration(self) -> float:
+        return self.finished - self.started
+
+
+@dataclass
+class WorkflowTimingReport:
+    """Per-step timings and critical path of a workflow run."""
+    timings: Dict[WorkflowStep, StepTiming] = field(default_factory=dict)
+    critical_path: List[WorkflowStep] = field(default_factory=list)
+    wall_time: float = 0.0
+
+    @property
+    def serial_time(self) -> float:
+        """Time the same steps would have taken run back to back."""
+        return sum(t.duration for t in self.timings.values())
+
+    def to_dict(self) -> Dict[str, object]:
+        """Convert report to dictionary for logging and context metadata."""
+        return {
+            'wall_time_seconds': round(self.wall_time, 3),
+            'serial_time_seconds': round(self.serial_time, 3),
+            'overlap_saved_seconds': round(max(self.serial_time - self.wall_time, 0.0), 3),
+            'critical_path': [step.value for step in self.critical_path],
+            'steps': {
+                step.value: {
+                    'start': round(t.started, 3),
+                    'end': round(t.finished, 3),
+                    'duration': round(t.duration, 3),
+                    'status': t.status,
+                }
+                for step, t in self.timings.items()
+            },
+        }
+
+
+class WorkflowExecutor:
+    """
+    Executes a set of workflow steps as a DAG.
+
+    Usage:
+        executor = WorkflowExecutor({WorkflowStep.PARSE_EMAIL: self._parse_email, ...})
+        report = await executor.run(context, steps)
+
+    Any step failure cancels the steps still running and is re-raised, so the
+    caller sees the same exception it would have seen from sequential execution.
+    """
+
+    def __init__(
+        self,
+        handlers: Dict[WorkflowStep, StepHandler],
+        stage_limiter: Optional[StageLimiter] = None
+    ):
+        """
+        Initialize the executor.
+
+        Args:
+            handlers: Coroutine function per step, called with the shared context
+            stage_limiter: Per-stage concurrency limits shared across offers
+                (defaults to the process-wide limiter)
+        """
+        self.logger = get_logger(__name__)
+        self.handlers = handlers
+        self.stage_limiter = stage_limiter or get_stage_limiter()
+
+    async def run(
+        self,
+        context: WorkflowContext,
+        steps: Iterable[WorkflowStep],
+        completed: Optional[Set[WorkflowStep]] = None,
+        on_step_completed: Optional[StepCallback] = None,
+        on_step_started: Optional[StepCallback] = None
+    ) -> WorkflowTimingReport:
+        """
+        Run steps concurrently where their declared dependencies allow.
+
+        Args:
+            context: Shared workflow context
+            steps: Steps to run, in definition order
+            completed: Steps already satisfied (skipped, outputs assumed in context)
+            on_step_completed: Called after each step succeeds (e.g. to checkpoint)
+            on_step_started: Called when a step is scheduled (e.g. for progress events)
+
+        Returns:
+            WorkflowTimingReport for the executed steps
+
+        Raises:
+            WorkflowStepTimeoutError: If a step exceeds its timeout
+            Exception: The first exception raised by a failing step
+        """
+        completed = set(completed or ())
+        ordered = [step for step in steps if step not in completed]
+        dependencies = {
+            step: set(WorkflowDefinition.get_dependencies(step, ordered))
+            for step in ordered
+        }
+
+        report = WorkflowTimingReport()
+        start = time.monotonic()
+        pending = list(ordered)
+        running: Dict[asyncio.Task, WorkflowStep] = {}
+
+        try:
+            while pending or running:
+                for step in [s for s in pending if dependencies[s] <= completed]:
+                    pending.remove(step)
+                    task = asyncio.create_task(self._run_step(step, context, start, report))
+                    running[task] = step
+                    if on_step_started:
+                        on_step_started(step, context)
+
+                if not running:
+                    # Only possible with a dependency cycle; fail loudly rather than hang
+                    raise RuntimeError(f"Unschedulable workflow steps: {[s.value for s in pending]}")
+
+                done, _ = await asyncio.wait(running.keys(), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    step = running.pop(task)
+                    error = task.exception()
+                    if error is not None:
+                        context.current_step = step
+                        raise error
+                    completed.add(step)
+                    if on_step_completed:
+                        on_step_completed(step, context)
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running.keys(), return_exceptions=True)
+            report.wall_time = time.monotonic() - start
+            report.critical_path = self._critical_path(report, dependencies)
+            self._log_report(report)
+
+        return report
+
+    async def _run_step(
+        self,
+        step: WorkflowStep,
+        context: WorkflowContext,
+        start: float,
+        report: WorkflowTimingReport
+    ) -> None:
+        handler = self.handlers[step]
+        spec = WorkflowDefinition.get_step_spec(step)
+        timeout = WorkflowDefinition.get_step_timeout(step)
+        started = time.monotonic() - start
+        status = "failed"
+        try:
+            # The timeout covers the step itself, not waiting for a stage slot
+            async with self.stage_limiter.stage(spec.stage):
+                await asyncio.wait_for(handler(context), timeout=timeout)
+            status = "completed"
+        except asyncio.TimeoutError:
+            if timeout is None:
+                # Raised inside the step (e.g. a client timeout), not by a step budget
+                raise
+            status = "timeout"
+            raise WorkflowStepTimeoutError(
+                f"Step {step.value} timed out after {timeout:.0f}s",
+                step_name=step.value,
+                timeout_seconds=timeout
+            )
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
+        finally:
+            report.timings[step] = StepTiming(step, started, time.monotonic() - start, status)
+
+    @staticmethod
+    def _critical_path(
+        report: WorkflowTimingReport,
+        dependencies: Dict[WorkflowStep, Set[WorkflowStep]]
+    ) -> List[WorkflowStep]:
+        """Walk back from the last-finishing step through its latest-finishing dependency."""
+        if not report.timings:
+            return []
+
+        path = []
+        step = max(report.timings.values(), key=lambda t: t.finished).step
+        while step is not None:
+            path.append(step)
+            timed_deps = [report.timings[d] for d in dependencies.get(step, ()) if d in report.timings]
+            step = max(timed_deps, key=lambda t: t.finished).step if timed_deps else None
+        return list(reversed(path))
+
+    def _log_report(self, report: WorkflowTimingReport) -> None:
+        summary = report.to_dict()
+        self.logger.info(
+            f"Workflow timing: wall {summary['wall_time_seconds']}s, "
+            f"serial {summary['serial_time_seconds']}s, "
+            f"saved {summary['overlap_saved_seconds']}s; "
+            f"critical path: {' -> '.join(summary['critical_path'])}"
+        )
@@ -4,13 +4,16 @@ Offer Creation Orchestrator
 Clean, ERP-agnostic orchestrator that replaces the 2,359-line main.py.
 Uses the adapter layer to work with any ERP system.
 """
-from typing import Dict, Any, List, Optional, Tuple
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
 from datetime import datetime, timedelta
 import csv
 import os
 import re
 from pathlib import Path
 
+from src.core.checkpoint import get_checkpoint_store, make_checkpoint_key
+from src.core.dag_executor import StepCallback, WorkflowExecutor
+from src.core.reference_data import get_reference_data
 from src.core.workflow import (
     WorkflowContext,
     WorkflowResult,
@@ -27,14 +30,20 @@ from src.extraction.company_extractor import CompanyExtractor
 from src.domain.offer import Offer, OfferLine
 from src.domain.customer import Customer
 from src.domain.person import Person
+from src.email_processing.attachment_store import attachment_bytes, attachment_path
 from src.product_matching.ai_analyzer import AIAnalyzer
-from src.product_matching.attachment_processor import AttachmentProcessor
-from src.product_matching.pdf_processor import PDFProcessor
 from src.product_matching.product_matcher import ProductMatcher
 from src.product_matching.matcher_class import ProductMatch
+from src.scheduler.batch_scope import batch_memoize
+from src.scheduler.stage_limits import STAGE_OCR, get_stage_limiter
 from src.utils.logger import get_logger
 from src.utils.exceptions import BaseOfferAutomationError, ValidationError
 
+if TYPE_CHECKING:
+    # Loaded on the first email with attachments (OCR/PDF dependencies are slow to import)
+    from src.product_matching.attachment_processor import AttachmentProcessor
+    from src.product_matching.pdf_processor import PDFProcessor
+
 
 class OfferOrchestrator:
     """
@@ -44,6 +53,26 @@ class OfferOrchestrator:
     ERP-agnostic implementation using the adapter pattern.
     """
 
+    # Steps up to and including offer build (human review stops here)
+    REVIEW_WORKFLOW_STEPS = [
+        WorkflowStep.PARSE_EMAIL,
+        WorkflowStep.EXTRACT_COMPANY,
+        WorkflowStep.FIND_CUSTOMER,
+        WorkflowStep.FIND_SALESPERSON,
+        WorkflowStep.EXTRACT_PRODUCTS,
+        WorkflowStep.MATCH_PRODUCTS,
+        WorkflowStep.CALCULATE_PRICING,
+        WorkflowStep.BUILD_OFFER,
+    ]
+
+    # Steps that write to the ERP
+    ERP_WORKFLOW_STEPS = [
+        WorkflowStep.CREATE_OFFER,
+        WorkflowStep.VERIFY_OFFER,
+    ]
+
+    FULL_WORKFLOW_STEPS = REVIEW_WORKFLOW_STEPS + ERP_WORKFLOW_STEPS
+
     def __init__(self, erp_type: Optional[str] = None):
         """
         Initialize the orchestrator.
@@ -93,12 +122,37 @@ class OfferOrchestrator:
 
         self.ai_analyzer: Optional[AIAnalyzer] = None
 
-        self.attachment_processor: Optional[AttachmentProcessor] = None
+        self.attachment_processor: Optional["AttachmentProcessor"] = None
+
+        self.pdf_processor: Optional["PDFProcessor"] = None
 
-        self.pdf_processor: Optional[PDFProcessor] = None
+        self._attachment_processors_loaded = False
 
         self.product_matcher: Optional[ProductMatcher] = None
 
+        # Cached, indexed CSV reference data (shared across orchestrators)
+
+        self.reference_data = get_reference_data()
+
+        # Step-level checkpoints for resuming failed requests
+
+        self.checkpoints = get_checkpoint_store()
+
+        # Step scheduler: runs independent steps concurrently
+
+        self.workflow_executor = WorkflowExecutor({
+            WorkflowStep.PARSE_EMAIL: self._parse_email,
+            WorkflowStep.EXTRACT_COMPANY: self._extract_company,
+            WorkflowStep.FIND_CUSTOMER: self._find_customer,
+            WorkflowStep.FIND_SALESPERSON: self._find_salesperson,
+            WorkflowStep.EXTRACT_PRODUCTS: self._extract_products,
+            WorkflowStep.MATCH_PRODUCTS: self._match_products,
+            WorkflowStep.CALCULATE_PRICING: self._calculate_pricing,
+            WorkflowStep.BUILD_OFFER: self._build_offer,
+            WorkflowStep.CREATE_OFFER: self._create_offer,
+            WorkflowStep.VERIFY_OFFER: self._verify_offer,
+        })
+
  
 
         # Initialize AI components if available
@@ -107,10 +161,6 @@ class OfferOrchestrator:
 
             self.ai_analyzer = AIAnalyzer()
 
-            self.attachment_processor = AttachmentProcessor()
-
-            self.pdf_processor = PDFProcessor()
-
             self.product_matcher = ProductMatcher(product_repository=self.product_repo)
 
             self.logger.info("AI components initialized")
@@ -119,39 +169,39 @@ class OfferOrchestrator:
 
             self.logger.warning(f"AI components not available: {e}")
 
-    async def process_offer_request(self, email_data: Dict[str, Any]) -> WorkflowResult:
+    async def process_offer_request(
+        self,
+        email_data: Dict[str, Any],
+        request_id: Optional[str] = None
+    ) -> WorkflowResult:
         """
         Process an offer request from an email.
 
         This is the main entry point that executes the complete workflow.
+        Steps are checkpointed; calling again with the same request resumes
+        at the first incomplete step.
 
         Args:
             email_data: Email data with sender, subject, body, attachments
+            request_id: Stable request identifier (defaults to the email ID)
 
         Returns:
             WorkflowResult with success status and offer details
         """
         context = WorkflowContext(email_data=email_data)
+        checkpoint_key = make_checkpoint_key(email_data, request_id)
 
         try:
             self.logger.info("=" * 80)
             self.logger.info("Starting offer creation workflow")
             self.logger.info("=" * 80)
 
-            # Execute workflow steps
-            await self._parse_email(context)
-            await self._extract_company(context)
-            await self._find_customer(context)
-            await self._find_salesperson(context)
-            await self._extract_products(context)
-            await self._match_products(context)
-            await self._calculate_pricing(context)
-            await self._build_offer(context)
-            await self._create_offer(context)
-            await self._verify_offer(context)
+            # Execute workflow steps (independent branches run concurrently)
+            await self._run_steps(context, self.FULL_WORKFLOW_STEPS, checkpoint_key)
 
             # Mark as complete
             context.current_step = WorkflowStep.COMPLETE
+            self.checkpoints.delete(checkpoint_key)
 
             # Build result
             result = WorkflowResult(
@@ -180,24 +230,35 @@ class OfferOrchestrator:
                 context=context
             )
 
-    async def process_offer_request_for_review(self, email_data: Dict[str, Any]) -> WorkflowResult:
+    async def process_offer_request_for_review(
+        self,
+        email_data: Dict[str, Any],
+        request_id: Optional[str] = None,
+        on_step_started: Optional[StepCallback] = None,
+        on_step_completed: Optional[StepCallback] = None
+    ) -> WorkflowResult:
         """
         Process an offer request but stop before ERP creation.
 
         This method runs workflow steps 1-8 (parse through build_offer) and
         returns a WorkflowResult ready for human review. The offer is NOT
         created in the ERP system - that happens via send_offer_to_erp().
+        Checkpoints are kept so creation can continue from them later.
 
         Used by the REST API to prepare offers for frontend review before
         sending to ERP.
 
         Args:
             email_data: Email data with sender, subject, body, attachments
+            request_id: Stable request identifier (defaults to the email ID)
+            on_step_started: Progress hook called when a step starts
+            on_step_completed: Progress hook called when a step finishes
 
         Returns:
             WorkflowResult with offer details ready for review
         """
         context = WorkflowContext(email_data=email_data)
+        checkpoint_key = make_checkpoint_key(email_data, request_id)
 
         try:
             self.logger.info("=" * 80)
@@ -205,14 +266,10 @@ class OfferOrchestrator:
             self.logger.info("=" * 80)
 
             # Execute workflow steps 1-8 (stops before CREATE_OFFER)
-            await self._parse_email(context)
-            await self._extract_company(context)
-            await self._find_customer(context)
-            await self._find_salesperson(context)
-            await self._extract_products(context)
-            await self._match_products(context)
-            await self._calculate_pricing(context)
-            await self._build_offer(context)
+            await self._run_steps(
+                context, self.REVIEW_WORKFLOW_STEPS, checkpoint_key,
+                on_step_started=on_step_started, on_step_completed=on_step_completed
+            )
 
             # Generate a temporary offer number for tracking
             import random
@@ -270,11 +327,12 @@ class OfferOrchestrator:
             self.logger.info("=" * 80)
 
             # Execute remaining workflow steps
-            await self._create_offer(context)
-            await self._verify_offer(context)
+            checkpoint_key = context.metadata.get('checkpoint_key')
+            await self._run_steps(context, self.ERP_WORKFLOW_STEPS, checkpoint_key)
 
             # Mark as complete
             context.current_step = WorkflowStep.COMPLETE
+            self.checkpoints.delete(checkpoint_key)
 
             result = WorkflowResult(
                 success=True,
@@ -299,6 +357,83 @@ class OfferOrchestrator:
                 context=context
             )
 
+    def restore_context(self, checkpoint_key: str) -> Optional[WorkflowContext]:
+        """
+        Rebuild a reviewed offer's context from checkpoints (e.g. after a restart).
+
+        Args:
+            checkpoint_key: Key the review run was checkpointed under
+
+        Returns:
+            WorkflowContext ready for send_offer_to_erp, or None if the review
+            steps did not all complete
+        """
+        context = WorkflowContext()
+        completed = self.checkpoints.restore(checkpoint_key, context, self.REVIEW_WORKFLOW_STEPS)
+        if WorkflowStep.BUILD_OFFER not in completed:
+            return None
+        context.metadata['checkpoint_key'] = checkpoint_key
+        context.current_step = WorkflowStep.BUILD_OFFER
+        return context
+
+    async def _run_steps(
+        self,
+        context: WorkflowContext,
+        steps: List[WorkflowStep],
+        checkpoint_key: Optional[str] = None,
+        on_step_started: Optional[StepCallback] = None,
+        on_step_completed: Optional[StepCallback] = None
+    ) -> None:
+        """Run steps through the DAG executor, resuming from and writing checkpoints."""
+        completed = set()
+        if checkpoint_key:
+            completed = self.checkpoints.restore(checkpoint_key, context, steps)
+            context.metadata['checkpoint_key'] = checkpoint_key
+
+        # Error/warning counts when each step started
+        problems_at_start: Dict[WorkflowStep, Tuple[int, int]] = {}
+
+        def step_started(step: WorkflowStep, ctx: WorkflowContext) -> None:
+            problems_at_start[step] = (len(ctx.errors), len(ctx.warnings))
+            if on_step_started:
+                on_step_started(step, ctx)
+
+        def step_completed(step: WorkflowStep, ctx: WorkflowContext) -> None:
+            if checkpoint_key and self._is_clean_step(step, ctx, problems_at_start.get(step, (0, 0))):
+                self.checkpoints.save_step(checkpoint_key, step, ctx)
+            if on_step_completed:
+                on_step_completed(step, ctx)
+
+        report = await self.workflow_executor.run(
+            context, steps, completed=completed, on_step_completed=step_completed,
+            on_step_started=step_started
+        )
+        context.metadata.setdefault('workflow_timing', []).append(report.to_dict())
+
+    def _is_clean_step(
+        self,
+        step: WorkflowStep,
+        context: WorkflowContext,
+        problems_at_start: Tuple[int, int]
+    ) -> bool:
+        """
+        Check whether a completed step may be checkpointed.
+
+        Steps that swallow failures (e.g. product extraction errors) still
+        complete; checkpointing their errors, warnings or empty outputs would
+        make every resume reuse the failed result instead of running the step
+        again. Concurrent steps' messages count too, which only skips a save.
+        """
+        errors_at_start, warnings_at_start = problems_at_start
+        if len(context.errors) > errors_at_start or len(context.warnings) > warnings_at_start:
+            self.logger.info(f"Not checkpointing {step.value}: it reported errors or warnings")
+            return False
+        outputs = [getattr(context, name, None) for name in WorkflowDefinition.get_step_spec(step).outputs]
+        if outputs and all(value is None or value == [] or value == {} or value == '' for value in outputs):
+            self.logger.info(f"Not checkpointing {step.value}: it produced no output")
+            return False
+        return True
+
     # ==================== WORKFLOW STEPS ====================
 
     async def _parse_email(self, context: WorkflowContext) -> None:
@@ -349,31 +484,25 @@ class OfferOrchestrator:
         context.current_step = WorkflowStep.FIND_CUSTOMER
         self.logger.info("Step 3: Finding customer in CSV")
 
-        # Read customers from CSV
-        customers = self._read_csv('customers.csv')
         if self.erp_type == 'csv':
             print("------------------FINDINGG CSV CUSTOMERS------------------")
 
             customer_data = None
 
-            # Try lookup by customer number first if available
+            # Try lookup by customer number (or Y-tunnus) first if available
             if context.customer_number:
-                for row in customers:
-                    if row.get('customer_number') == str(context.customer_number):
-                        customer_data = row
-                        break
+                customer_data = self.reference_data.find_customer_by_number(context.customer_number)
 
             # Fall back to name search (case-insensitive partial match)
             if not customer_data and context.company_name:
-                search_name = context.company_name.lower()
-                for row in customers:
-                    if search_name in row.get('name', '').lower():
-                        customer_data = row
-                        break
+                customer_data = self.reference_data.find_customer_by_name(context.company_name)
                 try:
                     from src.customer.enhanced_lookup import EnhancedCustomerLookup
                     enhanced_customer_lookup = EnhancedCustomerLookup()
-                    y_tunnus = await enhanced_customer_lookup._search_ytunnus_with_google(context.company_name)
+                    y_tunnus = await batch_memoize(
+                        "customer_ytunnus", context.company_name.lower(),
+                        lambda: enhanced_customer_lookup._search_ytunnus_with_google(context.company_name)
+                    )
                     if y_tunnus:
                         customer_data = {
                             'customer_number': y_tunnus
@@ -430,15 +559,18 @@ class OfferOrchestrator:
             self.logger.info("Step 3: Finding customer in ERP")
 
             # Try lookup by customer number first if available
+            # Within a bulk batch, lookups of the same customer are shared
             if context.customer_number:
-                context.customer = await self.customer_repo.find_by_number(
-                    context.customer_number
+                context.customer = await batch_memoize(
+                    "customer_by_number", context.customer_number,
+                    lambda: self.customer_repo.find_by_number(context.customer_number)
                 )
 
             # Fall back to name search
             if not context.customer:
-                context.customer = await self.customer_repo.find_by_name(
-                    context.company_name
+                context.customer = await batch_memoize(
+                    "customer_by_name", context.company_name.lower(),
+                    lambda: self.customer_repo.find_by_name(context.company_name)
                 )
 
             if not context.customer:
@@ -450,11 +582,14 @@ class OfferOrchestrator:
             self.logger.info(f"Credit allowed: {context.customer.credit_allowed}")
 
             # Get additional customer details and store in metadata
-            payment_terms = await self.customer_repo.get_payment_terms(
-                context.customer.id
+            customer_id = context.customer.id
+            payment_terms = await batch_memoize(
+                "customer_payment_terms", customer_id,
+                lambda: self.customer_repo.get_payment_terms(customer_id)
             )
-            invoicing_details = await self.customer_repo.get_invoicing_details(
-                context.customer.id
+            invoicing_details = await batch_memoize(
+                "customer_invoicing", customer_id,
+                lambda: self.customer_repo.get_invoicing_details(customer_id)
             )
 
             context.metadata['payment_terms'] = payment_terms
@@ -465,24 +600,15 @@ class OfferOrchestrator:
         context.current_step = WorkflowStep.FIND_SALESPERSON
         self.logger.info("Step 4: Finding salesperson in CSV")
 
-        # Read persons from CSV
-        persons = self._read_csv('persons.csv')
-
         person_data = None
 
         # Try to find by email first
         if context.sender_email:
-            for row in persons:
-                if row.get('email', '').lower() == context.sender_email.lower():
-                    person_data = row
-                    break
+            person_data = self.reference_data.find_person_by_email(context.sender_email)
 
         # Fall back to customer's responsible person
         if not person_data and context.customer and context.customer.responsible_person_number:
-            for row in persons:
-                if row.get('number') == str(context.customer.responsible_person_number):
-                    person_data = row
-                    break
+            person_data = self.reference_data.find_person_by_number(context.customer.responsible_person_number)
 
         if person_data:
             # Create Person object from CSV data
@@ -511,8 +637,9 @@ class OfferOrchestrator:
         # products from previous emails affecting current extraction
         self.ai_analyzer.reset_state()
 
-        # Process attachments
-        excel_data, pdf_data = await self._process_email_attachments(context.email_data)
+        # Process attachments (OCR/attachment parsing has its own concurrency limit)
+        async with get_stage_limiter().stage(STAGE_OCR):
+            excel_data, pdf_data = await self._process_email_attachments(context.email_data)
 
         # Extract products using AI
         filtered_emails = [context.email_data]
@@ -524,7 +651,7 @@ class OfferOrchestrator:
             filename = att.get('filename', 'unknown')
             mime_type = att.get('mime_type', 'unknown')
             has_data = 'data' in att and att.get('data') is not None
-            data_size = len(att.get('data', b'')) if has_data else 0
+            data_size = len(att.get('data', b'')) if has_data else att.get('size', 0)
             source = att.get('source', 'unknown')
             self.logger.info(f"   Attachment {i+1}: {filename} (mime: {mime_type}, source: {source}, size: {data_size} bytes)")
         
@@ -560,9 +687,6 @@ class OfferOrchestrator:
         if not context.extracted_products:
             raise ValidationError("No products found in email")
 
-        # Read products from CSV
-        products_csv = self._read_csv('products.csv')
-
         # Convert extracted products to ProductMatch objects
         context.matched_products = []
 
@@ -575,18 +699,11 @@ class OfferOrchestrator:
                 csv_product = None
                 if product_code:
                     # Search by product code (Tuotekoodi)
-                    for row in products_csv:
-                        if row.get('Tuotekoodi', '') == product_code:
-                            csv_product = row
-                            break
+                    csv_product = self.reference_data.find_product_by_code(product_code)
 
                 # If not found by code, try partial name match
                 if not csv_product and product_name:
-                    search_name = product_name.lower()
-                    for row in products_csv:
-                        if search_name in row.get('Tuotenimi', '').lower():
-                            csv_product = row
-                            break
+                    csv_product = self.reference_data.find_product_by_name(product_name)
 
                 # Use CSV data if found, otherwise use extracted data
                 if csv_product:
@@ -889,7 +1006,12 @@ class OfferOrchestrator:
         return Path(__file__).parent.parent / 'erp' / 'csv' / 'data' / filename
 
     def _read_csv(self, filename: str) -> List[Dict[str, str]]:
-        """Read CSV file and return list of dictionaries."""
+        """Return cached rows of a reference CSV file (reloaded when the file changes)."""
+        try:
+            return self.reference_data.rows(filename)
+        except KeyError:
+            pass
+
         csv_path = self._get_csv_path(filename)
         if not csv_path.exists():
             self.logger.error(f"CSV file not found: {csv_path}")
@@ -903,6 +1025,22 @@ class OfferOrchestrator:
             self.logger.error(f"Error reading CSV file {filename}: {e}")
             return []
 
+    def _ensure_attachment_processors(self) -> None:
+        """Create the Excel and PDF processors on first use."""
+        if self._attachment_processors_loaded:
+            return
+        self._attachment_processors_loaded = True
+        try:
+            from src.product_matching.attachment_processor import AttachmentProcessor
+            self.attachment_processor = AttachmentProcessor()
+        except Exception as e:
+            self.logger.warning(f"Attachment processor not available: {e}")
+        try:
+            from src.product_matching.pdf_processor import PDFProcessor
+            self.pdf_processor = PDFProcessor()
+        except Exception as e:
+            self.logger.warning(f"PDF processor not available: {e}")
+
     async def _process_email_attachments(
         self, email_data: Dict[str, Any]
     ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
@@ -918,6 +1056,8 @@ class OfferOrchestrator:
 
         self.logger.info(f"Processing {len(attachments)} email attachments")
 
+        self._ensure_attachment_processors()
+
         # Convert to format expected by processors
         converted_email = self._convert_gmail_to_legacy_format(email_data)
         email_list = [converted_email]
@@ -934,7 +1074,7 @@ class OfferOrchestrator:
         pdf_data = []
         if self.pdf_processor:
             try:
-                pdf_data = self.pdf_processor.extract_pdf_content(email_list)
+                pdf_data = await self.pdf_processor.extract_pdf_content(email_list)
             except Exception as e:
                 self.logger.error(f"PDF attachment processing failed: {e}")
 
@@ -990,8 +1130,13 @@ class OfferOrchestrator:
         """Convert Gmail OAuth format to legacy attachment processor format."""
 
         class AttachmentObject:
-            def __init__(self, data: bytes):
-                self.data = data
+            # Spooled attachments are read from disk only by the processor that needs them
+            def __init__(self, attachment: Dict[str, Any]):
+                self._attachment = attachment
+
+            @property
+            def data(self) -> bytes:
+                return attachment_bytes(self._attachment) or b''
 
             @property
             def content_stream(self):
@@ -1003,11 +1148,12 @@ class OfferOrchestrator:
         # Convert attachments
         converted_attachments = []
         for attachment in email_data.get('attachments', []):
-            attachment_data = attachment.get('data', b'')
             converted_attachment = {
                 'filename': attachment.get('filename', 'attachment'),
-                'attachment_object': AttachmentObject(attachment_data)
+                'attachment_object': AttachmentObject(attachment)
             }
+            if attachment_path(attachment):
+                converted_attachment['path'] = attachment['path']
             converted_attachments.append(converted_attachment)
 
         return {
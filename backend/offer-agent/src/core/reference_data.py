@@ -0,0 +1,267 @@
+"""
+Reference Data Registry
+
+Process-wide cache of the CSV reference files (customers, persons, products)
+used by the orchestrator. Each file is parsed once and re-parsed only when its
+mtime changes. Lookups go through hash indexes instead of scanning rows:
+
+- exact indexes on customer number, Y-tunnus, person email and product code
+- a normalised name index with a trigram index for substring ("fuzzy") search
+"""
+import csv
+import os
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Set
+
+from src.utils.logger import get_logger
+
+
+Row = Dict[str, str]
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_YTUNNUS_RE = re.compile(r'^(\d{7})-?(\d)$')
+
+
+def normalize_name(value: Optional[str]) -> str:
+    """Lowercase and collapse whitespace for name comparison."""
+    if not value:
+        return ''
+    return _WHITESPACE_RE.sub(' ', str(value)).strip().lower()
+
+
+def normalize_email(value: Optional[str]) -> str:
+    """Lowercase and strip an email address."""
+    return str(value).strip().lower() if value else ''
+
+
+def normalize_ytunnus(value: Optional[str]) -> str:
+    """Canonical Finnish business ID form (1234567-8); empty if not a Y-tunnus."""
+    if not value:
+        return ''
+    match = _YTUNNUS_RE.match(str(value).replace(' ', '').strip())
+    return f"{match.group(1)}-{match.group(2)}" if match else ''
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+@dataclass
+class ReferenceTable:
+    """
+    One CSV file with its indexes.
+
+    Args:
+        path: CSV file path (semicolon-delimited, UTF-8)
+        key_indexes: Index name -> function that extracts the key from a row
+        name_column: Column used for the normalised name index
+    """
+    path: Path
+    key_indexes: Dict[str, Callable[[Row], str]] = field(default_factory=dict)
+    name_column: Optional[str] = None
+
+    rows: List[Row] = field(default_factory=list, init=False)
+    mtime: Optional[float] = field(default=None, init=False)
+    _indexes: Dict[str, Dict[str, Row]] = field(default_factory=dict, init=False)
+    _names: List[str] = field(default_factory=list, init=False)
+    _name_index: Dict[str, int] = field(default_factory=dict, init=False)
+    _trigram_index: Dict[str, Set[int]] = field(default_factory=dict, init=False)
+    _lock: Lock = field(default_factory=Lock, init=False, repr=False)
+
+    def refresh(self) -> None:
+        """Reload the file if its mtime changed since the last load."""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            mtime = None
+
+        if mtime == self.mtime and (self.rows or mtime is None):
+            return
+
+        with self._lock:
+            if mtime == self.mtime and (self.rows or mtime is None):
+                return
+            self._load(mtime)
+
+    def _load(self, mtime: Optional[float]) -> None:
+        logger = get_logger(__name__)
+        rows: List[Row] = []
+        if mtime is None:
+            logger.error(f"CSV file not found: {self.path}")
+        else:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    rows = list(csv.DictReader(f, delimiter=';'))
+            except Exception as e:
+                logger.error(f"Error reading CSV file {self.path.name}: {e}")
+
+        indexes: Dict[str, Dict[str, Row]] = {}
+        for index_name, key_fn in self.key_indexes.items():
+            index: Dict[str, Row] = {}
+            for row in rows:
+                key = key_fn(row)
+                if key:
+                    # First occurrence wins, matching the previous linear scans
+                    index.setdefault(key, row)
+            indexes[index_name] = index
+
+        names: List[str] = []
+        name_index: Dict[str, int] = {}
+        trigram_index: Dict[str, Set[int]] = defaultdict(set)
+        if self.name_column:
+            for i, row in enumerate(rows):
+                name = normalize_name(row.get(self.name_column, ''))
+                names.append(name)
+                if name:
+                    name_index.setdefault(name, i)
+                for gram in _trigrams(name):
+                    trigram_index[gram].add(i)
+
+        # Swap in atomically so concurrent readers never see a half-built table
+        self.rows, self._indexes = rows, indexes
+        self._names, self._name_index, self._trigram_index = names, name_index, dict(trigram_index)
+        self.mtime = mtime
+        logger.info(f"Loaded {len(rows)} rows from {self.path.name}")
+
+    def get(self, index_name: str, key: Optional[str]) -> Optional[Row]:
+        """Exact lookup in a hash index; key must already be normalised."""
+        if not key:
+            return None
+        self.refresh()
+        return self._indexes.get(index_name, {}).get(key)
+
+    def find_by_name(self, query: Optional[str]) -> Optional[Row]:
+        """
+        Return the first row whose normalised name contains the query.
+
+        Exact name hits are answered from the name index; substring queries are
+        narrowed to rows sharing all of the query's trigrams before verifying.
+        """
+        search = normalize_name(query)
+        if not search or not self.name_column:
+            return None
+        self.refresh()
+
+        # An exact hit bounds the search: only earlier rows can win
+        exact = self._name_index.get(search)
+        limit = exact if exact is not None else len(self._names)
+
+        grams = _trigrams(search)
+        if grams:
+            postings = sorted((self._trigram_index.get(g, set()) for g in grams), key=len)
+            candidates = sorted(i for i in postings[0].intersection(*postings[1:]) if i < limit)
+        else:
+            # Queries shorter than a trigram: scan the pre-normalised names
+            candidates = range(limit)
+
+        for i in candidates:
+            if search in self._names[i]:
+                return self.rows[i]
+        return self.rows[exact] if exact is not None else None
+
+
+class ReferenceDataRegistry:
+    """Cached, indexed access to the CSV ERP reference data files."""
+
+    def __init__(self, data_dir: Optional[Path] = None):
+        """
+        Initialize the registry.
+
+        Args:
+            data_dir: Directory containing the CSV files
+                (defaults to src/erp/csv/data)
+        """
+        self.data_dir = Path(data_dir) if data_dir else Path(__file__).parent.parent / 'erp' / 'csv' / 'data'
+
+        self.customers = ReferenceTable(
+            path=self.data_dir / 'customers.csv',
+            key_indexes={
+                'customer_number': lambda row: (row.get('customer_number') or '').strip(),
+                'y_tunnus': lambda row: normalize_ytunnus(row.get('y_tunnus') or row.get('customer_number')),
+            },
+            name_column='name',
+        )
+        self.persons = ReferenceTable(
+            path=self.data_dir / 'persons.csv',
+            key_indexes={
+                'number': lambda row: (row.get('number') or '').strip(),
+                'email': lambda row: normalize_email(row.get('email')),
+            },
+            name_column='name',
+        )
+        self.products = ReferenceTable(
+            path=self.data_dir / 'products.csv',
+            key_indexes={
+                'product_code': lambda row: (row.get('Tuotekoodi') or '').strip(),
+            },
+            name_column='Tuotenimi',
+        )
+        self._tables: Dict[str, ReferenceTable] = {
+            'customers.csv': self.customers,
+            'persons.csv': self.persons,
+            'products.csv': self.products,
+        }
+
+    def rows(self, filename: str) -> List[Row]:
+        """All rows of a registered file (cached; reloaded on mtime change)."""
+        table = self._tables.get(filename)
+        if table is None:
+            raise KeyError(f"Unknown reference data file: {filename}")
+        table.refresh()
+        return table.rows
+
+    # Customers
+
+    def find_customer_by_number(self, customer_number: Optional[str]) -> Optional[Row]:
+        """Find a customer by customer number, falling back to the Y-tunnus index."""
+        if not customer_number:
+            return None
+        key = str(customer_number).strip()
+        return (self.customers.get('customer_number', key)
+                or self.customers.get('y_tunnus', normalize_ytunnus(key)))
+
+    def find_customer_by_ytunnus(self, y_tunnus: Optional[str]) -> Optional[Row]:
+        """Find a customer by Finnish business ID."""
+        return self.customers.get('y_tunnus', normalize_ytunnus(y_tunnus))
+
+    def find_customer_by_name(self, name: Optional[str]) -> Optional[Row]:
+        """Find the first customer whose name contains the given name."""
+        return self.customers.find_by_name(name)
+
+    # Persons
+
+    def find_person_by_email(self, email: Optional[str]) -> Optional[Row]:
+        """Find a person by email (case-insensitive)."""
+        return self.persons.get('email', normalize_email(email))
+
+    def find_person_by_number(self, number: Optional[str]) -> Optional[Row]:
+        """Find a person by person number."""
+        return self.persons.get('number', str(number).strip() if number else '')
+
+    # Products
+
+    def find_product_by_code(self, product_code: Optional[str]) -> Optional[Row]:
+        """Find a product by Tuotekoodi."""
+        return self.products.get('product_code', str(product_code).strip() if product_code else '')
+
+    def find_product_by_name(self, product_name: Optional[str]) -> Optional[Row]:
+        """Find the first product whose Tuotenimi contains the given name."""
+        return self.products.find_by_name(product_name)
+
+
+_registry: Optional[ReferenceDataRegistry] = None
+_registry_lock = Lock()
+
+
+def get_reference_data() -> ReferenceDataRegistry:
+    """Get the process-wide reference data registry."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ReferenceDataRegistry()
+    return _registry
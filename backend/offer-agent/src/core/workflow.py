@@ -1,17 +1,24 @@
 """
 Workflow Definition
 
-Defines the sequential steps for offer creation workflow.
+Defines the steps for offer creation workflow.
 Each step is ERP-agnostic and uses the repository interfaces.
+Steps declare the context fields they read and write, which makes the
+workflow a DAG: independent steps can run concurrently (see dag_executor).
 """
+import os
 from dataclasses import dataclass, field
-from typing import Dict, Any, Optional, List
+from typing import TYPE_CHECKING, Dict, Any, Optional, List, FrozenSet, Iterable
 from enum import Enum
 
 from src.domain.customer import Customer
 from src.domain.person import Person
 from src.domain.offer import Offer, OfferLine
-from src.product_matching.matcher_class import ProductMatch
+from src.scheduler.stage_limits import STAGE_ERP, STAGE_LLM
+
+if TYPE_CHECKING:
+    # matcher_class pulls in pandas/numpy/openai; only needed for the annotation
+    from src.product_matching.matcher_class import ProductMatch
 
 
 class WorkflowStep(Enum):
@@ -30,6 +37,23 @@ class WorkflowStep(Enum):
     COMPLETE = "complete"
 
 
+@dataclass(frozen=True)
+class StepSpec:
+    """
+    Declared data flow of a workflow step.
+
+    inputs/outputs name WorkflowContext fields. A step depends on every
+    earlier step that outputs one of its inputs. stage names the shared
+    resource the step is limited by (see src.scheduler.stage_limits).
+    timeout_seconds is an optional time budget; STEP_TIMEOUT_<STEP> overrides it.
+    """
+    step: WorkflowStep
+    inputs: FrozenSet[str] = frozenset()
+    outputs: FrozenSet[str] = frozenset()
+    timeout_seconds: Optional[float] = None
+    stage: Optional[str] = None
+
+
 @dataclass
 class WorkflowContext:
     """
@@ -60,7 +84,7 @@ class WorkflowContext:
 
     # Product extraction and matching
     extracted_products: List[Dict[str, Any]] = field(default_factory=list)
-    matched_products: List[ProductMatch] = field(default_factory=list)
+    matched_products: List["ProductMatch"] = field(default_factory=list)
 
     # Pricing
     pricing_result: Optional[Dict[str, Any]] = None
@@ -165,14 +189,129 @@ class WorkflowDefinition:
         WorkflowStep.CREATE_OFFER,
     }
 
-    # Define which steps can be retried
+    # Define which steps can be retried (resumed automatically after a failure).
+    # CREATE_OFFER is not: the ERP may have created the offer before the call
+    # failed, and creating it again would duplicate it.
     RETRIABLE_STEPS = {
         WorkflowStep.FIND_CUSTOMER,
         WorkflowStep.FIND_SALESPERSON,
         WorkflowStep.MATCH_PRODUCTS,
-        WorkflowStep.CREATE_OFFER,
+        WorkflowStep.CALCULATE_PRICING,
+        WorkflowStep.VERIFY_OFFER,
     }
 
+    # Declared inputs/outputs and stages per step
+    STEP_SPECS: Dict[WorkflowStep, StepSpec] = {
+        spec.step: spec for spec in [
+            StepSpec(
+                WorkflowStep.PARSE_EMAIL,
+                inputs=frozenset({'email_data'}),
+                outputs=frozenset({'sender_email', 'sender_name', 'email_subject', 'email_body'}),
+            ),
+            StepSpec(
+                WorkflowStep.EXTRACT_COMPANY,
+                inputs=frozenset({'email_data'}),
+                outputs=frozenset({'company_name', 'customer_number', 'delivery_contact',
+                                   'customer_reference', 'extraction_confidence'}),
+                stage=STAGE_LLM,
+            ),
+            StepSpec(
+                WorkflowStep.FIND_CUSTOMER,
+                inputs=frozenset({'company_name', 'customer_number', 'sender_email'}),
+                outputs=frozenset({'customer', 'metadata'}),
+                # No single stage: the ERP lookup, and in CSV mode the LLM and Google
+                # calls, are each limited by their own clients
+            ),
+            StepSpec(
+                WorkflowStep.FIND_SALESPERSON,
+                inputs=frozenset({'sender_email', 'customer'}),
+                outputs=frozenset({'salesperson'}),
+                stage=STAGE_ERP,
+            ),
+            StepSpec(
+                WorkflowStep.EXTRACT_PRODUCTS,
+                inputs=frozenset({'email_data'}),
+                outputs=frozenset({'extracted_products'}),
+                stage=STAGE_LLM,
+            ),
+            StepSpec(
+                WorkflowStep.MATCH_PRODUCTS,
+                inputs=frozenset({'extracted_products'}),
+                outputs=frozenset({'matched_products'}),
+            ),
+            StepSpec(
+                WorkflowStep.CALCULATE_PRICING,
+                inputs=frozenset({'customer', 'matched_products'}),
+                outputs=frozenset({'pricing_result'}),
+                stage=STAGE_ERP,
+            ),
+            StepSpec(
+                WorkflowStep.BUILD_OFFER,
+                inputs=frozenset({'customer', 'salesperson', 'pricing_result', 'metadata',
+                                  'delivery_contact', 'customer_reference'}),
+                outputs=frozenset({'offer'}),
+            ),
+            StepSpec(
+                WorkflowStep.CREATE_OFFER,
+                inputs=frozenset({'offer'}),
+                outputs=frozenset({'offer_number'}),
+                stage=STAGE_ERP,
+            ),
+            StepSpec(
+                WorkflowStep.VERIFY_OFFER,
+                inputs=frozenset({'offer_number'}),
+                outputs=frozenset({'verification_result'}),
+                stage=STAGE_ERP,
+            ),
+        ]
+    }
+
+    @classmethod
+    def get_step_spec(cls, step: WorkflowStep) -> StepSpec:
+        """Get the declared inputs/outputs of a step (empty spec if undeclared)."""
+        return cls.STEP_SPECS.get(step, StepSpec(step))
+
+    @classmethod
+    def get_step_timeout(cls, step: WorkflowStep) -> Optional[float]:
+        """
+        Time budget of a step in seconds, or None for no limit (the default).
+
+        Set STEP_TIMEOUT_<STEP> (e.g. STEP_TIMEOUT_EXTRACT_PRODUCTS=3600) to
+        enforce one; 0 disables it again.
+        """
+        raw = os.getenv(f"STEP_TIMEOUT_{step.name}")
+        if raw is None or not raw.strip():
+            return cls.get_step_spec(step).timeout_seconds
+        timeout = float(raw)
+        return timeout if timeout > 0 else None
+
+    @classmethod
+    def get_dependencies(
+        cls,
+        step: WorkflowStep,
+        steps: Optional[Iterable[WorkflowStep]] = None
+    ) -> List[WorkflowStep]:
+        """
+        Get the steps that must finish before `step` can run.
+
+        Args:
+            step: Step to resolve
+            steps: Steps being executed (defaults to WORKFLOW_STEPS). Producers
+                outside this set are assumed to have run already.
+
+        Returns:
+            Earlier steps whose outputs overlap the step's inputs
+        """
+        ordered = list(steps) if steps is not None else cls.WORKFLOW_STEPS
+        inputs = cls.get_step_spec(step).inputs
+        dependencies = []
+        for candidate in ordered:
+            if candidate == step:
+                break
+            if cls.get_step_spec(candidate).outputs & inputs:
+                dependencies.append(candidate)
+        return dependencies
+
     @classmethod
     def get_next_step(cls, current_step: WorkflowStep) -> Optional[WorkflowStep]:
         """Get the next step in the workflow."""
@@ -23,6 +23,7 @@ except ImportError:
     types = None
 
 from src.config.settings import get_settings
+from src.llm.gateway import get_llm_gateway
 from src.utils.logger import get_logger
 from src.lemonsoft.api_client import LemonsoftAPIClient
 from src.utils.exceptions import BaseOfferAutomationError
@@ -294,12 +295,12 @@ class EnhancedCustomerLookup:
                 continue
         
         # Rank customers by relevance
-        ranked_customers = self._LLM_decision(all_customers, search_term)
+        ranked_customers = await self._LLM_decision(all_customers, search_term)
         
         self.logger.info(f"Total unique customers found: {len(ranked_customers)}")
         return ranked_customers
     
-    def _LLM_decision(self, customers: List[Dict], search_term: str) -> List[Dict]:
+    async def _LLM_decision(self, customers: List[Dict], search_term: str) -> List[Dict]:
         """
         Use Gemini LLM to decide which companies match the search term and rank them.
         
@@ -378,10 +379,12 @@ DO NOT INCLUDE ANY OTHER TEXT THAN THE JSON RESPONSE - EVEN IF IT IS EMPTY.
                 temperature=0.3
             )
 
-            response = self.gemini_client.models.generate_content(
+            response = await get_llm_gateway().generate_content(
                 model=self.gemini_model,
                 contents=prompt,
                 config=config,
+                client=self.gemini_client,
+                label="customer_lookup",
             )
 
             # Extract response text
@@ -479,7 +482,7 @@ DO NOT INCLUDE ANY OTHER TEXT THAN THE JSON RESPONSE - EVEN IF IT IS EMPTY.
                     self.logger.error(f"Error in basic fallback search with '{term}': {e}")
                     continue
             
-            return self._LLM_decision(all_customers, search_term)
+            return await self._LLM_decision(all_customers, search_term)
         
         try:
             # Ask Gemini to generate alternative search strategies
@@ -530,10 +533,12 @@ Original term: "{search_term}"
                 candidate_count=1,
             )
 
-            response = self.gemini_client.models.generate_content(
+            response = await get_llm_gateway().generate_content(
                 model=self.gemini_model,
                 contents=prompt,
                 config=config,
+                client=self.gemini_client,
+                label="customer_lookup",
             )
 
             response_text = self._extract_gemini_response_text(response)
@@ -610,7 +615,7 @@ Original term: "{search_term}"
                         continue
                 
                 self.logger.info(f"🎯 Fallback search found {len(all_customers)} unique customers")
-                return self._LLM_decision(all_customers, search_term)
+                return await self._LLM_decision(all_customers, search_term)
                 
             except (json.JSONDecodeError, ValueError) as e:
                 self.logger.error(f"Failed to parse fallback strategies JSON: {e}")
@@ -790,10 +795,12 @@ If no Y-tunnus found or uncertain, return:
                 candidate_count=1,
             )
 
-            response = self.gemini_client.models.generate_content(
+            response = await get_llm_gateway().generate_content(
                 model=self.gemini_model,
                 contents=prompt,
                 config=config,
+                client=self.gemini_client,
+                label="customer_lookup",
             )
 
             response_text = self._extract_gemini_response_text(response)
@@ -1132,10 +1139,12 @@ RESPONSE: Return only "true" if they could refer to the same company, or "false"
                 candidate_count=1,
             )
 
-            response = self.gemini_client.models.generate_content(
+            response = await get_llm_gateway().generate_content(
                 model=self.gemini_model,
                 contents=prompt,
                 config=config,
+                client=self.gemini_client,
+                label="customer_lookup",
             )
 
             response_text = self._extract_gemini_response_text(response)
@@ -19,6 +19,7 @@ from config.settings import get_settings
 from utils.logger import get_logger
 from utils.exceptions import ExternalServiceError
 from utils.retry import retry_on_exception, WEB_SEARCH_RETRY_CONFIG
+from src.llm.gateway import get_llm_gateway
 
 
 @dataclass
@@ -119,15 +120,20 @@ class GeminiSearchGrounding:
             Focus on finding accurate, current business information.
             """
             
-            # Use Gemini 2.0 with Search Grounding
-            response = self.client.models.generate_content(
+            # Use Gemini 2.0 with Search Grounding, through the shared gateway and rate limits
+            response = await get_llm_gateway().generate_content(
                 model=self.model_id,
                 contents=search_prompt,
                 config=GenerateContentConfig(
                     tools=[self.google_search_tool],
                     response_modalities=["TEXT"],
                     temperature=0.1,  # Low temperature for factual information
-                )
+                ),
+                # Synchronous SDK call; the gateway runs it in a worker thread
+                transport=lambda model, contents, config: self.client.models.generate_content(
+                    model=model, contents=contents, config=config
+                ),
+                label="gemini_search",
             )
             
             # Extract response text
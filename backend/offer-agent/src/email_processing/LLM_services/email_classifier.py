@@ -5,7 +5,6 @@ Analyzes incoming emails to determine if they should trigger offer automation or
 
 import logging
 import json
-import time
 from typing import Dict, Any, List, Optional
 from enum import Enum
 from datetime import datetime
@@ -24,6 +23,8 @@ except ImportError:
             GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '')
             GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.5-pro')
 
+from src.llm.gateway import get_llm_gateway
+
 
 class EmailAction(Enum):
     """Possible actions for classified emails."""
@@ -38,59 +39,6 @@ class EmailClassifier:
     Uses LLM to analyze email content and context for intelligent routing.
     """
     
-    def _retry_llm_request(self, request_func, *args, **kwargs):
-        """Wrapper to retry LLM requests with appropriate wait times based on error type.
-        
-        - 503 errors: immediate retry (up to 3 times)
-        - Rate limit errors (429): wait 10 seconds before retry
-        - Other errors: exponential backoff
-        """
-        max_retries = 5
-        base_wait = 1  # Base wait time in seconds
-        
-        for attempt in range(max_retries):
-            try:
-                # Call the wrapped function
-                return request_func(*args, **kwargs)
-                
-            except Exception as e:
-                error_str = str(e).lower()
-                self.logger.warning(f"LLM request failed (attempt {attempt + 1}/{max_retries}): {e}")
-                
-                # Check if it's the last attempt
-                if attempt == max_retries - 1:
-                    self.logger.error(f"LLM request failed after {max_retries} attempts")
-                    raise
-                
-                # Determine wait time based on error type
-                wait_time = base_wait
-                
-                if "503" in error_str or "service unavailable" in error_str:
-                    # 503 errors: immediate retry (very short wait)
-                    wait_time = 0.5
-                    self.logger.info(f"503 error detected, retrying immediately (wait {wait_time}s)")
-                    
-                elif "429" in error_str or "rate limit" in error_str or "quota" in error_str:
-                    # Rate limit errors: wait 10 seconds
-                    wait_time = 10
-                    self.logger.info(f"Rate limit error detected, waiting {wait_time} seconds before retry")
-                    
-                elif "500" in error_str or "internal" in error_str:
-                    # Internal server errors: exponential backoff
-                    wait_time = base_wait * (2 ** attempt)
-                    self.logger.info(f"Server error detected, waiting {wait_time} seconds (exponential backoff)")
-                    
-                else:
-                    # Other errors: exponential backoff
-                    wait_time = base_wait * (2 ** attempt)
-                    self.logger.info(f"Unknown error, waiting {wait_time} seconds (exponential backoff)")
-                
-                # Wait before retrying
-                time.sleep(wait_time)
-        
-        # This should never be reached due to the raise in the last attempt
-        raise Exception(f"Failed to complete LLM request after {max_retries} attempts")
-    
     def __init__(self, gemini_client=None):
         """Initialize email classifier."""
         self.logger = logging.getLogger(__name__)
@@ -217,11 +165,14 @@ For suggested_reply, use Finnish if the original email is in Finnish, English ot
                 candidate_count=1,
             )
 
-            response = self._retry_llm_request(
-                self.gemini_client.models.generate_content,
+            response = await get_llm_gateway().generate_content(
                 model=Config.GEMINI_MODEL,
                 contents=prompt,
                 config=config,
+                client=self.gemini_client,
+                label="email_classifier",
+                cache=True,
+                hedge=True,
             )
 
             # Extract response text
@@ -0,0 +1,339 @@
+"""
+Attachment spool.
+
+Attachments used to travel through the pipeline as decoded bytes in the
+email dict, next to the base64 string they came from. The PDF and image
+processors then copied them into temp files again, and the offer queue and
+workflow contexts kept them alive until the offer was finished. A few
+30 MB drawings in concurrent emails were enough to spike the process RSS.
+
+AttachmentStore writes each attachment to a spool directory once, decoding
+base64 in chunks, and the attachment dict carries its path instead of its
+bytes:
+
+    {'filename', 'mime_type', 'size', 'sha256', 'path', 'source', 'spooled': True}
+
+Files are content-addressed (blobs/<sha256>), so the same drawing in many
+emails is stored once. Every request that uses a file holds a hard link to
+it under owners/<owner>/, and release(owner) drops the request's links once
+its workflow has finished. Blobs without links are deleted. Because links
+live on disk, a queued request keeps its files across restarts. sweep()
+clears owners left over from crashes after ATTACHMENT_SPOOL_TTL_HOURS.
+
+Consumers read spooled and in-memory attachments the same way, through
+attachment_bytes() and attachment_path().
+
+Configuration:
+
+    ATTACHMENT_SPOOL_ENABLED     spool attachments to disk (default: true)
+    ATTACHMENT_SPOOL_DIR         spool directory (default: /app/data/attachments)
+    ATTACHMENT_MAX_MB            largest accepted attachment (default: 50)
+    ATTACHMENT_SPOOL_MAX_GB      total spool size (default: 5)
+    ATTACHMENT_SPOOL_TTL_HOURS   age after which unreleased owners are swept (default: 72)
+"""
+import base64
+import binascii
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, Optional, Union
+
+from src.utils.exceptions import AttachmentSpoolError
+from src.utils.logger import get_logger
+
+
+# Multiple of 4, so every chunk but the last decodes on its own
+_BASE64_CHUNK = 4 * 256 * 1024
+_COPY_CHUNK = 1024 * 1024
+_WHITESPACE = re.compile(r"\s")
+
+
+def _safe_name(value: str) -> str:
+    return ''.join(c if c.isalnum() or c in '-_.' else '_' for c in str(value))[:128] or 'owner'
+
+
+def _base64_chunks(data: Union[str, bytes], urlsafe: bool) -> Iterable[bytes]:
+    """Decode base64 a chunk at a time (padding may be missing, as in Gmail's base64url)."""
+    if isinstance(data, bytes):
+        data = data.decode('ascii')
+    if _WHITESPACE.search(data):
+        data = _WHITESPACE.sub('', data)
+    decode = base64.urlsafe_b64decode if urlsafe else base64.b64decode
+    for start in range(0, len(data), _BASE64_CHUNK):
+        chunk = data[start:start + _BASE64_CHUNK]
+        if start + _BASE64_CHUNK >= len(data):
+            chunk += '=' * (-len(chunk) % 4)
+        yield decode(chunk)
+
+
+def attachment_path(attachment: Dict[str, Any]) -> Optional[str]:
+    """Path of a spooled attachment that still exists, else None."""
+    path = attachment.get('path') if isinstance(attachment, dict) else None
+    return path if path and os.path.exists(path) else None
+
+
+def attachment_bytes(attachment: Dict[str, Any]) -> Optional[bytes]:
+    """Content of an attachment, read from the spool or taken from its 'data'."""
+    if not isinstance(attachment, dict):
+        return None
+    data = attachment.get('data')
+    if isinstance(data, (bytes, bytearray)):
+        return bytes(data)
+    path = attachment_path(attachment)
+    if path:
+        with open(path, 'rb') as f:
+            return f.read()
+    return None
+
+
+class AttachmentStore:
+    """Content-addressed attachment files with per-request ownership."""
+
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        max_attachment_bytes: Optional[int] = None,
+        max_total_bytes: Optional[int] = None,
+        ttl_seconds: Optional[float] = None
+    ):
+        """
+        Args:
+            root: Spool directory (defaults to ATTACHMENT_SPOOL_DIR or /app/data/attachments)
+            max_attachment_bytes: Largest accepted attachment (defaults to ATTACHMENT_MAX_MB, 50 MB)
+            max_total_bytes: Spool size limit (defaults to ATTACHMENT_SPOOL_MAX_GB, 5 GB)
+            ttl_seconds: Unreleased owners older than this are swept (defaults to ATTACHMENT_SPOOL_TTL_HOURS, 72 h)
+        """
+        self.logger = get_logger(__name__)
+        self.root = Path(root or os.getenv('ATTACHMENT_SPOOL_DIR', '/app/data/attachments'))
+        self.max_attachment_bytes = max_attachment_bytes or int(float(os.getenv('ATTACHMENT_MAX_MB', '50')) * 1024 * 1024)
+        self.max_total_bytes = max_total_bytes or int(float(os.getenv('ATTACHMENT_SPOOL_MAX_GB', '5')) * 1024 ** 3)
+        self.ttl_seconds = ttl_seconds or float(os.getenv('ATTACHMENT_SPOOL_TTL_HOURS', '72')) * 3600
+
+        self._blobs = self.root / 'blobs'
+        self._owners = self.root / 'owners'
+        self._tmp = self.root / 'tmp'
+        for directory in (self._blobs, self._owners, self._tmp):
+            directory.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {'spooled': 0, 'deduplicated': 0, 'released': 0, 'blobs_deleted': 0, 'rejected': 0}
+        self._total_bytes = sum(path.stat().st_size for path in self._blobs.glob('*/*') if path.is_file())
+
+    # Writing
+
+    def _blob_path(self, sha256: str) -> Path:
+        return self._blobs / sha256[:2] / sha256
+
+    def _reserve(self, size_hint: int) -> None:
+        if size_hint > self.max_attachment_bytes:
+            self._stats['rejected'] += 1
+            raise AttachmentSpoolError(
+                f"Attachment of {size_hint} bytes exceeds the {self.max_attachment_bytes} byte limit",
+                context={'reason': 'too_large'}
+            )
+        if self._total_bytes + size_hint > self.max_total_bytes:
+            self.sweep()
+            if self._total_bytes + size_hint > self.max_total_bytes:
+                self._stats['rejected'] += 1
+                raise AttachmentSpoolError(
+                    f"Attachment spool is full ({self._total_bytes} of {self.max_total_bytes} bytes)",
+                    context={'reason': 'spool_full'}
+                )
+
+    def _write(self, chunks: Iterable[bytes], owner: str, size_hint: int = 0) -> Dict[str, Any]:
+        """Stream chunks to a temp file, then file it under its hash and link it to the owner."""
+        self._reserve(size_hint)
+        digest = hashlib.sha256()
+        size = 0
+        fd, temp_name = tempfile.mkstemp(dir=self._tmp)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    size += len(chunk)
+                    if size > self.max_attachment_bytes:
+                        self._stats['rejected'] += 1
+                        raise AttachmentSpoolError(
+                            f"Attachment exceeds the {self.max_attachment_bytes} byte limit",
+                            context={'reason': 'too_large'}
+                        )
+                    digest.update(chunk)
+                    f.write(chunk)
+            sha256 = digest.hexdigest()
+            blob = self._blob_path(sha256)
+            owner_dir = self._owners / _safe_name(owner)
+            link = owner_dir / sha256
+            with self._lock:
+                blob.parent.mkdir(exist_ok=True)
+                if blob.exists():
+                    os.unlink(temp_name)
+                    self._stats['deduplicated'] += 1
+                else:
+                    os.replace(temp_name, blob)
+                    self._total_bytes += size
+                owner_dir.mkdir(exist_ok=True)
+                if not link.exists():
+                    os.link(blob, link)
+                self._stats['spooled'] += 1
+            return {'path': str(link), 'sha256': sha256, 'size': size}
+        except BaseException:
+            if os.path.exists(temp_name):
+                os.unlink(temp_name)
+            raise
+
+    def _attachment(self, written: Dict[str, Any], filename: str, mime_type: str, source: str) -> Dict[str, Any]:
+        return {
+            'filename': filename,
+            'mime_type': mime_type,
+            'size': written['size'],
+            'sha256': written['sha256'],
+            'path': written['path'],
+            'source': source,
+            'spooled': True,
+        }
+
+    def spool_base64(
+        self,
+        data: Union[str, bytes],
+        owner: str,
+        filename: str,
+        mime_type: str = 'application/octet-stream',
+        source: str = 'gmail',
+        urlsafe: bool = True
+    ) -> Dict[str, Any]:
+        """Decode base64 content into the spool, chunk by chunk; returns the attachment dict."""
+        try:
+            written = self._write(_base64_chunks(data, urlsafe), owner, size_hint=len(data) * 3 // 4)
+        except (binascii.Error, ValueError) as e:
+            raise AttachmentSpoolError(f"Invalid base64 content: {e}", attachment_name=filename)
+        return self._attachment(written, filename, mime_type, source)
+
+    def spool_bytes(
+        self,
+        data: bytes,
+        owner: str,
+        filename: str,
+        mime_type: str = 'application/octet-stream',
+        source: str = 'gmail'
+    ) -> Dict[str, Any]:
+        """Write already decoded content into the spool; returns the attachment dict."""
+        view = memoryview(data)
+        chunks = (bytes(view[start:start + _COPY_CHUNK]) for start in range(0, len(view), _COPY_CHUNK))
+        return self._attachment(self._write(chunks, owner, size_hint=len(data)), filename, mime_type, source)
+
+    def spool_stream(
+        self,
+        stream: BinaryIO,
+        owner: str,
+        filename: str,
+        mime_type: str = 'application/octet-stream',
+        source: str = 'gmail'
+    ) -> Dict[str, Any]:
+        """Copy a binary stream into the spool; returns the attachment dict."""
+        chunks = iter(lambda: stream.read(_COPY_CHUNK), b'')
+        return self._attachment(self._write(chunks, owner), filename, mime_type, source)
+
+    # Cleanup
+
+    def release(self, owner: str) -> int:
+        """Drop an owner's links and delete files no other owner uses; returns files deleted."""
+        owner_dir = self._owners / _safe_name(owner)
+        if not owner_dir.exists():
+            return 0
+        deleted = 0
+        with self._lock:
+            for link in owner_dir.iterdir():
+                blob = self._blob_path(link.name)
+                try:
+                    link.unlink()
+                    # A blob whose only remaining link is itself is unused
+                    if blob.exists() and blob.stat().st_nlink <= 1:
+                        self._total_bytes -= blob.stat().st_size
+                        blob.unlink()
+                        deleted += 1
+                except FileNotFoundError:
+                    continue
+            shutil.rmtree(owner_dir, ignore_errors=True)
+            self._stats['released'] += 1
+            self._stats['blobs_deleted'] += deleted
+        return deleted
+
+    def sweep(self) -> Dict[str, int]:
+        """Release owners older than the TTL and delete unused blobs and stale temp files."""
+        cutoff = time.time() - self.ttl_seconds
+        owners = 0
+        for owner_dir in list(self._owners.iterdir()):
+            try:
+                if owner_dir.stat().st_mtime < cutoff:
+                    self.release(owner_dir.name)
+                    owners += 1
+            except FileNotFoundError:
+                continue
+        orphans = 0
+        with self._lock:
+            for blob in self._blobs.glob('*/*'):
+                try:
+                    stat = blob.stat()
+                    if stat.st_nlink <= 1:
+                        blob.unlink()
+                        self._total_bytes -= stat.st_size
+                        orphans += 1
+                except FileNotFoundError:
+                    continue
+            for temp in self._tmp.iterdir():
+                try:
+                    if temp.stat().st_mtime < time.time() - 3600:
+                        temp.unlink()
+                except FileNotFoundError:
+                    continue
+        if owners or orphans:
+            self.logger.info(f"Attachment spool sweep: released {owners} stale owners, deleted {orphans} unused files")
+        return {'owners_released': owners, 'blobs_deleted': orphans}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            'bytes': self._total_bytes,
+            'max_bytes': self.max_total_bytes,
+            'owners': sum(1 for _ in self._owners.iterdir()),
+        }
+
+
+def spooling_enabled() -> bool:
+    return os.getenv('ATTACHMENT_SPOOL_ENABLED', 'true').lower() == 'true'
+
+
+def new_owner() -> str:
+    """Owner ID for requests without a stable ID of their own."""
+    return f"req-{uuid.uuid4()}"
+
+
+def release_attachments(email_data: Dict[str, Any]) -> int:
+    """Release the spooled attachments of a finished request (no-op if none were spooled)."""
+    owner = email_data.get('attachment_owner') if isinstance(email_data, dict) else None
+    if not owner or not spooling_enabled():
+        return 0
+    try:
+        return get_attachment_store().release(owner)
+    except Exception as e:
+        get_logger(__name__).warning(f"Failed to release attachments of {owner}: {e}")
+        return 0
+
+
+_store: Optional[AttachmentStore] = None
+_store_lock = threading.Lock()
+
+
+def get_attachment_store() -> AttachmentStore:
+    """Get the process-wide attachment spool (swept of stale owners when created)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = AttachmentStore()
+            _store.sweep()
+        return _store
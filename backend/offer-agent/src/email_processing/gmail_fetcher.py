@@ -0,0 +1,479 @@
+"""
+Batched, concurrent Gmail API fetching.
+
+The Gmail processor used to run every API call synchronously on the event
+loop: one messages.list, then one messages.get per message, then one
+attachments.get per attachment. GmailFetcher groups those calls into Gmail
+batch HTTP requests (up to GMAIL_BATCH_SIZE calls per round trip) and runs
+up to GMAIL_FETCH_CONCURRENCY round trips at a time in worker threads, so
+the event loop never blocks on Gmail.
+
+- Field masks limit responses to the parts the processor reads.
+- Attachment batches are also capped by the attachments' total size
+  (GMAIL_ATTACHMENT_BATCH_MB), so one response never carries a whole
+  backlog of PDFs, and batches in flight at once by GMAIL_ATTACHMENT_INFLIGHT_MB:
+  a response is held in memory several times over while it is parsed.
+- Calls that a batch answers with 429/5xx are retried with backoff; other
+  per-call errors are logged and skipped.
+- GMAIL_FETCH_MODE=concurrent sends individual requests concurrently
+  instead of batching.
+
+googleapiclient's httplib2 transport is not thread-safe, so every worker
+thread gets its own authorized connection (http_factory).
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+from src.utils.logger import get_logger
+
+
+FETCH_MODE_BATCH = "batch"
+FETCH_MODE_CONCURRENT = "concurrent"
+
+# Field masks: only what the processor reads
+LIST_FIELDS = "messages(id,threadId),nextPageToken,resultSizeEstimate"
+MESSAGE_FIELDS = "id,threadId,labelIds,snippet,internalDate,payload(partId,mimeType,filename,headers,body,parts)"
+ATTACHMENT_FIELDS = "data,size"
+HISTORY_FIELDS = "history(id,messagesAdded(message(id,labelIds))),historyId,nextPageToken"
+
+# Gmail answers calls over its per-user quota with 429 (or 403 rateLimitExceeded)
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+_MAX_LIST_PAGE = 500
+# users.messages.batchModify accepts up to 1000 message IDs per call
+MAX_BATCH_MODIFY = 1000
+
+Call = Tuple[Hashable, Any]
+
+
+def _status_of(error: Exception) -> Optional[int]:
+    resp = getattr(error, 'resp', None)
+    status = getattr(resp, 'status', None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Whether a Gmail API error is worth retrying (throttling, 5xx, transport errors)."""
+    status = _status_of(error)
+    if status in _RETRY_STATUSES:
+        return True
+    if status == 403:
+        content = getattr(error, 'content', b'') or b''
+        return b'rateLimitExceeded' in content or b'userRateLimitExceeded' in content
+    # Transport errors (no HTTP status) are worth another try
+    return status is None
+
+
+class _TransformError(Exception):
+    """A response transform failed; wraps the error so it is not retried."""
+
+    def __init__(self, error: Exception):
+        super().__init__(str(error))
+        self.error = error
+
+
+class GmailFetcher:
+    """Fetches Gmail messages and attachments in batched, concurrent round trips."""
+
+    def __init__(
+        self,
+        service: Any,
+        credentials: Any = None,
+        user_id: str = 'me',
+        mode: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        attachment_batch_bytes: Optional[int] = None,
+        attachment_inflight_bytes: Optional[int] = None,
+        max_retries: int = 4,
+        http_factory: Optional[Callable[[], Any]] = None
+    ):
+        """
+        Args:
+            service: Gmail API resource (googleapiclient.discovery.build('gmail', 'v1'))
+            credentials: Credentials for the per-thread HTTP connections
+            user_id: Gmail user ('me' = the authenticated/delegated user)
+            mode: "batch" (Gmail batch requests) or "concurrent" (one request per call);
+                defaults to GMAIL_FETCH_MODE
+            batch_size: Calls per batch request (Gmail allows 100; defaults to GMAIL_BATCH_SIZE, 50)
+            max_concurrency: Round trips in flight (defaults to GMAIL_FETCH_CONCURRENCY, 4)
+            attachment_batch_bytes: Attachment bytes per batch (defaults to GMAIL_ATTACHMENT_BATCH_MB, 20)
+            attachment_inflight_bytes: Attachment bytes being downloaded at once; a
+                larger single attachment is fetched alone (defaults to GMAIL_ATTACHMENT_INFLIGHT_MB, 80)
+            max_retries: Retries of throttled or failed calls
+            http_factory: Creates a transport for a worker thread (defaults to an
+                AuthorizedHttp over the credentials, or the service's own transport)
+        """
+        self.logger = get_logger(__name__)
+        self.service = service
+        self.user_id = user_id
+        self.mode = (mode or os.getenv('GMAIL_FETCH_MODE', FETCH_MODE_BATCH)).lower()
+        self.batch_size = max(1, min(100, batch_size or int(os.getenv('GMAIL_BATCH_SIZE', '50'))))
+        self.max_concurrency = max(1, max_concurrency or int(os.getenv('GMAIL_FETCH_CONCURRENCY', '4')))
+        self.attachment_batch_bytes = attachment_batch_bytes or int(
+            float(os.getenv('GMAIL_ATTACHMENT_BATCH_MB', '20')) * 1024 * 1024
+        )
+        self.attachment_inflight_bytes = attachment_inflight_bytes or int(
+            float(os.getenv('GMAIL_ATTACHMENT_INFLIGHT_MB', '80')) * 1024 * 1024
+        )
+        self.max_retries = max_retries
+        self.http_factory = http_factory or self._default_http_factory(credentials)
+
+        # Concurrent mode sends every call as its own round trip
+        self._chunk_size = 1 if self.mode == FETCH_MODE_CONCURRENT else self.batch_size
+        self._local = threading.local()
+        # Without a per-thread transport, calls share the service's one and must not overlap
+        self._shared_http_lock = threading.Lock() if self.http_factory is None else None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, float] = defaultdict(float)
+
+    @staticmethod
+    def _default_http_factory(credentials: Any) -> Optional[Callable[[], Any]]:
+        if credentials is None:
+            return None
+
+        def factory():
+            import google_auth_httplib2
+            import httplib2
+
+            timeout = float(os.getenv('GMAIL_HTTP_TIMEOUT_SECONDS', '60'))
+            return google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http(timeout=timeout))
+
+        return factory
+
+    # Transport
+
+    def _http(self) -> Any:
+        """This thread's transport (None = the service's own)."""
+        if self.http_factory is None:
+            return None
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = self.http_factory()
+            self._local.http = http
+        return http
+
+    def _count(self, **counters: float) -> None:
+        with self._stats_lock:
+            for name, value in counters.items():
+                self._stats[name] += value
+
+    def _execute_sync(self, request: Any) -> Any:
+        if self._shared_http_lock is not None:
+            with self._shared_http_lock:
+                return request.execute()
+        return request.execute(http=self._http())
+
+    def _execute_batch_sync(
+        self,
+        calls: Sequence[Call],
+        transform: Optional[Callable[[Hashable, Any], Any]] = None
+    ) -> Tuple[Dict[Hashable, Any], Dict[Hashable, Exception]]:
+        """One round trip for the calls; returns (results, errors) by key."""
+        results: Dict[Hashable, Any] = {}
+        errors: Dict[Hashable, Exception] = {}
+        started = time.perf_counter()
+
+        def store(key: Hashable, response: Any) -> None:
+            if transform is None:
+                results[key] = response
+                return
+            try:
+                results[key] = transform(key, response)
+            except Exception as e:
+                errors[key] = _TransformError(e)
+
+        try:
+            if len(calls) == 1:
+                key, request = calls[0]
+                try:
+                    response = self._execute_sync(request)
+                except Exception as e:
+                    errors[key] = e
+                else:
+                    store(key, response)
+                return results, errors
+
+            keys = {str(index): key for index, (key, _) in enumerate(calls)}
+
+            def callback(request_id, response, exception):
+                key = keys[request_id]
+                if exception is not None:
+                    errors[key] = exception
+                else:
+                    store(key, response)
+
+            batch = self.service.new_batch_http_request(callback=callback)
+            for index, (_, request) in enumerate(calls):
+                batch.add(request, request_id=str(index))
+            try:
+                self._execute_sync(batch)
+            except Exception as e:
+                # The whole round trip failed: every call without an answer failed with it
+                for key, _ in calls:
+                    if key not in results and key not in errors:
+                        errors[key] = e
+            return results, errors
+        finally:
+            self._count(round_trips=1, calls=len(calls), seconds=time.perf_counter() - started)
+
+    async def _limited(self, function: Callable, *args: Any) -> Any:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            return await asyncio.to_thread(function, *args)
+
+    async def execute(self, request: Any) -> Any:
+        """Run one Gmail API request in a worker thread."""
+        result = await self._limited(self._execute_sync, request)
+        self._count(round_trips=1, calls=1)
+        return result
+
+    async def run_calls(
+        self,
+        calls: Sequence[Call],
+        chunks: Optional[List[List[Call]]] = None,
+        transform: Optional[Callable[[Hashable, Any], Any]] = None
+    ) -> Tuple[Dict[Hashable, Any], Dict[Hashable, Exception]]:
+        """
+        Run many calls as batches, concurrently, retrying throttled ones.
+
+        Args:
+            calls: (key, request) pairs
+            chunks: Pre-grouped batches (default: batch_size calls each, or one
+                call each in concurrent mode)
+            transform: Applied to each response as it arrives, in the worker
+                thread, before the next one is parsed; its result is stored
+                instead of the response. Transform errors are not retried.
+
+        Returns:
+            (results, errors) keyed like the calls
+        """
+        results: Dict[Hashable, Any] = {}
+        errors: Dict[Hashable, Exception] = {}
+        pending: List[List[Call]] = chunks or [
+            list(calls[start:start + self._chunk_size]) for start in range(0, len(calls), self._chunk_size)
+        ]
+        attempt = 0
+        while pending:
+            outcomes = await asyncio.gather(*(
+                self._limited(self._execute_batch_sync, chunk, transform) for chunk in pending
+            ))
+            retry: List[Call] = []
+            for chunk, (chunk_results, chunk_errors) in zip(pending, outcomes):
+                results.update(chunk_results)
+                for key, request in chunk:
+                    error = chunk_errors.get(key)
+                    if error is None:
+                        continue
+                    if isinstance(error, _TransformError):
+                        errors[key] = error.error
+                    elif attempt < self.max_retries and is_retryable_error(error):
+                        retry.append((key, request))
+                    else:
+                        errors[key] = error
+            if not retry:
+                break
+            attempt += 1
+            self._count(retries=len(retry))
+            delay = min(2 ** (attempt - 1), 16) * (0.5 + random.random() / 2)
+            self.logger.info(f"Gmail throttled or failed {len(retry)} calls; retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            pending = [retry[start:start + self._chunk_size] for start in range(0, len(retry), self._chunk_size)]
+        if errors:
+            self._count(failures=len(errors))
+        return results, errors
+
+    # Gmail operations
+
+    def _messages(self) -> Any:
+        return self.service.users().messages()
+
+    async def list_message_ids(self, query: str = 'is:unread', max_results: int = 10, label_ids: Optional[List[str]] = None) -> List[str]:
+        """IDs of messages matching the query, newest first, following pages up to max_results."""
+        ids: List[str] = []
+        page_token = None
+        while len(ids) < max_results:
+            kwargs = {
+                'userId': self.user_id,
+                'q': query,
+                'maxResults': min(_MAX_LIST_PAGE, max_results - len(ids)),
+                'fields': LIST_FIELDS,
+            }
+            if label_ids:
+                kwargs['labelIds'] = label_ids
+            if page_token:
+                kwargs['pageToken'] = page_token
+            response = await self.execute(self._messages().list(**kwargs))
+            ids.extend(message['id'] for message in response.get('messages', []) or [])
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+        return ids[:max_results]
+
+    async def get_messages(self, message_ids: Iterable[str], fields: str = MESSAGE_FIELDS) -> Dict[str, Dict[str, Any]]:
+        """Full messages by ID (format=full, field-masked); failed ones are logged and left out."""
+        message_ids = list(dict.fromkeys(message_ids))
+        calls = [
+            (message_id, self._messages().get(userId=self.user_id, id=message_id, format='full', fields=fields))
+            for message_id in message_ids
+        ]
+        results, errors = await self.run_calls(calls)
+        for message_id, error in errors.items():
+            self.logger.error(f"Failed to fetch Gmail message {message_id}: {error}")
+        return results
+
+    async def get_attachments(
+        self,
+        refs: Iterable[Tuple[str, str, int]],
+        transform: Optional[Callable[[Tuple[str, str], Dict[str, Any]], Any]] = None
+    ) -> Dict[Tuple[str, str], Any]:
+        """
+        Attachment bodies ({'data': base64url, 'size': n}) by (message_id, attachment_id).
+
+        Args:
+            refs: (message_id, attachment_id, size_hint) triples; the size from the
+                message part keeps each batch under attachment_batch_bytes
+            transform: Called with the key and body of each attachment as soon as it
+                arrives (e.g. to spool it to disk); its result replaces the body, so
+                the base64 text can be freed before the rest of the batch is handled
+        """
+        chunks: List[List[Call]] = []
+        chunk_bytes: List[int] = []
+        current: List[Call] = []
+        current_bytes = 0
+        for message_id, attachment_id, size in dict.fromkeys(refs):
+            request = self._messages().attachments().get(
+                userId=self.user_id, messageId=message_id, id=attachment_id, fields=ATTACHMENT_FIELDS
+            )
+            # base64 in transit is a third larger than the attachment
+            encoded = int((size or 0) * 4 / 3)
+            if current and (len(current) >= self._chunk_size or current_bytes + encoded > self.attachment_batch_bytes):
+                chunks.append(current)
+                chunk_bytes.append(current_bytes)
+                current, current_bytes = [], 0
+            current.append(((message_id, attachment_id), request))
+            current_bytes += encoded
+        if current:
+            chunks.append(current)
+            chunk_bytes.append(current_bytes)
+        if not chunks:
+            return {}
+
+        # Waves of batches within the in-flight budget, one wave after another
+        waves: List[List[List[Call]]] = [[]]
+        wave_bytes = 0
+        for chunk, size in zip(chunks, chunk_bytes):
+            if waves[-1] and wave_bytes + size > self.attachment_inflight_bytes:
+                waves.append([])
+                wave_bytes = 0
+            waves[-1].append(chunk)
+            wave_bytes += size
+
+        results: Dict[Hashable, Any] = {}
+        errors: Dict[Hashable, Exception] = {}
+        for wave in waves:
+            wave_results, wave_errors = await self.run_calls(
+                [call for chunk in wave for call in chunk], chunks=wave, transform=transform
+            )
+            results.update(wave_results)
+            errors.update(wave_errors)
+        for (message_id, attachment_id), error in errors.items():
+            self.logger.error(f"Failed to fetch attachment {attachment_id} of message {message_id}: {error}")
+        return results
+
+    async def get_profile(self) -> Dict[str, Any]:
+        """Mailbox profile (emailAddress, messagesTotal, historyId)."""
+        return await self.execute(self.service.users().getProfile(userId=self.user_id))
+
+    async def list_history(
+        self,
+        start_history_id: str,
+        label_id: Optional[str] = None,
+        history_types: Sequence[str] = ('messageAdded',),
+        max_records: int = 5000
+    ) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Mailbox changes since a history ID, following pages.
+
+        Raises googleapiclient's HttpError 404 when start_history_id has
+        expired (Gmail keeps roughly a week of history); callers must then
+        resynchronise in full.
+
+        Returns:
+            (history records, the historyId to continue from: the mailbox's
+            current one, or the last record's when max_records cut the listing short)
+        """
+        records: List[Dict[str, Any]] = []
+        page_token = None
+        history_id = start_history_id
+        while True:
+            kwargs = {
+                'userId': self.user_id,
+                'startHistoryId': start_history_id,
+                'historyTypes': list(history_types),
+                'maxResults': _MAX_LIST_PAGE,
+                'fields': HISTORY_FIELDS,
+            }
+            if label_id:
+                kwargs['labelId'] = label_id
+            if page_token:
+                kwargs['pageToken'] = page_token
+            response = await self.execute(self.service.users().history().list(**kwargs))
+            records.extend(response.get('history', []) or [])
+            history_id = response.get('historyId', history_id)
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+            if len(records) >= max_records:
+                # Resume after the last record read, not at the mailbox's current state
+                history_id = records[-1].get('id', start_history_id)
+                break
+        return records, str(history_id)
+
+    async def batch_modify(
+        self,
+        message_ids: Sequence[str],
+        add_label_ids: Sequence[str] = (),
+        remove_label_ids: Sequence[str] = ()
+    ) -> None:
+        """Apply one label change to many messages (MAX_BATCH_MODIFY per call)."""
+        for start in range(0, len(message_ids), MAX_BATCH_MODIFY):
+            body: Dict[str, Any] = {'ids': list(message_ids[start:start + MAX_BATCH_MODIFY])}
+            if add_label_ids:
+                body['addLabelIds'] = list(add_label_ids)
+            if remove_label_ids:
+                body['removeLabelIds'] = list(remove_label_ids)
+            await self.execute(self._messages().batchModify(userId=self.user_id, body=body))
+
+    async def ensure_labels(self, names: Iterable[str]) -> Dict[str, str]:
+        """Label IDs by name, creating user labels that do not exist yet."""
+        names = [name for name in dict.fromkeys(names) if name]
+        labels = self.service.users().labels()
+        response = await self.execute(labels.list(userId=self.user_id, fields='labels(id,name)'))
+        ids = {label['name']: label['id'] for label in response.get('labels', []) or []}
+        for name in names:
+            if name not in ids:
+                created = await self.execute(labels.create(userId=self.user_id, body={
+                    'name': name,
+                    'labelListVisibility': 'labelShow',
+                    'messageListVisibility': 'show',
+                }))
+                ids[name] = created['id']
+                self.logger.info(f"Created Gmail label {name}")
+        return {name: ids[name] for name in names}
+
+    def stats(self) -> Dict[str, Any]:
+        """Round trips, calls, retries, failures and time spent in Gmail."""
+        with self._stats_lock:
+            snapshot = {name: round(value, 3) if isinstance(value, float) else value for name, value in self._stats.items()}
+        snapshot.update({'mode': self.mode, 'batch_size': self.batch_size, 'max_concurrency': self.max_concurrency})
+        return snapshot
@@ -20,8 +20,10 @@ from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
 from src.config.settings import get_settings
+from src.email_processing.attachment_store import get_attachment_store, spooling_enabled
+from src.email_processing.gmail_fetcher import GmailFetcher
 from src.utils.logger import get_logger
-from src.utils.exceptions import BaseOfferAutomationError
+from src.utils.exceptions import AttachmentSpoolError, BaseOfferAutomationError
 
 
 class GmailServiceAccountProcessor:
@@ -40,6 +42,7 @@ class GmailServiceAccountProcessor:
         self.logger = get_logger(__name__)
         self.gmail_service = None
         self.credentials = None
+        self.fetcher: Optional[GmailFetcher] = None
         # Service account configuration
         self.service_account_file = os.getenv('GMAIL_SERVICE_ACCOUNT_FILE', 'config/gmail-service-account.json')
         self.delegated_email = os.getenv('GMAIL_DELEGATED_USER', os.getenv('MONITORED_EMAIL', 'automations@agent.lvi-wabek.fi'))
@@ -103,6 +106,7 @@ class GmailServiceAccountProcessor:
             
             # Build Gmail service
             self.gmail_service = build('gmail', 'v1', credentials=self.credentials)
+            self.fetcher = GmailFetcher(self.gmail_service, credentials=self.credentials)
             
             self.logger.info(f"[SUCCESS] Gmail Service Account initialized successfully")
             self.logger.info(f"[SUCCESS] Delegated user: {self.delegated_email}")
@@ -128,24 +132,8 @@ class GmailServiceAccountProcessor:
             await self.initialize()
         
         try:
-            
-            # Get list of messages
-            response = self.gmail_service.users().messages().list(
-                userId='me',
-                q=query,
-                maxResults=max_results
-            ).execute()
-            
-            messages = response.get('messages', [])
-            
-            # Get full content for each message
-            emails = []
-            for message in messages:
-                email_data = await self._get_email_content(message['id'])
-                if email_data:
-                    emails.append(email_data)
-            
-            return emails
+            message_ids = await self.fetcher.list_message_ids(query=query, max_results=max_results)
+            return await self._get_emails_content(message_ids)
             
         except HttpError as e:
             self.logger.error(f"Gmail API error: {e}")
@@ -154,6 +142,71 @@ class GmailServiceAccountProcessor:
             self.logger.error(f"Error fetching emails: {e}")
             raise BaseOfferAutomationError(f"Unexpected error fetching emails: {str(e)}")
     
+    async def get_emails_by_id(self, message_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        Get full emails by Gmail message ID (e.g. those handed out by MailboxSync).
+        
+        Args:
+            message_ids: Gmail message IDs
+            
+        Returns:
+            Email data dictionaries for the messages that could be fetched, in order
+        """
+        if not self.gmail_service:
+            await self.initialize()
+        
+        try:
+            return await self._get_emails_content(message_ids)
+        except Exception as e:
+            self.logger.error(f"Error fetching emails by ID: {e}")
+            raise BaseOfferAutomationError(f"Failed to fetch emails: {str(e)}")
+    
+    async def _get_emails_content(self, message_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        Get full content of several emails, fetching messages and then all of
+        their attachments in batched round trips.
+        
+        Args:
+            message_ids: Gmail message IDs
+            
+        Returns:
+            Email data dictionaries, in the order of message_ids (failed ones left out)
+        """
+        if not message_ids:
+            return []
+        
+        messages = await self.fetcher.get_messages(message_ids)
+        
+        attachment_parts = {
+            message_id: self._find_attachment_parts(message.get('payload', {}))
+            for message_id, message in messages.items()
+        }
+        attachment_data = await self.fetcher.get_attachments(
+            (
+                (message_id, part['body']['attachmentId'], part['body'].get('size', 0))
+                for message_id, parts in attachment_parts.items()
+                for part in parts
+                if part.get('body', {}).get('attachmentId')
+            ),
+            transform=self._spool_transform(attachment_parts)
+        )
+        
+        emails = []
+        for message_id in message_ids:
+            message = messages.get(message_id)
+            if message is None:
+                continue
+            email_data = self._build_email_data(message_id, message, attachment_parts[message_id], attachment_data)
+            if email_data:
+                emails.append(email_data)
+        
+        stats = self.fetcher.stats()
+        self.logger.info(
+            f"Fetched {len(emails)} emails in {stats.get('round_trips', 0):.0f} Gmail round trips so far "
+            f"({stats.get('calls', 0):.0f} calls, mode={stats['mode']})"
+        )
+        return emails
+    
     async def _get_email_content(self, message_id: str) -> Optional[Dict[str, Any]]:
         """
         Get full email content including attachments.
@@ -165,13 +218,21 @@ class GmailServiceAccountProcessor:
             Email data dictionary or None if failed
         """
         try:
-            # Get full message
-            message = self.gmail_service.users().messages().get(
-                userId='me',
-                id=message_id,
-                format='full'
-            ).execute()
-            
+            emails = await self._get_emails_content([message_id])
+            return emails[0] if emails else None
+        except Exception as e:
+            self.logger.error(f"Error extracting email content for {message_id}: {e}")
+            return None
+    
+    def _build_email_data(
+        self,
+        message_id: str,
+        message: Dict[str, Any],
+        attachment_parts: List[Dict],
+        attachment_data: Dict
+    ) -> Optional[Dict[str, Any]]:
+        """Email data dictionary from a fetched message and its fetched attachments."""
+        try:
             # Extract headers
             headers = {}
             if 'payload' in message and 'headers' in message['payload']:
@@ -194,7 +255,10 @@ class GmailServiceAccountProcessor:
             
             # Extract body and attachments
             email_data['body'] = self._extract_email_body(message['payload'])
-            email_data['attachments'] = await self._extract_attachments(message_id, message['payload'])
+            email_data['attachments'] = self._collect_attachments(message_id, attachment_parts, attachment_data)
+            if any(attachment.get('spooled') for attachment in email_data['attachments']):
+                # Spooled files are released when the email's workflow is done
+                email_data['attachment_owner'] = message_id
             
             self.logger.info(f"Extracted email: {headers.get('Subject', 'No Subject')[:50]}...")
             
@@ -298,50 +362,99 @@ class GmailServiceAccountProcessor:
     
     async def _extract_attachments(self, message_id: str, payload: Dict) -> List[Dict[str, Any]]:
         """Extract email attachments with enhanced forwarded email support."""
-        attachments = []
-        
         try:
             self.logger.debug(f"🔍 Extracting attachments from message {message_id}")
             attachment_parts = self._find_attachment_parts(payload)
-            self.logger.info(f"📎 Found {len(attachment_parts)} attachment parts")
-            
-            for i, part in enumerate(attachment_parts):
-                filename = part.get('filename', f'attachment_{i}')
-                attachment_id = part.get('body', {}).get('attachmentId')
-                part_mime = part.get('mimeType', 'application/octet-stream')
-                
-                self.logger.debug(f"   Attachment {i}: filename='{filename}', mimeType='{part_mime}', attachmentId='{attachment_id}'")
-                
-                if attachment_id:
-                    try:
-                        # Get attachment data
-                        attachment = self.gmail_service.users().messages().attachments().get(
-                            userId='me',
-                            messageId=message_id,
-                            id=attachment_id
-                        ).execute()
-                        
-                        # Decode attachment data
-                        file_data = base64.urlsafe_b64decode(attachment['data'])
-                        
-                        attachment_info = {
-                            'filename': filename,
-                            'mime_type': part_mime,
-                            'size': attachment.get('size', len(file_data)),
-                            'data': file_data,
-                            'source': 'gmail'
-                        }
-                        
-                        attachments.append(attachment_info)
-                        self.logger.info(f"✅ Extracted attachment: {filename} ({len(file_data)} bytes)")
-                        
-                    except Exception as e:
-                        self.logger.error(f"❌ Failed to extract attachment {filename}: {e}")
-                else:
-                    self.logger.warning(f"⚠️ Attachment {filename} has no attachmentId - might be inline content")
-        
+            attachment_data = await self.fetcher.get_attachments(
+                (
+                    (message_id, part['body']['attachmentId'], part['body'].get('size', 0))
+                    for part in attachment_parts
+                    if part.get('body', {}).get('attachmentId')
+                ),
+                transform=self._spool_transform({message_id: attachment_parts})
+            )
+            return self._collect_attachments(message_id, attachment_parts, attachment_data)
         except Exception as e:
             self.logger.error(f"Error extracting attachments: {e}")
+            return []
+    
+    def _spool_transform(self, attachment_parts: Dict[str, List[Dict]]):
+        """
+        Fetch transform that writes each attachment to the attachment spool as it
+        arrives, so only its path is kept (None when spooling is disabled).
+        
+        Attachments over the size limit fail (and are skipped); if the spool is
+        full, the base64 body is kept and decoded in memory as before.
+        """
+        if not spooling_enabled():
+            return None
+        store = get_attachment_store()
+        parts = {
+            (message_id, part['body']['attachmentId']): part
+            for message_id, message_parts in attachment_parts.items()
+            for part in message_parts
+            if part.get('body', {}).get('attachmentId')
+        }
+        
+        def spool(key, body):
+            message_id, _ = key
+            part = parts.get(key, {})
+            try:
+                return store.spool_base64(
+                    body.get('data', ''),
+                    owner=message_id,
+                    filename=part.get('filename') or 'attachment',
+                    mime_type=part.get('mimeType', 'application/octet-stream')
+                )
+            except AttachmentSpoolError as e:
+                if e.context.get('reason') != 'spool_full':
+                    raise
+                self.logger.warning(f"⚠️ {e}; keeping {part.get('filename')} in memory")
+                return body
+        
+        return spool
+    
+    def _collect_attachments(self, message_id: str, attachment_parts: List[Dict], attachment_data: Dict) -> List[Dict[str, Any]]:
+        """Collect a message's fetched attachments (attachment_data is keyed by (message_id, attachment_id))."""
+        attachments = []
+        self.logger.info(f"📎 Found {len(attachment_parts)} attachment parts")
+        
+        for i, part in enumerate(attachment_parts):
+            filename = part.get('filename', f'attachment_{i}')
+            attachment_id = part.get('body', {}).get('attachmentId')
+            part_mime = part.get('mimeType', 'application/octet-stream')
+            
+            self.logger.debug(f"   Attachment {i}: filename='{filename}', mimeType='{part_mime}', attachmentId='{attachment_id}'")
+            
+            if attachment_id:
+                attachment = attachment_data.get((message_id, attachment_id))
+                if attachment is None:
+                    self.logger.error(f"❌ Failed to extract attachment {filename}: not fetched")
+                    continue
+                if attachment.get('spooled'):
+                    attachment_info = dict(attachment, filename=filename, mime_type=part_mime)
+                    attachments.append(attachment_info)
+                    self.logger.info(f"✅ Spooled attachment: {filename} ({attachment_info['size']} bytes)")
+                    continue
+                try:
+                    # Decode attachment data
+                    file_data = base64.urlsafe_b64decode(attachment['data'])
+                    
+                    attachment_info = {
+                        'filename': filename,
+                        'mime_type': part_mime,
+                        'size': attachment.get('size', len(file_data)),
+                        'data': file_data,
+                        'source': 'gmail'
+                    }
+                    
+                    attachments.append(attachment_info)
+                    self.logger.info(f"✅ Extracted attachment: {filename} ({len(file_data)} bytes)")
+                    
+                except Exception as e:
+                    self.logger.error(f"❌ Failed to extract attachment {filename}: {e}")
+            else:
+                self.logger.warning(f"⚠️ Attachment {filename} has no attachmentId - might be inline content")
         
         self.logger.info(f"📎 Total attachments extracted: {len(attachments)}")
         return attachments
@@ -387,11 +500,11 @@ class GmailServiceAccountProcessor:
     async def mark_email_as_read(self, message_id: str) -> bool:
         """Mark email as read."""
         try:
-            self.gmail_service.users().messages().modify(
+            await self.fetcher.execute(self.gmail_service.users().messages().modify(
                 userId='me',
                 id=message_id,
                 body={'removeLabelIds': ['UNREAD']}
-            ).execute()
+            ))
             
             self.logger.info(f"Marked email as read: {message_id}")
             return True
@@ -453,7 +566,7 @@ class GmailServiceAccountProcessor:
                 return {'status': 'unhealthy', 'error': 'Service not initialized'}
             
             # Test with a simple API call
-            profile = self.gmail_service.users().getProfile(userId='me').execute()
+            profile = await self.fetcher.execute(self.gmail_service.users().getProfile(userId='me'))
             
             # Also check token status
             token_status = await self.check_token_status()
@@ -463,7 +576,8 @@ class GmailServiceAccountProcessor:
                 'email_address': profile.get('emailAddress'),
                 'messages_total': profile.get('messagesTotal'),
                 'threads_total': profile.get('threadsTotal'),
-                'token_status': token_status
+                'token_status': token_status,
+                'fetch_stats': self.fetcher.stats()
             }
             
         except Exception as e:
@@ -0,0 +1,216 @@
+"""
+Buffered Gmail label updates.
+
+Marking emails read used to cost one users.messages.modify call per email,
+made one after another at the end of every poll. LabelUpdateBuffer collects
+message state transitions instead and applies them with
+users.messages.batchModify, one call per distinct label change for up to
+1000 messages:
+
+- read: remove UNREAD
+- processed: add the processed status label (GMAIL_PROCESSED_LABEL), remove UNREAD
+- failed: add the failed status label (GMAIL_FAILED_LABEL)
+
+Transitions for the same message are merged (a later one wins for a label
+both added and removed). The buffer flushes when GMAIL_LABEL_FLUSH_SIZE
+messages are waiting or every GMAIL_LABEL_FLUSH_SECONDS, and on stop().
+Throttled or failed flushes are retried with backoff; changes still
+failing after max_retries are dropped and logged.
+
+Status labels are created in the mailbox on first use. Because offers are
+labelled, the mailbox can also be searched by state, e.g.
+MAILBOX_SYNC_QUERY="in:inbox -label:offer-agent-processed -label:offer-agent-failed".
+"""
+import asyncio
+import os
+import random
+import time
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from src.email_processing.gmail_fetcher import MAX_BATCH_MODIFY, GmailFetcher, is_retryable_error
+from src.utils.logger import get_logger
+
+
+TRANSITION_READ = "read"
+TRANSITION_PROCESSED = "processed"
+TRANSITION_FAILED = "failed"
+
+LABEL_UNREAD = "UNREAD"
+
+Change = Tuple[FrozenSet[str], FrozenSet[str]]
+
+
+class LabelUpdateBuffer:
+    """Accumulates Gmail label changes and applies them with batchModify."""
+
+    def __init__(
+        self,
+        fetcher: GmailFetcher,
+        processed_label: Optional[str] = None,
+        failed_label: Optional[str] = None,
+        flush_size: Optional[int] = None,
+        flush_seconds: Optional[float] = None,
+        max_retries: int = 4
+    ):
+        """
+        Args:
+            fetcher: Gmail fetcher for the mailbox
+            processed_label: Status label for handled emails (defaults to GMAIL_PROCESSED_LABEL;
+                empty = no label, processed only marks read)
+            failed_label: Status label for failed offers (defaults to GMAIL_FAILED_LABEL)
+            flush_size: Waiting messages that trigger a flush (defaults to GMAIL_LABEL_FLUSH_SIZE, 1000)
+            flush_seconds: Longest a change waits (defaults to GMAIL_LABEL_FLUSH_SECONDS, 5)
+            max_retries: Flush attempts before a change is dropped
+        """
+        self.logger = get_logger(__name__)
+        self.fetcher = fetcher
+        self.processed_label = (
+            processed_label if processed_label is not None
+            else os.getenv('GMAIL_PROCESSED_LABEL', 'offer-agent-processed')
+        )
+        self.failed_label = (
+            failed_label if failed_label is not None
+            else os.getenv('GMAIL_FAILED_LABEL', 'offer-agent-failed')
+        )
+        self.flush_size = max(1, min(MAX_BATCH_MODIFY, flush_size or int(os.getenv('GMAIL_LABEL_FLUSH_SIZE', '1000'))))
+        self.flush_seconds = flush_seconds or float(os.getenv('GMAIL_LABEL_FLUSH_SECONDS', '5'))
+        self.max_retries = max_retries
+
+        # message ID -> (labels to add, labels to remove), by label name
+        self._pending: Dict[str, Tuple[Set[str], Set[str]]] = {}
+        self._attempts: Dict[str, int] = {}
+        self._label_ids: Dict[str, str] = {LABEL_UNREAD: LABEL_UNREAD}
+        self._flush_lock = asyncio.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stats: Dict[str, Any] = {
+            'queued': 0, 'flushes': 0, 'api_calls': 0, 'messages_updated': 0, 'retries': 0, 'dropped': 0,
+            'last_flush_at': None,
+        }
+
+    def _transition(self, transition: str) -> Tuple[Set[str], Set[str]]:
+        if transition == TRANSITION_READ:
+            return set(), {LABEL_UNREAD}
+        if transition == TRANSITION_PROCESSED:
+            return ({self.processed_label} if self.processed_label else set()), {LABEL_UNREAD}
+        if transition == TRANSITION_FAILED:
+            return ({self.failed_label} if self.failed_label else set()), set()
+        raise ValueError(f"Unknown label transition: {transition}")
+
+    def add(self, message_ids: Iterable[str], transition: str) -> None:
+        """Queue a transition for messages; flushes early once flush_size messages wait."""
+        add, remove = self._transition(transition)
+        for message_id in message_ids:
+            if not message_id:
+                continue
+            pending_add, pending_remove = self._pending.setdefault(message_id, (set(), set()))
+            pending_add.difference_update(remove)
+            pending_remove.difference_update(add)
+            pending_add.update(add)
+            pending_remove.update(remove)
+            self._stats['queued'] += 1
+        if len(self._pending) >= self.flush_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    @property
+    def pending(self) -> int:
+        """Messages with changes waiting to be flushed."""
+        return len(self._pending)
+
+    async def _resolve(self, names: Iterable[str]) -> List[str]:
+        missing = [name for name in names if name not in self._label_ids]
+        if missing:
+            self._label_ids.update(await self.fetcher.ensure_labels(missing))
+        return [self._label_ids[name] for name in names]
+
+    async def flush(self) -> int:
+        """Apply all waiting changes now; returns the number of messages updated."""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, {}
+
+            groups: Dict[Change, List[str]] = {}
+            for message_id, (add, remove) in pending.items():
+                if add or remove:
+                    groups.setdefault((frozenset(add), frozenset(remove)), []).append(message_id)
+
+            updated = 0
+            failed: Dict[str, Tuple[Set[str], Set[str]]] = {}
+            for (add, remove), message_ids in groups.items():
+                try:
+                    add_ids = await self._resolve(sorted(add))
+                    remove_ids = await self._resolve(sorted(remove))
+                    await self.fetcher.batch_modify(message_ids, add_ids, remove_ids)
+                    self._stats['api_calls'] += -(-len(message_ids) // MAX_BATCH_MODIFY)
+                    updated += len(message_ids)
+                    for message_id in message_ids:
+                        self._attempts.pop(message_id, None)
+                except Exception as e:
+                    retryable = is_retryable_error(e)
+                    for message_id in message_ids:
+                        attempts = self._attempts.get(message_id, 0) + 1
+                        if retryable and attempts <= self.max_retries:
+                            self._attempts[message_id] = attempts
+                            failed[message_id] = (set(add), set(remove))
+                        else:
+                            self._attempts.pop(message_id, None)
+                            self._stats['dropped'] += 1
+                    self.logger.warning(
+                        f"Gmail label update for {len(message_ids)} message(s) failed"
+                        f"{' (will retry)' if retryable else ''}: {e}"
+                    )
+
+            # Failed changes go back under any change queued since; newer transitions win
+            for message_id, (add, remove) in failed.items():
+                newer = self._pending.get(message_id)
+                if newer is not None:
+                    add = (add - newer[1]) | newer[0]
+                    remove = (remove - newer[0]) | newer[1]
+                self._pending[message_id] = (add, remove)
+            if failed:
+                self._stats['retries'] += len(failed)
+
+            self._stats['flushes'] += 1
+            self._stats['messages_updated'] += updated
+            self._stats['last_flush_at'] = time.time()
+            if updated:
+                self.logger.info(f"🏷️ Updated labels of {updated} email(s) in {len(groups)} batchModify group(s)")
+            return updated
+
+    async def _loop(self) -> None:
+        failures = 0
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            retries_before = self._stats['retries']
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Label flush crashed: {e}")
+            # Back off while flushes keep failing
+            failures = failures + 1 if self._stats['retries'] > retries_before else 0
+            if failures:
+                await asyncio.sleep(min(2 ** (failures - 1), 30) * (0.5 + random.random() / 2))
+
+    def start(self) -> None:
+        """Start the background flusher (idempotent)."""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Stop the flusher and apply whatever is still waiting."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, 'pending': len(self._pending)}
@@ -0,0 +1,392 @@
+"""
+Incremental Gmail mailbox sync.
+
+The email poller used to list all unread mail on every cycle and relied on
+marking messages read to avoid seeing them again, so a failed mark-as-read
+meant a second offer for the same email. MailboxSync instead keeps the
+mailbox's last Gmail historyId and, on each poll, asks users.history.list
+only for messages added since then: an idle poll is one small request.
+
+New message IDs go into a local ledger (SQLite) as pending before the
+historyId advances, in one transaction, and only move to processed once
+the poller has queued or skipped them. A message therefore is never lost
+between polls and never handed out again once processed, whatever its
+read state in Gmail.
+
+A full resync (listing the query, is:unread by default) runs on the first
+poll and whenever Gmail no longer has the stored history (404, after
+roughly a week); messages already in the ledger are not processed again.
+
+Configuration:
+
+    MAILBOX_SYNC_ENABLED             use history sync in the poller (default: true)
+    MAILBOX_SYNC_PATH                ledger database (default: /app/data/mailbox_sync.db)
+    MAILBOX_SYNC_LABEL               label new mail must arrive in (default: INBOX)
+    MAILBOX_SYNC_QUERY               Gmail search for full resyncs (default: is:unread; with
+                                     status labels e.g. "in:inbox -label:offer-agent-processed")
+    MAILBOX_FULL_SYNC_LIMIT          messages listed by a full resync (default: 500)
+    MAILBOX_SYNC_MAX_ATTEMPTS        failed fetches before a message is given up (default: 3)
+    MAILBOX_LEDGER_RETENTION_DAYS    how long processed IDs are remembered (default: 30)
+"""
+import asyncio
+import os
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.email_processing.gmail_fetcher import GmailFetcher
+from src.utils.logger import get_logger
+
+
+MESSAGE_PENDING = "pending"
+MESSAGE_PROCESSED = "processed"
+MESSAGE_FAILED = "failed"
+
+SYNC_FULL = "full"
+SYNC_INCREMENTAL = "incremental"
+
+
+@dataclass
+class SyncState:
+    """Where a mailbox's sync stands."""
+    mailbox: str
+    history_id: Optional[str] = None
+    full_sync_at: Optional[float] = None
+    synced_at: Optional[float] = None
+
+
+@dataclass
+class SyncResult:
+    """Outcome of one sync."""
+    mode: str
+    history_id: str
+    seen: int = 0
+    added: List[str] = field(default_factory=list)
+    reason: str = ""
+
+
+class MailboxSyncStore:
+    """
+    History IDs and the processed-message ledger, in a local SQLite database.
+
+    Sync methods are safe to call from any thread; the async wrappers run them
+    in a worker thread so the event loop is never blocked on disk I/O.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Args:
+            db_path: SQLite file path. Defaults to MAILBOX_SYNC_PATH or
+                /app/data/mailbox_sync.db. Use ":memory:" for tests.
+        """
+        self.logger = get_logger(__name__)
+        self._lock = Lock()
+
+        path = db_path or os.getenv("MAILBOX_SYNC_PATH", "/app/data/mailbox_sync.db")
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS sync_state (
+                mailbox TEXT PRIMARY KEY,
+                history_id TEXT,
+                full_sync_at REAL,
+                synced_at REAL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS mailbox_messages (
+                mailbox TEXT NOT NULL,
+                message_id TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                first_seen_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (mailbox, message_id)
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_mailbox_messages_status "
+            "ON mailbox_messages (mailbox, status, first_seen_at)"
+        )
+
+    # ==================== SYNC API ====================
+
+    def get_state(self, mailbox: str) -> SyncState:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT history_id, full_sync_at, synced_at FROM sync_state WHERE mailbox = ?", (mailbox,)
+            ).fetchone()
+        if row is None:
+            return SyncState(mailbox=mailbox)
+        return SyncState(mailbox=mailbox, history_id=row[0], full_sync_at=row[1], synced_at=row[2])
+
+    def record_sync(self, mailbox: str, message_ids: Iterable[str], history_id: str, full_sync: bool = False) -> List[str]:
+        """
+        Add newly seen messages as pending and advance the history ID, atomically.
+
+        Messages already in the ledger (pending, processed or failed) are left as they are.
+
+        Returns:
+            IDs that were not in the ledger yet
+        """
+        now = time.time()
+        added = []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for message_id in dict.fromkeys(message_ids):
+                    cursor = self._conn.execute(
+                        """
+                        INSERT OR IGNORE INTO mailbox_messages
+                            (mailbox, message_id, status, attempts, first_seen_at, updated_at)
+                        VALUES (?, ?, ?, 0, ?, ?)
+                        """,
+                        (mailbox, message_id, MESSAGE_PENDING, now, now)
+                    )
+                    if cursor.rowcount:
+                        added.append(message_id)
+                self._conn.execute(
+                    """
+                    INSERT INTO sync_state (mailbox, history_id, full_sync_at, synced_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(mailbox) DO UPDATE SET
+                        history_id = excluded.history_id,
+                        full_sync_at = COALESCE(excluded.full_sync_at, sync_state.full_sync_at),
+                        synced_at = excluded.synced_at
+                    """,
+                    (mailbox, history_id, now if full_sync else None, now)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return added
+
+    def pending(self, mailbox: str, limit: int = 10) -> List[str]:
+        """Oldest pending message IDs."""
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT message_id FROM mailbox_messages
+                WHERE mailbox = ? AND status = ?
+                ORDER BY first_seen_at ASC, rowid ASC
+                LIMIT ?
+                """,
+                (mailbox, MESSAGE_PENDING, limit)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def mark(self, mailbox: str, message_ids: Iterable[str], status: str = MESSAGE_PROCESSED) -> int:
+        """Set the status of messages; returns how many were updated."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.executemany(
+                "UPDATE mailbox_messages SET status = ?, updated_at = ? WHERE mailbox = ? AND message_id = ?",
+                [(status, now, mailbox, message_id) for message_id in message_ids]
+            )
+            return cursor.rowcount
+
+    def record_failure(self, mailbox: str, message_ids: Iterable[str], max_attempts: int = 3) -> List[str]:
+        """
+        Count a failed fetch; messages that reach max_attempts are marked failed.
+
+        Returns:
+            IDs that were given up
+        """
+        now = time.time()
+        given_up = []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for message_id in message_ids:
+                    row = self._conn.execute(
+                        "SELECT attempts FROM mailbox_messages WHERE mailbox = ? AND message_id = ? AND status = ?",
+                        (mailbox, message_id, MESSAGE_PENDING)
+                    ).fetchone()
+                    if row is None:
+                        continue
+                    attempts = row[0] + 1
+                    status = MESSAGE_FAILED if attempts >= max_attempts else MESSAGE_PENDING
+                    self._conn.execute(
+                        "UPDATE mailbox_messages SET attempts = ?, status = ?, updated_at = ? "
+                        "WHERE mailbox = ? AND message_id = ?",
+                        (attempts, status, now, mailbox, message_id)
+                    )
+                    if status == MESSAGE_FAILED:
+                        given_up.append(message_id)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return given_up
+
+    def status_of(self, mailbox: str, message_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status FROM mailbox_messages WHERE mailbox = ? AND message_id = ?", (mailbox, message_id)
+            ).fetchone()
+        return row[0] if row else None
+
+    def counts(self, mailbox: str) -> Dict[str, int]:
+        """Number of ledger entries per status."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM mailbox_messages WHERE mailbox = ? GROUP BY status", (mailbox,)
+            ).fetchall()
+        return {status: count for status, count in rows}
+
+    def purge(self, older_than_seconds: float = 30 * 86400) -> int:
+        """Forget processed/failed messages older than the given age."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM mailbox_messages WHERE status IN (?, ?) AND updated_at < ?",
+                (MESSAGE_PROCESSED, MESSAGE_FAILED, time.time() - older_than_seconds)
+            )
+            return cursor.rowcount
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    # ==================== ASYNC WRAPPERS ====================
+
+    async def get_state_async(self, mailbox: str) -> SyncState:
+        return await asyncio.to_thread(self.get_state, mailbox)
+
+    async def record_sync_async(self, mailbox: str, message_ids: Iterable[str], history_id: str, full_sync: bool = False) -> List[str]:
+        return await asyncio.to_thread(self.record_sync, mailbox, list(message_ids), history_id, full_sync)
+
+    async def pending_async(self, mailbox: str, limit: int = 10) -> List[str]:
+        return await asyncio.to_thread(self.pending, mailbox, limit)
+
+    async def mark_async(self, mailbox: str, message_ids: Iterable[str], status: str = MESSAGE_PROCESSED) -> int:
+        return await asyncio.to_thread(self.mark, mailbox, list(message_ids), status)
+
+    async def record_failure_async(self, mailbox: str, message_ids: Iterable[str], max_attempts: int = 3) -> List[str]:
+        return await asyncio.to_thread(self.record_failure, mailbox, list(message_ids), max_attempts)
+
+
+class MailboxSync:
+    """Pulls new mail into the ledger via Gmail history and hands out pending messages."""
+
+    def __init__(
+        self,
+        fetcher: GmailFetcher,
+        store: Optional[MailboxSyncStore] = None,
+        mailbox: str = 'me',
+        query: Optional[str] = None,
+        label_id: Optional[str] = None,
+        required_labels: Iterable[str] = ('UNREAD',),
+        full_sync_limit: Optional[int] = None,
+        max_attempts: Optional[int] = None
+    ):
+        """
+        Args:
+            fetcher: Gmail fetcher for the mailbox
+            store: Ledger (defaults to a MailboxSyncStore at MAILBOX_SYNC_PATH)
+            mailbox: Ledger key for the mailbox (e.g. the delegated address)
+            query: Gmail search for full resyncs (defaults to MAILBOX_SYNC_QUERY, is:unread)
+            label_id: Label new messages must be added to (defaults to MAILBOX_SYNC_LABEL, INBOX)
+            required_labels: Labels a new message must carry when it arrives
+                (UNREAD matches the is:unread query of a full resync)
+            full_sync_limit: Messages listed by a full resync
+            max_attempts: Failed fetches before a message is given up
+        """
+        self.logger = get_logger(__name__)
+        self.fetcher = fetcher
+        self.store = store or MailboxSyncStore()
+        self.mailbox = mailbox
+        self.query = query or os.getenv('MAILBOX_SYNC_QUERY', 'is:unread')
+        self.label_id = label_id or os.getenv('MAILBOX_SYNC_LABEL', 'INBOX')
+        self.required_labels = set(required_labels)
+        self.full_sync_limit = full_sync_limit or int(os.getenv('MAILBOX_FULL_SYNC_LIMIT', '500'))
+        self.max_attempts = max_attempts or int(os.getenv('MAILBOX_SYNC_MAX_ATTEMPTS', '3'))
+        self.retention_seconds = float(os.getenv('MAILBOX_LEDGER_RETENTION_DAYS', '30')) * 86400
+        self._sync_lock = asyncio.Lock()
+        self._stats: Dict[str, Any] = {'syncs': 0, 'full_syncs': 0, 'messages_added': 0, 'last_sync': None}
+
+    def _wanted(self, message: Dict[str, Any]) -> bool:
+        return self.required_labels <= set(message.get('labelIds', []) or [])
+
+    async def _full_sync(self, reason: str) -> SyncResult:
+        # Take the history ID before listing: mail that arrives during the
+        # listing then shows up in the next delta instead of being missed
+        profile = await self.fetcher.get_profile()
+        history_id = str(profile['historyId'])
+        message_ids = await self.fetcher.list_message_ids(query=self.query, max_results=self.full_sync_limit)
+        # Listings are newest first; hand out the oldest mail first
+        message_ids.reverse()
+        added = await self.store.record_sync_async(self.mailbox, message_ids, history_id, full_sync=True)
+        self._stats['full_syncs'] += 1
+        self.logger.info(
+            f"📬 Full mailbox sync ({reason}): {len(message_ids)} messages match '{self.query}', "
+            f"{len(added)} new; history ID {history_id}"
+        )
+        return SyncResult(mode=SYNC_FULL, history_id=history_id, seen=len(message_ids), added=added, reason=reason)
+
+    async def sync(self) -> SyncResult:
+        """Record messages added since the last sync as pending."""
+        async with self._sync_lock:
+            state = await self.store.get_state_async(self.mailbox)
+            if not state.history_id:
+                result = await self._full_sync("no sync state")
+            else:
+                try:
+                    records, history_id = await self.fetcher.list_history(state.history_id, label_id=self.label_id)
+                except Exception as e:
+                    if getattr(getattr(e, 'resp', None), 'status', None) not in (404, '404'):
+                        raise
+                    result = await self._full_sync(f"history {state.history_id} expired")
+                else:
+                    message_ids = [
+                        added['message']['id']
+                        for record in records
+                        for added in record.get('messagesAdded', []) or []
+                        if self._wanted(added.get('message', {}))
+                    ]
+                    added = await self.store.record_sync_async(self.mailbox, message_ids, history_id)
+                    result = SyncResult(mode=SYNC_INCREMENTAL, history_id=history_id, seen=len(message_ids), added=added)
+                    if added:
+                        self.logger.info(f"📬 {len(added)} new message(s) since history {state.history_id}")
+
+            self._stats['syncs'] += 1
+            self._stats['messages_added'] += len(result.added)
+            self._stats['last_sync'] = {
+                'mode': result.mode,
+                'history_id': result.history_id,
+                'added': len(result.added),
+                'at': time.time(),
+            }
+            if self._stats['syncs'] % 1000 == 1:
+                await asyncio.to_thread(self.store.purge, self.retention_seconds)
+            return result
+
+    async def next_batch(self, max_results: int = 10) -> List[str]:
+        """Sync, then return up to max_results pending message IDs, oldest first."""
+        await self.sync()
+        return await self.store.pending_async(self.mailbox, max_results)
+
+    async def mark_processed(self, message_ids: Iterable[str]) -> None:
+        """Record messages as handled; later syncs will not hand them out again."""
+        await self.store.mark_async(self.mailbox, message_ids, MESSAGE_PROCESSED)
+
+    async def mark_failed(self, message_ids: Iterable[str]) -> List[str]:
+        """Record a failed fetch; returns the IDs given up after max_attempts."""
+        message_ids = list(message_ids)
+        if not message_ids:
+            return []
+        given_up = await self.store.record_failure_async(self.mailbox, message_ids, self.max_attempts)
+        if given_up:
+            self.logger.warning(f"Giving up on {len(given_up)} message(s) after {self.max_attempts} failed fetches: {given_up}")
+        return given_up
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, 'ledger': self.store.counts(self.mailbox)}
+
+    def close(self) -> None:
+        self.store.close()
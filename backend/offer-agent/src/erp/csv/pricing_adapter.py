@@ -2,24 +2,32 @@
 CSV Pricing Adapter
 
 Implements the PricingService interface for CSV-based pricing.
-Uses simple pricing rules for demo purposes.
+Uses simple pricing rules for demo purposes, evaluated through the shared
+PricingRuleEngine so CSV and Lemonsoft offers resolve discounts the same way.
 """
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from decimal import Decimal
 
 from src.erp.base.pricing_service import PricingService
 from src.domain.offer import Offer, OfferLine
 from src.pricing.net_price import OfferPricing, LineItemPricing
+from src.pricing.rule_engine import PricingRuleEngine, PricingSnapshot
 from src.product_matching.matcher_class import ProductMatch
 from src.utils.logger import get_logger
 
 
+CSV_VAT_RATE = 24.0
+
+
 class CSVPricingAdapter(PricingService):
     """CSV implementation of the PricingService interface."""
 
     def __init__(self):
         """Initialize the CSV pricing adapter."""
         self.logger = get_logger(__name__)
+        self.rule_engine = PricingRuleEngine()
+        # CSV mode has no pricelists: only frame-level (manual) rules can fire
+        self.snapshot = PricingSnapshot(sql_available=False)
         self.logger.info("CSV Pricing Adapter initialized - using simple demo pricing")
 
     @property
@@ -30,39 +38,16 @@ class CSVPricingAdapter(PricingService):
     async def calculate_offer_pricing(self, offer: Offer, discount_percent: float = 0.0) -> OfferPricing:
         """Calculate pricing for an offer."""
         try:
-            line_items = []
-            subtotal = Decimal('0')
-
-            for line in offer.lines:
-                # Simple pricing: use unit price from product
-                unit_price = Decimal(str(line.unit_price))
-                list_price = unit_price  # Same as unit price in demo
-                quantity = Decimal(str(line.quantity))
-                line_discount = Decimal(str(line.discount_percent)) / 100
-
-                # Calculate line total
-                line_subtotal = unit_price * quantity
-                line_discount_amount = line_subtotal * line_discount
-                line_net_price = unit_price * (1 - line_discount)
-                line_total = line_subtotal - line_discount_amount
-                line_vat = line_total * Decimal('0.24')
-
-                line_pricing = LineItemPricing(
-                    product_code=line.product_code,
-                    product_name=line.product_name,
-                    quantity=float(quantity),
-                    unit_price=float(unit_price),
-                    list_price=float(list_price),
-                    discount_percent=float(line_discount * 100),
-                    discount_amount=float(line_discount_amount),
-                    net_price=float(line_net_price),
-                    line_total=float(line_total),
-                    vat_rate=24.0,
-                    vat_amount=float(line_vat),
-                )
-
-                line_items.append(line_pricing)
-                subtotal += line_total
+            line_items, subtotal = self._price_lines([
+                {
+                    'product_code': line.product_code,
+                    'product_name': line.product_name,
+                    'quantity': line.quantity,
+                    'list_price': line.unit_price,
+                    'manual_discount_percent': line.discount_percent,
+                }
+                for line in offer.lines
+            ])
 
             # Apply offer-level discount if any
             offer_discount_decimal = Decimal(str(discount_percent)) / 100
@@ -108,42 +93,19 @@ class CSVPricingAdapter(PricingService):
     ) -> OfferPricing:
         """Calculate complete pricing for an offer."""
         try:
-            line_items = []
-            subtotal = Decimal('0')
-
+            lines = []
             for match in matched_products:
-                # Get unit price from the matched product
-                unit_price = Decimal(str(match.unit_price)) if match.unit_price else Decimal('0')
-                list_price = unit_price
-                quantity = Decimal(str(match.quantity))
-
-                # Simple discount logic
-                discount_percent = await self.get_customer_discount(customer_id, match.product_code)
-                line_discount = Decimal(str(discount_percent)) / 100
-
-                # Calculate line total
-                line_subtotal = unit_price * quantity
-                line_discount_amount = line_subtotal * line_discount
-                line_net_price = unit_price * (1 - line_discount)
-                line_total = line_subtotal - line_discount_amount
-                line_vat = line_total * Decimal('0.24')
-
-                line_pricing = LineItemPricing(
-                    product_code=match.product_code,
-                    product_name=match.product_name or "",
-                    quantity=float(quantity),
-                    unit_price=float(unit_price),
-                    list_price=float(list_price),
-                    discount_percent=discount_percent,
-                    discount_amount=float(line_discount_amount),
-                    net_price=float(line_net_price),
-                    line_total=float(line_total),
-                    vat_rate=24.0,
-                    vat_amount=float(line_vat),
-                )
-
-                line_items.append(line_pricing)
-                subtotal += line_total
+                unit_price = getattr(match, 'unit_price', None) or getattr(match, 'price', None) or 0.0
+                quantity = getattr(match, 'quantity', None) or getattr(match, 'quantity_requested', 0.0)
+                lines.append({
+                    'product_code': match.product_code,
+                    'product_name': match.product_name or "",
+                    'quantity': quantity,
+                    'list_price': unit_price,
+                    'manual_discount_percent': await self.get_customer_discount(customer_id, match.product_code),
+                })
+
+            line_items, subtotal = self._price_lines(lines)
 
             # Calculate VAT
             vat_amount = subtotal * Decimal('0.24')
@@ -173,6 +135,46 @@ class CSVPricingAdapter(PricingService):
                 currency='EUR',
             )
 
+    def _price_lines(self, lines: List[Dict[str, Any]]) -> tuple:
+        """
+        Price offer lines in one rule-engine pass.
+
+        Args:
+            lines: Dicts with product_code, product_name, quantity, list_price
+                and manual_discount_percent
+
+        Returns:
+            (line_items, subtotal) where subtotal is a Decimal
+        """
+        if not lines:
+            return [], Decimal('0')
+
+        frame = self.rule_engine.build_frame(lines)
+        frame['vat_rate'] = CSV_VAT_RATE
+        priced = self.rule_engine.evaluate(frame, self.snapshot)
+
+        line_items = []
+        subtotal = Decimal('0')
+        for line, row in zip(lines, priced.itertuples(index=False)):
+            line_subtotal = row.list_price * row.quantity
+            line_items.append(LineItemPricing(
+                product_code=line['product_code'],
+                product_name=line.get('product_name') or "",
+                quantity=float(row.quantity),
+                unit_price=float(row.list_price),
+                list_price=float(row.list_price),
+                discount_percent=float(row.discount_percent),
+                discount_amount=float(line_subtotal - row.line_total),
+                net_price=float(row.discounted_price),
+                line_total=float(row.line_total),
+                vat_rate=CSV_VAT_RATE,
+                vat_amount=float(row.vat_amount),
+                applied_rules=[row.applied_rule] if row.discount_type == 'manual' else [],
+            ))
+            subtotal += Decimal(str(row.line_total))
+
+        return line_items, subtotal
+
     async def calculate_line_pricing(
         self,
         customer_id: str,
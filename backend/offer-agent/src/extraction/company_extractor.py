@@ -4,13 +4,13 @@ Company Information Extractor
 Extracts company name, delivery contact, and customer reference from emails using AI.
 This module is completely ERP-independent - it only handles text extraction.
 """
-import time
 import json
 from typing import Dict, Any, Optional
 from datetime import datetime
 from google import genai
 from google.genai import types
 import os
+from src.llm.gateway import get_llm_gateway
 from src.utils.logger import get_logger
 from dotenv import load_dotenv
 
@@ -179,21 +179,18 @@ RESPONSE FORMAT (JSON only):
 
 Only return JSON, no other text."""
 
-            # Use retry wrapper for LLM request
-            def make_request():
-                import google.genai as genai
-                model = genai.Client(api_key=os.getenv('GEMINI_API_KEY'))
-                response = model.models.generate_content(
-                    model='gemini-2.5-flash',
-                    contents=prompt,
-                    config=types.GenerateContentConfig(
-                        temperature=0.1,
-                        max_output_tokens=500,
-                    )
-                )
-                return response.text
-
-            response = self._retry_llm_request(make_request)
+            response = await get_llm_gateway().generate_content(
+                model='gemini-2.5-flash',
+                contents=prompt,
+                config=types.GenerateContentConfig(
+                    temperature=0.1,
+                    max_output_tokens=500,
+                ),
+                client=self.gemini_client,
+                label="company_extractor",
+                cache=True,
+                hedge=True,
+            )
 
             if response and response.text:
                 retry_info = json.loads(response.text)
@@ -323,11 +320,14 @@ If no clear customer number found, use "null"."""
                 temperature=0.1,
                 candidate_count=1,
             )
-            response = self._retry_llm_request(
-                self.gemini_client.models.generate_content,
+            response = await get_llm_gateway().generate_content(
                 model=gemini_model,
                 contents=prompt,
                 config=config,
+                client=self.gemini_client,
+                label="company_extractor",
+                cache=True,
+                hedge=True,
             )
 
             # Extract response text using the same method as AIAnalyzer
@@ -478,57 +478,3 @@ If no clear customer number found, use "null"."""
             'email_domain': sender_email.split('@')[1] if '@' in sender_email else '',
             'source': 'fallback_extraction'
         }
-
-    def _retry_llm_request(self, request_func, *args, **kwargs):
-        """
-        Wrapper to retry LLM requests with appropriate wait times based on error type.
-
-        - 503 errors: immediate retry (up to 3 times)
-        - Rate limit errors (429): wait 10 seconds before retry
-        - Other errors: exponential backoff
-        """
-        max_retries = 5
-        base_wait = 1  # Base wait time in seconds
-
-        for attempt in range(max_retries):
-            try:
-                # Call the wrapped function
-                return request_func(*args, **kwargs)
-
-            except Exception as e:
-                error_str = str(e).lower()
-                self.logger.warning(f"LLM request failed (attempt {attempt + 1}/{max_retries}): {e}")
-
-                # Check if it's the last attempt
-                if attempt == max_retries - 1:
-                    self.logger.error(f"LLM request failed after {max_retries} attempts")
-                    raise
-
-                # Determine wait time based on error type
-                wait_time = base_wait
-
-                if "503" in error_str or "service unavailable" in error_str:
-                    # 503 errors: immediate retry (very short wait)
-                    wait_time = 1
-                    self.logger.info(f"503 error detected, retrying immediately (wait {wait_time}s)")
-
-                elif "429" in error_str or "rate limit" in error_str or "quota" in error_str:
-                    # Rate limit errors: wait 10 seconds
-                    wait_time = 10
-                    self.logger.info(f"Rate limit error detected, waiting {wait_time} seconds before retry")
-
-                elif "500" in error_str or "internal" in error_str:
-                    # Internal server errors: exponential backoff
-                    wait_time = base_wait * (2 ** attempt)
-                    self.logger.info(f"Server error detected, waiting {wait_time} seconds (exponential backoff)")
-
-                else:
-                    # Other errors: exponential backoff
-                    wait_time = base_wait * (2 ** attempt)
-                    self.logger.info(f"Unknown error, waiting {wait_time} seconds (exponential backoff)")
-
-                # Wait before retrying
-                time.sleep(wait_time)
-
-        # This should never be reached due to the raise in the last attempt
-        raise Exception(f"Failed to complete LLM request after {max_retries} attempts")
@@ -0,0 +1,44 @@
+"""
+Health Module
+
+Background probes of external dependencies (Lemonsoft, database, S3, LLM
+providers) with cached results for health endpoints and load shedding.
+"""
+
+from src.health.monitor import (
+    STATE_DEGRADED,
+    STATE_HEALTHY,
+    STATE_UNHEALTHY,
+    STATE_UNKNOWN,
+    DependencyProbe,
+    HealthMonitor,
+    ProbeStatus,
+    get_health_monitor,
+)
+from src.health.probes import (
+    PROBE_DATABASE,
+    PROBE_GEMINI,
+    PROBE_LEMONSOFT,
+    PROBE_OPENAI,
+    PROBE_S3,
+    default_probes,
+    intake_dependencies,
+)
+
+__all__ = [
+    "DependencyProbe",
+    "HealthMonitor",
+    "ProbeStatus",
+    "get_health_monitor",
+    "default_probes",
+    "intake_dependencies",
+    "STATE_HEALTHY",
+    "STATE_DEGRADED",
+    "STATE_UNHEALTHY",
+    "STATE_UNKNOWN",
+    "PROBE_LEMONSOFT",
+    "PROBE_DATABASE",
+    "PROBE_S3",
+    "PROBE_GEMINI",
+    "PROBE_OPENAI",
+]
@@ -0,0 +1,253 @@
+"""
+Background dependency health monitor.
+
+Health endpoints used to be either shallow or to open fresh connections to
+the ERP on every poll, and orchestrators poll every few seconds. Instead,
+HealthMonitor runs one probe task per dependency (Lemonsoft API, SQL
+database, S3, LLM providers), each on its own interval and with its own
+timeout, and keeps the latest result with its timestamp and latency.
+/health serves snapshot() from memory; nothing is probed per request.
+
+Each dependency is in one of these states:
+
+- unknown: not probed yet, or the last result is stale
+- healthy: last probe succeeded within the latency budget
+- degraded: last probe was slow, or failed fewer than failure_threshold times in a row
+- unhealthy: failure_threshold consecutive failures
+
+The email poller asks should_pause() before fetching new work, so intake
+pauses while the ERP is slow or down instead of queueing requests that
+would time out against it.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional
+
+from src.utils.logger import get_logger
+
+
+STATE_UNKNOWN = "unknown"
+STATE_HEALTHY = "healthy"
+STATE_DEGRADED = "degraded"
+STATE_UNHEALTHY = "unhealthy"
+
+# Worst first; the overall state is the worst state of the critical dependencies
+_SEVERITY = {STATE_HEALTHY: 0, STATE_UNKNOWN: 1, STATE_DEGRADED: 2, STATE_UNHEALTHY: 3}
+
+
+@dataclass
+class DependencyProbe:
+    """How and how often to check one dependency."""
+    name: str
+    check: Callable[[], Awaitable[Optional[Dict[str, Any]]]]
+    interval: float = 30.0
+    timeout: float = 10.0
+    degraded_latency: float = 2.0
+    failure_threshold: int = 2
+    critical: bool = True
+
+
+@dataclass
+class ProbeStatus:
+    """Cached outcome of a dependency's probes."""
+    state: str = STATE_UNKNOWN
+    checked_at: Optional[float] = None
+    latency_ms: Optional[float] = None
+    consecutive_failures: int = 0
+    last_success_at: Optional[float] = None
+    last_error: Optional[str] = None
+    detail: Dict[str, Any] = field(default_factory=dict)
+    probes: int = 0
+    failures: int = 0
+    recent_ms: Deque[float] = field(default_factory=lambda: deque(maxlen=20))
+
+
+class HealthMonitor:
+    """Probes registered dependencies in the background and caches their state."""
+
+    def __init__(self, stale_after_intervals: float = 3.0):
+        """
+        Args:
+            stale_after_intervals: A result older than this many probe intervals counts as unknown
+        """
+        self.logger = get_logger(__name__)
+        self.stale_after_intervals = stale_after_intervals
+        self._probes: Dict[str, DependencyProbe] = {}
+        self._status: Dict[str, ProbeStatus] = {}
+        self._lock = Lock()
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def register(self, probe: DependencyProbe) -> None:
+        """Add (or replace) a dependency probe; takes effect on the next start()."""
+        with self._lock:
+            self._probes[probe.name] = probe
+            self._status.setdefault(probe.name, ProbeStatus())
+
+    @property
+    def dependencies(self) -> List[str]:
+        return list(self._probes)
+
+    # Probing
+
+    async def probe(self, name: str) -> ProbeStatus:
+        """Run one probe now and record its result."""
+        probe = self._probes[name]
+        started = time.perf_counter()
+        error: Optional[str] = None
+        detail: Dict[str, Any] = {}
+        try:
+            detail = await asyncio.wait_for(probe.check(), probe.timeout) or {}
+        except asyncio.TimeoutError:
+            error = f"timed out after {probe.timeout:.0f}s"
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        latency_ms = (time.perf_counter() - started) * 1000
+        return self._record(probe, latency_ms, error, detail)
+
+    async def probe_all(self, names: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """Probe dependencies concurrently now; returns the new snapshot."""
+        names = list(names) if names is not None else self.dependencies
+        await asyncio.gather(*(self.probe(name) for name in names))
+        return self.snapshot()
+
+    def _record(self, probe: DependencyProbe, latency_ms: float, error: Optional[str], detail: Dict[str, Any]) -> ProbeStatus:
+        with self._lock:
+            status = self._status.setdefault(probe.name, ProbeStatus())
+            previous = status.state
+            status.checked_at = time.time()
+            status.latency_ms = round(latency_ms, 1)
+            status.probes += 1
+            status.detail = detail
+            if error is None:
+                status.consecutive_failures = 0
+                status.last_success_at = status.checked_at
+                status.last_error = None
+                status.recent_ms.append(latency_ms)
+                slow = latency_ms > probe.degraded_latency * 1000
+                status.state = STATE_DEGRADED if slow else STATE_HEALTHY
+            else:
+                status.failures += 1
+                status.consecutive_failures += 1
+                status.last_error = error
+                status.state = (
+                    STATE_UNHEALTHY if status.consecutive_failures >= probe.failure_threshold else STATE_DEGRADED
+                )
+
+        if status.state != previous:
+            log = self.logger.info if status.state == STATE_HEALTHY else self.logger.warning
+            reason = f": {error}" if error else f" ({latency_ms:.0f} ms)"
+            log(f"Dependency {probe.name} is {status.state} (was {previous}){reason}")
+        return status
+
+    async def _loop(self, probe: DependencyProbe) -> None:
+        # Spread the first probes so dependencies are not all hit at the same instant
+        await asyncio.sleep((hash(probe.name) % 1000) / 1000 * min(probe.interval, 5.0))
+        while True:
+            try:
+                await self.probe(probe.name)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Health probe {probe.name} crashed: {e}")
+            await asyncio.sleep(probe.interval)
+
+    def start(self) -> None:
+        """Start one background probe task per dependency (idempotent)."""
+        for name, probe in self._probes.items():
+            task = self._tasks.get(name)
+            if task is None or task.done():
+                self._tasks[name] = asyncio.create_task(self._loop(probe))
+        if self._tasks:
+            self.logger.info(
+                "Health monitor probing " + ", ".join(
+                    f"{name} every {probe.interval:.0f}s" for name, probe in self._probes.items()
+                )
+            )
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # Cached state
+
+    def state(self, name: str) -> str:
+        """Current state of a dependency (unknown when never probed or stale)."""
+        with self._lock:
+            probe = self._probes.get(name)
+            status = self._status.get(name)
+            if probe is None or status is None or status.checked_at is None:
+                return STATE_UNKNOWN
+            if time.time() - status.checked_at > probe.interval * self.stale_after_intervals + probe.timeout:
+                return STATE_UNKNOWN
+            return status.state
+
+    def overall(self) -> str:
+        """Worst state among the critical dependencies (healthy when none are registered)."""
+        states = [self.state(name) for name, probe in self._probes.items() if probe.critical]
+        return max(states, key=_SEVERITY.__getitem__, default=STATE_HEALTHY)
+
+    def should_pause(self, dependencies: Iterable[str], states: Iterable[str] = (STATE_DEGRADED, STATE_UNHEALTHY)) -> List[str]:
+        """
+        Dependencies (of those given) whose state means new work should wait.
+
+        Unregistered dependencies are ignored, so callers can name everything
+        they touch and only monitored ones count.
+        """
+        states = set(states)
+        return [name for name in dependencies if name in self._probes and self.state(name) in states]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Cached state of every dependency; does no I/O."""
+        now = time.time()
+        dependencies: Dict[str, Any] = {}
+        for name, probe in self._probes.items():
+            state = self.state(name)
+            with self._lock:
+                status = self._status.get(name) or ProbeStatus()
+                recent = sorted(status.recent_ms)
+                dependencies[name] = {
+                    'state': state,
+                    'critical': probe.critical,
+                    'checked_at': status.checked_at,
+                    'age_seconds': round(now - status.checked_at, 1) if status.checked_at else None,
+                    'latency_ms': status.latency_ms,
+                    'p50_ms': round(recent[len(recent) // 2], 1) if recent else None,
+                    'consecutive_failures': status.consecutive_failures,
+                    'last_success_at': status.last_success_at,
+                    'last_error': status.last_error,
+                    'probes': status.probes,
+                    'failures': status.failures,
+                    'interval_seconds': probe.interval,
+                    'detail': status.detail,
+                }
+        return {'status': self.overall(), 'dependencies': dependencies}
+
+
+_monitor: Optional[HealthMonitor] = None
+_monitor_lock = Lock()
+
+
+def get_health_monitor() -> HealthMonitor:
+    """
+    Get the process-wide health monitor, with the default dependency probes
+    registered (see src.health.probes; HEALTH_PROBES selects them).
+    """
+    global _monitor
+    with _monitor_lock:
+        if _monitor is None:
+            from src.health.probes import default_probes
+
+            monitor = HealthMonitor(
+                stale_after_intervals=float(os.getenv("HEALTH_STALE_AFTER_INTERVALS", "3"))
+            )
+            for probe in default_probes():
+                monitor.register(probe)
+            _monitor = monitor
+        return _monitor
@@ -0,0 +1,201 @@
+"""
+Dependency probes for the health monitor.
+
+Every probe keeps one long-lived client and reuses it, so a probe costs one
+lightweight request on an existing connection: the Lemonsoft /api/health
+endpoint, SELECT 1 against the database (directly or through the SQL
+proxy), a HEAD on the learning bucket, and model metadata lookups for the
+LLM providers (no tokens are spent).
+
+Configuration (NAME is LEMONSOFT, DATABASE, S3, GEMINI or OPENAI):
+
+    HEALTH_PROBES                   comma-separated probes to run (default: by ERP type and API keys)
+    HEALTH_<NAME>_INTERVAL          seconds between probes
+    HEALTH_<NAME>_TIMEOUT           seconds before a probe counts as failed
+    HEALTH_<NAME>_DEGRADED_SECONDS  latency above which the dependency is degraded
+    INTAKE_PAUSE_DEPENDENCIES       dependencies offer intake waits for (default: those of the ERP adapter)
+
+The ERP type is read from ERP_TYPE with the same default as src.main (csv).
+Only the ERP adapter's own dependencies are probed and pause intake; the
+CSV adapter has none.
+"""
+import asyncio
+import os
+from typing import Any, Dict, List, Optional
+
+from src.health.monitor import DependencyProbe
+
+
+PROBE_LEMONSOFT = "lemonsoft"
+PROBE_DATABASE = "database"
+PROBE_S3 = "s3"
+PROBE_GEMINI = "gemini"
+PROBE_OPENAI = "openai"
+
+# Dependencies of each ERP adapter; ERP types not listed use none
+ERP_DEPENDENCIES = {
+    'lemonsoft': [PROBE_LEMONSOFT, PROBE_DATABASE],
+}
+
+# interval, timeout, degraded latency (seconds), critical
+_DEFAULTS = {
+    PROBE_LEMONSOFT: (30.0, 10.0, 2.0, True),
+    PROBE_DATABASE: (60.0, 15.0, 3.0, True),
+    PROBE_S3: (300.0, 10.0, 3.0, False),
+    PROBE_GEMINI: (120.0, 10.0, 3.0, True),
+    PROBE_OPENAI: (300.0, 10.0, 3.0, False),
+}
+
+
+class LemonsoftProbe:
+    """Lemonsoft REST API health endpoint, over one authenticated client."""
+
+    def __init__(self):
+        self._client = None
+
+    async def __call__(self) -> Dict[str, Any]:
+        if self._client is None:
+            from src.lemonsoft.api_client import LemonsoftAPIClient
+            self._client = LemonsoftAPIClient()
+        result = await self._client.health_check()
+        if result.get('status') != 'healthy':
+            raise RuntimeError(result.get('error') or "Lemonsoft API unhealthy")
+        return {'api_version': result.get('api_version')}
+
+
+class DatabaseProbe:
+    """SELECT 1 against the Lemonsoft database, via the SQL proxy in docker mode."""
+
+    def __init__(self):
+        self.deployment_mode = os.getenv('DEPLOYMENT_MODE', 'direct').lower()
+        self._http_client = None
+        self._database_client = None
+
+    async def __call__(self) -> Dict[str, Any]:
+        if self.deployment_mode == 'docker':
+            return await self._via_proxy()
+        if self._database_client is None:
+            from src.lemonsoft.database_connection import create_database_client
+            self._database_client = create_database_client()
+        rows = await self._database_client.execute_query_async("SELECT 1 AS ok")
+        if not rows:
+            raise RuntimeError("Database returned no rows")
+        return {'mode': 'direct'}
+
+    async def _via_proxy(self) -> Dict[str, Any]:
+        if self._http_client is None:
+            import httpx
+            self._http_client = httpx.AsyncClient(timeout=_DEFAULTS[PROBE_DATABASE][1])
+        response = await self._http_client.post(
+            f"{os.getenv('SQL_PROXY_URL', 'https://xxxxx.azurewebsites.net')}/api/query",
+            headers={
+                'x-functions-key': os.getenv('AZURE_FUNCTION_KEY', ''),
+                'X-API-Key': os.getenv('SQL_PROXY_API_KEY', ''),
+                'Content-Type': 'application/json',
+            },
+            json={'query': "SELECT 1 AS ok", 'params': [], 'database': os.getenv('DATABASE_NAME', 'LemonDB1')},
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"SQL proxy returned HTTP {response.status_code}")
+        result = response.json()
+        if not result.get('success'):
+            raise RuntimeError(f"SQL proxy query failed: {result.get('error')}")
+        return {'mode': 'proxy'}
+
+
+class S3Probe:
+    """HEAD on the learning data bucket."""
+
+    def __init__(self):
+        self.bucket = os.getenv('AWS_S3_BUCKET_LEARNING', 'offer-learning-data')
+        self._client = None
+
+    async def __call__(self) -> Dict[str, Any]:
+        if self._client is None:
+            import boto3
+            self._client = boto3.client('s3', region_name=os.getenv('AWS_REGION', 'eu-north-1'))
+        await asyncio.to_thread(self._client.head_bucket, Bucket=self.bucket)
+        return {'bucket': self.bucket}
+
+
+class GeminiProbe:
+    """Model metadata lookup with the LLM gateway's Gemini client."""
+
+    def __init__(self):
+        self.model = os.getenv('GEMINI_MODEL', 'gemini-2.5-flash')
+
+    async def __call__(self) -> Dict[str, Any]:
+        from src.llm.gateway import get_llm_gateway
+
+        gateway = get_llm_gateway()
+        model = await gateway.client.aio.models.get(model=self.model)
+        return {'model': getattr(model, 'name', self.model), 'in_flight': gateway.stats().get('in_flight', 0)}
+
+
+class OpenAIProbe:
+    """Embedding model lookup with the shared OpenAI client."""
+
+    def __init__(self):
+        self.model = os.getenv('OPENAI_EMBEDDING_MODEL', 'text-embedding-3-large')
+
+    async def __call__(self) -> Dict[str, Any]:
+        from src.product_matching.shared_resources import get_openai_client
+
+        client = get_openai_client(os.getenv('OPENAI_API_KEY'))
+        model = await asyncio.to_thread(client.models.retrieve, self.model)
+        return {'model': getattr(model, 'id', self.model)}
+
+
+_CHECKS = {
+    PROBE_LEMONSOFT: LemonsoftProbe,
+    PROBE_DATABASE: DatabaseProbe,
+    PROBE_S3: S3Probe,
+    PROBE_GEMINI: GeminiProbe,
+    PROBE_OPENAI: OpenAIProbe,
+}
+
+
+def _erp_dependencies() -> List[str]:
+    return list(ERP_DEPENDENCIES.get(os.getenv('ERP_TYPE', 'csv').lower(), []))
+
+
+def _enabled_probes() -> List[str]:
+    configured = os.getenv('HEALTH_PROBES')
+    if configured is not None:
+        return [name.strip().lower() for name in configured.split(',') if name.strip().lower() in _CHECKS]
+    names = _erp_dependencies()
+    names.append(PROBE_S3)
+    if os.getenv('GEMINI_API_KEY'):
+        names.append(PROBE_GEMINI)
+    if os.getenv('OPENAI_API_KEY'):
+        names.append(PROBE_OPENAI)
+    return names
+
+
+def _setting(name: str, key: str, default: float) -> float:
+    value: Optional[str] = os.getenv(f"HEALTH_{name.upper()}_{key}")
+    return float(value) if value else default
+
+
+def intake_dependencies() -> List[str]:
+    """Dependencies whose outage pauses email polling and offer workers."""
+    configured = os.getenv('INTAKE_PAUSE_DEPENDENCIES')
+    if configured is None:
+        return _erp_dependencies()
+    return [name.strip().lower() for name in configured.split(',') if name.strip()]
+
+
+def default_probes() -> List[DependencyProbe]:
+    """Probes for the dependencies this deployment uses."""
+    probes = []
+    for name in _enabled_probes():
+        interval, timeout, degraded, critical = _DEFAULTS[name]
+        probes.append(DependencyProbe(
+            name=name,
+            check=_CHECKS[name](),
+            interval=_setting(name, 'INTERVAL', interval),
+            timeout=_setting(name, 'TIMEOUT', timeout),
+            degraded_latency=_setting(name, 'DEGRADED_SECONDS', degraded),
+            critical=critical,
+        ))
+    return probes
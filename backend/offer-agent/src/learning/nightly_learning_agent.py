@@ -27,6 +27,9 @@ import httpx
 from google import genai
 from google.genai import types
 
+from src.llm.gateway import get_llm_gateway
+from src.llm.rate_limiter import PRIORITY_BATCH, use_llm_priority
+
 
 # Configure logging for Lambda
 logger = logging.getLogger()
@@ -379,7 +382,7 @@ class LearningAgent:
         # Fallback to product name
         return product.get('product_name', 'Unknown')
     
-    def analyze_changes_with_gemini(
+    async def analyze_changes_with_gemini(
         self,
         comparison: OfferComparisonResult,
         original_context: Dict
@@ -403,7 +406,7 @@ class LearningAgent:
         # Analyze product swaps (modified rows)
         for change in comparison.modified_rows:
             try:
-                learning = self._analyze_product_swap(change, original_context)
+                learning = await self._analyze_product_swap(change, original_context)
                 if learning:
                     learnings.append(learning)
             except Exception as e:
@@ -412,7 +415,7 @@ class LearningAgent:
         # Analyze deleted/added pairs (might indicate replacements)
         if comparison.deleted_rows and comparison.added_rows:
             try:
-                learning = self._analyze_product_replacement(
+                learning = await self._analyze_product_replacement(
                     comparison.deleted_rows,
                     comparison.added_rows,
                     original_context
@@ -424,7 +427,7 @@ class LearningAgent:
         
         return learnings
     
-    def _analyze_product_swap(
+    async def _analyze_product_swap(
         self,
         change: Dict,
         original_context: Dict
@@ -479,10 +482,13 @@ Only return JSON, no other text."""
                 response_mime_type="application/json"
             )
             
-            response = self.gemini_client.models.generate_content(
+            # Through the gateway: shared RPM/TPM limits, and no blocking of the event loop
+            response = await get_llm_gateway().generate_content(
                 model=self.gemini_model,
                 contents=prompt,
-                config=config
+                config=config,
+                client=self.gemini_client,
+                label="nightly_learning",
             )
             
             # Extract response text
@@ -524,7 +530,7 @@ Only return JSON, no other text."""
             logger.error(f"Gemini analysis failed for product swap: {e}")
             return None
     
-    def _analyze_product_replacement(
+    async def _analyze_product_replacement(
         self,
         deleted_rows: List[Dict],
         added_rows: List[Dict],
@@ -568,10 +574,12 @@ RESPONSE FORMAT (JSON):
                     response_mime_type="application/json"
                 )
                 
-                response = self.gemini_client.models.generate_content(
+                response = await get_llm_gateway().generate_content(
                     model=self.gemini_model,
                     contents=summary_prompt,
-                    config=config
+                    config=config,
+                    client=self.gemini_client,
+                    label="nightly_learning",
                 )
                 
                 response_text = response.text if hasattr(response, 'text') else None
@@ -748,7 +756,7 @@ RESPONSE FORMAT (JSON):
         )
         
         # Analyze changes with Gemini
-        learnings = self.analyze_changes_with_gemini(comparison, original_context)
+        learnings = await self.analyze_changes_with_gemini(comparison, original_context)
         
         # Save learnings
         if learnings:
@@ -810,19 +818,20 @@ RESPONSE FORMAT (JSON):
             offer_list = sorted(list(offer_numbers))
             logger.info(f"Found {len(offer_list)} offers to process from past 3 days")
             
-            # Process each offer
+            # Process each offer; its LLM calls yield to interactive and email offers
             results = []
-            for offer_number in offer_list:
-                try:
-                    result = await self.process_offer(offer_number)
-                    results.append(result)
-                except Exception as e:
-                    logger.error(f"Error processing offer {offer_number}: {e}")
-                    results.append({
-                        'success': False,
-                        'error': str(e),
-                        'offer_number': offer_number
-                    })
+            with use_llm_priority(PRIORITY_BATCH):
+                for offer_number in offer_list:
+                    try:
+                        result = await self.process_offer(offer_number)
+                        results.append(result)
+                    except Exception as e:
+                        logger.error(f"Error processing offer {offer_number}: {e}")
+                        results.append({
+                            'success': False,
+                            'error': str(e),
+                            'offer_number': offer_number
+                        })
             
             # Summarize results
             successful = sum(1 for r in results if r.get('success'))
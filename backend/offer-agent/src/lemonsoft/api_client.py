@@ -15,6 +15,14 @@ import hashlib
 import httpx
 from httpx import AsyncClient, HTTPStatusError, RequestError
 
+from src.benchmark.recorder import (
+    KIND_ERP_API,
+    KIND_ERP_HTTP,
+    KIND_ERP_SOAP,
+    decode_http_response,
+    encode_http_response,
+    get_interaction_recorder,
+)
 from src.config.settings import get_settings
 from src.config.constants import BusinessConstants, TechnicalConstants, LemonsoftConstants
 from src.utils.logger import get_logger, get_audit_logger
@@ -267,6 +275,13 @@ class LemonsoftAPIClient:
             if self.client is None:
                 raise Exception("AsyncClient creation returned None")
             
+            # Replayed sessions never reach Lemonsoft, so there is nothing to log in to
+            if get_interaction_recorder().replaying:
+                self.session_token = "replay"
+                self.session_expires_at = datetime.utcnow() + timedelta(hours=TechnicalConstants.SESSION_VALIDITY_HOURS)
+                self.logger.info("Lemonsoft API client initialized in replay mode")
+                return
+
             # Authenticate and get session token
             try:
                 await self._authenticate()
@@ -404,7 +419,6 @@ class LemonsoftAPIClient:
         
         self.request_count += 1
     
-    @retry_on_exception(config=EXTERNAL_API_RETRY_CONFIG)
     async def _make_request(
         self, 
         method: str, 
@@ -412,7 +426,23 @@ class LemonsoftAPIClient:
         data: Dict = None,
         params: Dict = None
     ) -> Dict:
-        """Make authenticated API request with error handling."""
+        """Make authenticated API request with error handling (recorded/replayed when enabled)."""
+        return await get_interaction_recorder().call(
+            KIND_ERP_API,
+            (method, endpoint, data, params),
+            lambda: self._send_request(method, endpoint, data, params),
+            label=f"{method} {endpoint.split('?')[0]}",
+        )
+
+    @retry_on_exception(config=EXTERNAL_API_RETRY_CONFIG)
+    async def _send_request(
+        self, 
+        method: str, 
+        endpoint: str, 
+        data: Dict = None,
+        params: Dict = None
+    ) -> Dict:
+        """Send an authenticated API request and parse the JSON result."""
         await self._ensure_authenticated()
         await self._rate_limit_check()
         
@@ -483,42 +513,37 @@ class LemonsoftAPIClient:
     # HTTP method shortcuts for convenience
     async def get(self, endpoint: str, params: Dict = None) -> 'httpx.Response':
         """Make GET request and return httpx Response object."""
-        await self._ensure_authenticated()
-        await self._rate_limit_check()
-        
-        try:
-            self.logger.debug(f"Making GET request to {endpoint}")
-            response = await self.client.get(endpoint, params=params)
-            return response
-        except Exception as e:
-            self.logger.error(f"GET request failed for {endpoint}: {e}")
-            raise
+        return await self._send_http('GET', endpoint, params=params)
     
     async def post(self, endpoint: str, json: Dict = None, data: Dict = None) -> 'httpx.Response':
         """Make POST request and return httpx Response object."""
-        await self._ensure_authenticated()
-        await self._rate_limit_check()
-        
-        try:
-            self.logger.debug(f"Making POST request to {endpoint}")
-            response = await self.client.post(endpoint, json=json, data=data)
-            return response
-        except Exception as e:
-            self.logger.error(f"POST request failed for {endpoint}: {e}")
-            raise
+        return await self._send_http('POST', endpoint, json=json, data=data)
     
     async def put(self, endpoint: str, json: Dict = None, data: Dict = None) -> 'httpx.Response':
         """Make PUT request and return httpx Response object."""
-        await self._ensure_authenticated()
-        await self._rate_limit_check()
+        return await self._send_http('PUT', endpoint, json=json, data=data)
+    
+    async def _send_http(self, method: str, endpoint: str, **kwargs) -> 'httpx.Response':
+        """Authenticated raw request behind get/post/put (recorded/replayed when enabled)."""
+        async def send() -> 'httpx.Response':
+            await self._ensure_authenticated()
+            await self._rate_limit_check()
+            
+            try:
+                self.logger.debug(f"Making {method} request to {endpoint}")
+                return await self.client.request(method, endpoint, **kwargs)
+            except Exception as e:
+                self.logger.error(f"{method} request failed for {endpoint}: {e}")
+                raise
         
-        try:
-            self.logger.debug(f"Making PUT request to {endpoint}")
-            response = await self.client.put(endpoint, json=json, data=data)
-            return response
-        except Exception as e:
-            self.logger.error(f"PUT request failed for {endpoint}: {e}")
-            raise
+        return await get_interaction_recorder().call(
+            KIND_ERP_HTTP,
+            (method, endpoint, kwargs),
+            send,
+            label=f"{method} {endpoint.split('?')[0]}",
+            encode=encode_http_response,
+            decode=decode_http_response,
+        )
     
     # Customer Management Methods
     
@@ -1083,12 +1108,16 @@ class LemonsoftAPIClient:
         # Direct DB failed – fallback to SOAP ExecuteSQL
         try:
             self.logger.info("Using SOAP ExecuteSQL for query execution")
-            # Ensure SOAP client is initialized before running in executor
-            await self._ensure_soap_authenticated()
             
-            loop = asyncio.get_event_loop()
-            rows = await loop.run_in_executor(None, self._soap_execute_sql, query, params)
-            return rows
+            async def run_soap_query() -> List[Dict]:
+                # Ensure SOAP client is initialized before running in executor
+                await self._ensure_soap_authenticated()
+                loop = asyncio.get_event_loop()
+                return await loop.run_in_executor(None, self._soap_execute_sql, query, params)
+            
+            return await get_interaction_recorder().call(
+                KIND_ERP_SOAP, (query, params), run_soap_query, label="lemonsoft_soap_sql"
+            )
         except Exception as soap_err:
             self.logger.error(f"SOAP ExecuteSQL failed: {soap_err}")
             return []
\ No newline at end of file
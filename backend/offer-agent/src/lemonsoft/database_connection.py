@@ -10,6 +10,7 @@ from dataclasses import dataclass
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 
+from src.benchmark.recorder import KIND_ERP_SQL, decode_tuple_rows, encode_tuple_rows, get_interaction_recorder
 from src.config.settings import get_settings
 from src.utils.logger import get_logger
 from src.utils.exceptions import BaseOfferAutomationError
@@ -303,6 +304,15 @@ class LemonsoftDatabaseClient:
         Returns:
             List of dictionaries representing query results
         """
+        return get_interaction_recorder().call_sync(
+            KIND_ERP_SQL,
+            (query, params, 'dicts'),
+            lambda: self._fetch_dicts(query, params),
+            label="lemonsoft_sql",
+        )
+    
+    def _fetch_dicts(self, query: str, params: Optional[List] = None) -> List[Dict[str, Any]]:
+        """Run a query against the database and return rows as dictionaries."""
         with self.get_connection() as conn:
             cursor = conn.cursor()
             
@@ -449,6 +459,17 @@ class LemonsoftDatabaseClient:
     
     def _execute_query_sync_simple(self, query: str, params: Optional[List] = None) -> List[Tuple]:
         """Execute query and return simple tuple results."""
+        return get_interaction_recorder().call_sync(
+            KIND_ERP_SQL,
+            (query, params, 'tuples'),
+            lambda: self._fetch_tuples(query, params),
+            label="lemonsoft_sql",
+            encode=encode_tuple_rows,
+            decode=decode_tuple_rows,
+        )
+    
+    def _fetch_tuples(self, query: str, params: Optional[List] = None) -> List[Tuple]:
+        """Run a query against the database and return raw row tuples."""
         with self.get_connection() as conn:
             cursor = conn.cursor()
             
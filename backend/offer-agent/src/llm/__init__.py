@@ -0,0 +1,57 @@
+"""
+LLM Module
+
+Async gateway for all Gemini generate_content calls: timeouts, retries with
+jittered backoff and model fallback, without blocking the event loop. Calls
+share a process-wide RPM/TPM rate limiter with priority lanes; deterministic
+call sites can opt in to a content-addressed response cache. Long answers can
+be streamed and parsed incrementally. Static prompt prefixes of agentic
+loops are registered as Gemini cached content. Calls slower than their
+model's recent latency percentile are hedged with a budgeted duplicate.
+"""
+
+from src.llm.cache import LLMResponseCache, get_llm_cache, make_cache_key
+from src.llm.context_cache import GeminiContextCache, get_context_cache
+
+from src.llm.gateway import (
+    DEFAULT_FALLBACK_MODELS,
+    LLMGateway,
+    build_model_chain,
+    get_llm_gateway,
+)
+from src.llm.hedging import HedgePolicy
+from src.llm.rate_limiter import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_OFFER,
+    RateLimit,
+    RateLimiter,
+    estimate_tokens,
+    get_rate_limiter,
+    provider_for_model,
+    use_llm_priority,
+)
+from src.llm.streaming_json import IncrementalJSONObjectParser
+
+__all__ = [
+    "LLMResponseCache",
+    "get_llm_cache",
+    "make_cache_key",
+    "GeminiContextCache",
+    "get_context_cache",
+    "DEFAULT_FALLBACK_MODELS",
+    "LLMGateway",
+    "build_model_chain",
+    "get_llm_gateway",
+    "HedgePolicy",
+    "PRIORITY_BATCH",
+    "PRIORITY_INTERACTIVE",
+    "PRIORITY_OFFER",
+    "RateLimit",
+    "RateLimiter",
+    "estimate_tokens",
+    "get_rate_limiter",
+    "provider_for_model",
+    "use_llm_priority",
+    "IncrementalJSONObjectParser",
+]
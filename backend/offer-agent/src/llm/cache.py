@@ -0,0 +1,280 @@
+"""
+LLM Response Cache
+
+Content-addressed cache for LLM calls that are pure functions of their input
+(classification, company extraction, PDF filtering, Excel analysis, match
+review). The key is a SHA-256 of the model, contents and generation config -
+which carries the system instruction and tool schema - so a re-sent or
+forwarded email with identical content is answered from disk.
+
+Entries live in a local SQLite file bounded by size (least recently used
+entries are evicted first) and by TTL. Caching is opt-in per call site:
+    await get_llm_gateway().generate_content(..., cache=True)
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import defaultdict
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Optional
+
+from src.utils.logger import get_logger
+
+
+def _canonical(value: Any) -> Any:
+    """JSON-stable form of prompts, genai objects and configs."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, bytes):
+        return {'__bytes__': hashlib.sha256(value).hexdigest()}
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [_canonical(v) for v in value]
+    if hasattr(value, 'model_dump'):
+        # genai types are pydantic models
+        return _canonical(value.model_dump(mode='json', exclude_none=True))
+    if hasattr(value, '__dict__'):
+        return _canonical({k: v for k, v in vars(value).items() if not k.startswith('_')})
+    return str(value)
+
+
+def make_cache_key(*parts: Any, namespace: str = "") -> str:
+    """SHA-256 over the canonical JSON of the given parts."""
+    payload = json.dumps([namespace, [_canonical(p) for p in parts]], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def serialize_response(response: Any) -> Optional[str]:
+    """JSON for a genai GenerateContentResponse; None for responses we cannot round-trip."""
+    if not hasattr(response, 'model_dump_json'):
+        return None
+    try:
+        return response.model_dump_json(exclude_none=True)
+    except Exception:
+        return None
+
+
+def deserialize_response(data: str) -> Any:
+    """Rebuild a GenerateContentResponse stored by serialize_response."""
+    from google.genai import types
+    return types.GenerateContentResponse.model_validate_json(data)
+
+
+class LLMResponseCache:
+    """
+    Size- and TTL-bounded persistent key/value store for LLM results.
+
+    Values are stored as text: serialized genai responses (get_response /
+    put_response) or arbitrary JSON for call sites that cache their parsed
+    result instead (get_json / put_json). Sync methods are thread-safe;
+    callers on the event loop should run them via asyncio.to_thread.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        enabled: Optional[bool] = None
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            db_path: SQLite file path. Defaults to LLM_CACHE_PATH or
+                /app/data/llm_cache.db. Use ":memory:" for tests.
+            max_bytes: Total value size before LRU eviction (LLM_CACHE_MAX_MB, default 256)
+            ttl_seconds: Entry lifetime (LLM_CACHE_TTL_SECONDS, default 7 days)
+            enabled: Master switch (LLM_CACHE_ENABLED, default true)
+        """
+        self.logger = get_logger(__name__)
+        self.enabled = enabled if enabled is not None else (
+            os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+        )
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            float(os.getenv('LLM_CACHE_MAX_MB', '256')) * 1024 * 1024
+        )
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(
+            os.getenv('LLM_CACHE_TTL_SECONDS', str(7 * 24 * 3600))
+        )
+
+        self._lock = Lock()
+        self._stats: Dict[str, int] = defaultdict(int)
+        self._conn: Optional[sqlite3.Connection] = None
+
+        if not self.enabled:
+            return
+
+        path = db_path or os.getenv('LLM_CACHE_PATH', '/app/data/llm_cache.db')
+        try:
+            if path != ":memory:":
+                Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    label TEXT,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (accessed_at)")
+        except (OSError, sqlite3.Error) as e:
+            self.logger.warning(f"LLM cache disabled, could not open {path}: {e}")
+            self.enabled = False
+            self._conn = None
+
+    # ------------------------------------------------------------------
+    # Raw text entries
+    # ------------------------------------------------------------------
+    def get(self, key: str, label: str = "") -> Optional[str]:
+        """Stored value, or None on miss/expiry."""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._count('misses', label)
+                return None
+            value, expires_at = row
+            if expires_at < now:
+                self._conn.execute("DELETE FROM llm_cache WHERE cache_key = ?", (key,))
+                self._count('expired', label)
+                self._count('misses', label)
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE cache_key = ?", (now, key))
+            self._count('hits', label)
+            return value
+
+    def put(self, key: str, value: str, label: str = "", ttl_seconds: Optional[float] = None) -> None:
+        """Store a value and evict least recently used entries beyond max_bytes."""
+        if not self.enabled:
+            return
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache "
+                "(cache_key, label, value, size, created_at, accessed_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, label, value, size, now, now, now + ttl),
+            )
+            self._count('stores', label)
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (now,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        victims = []
+        for key, size in self._conn.execute("SELECT cache_key, size FROM llm_cache ORDER BY accessed_at"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM llm_cache WHERE cache_key = ?", victims)
+        self._stats['evictions'] += len(victims)
+
+    # ------------------------------------------------------------------
+    # Typed helpers
+    # ------------------------------------------------------------------
+    def get_response(self, key: str, label: str = "") -> Any:
+        """Cached genai response, or None."""
+        data = self.get(key, label)
+        if data is None:
+            return None
+        try:
+            return deserialize_response(data)
+        except Exception as e:
+            self.logger.warning(f"Dropping unreadable LLM cache entry {key[:12]}: {e}")
+            self.delete(key)
+            return None
+
+    def put_response(self, key: str, response: Any, label: str = "", ttl_seconds: Optional[float] = None) -> bool:
+        """Cache a genai response; returns False if it cannot be serialized."""
+        data = serialize_response(response)
+        if data is None:
+            return False
+        self.put(key, data, label, ttl_seconds)
+        return True
+
+    def get_json(self, key: str, label: str = "") -> Any:
+        """Cached JSON value, or None."""
+        data = self.get(key, label)
+        return json.loads(data) if data is not None else None
+
+    def put_json(self, key: str, value: Any, label: str = "", ttl_seconds: Optional[float] = None) -> None:
+        """Cache a JSON-serializable value."""
+        self.put(key, json.dumps(value, ensure_ascii=False), label, ttl_seconds)
+
+    def delete(self, key: str) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache WHERE cache_key = ?", (key,))
+
+    def clear(self) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+
+    def _count(self, key: str, label: str) -> None:
+        self._stats[key] += 1
+        if label:
+            self._stats[f"{label}.{key}"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/store/eviction counters plus entry count and size."""
+        if not self.enabled:
+            return {'enabled': False}
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+            ).fetchone()
+            counters = dict(self._stats)
+        lookups = counters.get('hits', 0) + counters.get('misses', 0)
+        return {
+            'enabled': True,
+            'entries': entries,
+            'size_bytes': size,
+            'max_bytes': self.max_bytes,
+            'hit_rate': round(counters.get('hits', 0) / lookups, 3) if lookups else 0.0,
+            **counters,
+        }
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+            self.enabled = False
+
+
+_cache: Optional[LLMResponseCache] = None
+_cache_lock = Lock()
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """Get the process-wide LLM response cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMResponseCache()
+        return _cache
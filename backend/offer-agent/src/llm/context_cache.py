@@ -0,0 +1,182 @@
+"""
+Gemini Context Cache
+
+Registers the static prefix of a long-running conversation - system
+instruction, tool declarations and tool config - as Gemini cached content,
+so every turn of an agentic loop sends only the conversation and is billed
+the cached-token rate for the prefix.
+
+The cache entry is created lazily per (model, prefix) the first time a call
+is made and reused until shortly before its TTL runs out. Callers must keep
+per-request content out of the prefix, or every request creates its own
+entry. At most LLM_CONTEXT_CACHE_MAX_ENTRIES entries are kept: the least
+recently used one is deleted from Gemini when a new one is needed, and
+expired or superseded entries are deleted as well. Prefixes below the
+provider minimum, non-Gemini models and failures to create the entry all fall
+back to sending the config unchanged.
+
+    config = await get_context_cache().apply(client, model, config)
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Dict, Optional
+
+from src.llm.cache import make_cache_key
+from src.llm.rate_limiter import estimate_tokens
+from src.utils.logger import get_logger
+
+
+# Fields moved into the cached content; Gemini rejects requests that repeat them
+PREFIX_FIELDS = ('system_instruction', 'tools', 'tool_config')
+
+
+# Prefixes remembered as not cacheable (too small, or creation failed)
+MAX_FAILED_KEYS = 1024
+
+
+@dataclass
+class _CacheEntry:
+    name: str
+    expires_at: float
+    client: Any
+
+
+class GeminiContextCache:
+    """Creates and reuses Gemini cached-content entries for static prompt prefixes."""
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        min_tokens: Optional[int] = None,
+        ttl_seconds: Optional[int] = None,
+        max_entries: Optional[int] = None
+    ):
+        self.logger = get_logger(__name__)
+        self.enabled = enabled if enabled is not None else (
+            os.getenv('LLM_CONTEXT_CACHE_ENABLED', 'true').lower() == 'true'
+        )
+        # Gemini refuses explicit caches below a model-dependent minimum size
+        self.min_tokens = min_tokens if min_tokens is not None else int(
+            os.getenv('LLM_CONTEXT_CACHE_MIN_TOKENS', '4096')
+        )
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else int(
+            os.getenv('LLM_CONTEXT_CACHE_TTL_SECONDS', '1800')
+        )
+        self.max_entries = max(max_entries if max_entries is not None else int(
+            os.getenv('LLM_CONTEXT_CACHE_MAX_ENTRIES', '16')
+        ), 1)
+        # Least recently used first
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._failed: "OrderedDict[str, None]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._stats = {'created': 0, 'reused': 0, 'skipped': 0, 'errors': 0, 'deleted': 0}
+
+    async def apply(self, client: Any, model: str, config: Any) -> Any:
+        """Return config with its static prefix replaced by a cached_content reference."""
+        if not self.enabled or config is None or 'gemini' not in model.lower():
+            return config
+        if getattr(config, 'cached_content', None):
+            return config
+        prefix = {field: getattr(config, field, None) for field in PREFIX_FIELDS}
+        if not prefix['system_instruction'] and not prefix['tools']:
+            return config
+
+        key = make_cache_key(model, prefix, namespace="context_cache")
+        if key in self._failed:
+            return config
+        if estimate_tokens(prefix['system_instruction']) + estimate_tokens(str(prefix['tools'])) < self.min_tokens:
+            self._stats['skipped'] += 1
+            self._remember_failed(key)
+            return config
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > time.time():
+                self._entries.move_to_end(key)
+                self._stats['reused'] += 1
+            else:
+                await self._evict(key)
+                entry = await self._create(client, model, prefix, key)
+                if entry is None:
+                    return config
+
+        updates = {field: None for field in PREFIX_FIELDS}
+        updates['cached_content'] = entry.name
+        return config.model_copy(update=updates)
+
+    async def _create(self, client: Any, model: str, prefix: Dict[str, Any], key: str) -> Optional[_CacheEntry]:
+        from google.genai import types
+
+        try:
+            cached = await client.aio.caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(
+                    display_name=f"prefix-{key[:16]}",
+                    ttl=f"{self.ttl_seconds}s",
+                    **{field: value for field, value in prefix.items() if value},
+                ),
+            )
+        except Exception as e:
+            # Unsupported model or prefix too small for this model: stop trying for this prefix
+            self.logger.warning(f"Context cache not created for {model}: {e}")
+            self._stats['errors'] += 1
+            self._remember_failed(key)
+            return None
+
+        # Renew a minute early so a request never references an expired entry
+        entry = _CacheEntry(name=cached.name, expires_at=time.time() + max(self.ttl_seconds - 60, 1), client=client)
+        self._entries[key] = entry
+        self._stats['created'] += 1
+        self.logger.info(f"Created context cache {cached.name} for {model}")
+        return entry
+
+    async def _evict(self, key: str) -> None:
+        """Before creating an entry for key: drop its old entry, expired ones and the LRU overflow."""
+        now = time.time()
+        doomed = [k for k, entry in self._entries.items() if k == key or entry.expires_at <= now]
+        overflow = len(self._entries) - len(doomed) - (self.max_entries - 1)
+        doomed += [k for k in self._entries if k not in doomed][:max(overflow, 0)]
+        for k in doomed:
+            await self._delete(self._entries.pop(k))
+        # Locks of keys without an entry; the caller's own lock is held, so it stays
+        for k in [k for k, lock in self._locks.items() if k not in self._entries and not lock.locked()]:
+            del self._locks[k]
+
+    async def _delete(self, entry: _CacheEntry) -> None:
+        """Delete a cached content from Gemini so it stops accruing storage until its TTL."""
+        try:
+            await entry.client.aio.caches.delete(name=entry.name)
+            self._stats['deleted'] += 1
+        except Exception as e:
+            # Already expired or deleted; Gemini drops it at its TTL either way
+            self.logger.debug(f"Context cache {entry.name} not deleted: {e}")
+
+    def _remember_failed(self, key: str) -> None:
+        self._failed[key] = None
+        while len(self._failed) > MAX_FAILED_KEYS:
+            self._failed.popitem(last=False)
+        lock = self._locks.get(key)
+        if lock is not None and not lock.locked():
+            del self._locks[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters plus the number of live cache entries."""
+        return {**self._stats, 'entries': len(self._entries)}
+
+
+_context_cache: Optional[GeminiContextCache] = None
+_context_cache_lock = Lock()
+
+
+def get_context_cache() -> GeminiContextCache:
+    """Get the process-wide Gemini context cache."""
+    global _context_cache
+    with _context_cache_lock:
+        if _context_cache is None:
+            _context_cache = GeminiContextCache()
+        return _context_cache
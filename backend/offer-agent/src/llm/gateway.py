@@ -0,0 +1,549 @@
+"""
+LLM Gateway
+
+Single non-blocking entry point for Gemini generate_content calls. Uses the
+genai async client (client.aio) so a slow or retrying LLM call never blocks
+the event loop, and applies the same policy everywhere: the shared RPM/TPM
+rate limiter, per-call timeouts, jittered exponential backoff and the model
+fallback chain (requested -> gemini-2.5-flash -> gemini-2.0-flash). Call
+sites with deterministic prompts can opt in to the response cache. Every
+round trip passes through the interaction recorder, so calls can be
+recorded to fixtures and replayed offline for benchmarking.
+
+Usage:
+    response = await get_llm_gateway().generate_content(
+        model=Config.GEMINI_MODEL,
+        contents=prompt,
+        config=types.GenerateContentConfig(temperature=0.1),
+        client=self.gemini_client,
+    )
+"""
+import asyncio
+import inspect
+import os
+import time
+from collections import defaultdict
+from threading import Lock
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from src.benchmark.recorder import (
+    KIND_LLM,
+    InteractionRecorder,
+    decode_llm_response,
+    encode_llm_response,
+    get_interaction_recorder,
+    llm_response_tokens,
+)
+from src.llm.cache import LLMResponseCache, get_llm_cache, make_cache_key
+from src.llm.hedging import HedgePolicy
+from src.llm.rate_limiter import RateLimiter, estimate_tokens, get_rate_limiter, provider_for_model
+from src.utils.logger import get_logger
+from src.utils.retry import RetryConfig, calculate_delay
+
+
+DEFAULT_FALLBACK_MODELS: Sequence[str] = ('gemini-2.5-flash', 'gemini-2.0-flash')
+
+# Signature of a custom transport: (model, contents, config) -> response.
+# May be sync (run in a worker thread) or async.
+Transport = Callable[[str, Any, Any], Any]
+
+
+def build_model_chain(model: str, fallback_models: Sequence[str] = DEFAULT_FALLBACK_MODELS) -> List[str]:
+    """Requested model followed by the fallbacks, without duplicates."""
+    chain = [model]
+    for fallback in fallback_models:
+        if fallback not in chain:
+            chain.append(fallback)
+    return chain
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """429 / quota errors need a longer wait than other transient failures."""
+    text = str(error).lower()
+    return "429" in text or "rate limit" in text or "quota" in text or "resource_exhausted" in text
+
+
+def is_thought_signature_error(error: BaseException) -> bool:
+    """Gemini 3 thought_signature errors need a history fix, not a model change."""
+    text = str(error).lower()
+    return "thought_signature" in text or "thoughtsignature" in text
+
+
+class LLMGateway:
+    """
+    Async generate_content with timeouts, retries and model fallback.
+
+    Callers keep their own genai clients (pass client=...); the gateway only
+    owns the call policy. A custom transport can be supplied per call for
+    providers that are not reached through the genai SDK (OpenRouter, xAI).
+    """
+
+    def __init__(
+        self,
+        client: Any = None,
+        fallback_models: Sequence[str] = DEFAULT_FALLBACK_MODELS,
+        retry_config: Optional[RetryConfig] = None,
+        timeout_seconds: Optional[float] = None,
+        primary_model_failures: Optional[int] = None,
+        rate_limit_min_delay: float = 10.0,
+        rate_limiter: Optional[RateLimiter] = None,
+        cache: Optional[LLMResponseCache] = None,
+        recorder: Optional[InteractionRecorder] = None,
+        hedge_policy: Optional[HedgePolicy] = None
+    ):
+        """
+        Initialize the gateway.
+
+        Args:
+            client: Default genai client (created lazily from GEMINI_API_KEY if omitted)
+            fallback_models: Models tried after the requested model keeps failing
+            retry_config: Attempts and backoff (defaults from LLM_MAX_ATTEMPTS)
+            timeout_seconds: Per-attempt timeout (defaults from LLM_TIMEOUT_SECONDS)
+            primary_model_failures: Failures on the requested model before falling back
+            rate_limit_min_delay: Minimum wait after a 429 / quota error
+            rate_limiter: RPM/TPM limiter (defaults to the process-wide limiter)
+            cache: Response cache (defaults to the process-wide cache, opened on first use)
+            recorder: Record/replay hook (defaults to the process-wide recorder)
+            hedge_policy: When to send a duplicate of a slow call (defaults from LLM_HEDGE_*)
+        """
+        self.logger = get_logger(__name__)
+        self._client = client
+        self._client_lock = Lock()
+        self.fallback_models = tuple(fallback_models)
+        self.retry_config = retry_config or RetryConfig(
+            max_attempts=int(os.getenv('LLM_MAX_ATTEMPTS', '5')),
+            base_delay=1.0,
+            max_delay=30.0,
+            jitter=True,
+        )
+        self.timeout_seconds = timeout_seconds if timeout_seconds is not None else float(
+            os.getenv('LLM_TIMEOUT_SECONDS', '120')
+        )
+        self.primary_model_failures = primary_model_failures if primary_model_failures is not None else int(
+            os.getenv('LLM_PRIMARY_MODEL_FAILURES', '3')
+        )
+        self.rate_limit_min_delay = rate_limit_min_delay
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self._cache = cache
+        self._recorder = recorder
+        self.hedge_policy = hedge_policy or HedgePolicy()
+
+        self._stats_lock = Lock()
+        self._stats: Dict[str, int] = defaultdict(int)
+        self._in_flight = 0
+
+    @property
+    def client(self) -> Any:
+        """Default genai client, created on first use."""
+        with self._client_lock:
+            if self._client is None:
+                from google import genai
+                self._client = genai.Client(api_key=os.getenv('GEMINI_API_KEY'))
+            return self._client
+
+    @property
+    def cache(self) -> LLMResponseCache:
+        """Response cache, opened on first use."""
+        if self._cache is None:
+            self._cache = get_llm_cache()
+        return self._cache
+
+    @property
+    def recorder(self) -> InteractionRecorder:
+        """Interaction recorder; looked up per call so a benchmark can swap it."""
+        return self._recorder or get_interaction_recorder()
+
+    async def generate_content(
+        self,
+        model: str,
+        contents: Any,
+        config: Any = None,
+        *,
+        client: Any = None,
+        timeout: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        fallback: bool = True,
+        transport: Optional[Transport] = None,
+        label: Optional[str] = None,
+        provider: Optional[str] = None,
+        priority: Optional[int] = None,
+        cache: bool = False,
+        cache_ttl: Optional[float] = None,
+        hedge: bool = False
+    ) -> Any:
+        """
+        Call generate_content without blocking the event loop.
+
+        Args:
+            model: Requested model
+            contents: Prompt string, Content or list of Contents
+            config: GenerateContentConfig
+            client: genai client to use (defaults to the gateway's client)
+            timeout: Per-attempt timeout in seconds (None uses the gateway default, 0 disables)
+            max_attempts: Override the number of attempts
+            fallback: Whether to switch to fallback models after repeated failures
+            transport: Custom (model, contents, config) callable instead of the genai SDK
+            label: Short caller name for logs and stats
+            provider: Quota the call counts against (derived from the model if omitted)
+            priority: Rate-limiter lane (defaults to the context's lane)
+            cache: Serve/store the response in the content-addressed cache. Only
+                for prompts whose answer depends on nothing but the inputs.
+            cache_ttl: Override the cache TTL for this entry (seconds)
+            hedge: Send a duplicate if the call is slower than the model's recent
+                latency percentile (see src.llm.hedging). Only for short,
+                idempotent prompts; the duplicate is billed even when cancelled.
+
+        Returns:
+            The generate_content response
+
+        Raises:
+            The last error once all attempts are exhausted. asyncio.CancelledError
+            is never retried.
+        """
+        attempts = max_attempts or self.retry_config.max_attempts
+        per_call_timeout = self.timeout_seconds if timeout is None else timeout
+        chain = build_model_chain(model, self.fallback_models) if fallback else [model]
+        caller = label or "llm"
+        estimated_tokens = estimate_tokens(contents)
+
+        cache_key = None
+        if cache and self.cache.enabled:
+            cache_key = make_cache_key(model, contents, config, namespace="generate_content")
+            cached = await asyncio.to_thread(self.cache.get_response, cache_key, caller)
+            if cached is not None:
+                self._count('cache_hits')
+                self.logger.debug(f"[{caller}] LLM cache hit {cache_key[:12]}")
+                return cached
+
+        model_index = 0
+        thought_signature_errors = 0
+        last_error: Optional[BaseException] = None
+
+        for attempt in range(1, attempts + 1):
+            # Switch models after repeated failures - but not for thought_signature
+            # errors, which a different model will not fix
+            if (
+                attempt > self.primary_model_failures
+                and model_index < len(chain) - 1
+                and thought_signature_errors == 0
+            ):
+                model_index += 1
+                self._count('fallbacks')
+                self.logger.info(f"[{caller}] Switching to fallback model: {chain[model_index]}")
+            current_model = chain[model_index]
+            quota = provider or provider_for_model(current_model)
+
+            await self.rate_limiter.acquire(quota, current_model, estimated_tokens, priority)
+
+            started = time.monotonic()
+            try:
+                self._count('calls')
+                self._in_flight += 1
+                try:
+                    def make_call(call_model: str) -> Awaitable[Any]:
+                        return self.recorder.call(
+                            KIND_LLM,
+                            (call_model, contents, config),
+                            lambda: self._invoke(client, transport, call_model, contents, config),
+                            label=caller,
+                            encode=encode_llm_response,
+                            decode=decode_llm_response,
+                            tokens=llm_response_tokens,
+                        )
+
+                    # Duplicates would desynchronise recorded fixtures, so never hedge while recording/replaying
+                    if hedge and self.hedge_policy.enabled and not (self.recorder.recording or self.recorder.replaying):
+                        hedge_model = current_model
+                        if self.hedge_policy.to_fallback and model_index < len(chain) - 1:
+                            hedge_model = chain[model_index + 1]
+                        call = self._hedged_call(
+                            make_call, current_model, hedge_model, provider, estimated_tokens, priority, caller
+                        )
+                    else:
+                        call = self._timed_call(make_call, current_model)
+                    if per_call_timeout:
+                        response, answered_by = await asyncio.wait_for(call, timeout=per_call_timeout)
+                    else:
+                        response, answered_by = await call
+                finally:
+                    self._in_flight -= 1
+
+                usage = getattr(response, 'usage_metadata', None)
+                self.rate_limiter.settle(
+                    provider or provider_for_model(answered_by), answered_by, estimated_tokens,
+                    getattr(usage, 'total_token_count', None)
+                )
+
+                if answered_by != model:
+                    self.logger.info(f"[{caller}] Request succeeded with fallback model: {answered_by}")
+                if cache_key is not None:
+                    await asyncio.to_thread(self.cache.put_response, cache_key, response, caller, cache_ttl)
+                return response
+
+            except asyncio.CancelledError:
+                raise
+            except asyncio.TimeoutError as e:
+                self._count('timeouts')
+                last_error = e
+                self.logger.warning(
+                    f"[{caller}] LLM request to {current_model} timed out after "
+                    f"{time.monotonic() - started:.1f}s (attempt {attempt}/{attempts})"
+                )
+            except Exception as e:
+                self._count('errors')
+                last_error = e
+                if is_rate_limit_error(e):
+                    self._count('rate_limited')
+                    self.rate_limiter.backoff(quota, current_model)
+                if is_thought_signature_error(e):
+                    thought_signature_errors += 1
+                self.logger.warning(
+                    f"[{caller}] LLM request failed with {current_model} (attempt {attempt}/{attempts}): {e}"
+                )
+
+            if attempt == attempts:
+                break
+
+            delay = calculate_delay(attempt, self.retry_config)
+            if last_error is not None and is_rate_limit_error(last_error):
+                delay = max(delay, self.rate_limit_min_delay)
+            self._count('retries')
+            self.logger.info(f"[{caller}] Retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+        self.logger.error(f"[{caller}] LLM request failed after {attempts} attempts across {model_index + 1} models")
+        raise last_error
+
+    async def stream_content(
+        self,
+        model: str,
+        contents: Any,
+        config: Any = None,
+        *,
+        client: Any = None,
+        timeout: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        fallback: bool = True,
+        label: Optional[str] = None,
+        provider: Optional[str] = None,
+        priority: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream the text of a generate_content answer chunk by chunk.
+
+        Rate limiting, retries and model fallback apply until the first chunk
+        arrives. After that the caller has already consumed part of the answer,
+        so a failure is raised instead of silently restarting the stream.
+
+        Args:
+            model, contents, config, client, max_attempts, fallback, label,
+            provider, priority: As for generate_content
+            timeout: Maximum wait for the next chunk (None uses the gateway
+                default, 0 disables)
+
+        Yields:
+            Text chunks in order
+        """
+        attempts = max_attempts or self.retry_config.max_attempts
+        chunk_timeout = self.timeout_seconds if timeout is None else timeout
+        chain = build_model_chain(model, self.fallback_models) if fallback else [model]
+        caller = label or "llm"
+        estimated_tokens = estimate_tokens(contents)
+
+        model_index = 0
+        last_error: Optional[BaseException] = None
+
+        for attempt in range(1, attempts + 1):
+            if attempt > self.primary_model_failures and model_index < len(chain) - 1:
+                model_index += 1
+                self._count('fallbacks')
+                self.logger.info(f"[{caller}] Switching to fallback model: {chain[model_index]}")
+            current_model = chain[model_index]
+            quota = provider or provider_for_model(current_model)
+
+            await self.rate_limiter.acquire(quota, current_model, estimated_tokens, priority)
+
+            usage: Dict[str, int] = {}
+            received_any = False
+            self._count('streams')
+            self._in_flight += 1
+            try:
+                stream = self.recorder.stream(
+                    KIND_LLM,
+                    (current_model, contents, config, 'stream'),
+                    lambda: self._stream_text(client, current_model, contents, config, usage),
+                    label=caller,
+                    tokens=lambda: usage.get('total_tokens', 0),
+                ).__aiter__()
+                while True:
+                    try:
+                        if chunk_timeout:
+                            chunk = await asyncio.wait_for(stream.__anext__(), timeout=chunk_timeout)
+                        else:
+                            chunk = await stream.__anext__()
+                    except StopAsyncIteration:
+                        break
+                    received_any = True
+                    yield chunk
+
+                self.rate_limiter.settle(quota, current_model, estimated_tokens, usage.get('total_tokens'))
+                return
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if received_any:
+                    self._count('stream_errors')
+                    self.logger.warning(f"[{caller}] LLM stream from {current_model} failed mid-answer: {e}")
+                    raise
+                self._count('timeouts' if isinstance(e, asyncio.TimeoutError) else 'errors')
+                last_error = e
+                if is_rate_limit_error(e):
+                    self._count('rate_limited')
+                    self.rate_limiter.backoff(quota, current_model)
+                self.logger.warning(
+                    f"[{caller}] LLM stream failed with {current_model} (attempt {attempt}/{attempts}): {e!r}"
+                )
+            finally:
+                self._in_flight -= 1
+
+            if attempt == attempts:
+                break
+
+            delay = calculate_delay(attempt, self.retry_config)
+            if last_error is not None and is_rate_limit_error(last_error):
+                delay = max(delay, self.rate_limit_min_delay)
+            self._count('retries')
+            await asyncio.sleep(delay)
+
+        self.logger.error(f"[{caller}] LLM stream failed after {attempts} attempts across {model_index + 1} models")
+        raise last_error
+
+    async def _stream_text(
+        self,
+        client: Any,
+        model: str,
+        contents: Any,
+        config: Any,
+        usage: Dict[str, int]
+    ) -> AsyncIterator[str]:
+        genai_client = client or self.client
+        stream = await genai_client.aio.models.generate_content_stream(model=model, contents=contents, config=config)
+        async for chunk in stream:
+            metadata = getattr(chunk, 'usage_metadata', None)
+            if getattr(metadata, 'total_token_count', None):
+                usage['total_tokens'] = metadata.total_token_count
+            text = getattr(chunk, 'text', None)
+            if text:
+                yield text
+
+    async def _timed_call(self, make_call: Callable[[str], Awaitable[Any]], model: str):
+        """Unhedged call that still feeds the model's latency window."""
+        started = time.monotonic()
+        response = await make_call(model)
+        self.hedge_policy.observe(model, time.monotonic() - started)
+        return response, model
+
+    async def _hedged_call(
+        self,
+        make_call: Callable[[str], Awaitable[Any]],
+        model: str,
+        hedge_model: str,
+        provider: Optional[str],
+        estimated_tokens: int,
+        priority: Optional[int],
+        caller: str
+    ):
+        """
+        Race the call against a duplicate sent once it is slower than the hedge delay.
+
+        Returns (response, model that answered). The first successful answer
+        wins and the other request is cancelled; if one request fails, the
+        other is still awaited. Raises the primary's error if both fail.
+        """
+        policy = self.hedge_policy
+        policy.record_call()
+        delay = policy.delay(model)
+        started = time.monotonic()
+        primary = asyncio.ensure_future(make_call(model))
+        tasks = {primary: model}
+
+        async def send_hedge() -> Any:
+            await self.rate_limiter.acquire(
+                provider or provider_for_model(hedge_model), hedge_model, estimated_tokens, priority
+            )
+            return await make_call(hedge_model)
+
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if not done:
+                if policy.try_acquire():
+                    self._count('hedges')
+                    self.logger.info(
+                        f"[{caller}] {model} has not answered in {delay:.1f}s, hedging with {hedge_model}"
+                    )
+                    tasks[asyncio.ensure_future(send_hedge())] = hedge_model
+                else:
+                    self._count('hedges_over_budget')
+
+            errors: Dict[asyncio.Future, BaseException] = {}
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        errors[task] = task.exception()
+                        continue
+                    elapsed = time.monotonic() - started
+                    if task is primary:
+                        policy.observe(model, elapsed)
+                    else:
+                        self._count('hedge_wins')
+                        # The slow primary is a lower bound for its model's latency
+                        policy.observe(model, elapsed)
+                    return task.result(), tasks[task]
+            raise errors.get(primary) or next(iter(errors.values()))
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def _invoke(
+        self,
+        client: Any,
+        transport: Optional[Transport],
+        model: str,
+        contents: Any,
+        config: Any
+    ) -> Awaitable[Any]:
+        if transport is not None:
+            if inspect.iscoroutinefunction(transport):
+                return transport(model, contents, config)
+            return asyncio.to_thread(transport, model, contents, config)
+
+        genai_client = client or self.client
+        return genai_client.aio.models.generate_content(model=model, contents=contents, config=config)
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Call, retry, fallback, timeout and error counters."""
+        with self._stats_lock:
+            snapshot = dict(self._stats)
+        snapshot['in_flight'] = self._in_flight
+        return snapshot
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = Lock()
+
+
+def get_llm_gateway() -> LLMGateway:
+    """Get the process-wide LLM gateway."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+        return _gateway
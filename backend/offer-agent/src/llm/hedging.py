@@ -0,0 +1,114 @@
+"""
+Hedged LLM requests.
+
+Most generate_content calls return in a few seconds, but a small share sits
+in the provider queue for 30-60s. If a call has not returned within the
+recent latency percentile for its model, a duplicate is sent - optionally to
+the next model of the fallback chain - and whichever answers first wins; the
+other is cancelled.
+
+The hedge delay adapts per model (LLM_HEDGE_PERCENTILE of the recent
+successful latencies, never below LLM_HEDGE_MIN_SECONDS), and a budget caps
+the extra spend: hedges may be at most LLM_HEDGE_BUDGET of all calls, plus a
+small burst allowance so the first slow calls of a quiet process can hedge.
+
+Hedging is off by default. The provider bills a cancelled duplicate too, so
+when it is enabled only call sites that opt in (hedge=True) are hedged: short,
+idempotent prompts such as classification and company extraction, never the
+long function-calling agent loops.
+"""
+import os
+from collections import defaultdict
+from threading import Lock
+from typing import Dict, Optional
+
+from src.scheduler.metrics import LatencyWindow
+
+
+class HedgePolicy:
+    """Per-model hedge delays and the extra-call budget."""
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        percentile: Optional[float] = None,
+        min_delay: Optional[float] = None,
+        initial_delay: Optional[float] = None,
+        min_samples: Optional[int] = None,
+        budget_ratio: Optional[float] = None,
+        burst: Optional[int] = None,
+        to_fallback: Optional[bool] = None,
+        max_samples: int = 500
+    ):
+        """
+        Args:
+            enabled: Hedge at all (LLM_HEDGE_ENABLED)
+            percentile: Latency percentile after which a call is hedged (LLM_HEDGE_PERCENTILE)
+            min_delay: Lower bound for the hedge delay in seconds (LLM_HEDGE_MIN_SECONDS)
+            initial_delay: Delay used until min_samples latencies are known (LLM_HEDGE_INITIAL_SECONDS)
+            min_samples: Samples a model needs before its percentile is trusted (LLM_HEDGE_MIN_SAMPLES)
+            budget_ratio: Hedges allowed per primary call (LLM_HEDGE_BUDGET)
+            burst: Hedges allowed beyond the ratio (LLM_HEDGE_BURST)
+            to_fallback: Send the hedge to the next model of the chain (LLM_HEDGE_TO_FALLBACK)
+            max_samples: Latency window size per model
+        """
+        def env_flag(name: str, default: str) -> bool:
+            return os.getenv(name, default).lower() in ('1', 'true', 'yes')
+
+        self.enabled = enabled if enabled is not None else env_flag('LLM_HEDGE_ENABLED', 'false')
+        self.percentile = percentile if percentile is not None else float(os.getenv('LLM_HEDGE_PERCENTILE', '95'))
+        self.min_delay = min_delay if min_delay is not None else float(os.getenv('LLM_HEDGE_MIN_SECONDS', '2'))
+        self.initial_delay = initial_delay if initial_delay is not None else float(
+            os.getenv('LLM_HEDGE_INITIAL_SECONDS', '30')
+        )
+        self.min_samples = min_samples if min_samples is not None else int(os.getenv('LLM_HEDGE_MIN_SAMPLES', '20'))
+        self.budget_ratio = budget_ratio if budget_ratio is not None else float(os.getenv('LLM_HEDGE_BUDGET', '0.1'))
+        self.burst = burst if burst is not None else int(os.getenv('LLM_HEDGE_BURST', '2'))
+        self.to_fallback = to_fallback if to_fallback is not None else env_flag('LLM_HEDGE_TO_FALLBACK', 'false')
+
+        self._lock = Lock()
+        self._max_samples = max_samples
+        self._latency: Dict[str, LatencyWindow] = defaultdict(lambda: LatencyWindow(self._max_samples))
+        self._calls = 0
+        self._hedges = 0
+
+    def delay(self, model: str) -> Optional[float]:
+        """Seconds to wait for the primary call before hedging; None disables hedging."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            window = self._latency.get(model)
+            if window is None or len(window.samples) < self.min_samples:
+                return max(self.initial_delay, self.min_delay)
+            return max(window.percentile(self.percentile), self.min_delay)
+
+    def observe(self, model: str, seconds: float) -> None:
+        """Latency of a successful call."""
+        with self._lock:
+            self._latency[model].add(seconds)
+
+    def record_call(self) -> None:
+        """A primary call was sent; grows the hedge budget."""
+        with self._lock:
+            self._calls += 1
+
+    def try_acquire(self) -> bool:
+        """Take one hedge from the budget, if any is left."""
+        with self._lock:
+            if self._hedges >= self._calls * self.budget_ratio + self.burst:
+                return False
+            self._hedges += 1
+            return True
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                'primary_calls': self._calls,
+                'hedges': self._hedges,
+                'hedge_ratio': round(self._hedges / self._calls, 3) if self._calls else 0.0,
+                'delays': {
+                    model: round(max(window.percentile(self.percentile), self.min_delay), 3)
+                    for model, window in self._latency.items()
+                    if len(window.samples) >= self.min_samples
+                },
+            }
@@ -0,0 +1,408 @@
+"""
+LLM Rate Limiter
+
+Process-wide requests-per-minute and tokens-per-minute limits for every LLM
+provider, keyed by (provider, model). Each key has two token buckets (RPM and
+TPM); a call waits until both have room. Waiters are served strictly by
+priority lane, so interactive API requests overtake queued email-pipeline
+calls, and those overtake nightly/batch work.
+
+The priority of a call comes from the surrounding context (see
+use_llm_priority), so entry points set it once and every LLM call below
+inherits it.
+
+Usage:
+    with use_llm_priority(PRIORITY_INTERACTIVE):
+        await orchestrator.process_offer_request_for_review(email_data)
+
+    await get_rate_limiter().acquire("gemini", "gemini-2.5-flash", tokens=1200)
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import json
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from src.utils.logger import get_logger
+
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_OFFER = 1
+PRIORITY_BATCH = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_OFFER: "offer",
+    PRIORITY_BATCH: "batch",
+}
+
+_current_priority: contextvars.ContextVar[int] = contextvars.ContextVar('llm_priority', default=PRIORITY_OFFER)
+
+
+@contextmanager
+def use_llm_priority(priority: int) -> Iterator[None]:
+    """Run the enclosed code (and tasks it creates) in the given priority lane."""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_llm_priority() -> int:
+    """Priority lane of the current context."""
+    return _current_priority.get()
+
+
+def estimate_tokens(contents: Any) -> int:
+    """
+    Rough prompt size: ~4 characters per token, plus per-message overhead.
+
+    Handles plain strings, genai Content objects (text, function_call and
+    function_response parts) and lists of either.
+    """
+    if contents is None:
+        return 0
+    if isinstance(contents, str):
+        return len(contents) // 4
+    if isinstance(contents, (list, tuple)):
+        return sum(estimate_tokens(item) for item in contents)
+
+    parts = getattr(contents, 'parts', None)
+    if parts is None:
+        if hasattr(contents, 'text') and contents.text:
+            return len(contents.text) // 4
+        return len(str(contents)) // 4
+
+    token_count = 0
+    for part in parts:
+        if getattr(part, 'text', None):
+            token_count += len(part.text) // 4
+        elif getattr(part, 'function_call', None):
+            token_count += len(str(part.function_call)) // 4
+        elif getattr(part, 'function_response', None):
+            token_count += len(str(part.function_response)) // 4
+        else:
+            token_count += 50
+    # Message metadata overhead
+    return token_count + 10
+
+
+def provider_for_model(model: str) -> str:
+    """Provider whose quota a model counts against."""
+    name = (model or "").lower()
+    if 'grok' in name:
+        return 'xai'
+    if 'gemini' in name or name.startswith('google/'):
+        return 'gemini'
+    if name.startswith(('gpt', 'o1', 'o3', 'o4', 'text-embedding', 'openai/')):
+        return 'openai'
+    return 'openrouter'
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """Per-minute quota; 0 disables that dimension."""
+    rpm: int
+    tpm: int
+
+
+DEFAULT_PROVIDER_LIMITS: Dict[str, RateLimit] = {
+    'gemini': RateLimit(rpm=1000, tpm=2_000_000),
+    'openai': RateLimit(rpm=500, tpm=1_000_000),
+    'openrouter': RateLimit(rpm=500, tpm=1_000_000),
+    'xai': RateLimit(rpm=480, tpm=2_000_000),
+}
+
+
+def load_rate_limits() -> Tuple[Dict[str, RateLimit], Dict[str, RateLimit]]:
+    """
+    Provider limits from LLM_RPM_<PROVIDER> / LLM_TPM_<PROVIDER>, and per-model
+    overrides from LLM_RATE_LIMITS, a JSON object like
+    {"gemini/gemini-2.5-pro": {"rpm": 150, "tpm": 2000000}}.
+
+    Returns:
+        (provider limits, per-model limits keyed "provider/model")
+    """
+    providers = {
+        provider: RateLimit(
+            rpm=int(os.getenv(f"LLM_RPM_{provider.upper()}", str(default.rpm))),
+            tpm=int(os.getenv(f"LLM_TPM_{provider.upper()}", str(default.tpm))),
+        )
+        for provider, default in DEFAULT_PROVIDER_LIMITS.items()
+    }
+
+    models: Dict[str, RateLimit] = {}
+    raw = os.getenv('LLM_RATE_LIMITS', '').strip()
+    if raw:
+        try:
+            for key, value in json.loads(raw).items():
+                models[key] = RateLimit(rpm=int(value.get('rpm', 0)), tpm=int(value.get('tpm', 0)))
+        except (ValueError, AttributeError, TypeError) as e:
+            get_logger(__name__).warning(f"Ignoring invalid LLM_RATE_LIMITS: {e}")
+    return providers, models
+
+
+class TokenBucket:
+    """Continuous-refill token bucket holding at most one minute of quota."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def refill(self, now: float) -> None:
+        if self.unlimited:
+            return
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def clamp(self, amount: float) -> float:
+        # A single request larger than the whole bucket would never fit
+        return amount if self.unlimited else min(amount, self.capacity)
+
+    def wait_time(self, amount: float) -> float:
+        if self.unlimited or self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        if not self.unlimited:
+            self.tokens -= amount
+
+    def drain(self) -> None:
+        if not self.unlimited:
+            self.tokens = min(self.tokens, 0.0)
+
+
+class _KeyState:
+    """Buckets and priority-ordered waiters for one (provider, model)."""
+
+    def __init__(self, limit: RateLimit):
+        self.limit = limit
+        self.requests = TokenBucket(limit.rpm)
+        self.tokens = TokenBucket(limit.tpm)
+        self.waiters: List[Tuple[int, int]] = []  # heap of (priority, ticket)
+        self.granted = 0
+        self.throttled = 0
+        self.wait_total = 0.0
+
+
+class RateLimiter:
+    """
+    Shared RPM/TPM limiter with priority lanes.
+
+    Safe to use from several threads and event loops: state is guarded by a
+    threading lock and waiters poll (asyncio.sleep / time.sleep) for the
+    computed refill time instead of relying on loop-bound primitives.
+    """
+
+    def __init__(
+        self,
+        provider_limits: Optional[Dict[str, RateLimit]] = None,
+        model_limits: Optional[Dict[str, RateLimit]] = None,
+        max_poll_seconds: float = 0.25
+    ):
+        """
+        Initialize the limiter.
+
+        Args:
+            provider_limits: Limits per provider (defaults from load_rate_limits())
+            model_limits: Per-model overrides keyed "provider/model"
+            max_poll_seconds: Longest sleep between checks while waiting
+        """
+        self.logger = get_logger(__name__)
+        if provider_limits is None and model_limits is None:
+            provider_limits, model_limits = load_rate_limits()
+        self.provider_limits = provider_limits or {}
+        self.model_limits = model_limits or {}
+        self.max_poll_seconds = max_poll_seconds
+
+        self._lock = Lock()
+        self._states: Dict[Tuple[str, str], _KeyState] = {}
+        self._tickets = itertools.count()
+
+    def limit_for(self, provider: str, model: str) -> RateLimit:
+        """Most specific configured limit for a key."""
+        specific = self.model_limits.get(f"{provider}/{model}")
+        if specific:
+            return specific
+        return self.provider_limits.get(provider, RateLimit(rpm=0, tpm=0))
+
+    def _state(self, provider: str, model: str) -> _KeyState:
+        key = (provider, model)
+        state = self._states.get(key)
+        if state is None:
+            state = _KeyState(self.limit_for(provider, model))
+            self._states[key] = state
+        return state
+
+    def _enqueue(self, provider: str, model: str, priority: int) -> Tuple[_KeyState, Tuple[int, int]]:
+        with self._lock:
+            state = self._state(provider, model)
+            entry = (priority, next(self._tickets))
+            heapq.heappush(state.waiters, entry)
+            return state, entry
+
+    def _try_grant(self, state: _KeyState, entry: Tuple[int, int], tokens: int) -> float:
+        """Grant if this waiter is first in line and both buckets have room; else seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            state.requests.refill(now)
+            state.tokens.refill(now)
+
+            if state.waiters[0] != entry:
+                # Someone with higher priority (or earlier, same priority) goes first
+                return self.max_poll_seconds / 5
+
+            needed = state.tokens.clamp(tokens)
+            wait = max(state.requests.wait_time(1), state.tokens.wait_time(needed))
+            if wait > 0:
+                return wait
+
+            state.requests.consume(1)
+            state.tokens.consume(needed)
+            heapq.heappop(state.waiters)
+            state.granted += 1
+            return 0.0
+
+    def _cancel(self, state: _KeyState, entry: Tuple[int, int]) -> None:
+        with self._lock:
+            try:
+                state.waiters.remove(entry)
+                heapq.heapify(state.waiters)
+            except ValueError:
+                pass
+
+    def _record_wait(self, state: _KeyState, waited: float) -> None:
+        if waited <= 0:
+            return
+        with self._lock:
+            state.throttled += 1
+            state.wait_total += waited
+
+    async def acquire(
+        self,
+        provider: str,
+        model: str,
+        tokens: int = 0,
+        priority: Optional[int] = None
+    ) -> float:
+        """
+        Wait for one request slot and `tokens` of TPM quota.
+
+        Args:
+            provider: Provider name ("gemini", "openai", "openrouter", "xai")
+            model: Model name
+            tokens: Estimated prompt tokens for this call
+            priority: Lane (defaults to the context's lane)
+
+        Returns:
+            Seconds spent waiting
+        """
+        lane = current_llm_priority() if priority is None else priority
+        state, entry = self._enqueue(provider, model, lane)
+        started = time.monotonic()
+        try:
+            while True:
+                wait = self._try_grant(state, entry, tokens)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(min(wait, self.max_poll_seconds))
+        except BaseException:
+            self._cancel(state, entry)
+            raise
+
+        waited = time.monotonic() - started
+        self._record_wait(state, waited)
+        if waited > 1:
+            self.logger.info(
+                f"⏳ {provider}/{model} rate limit: waited {waited:.1f}s "
+                f"({PRIORITY_NAMES.get(lane, lane)} lane)"
+            )
+        return waited
+
+    def acquire_sync(
+        self,
+        provider: str,
+        model: str,
+        tokens: int = 0,
+        priority: Optional[int] = None
+    ) -> float:
+        """Blocking variant of acquire() for synchronous clients and worker threads."""
+        lane = current_llm_priority() if priority is None else priority
+        state, entry = self._enqueue(provider, model, lane)
+        started = time.monotonic()
+        try:
+            while True:
+                wait = self._try_grant(state, entry, tokens)
+                if wait <= 0:
+                    break
+                time.sleep(min(wait, self.max_poll_seconds))
+        except BaseException:
+            self._cancel(state, entry)
+            raise
+
+        waited = time.monotonic() - started
+        self._record_wait(state, waited)
+        return waited
+
+    def settle(self, provider: str, model: str, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Charge the difference once the provider reports real usage (prompt + output)."""
+        if not actual_tokens:
+            return
+        with self._lock:
+            bucket = self._state(provider, model).tokens
+            if bucket.unlimited:
+                return
+            bucket.consume(actual_tokens - bucket.clamp(estimated_tokens))
+            bucket.tokens = min(bucket.tokens, bucket.capacity)
+
+    def backoff(self, provider: str, model: str) -> None:
+        """Provider returned 429: empty the request bucket so every caller slows down."""
+        with self._lock:
+            self._state(provider, model).requests.drain()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-key limits, remaining quota, queue length and wait totals."""
+        with self._lock:
+            now = time.monotonic()
+            result = {}
+            for (provider, model), state in self._states.items():
+                state.requests.refill(now)
+                state.tokens.refill(now)
+                result[f"{provider}/{model}"] = {
+                    'rpm': state.limit.rpm,
+                    'tpm': state.limit.tpm,
+                    'requests_available': round(state.requests.tokens, 1),
+                    'tokens_available': round(state.tokens.tokens),
+                    'waiting': len(state.waiters),
+                    'granted': state.granted,
+                    'throttled': state.throttled,
+                    'wait_seconds_total': round(state.wait_total, 3),
+                }
+            return result
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Get the process-wide LLM rate limiter."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
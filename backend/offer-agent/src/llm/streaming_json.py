@@ -0,0 +1,116 @@
+"""
+Streaming JSON Object Parser
+
+Incrementally parses a streamed top-level JSON object and hands out each
+member as soon as its value is complete, so a caller can act on the first
+entries of a long LLM answer while the rest is still being generated.
+
+    parser = IncrementalJSONObjectParser()
+    async for chunk in stream:
+        for key, value in parser.feed(chunk):
+            ...
+
+Leading prose or a ```json fence before the opening brace is skipped.
+Malformed input never raises from feed(); the caller should still parse the
+complete text at the end and treat the streamed members as an early preview.
+"""
+import json
+from typing import Any, List, Tuple
+
+
+_WHITESPACE = " \t\r\n"
+
+
+class IncrementalJSONObjectParser:
+    """Yields (key, value) pairs of a top-level JSON object as they complete."""
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder(strict=False)
+        self._buffer = ""
+        self._pos = 0
+        self._started = False
+        self._done = False
+        self.failed = False
+        self.members_parsed = 0
+
+    @property
+    def complete(self) -> bool:
+        """Whether the closing brace of the object has been parsed."""
+        return self._done
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far."""
+        return self._buffer
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Add streamed text and return members completed by it."""
+        self._buffer += chunk
+        if self._done or self.failed:
+            return []
+
+        if not self._started:
+            start = self._buffer.find("{", self._pos)
+            if start < 0:
+                return []
+            self._pos = start + 1
+            self._started = True
+
+        members = []
+        while True:
+            member = self._next_member()
+            if member is None:
+                break
+            members.append(member)
+        self.members_parsed += len(members)
+        return members
+
+    def _skip(self, chars: str) -> int:
+        pos = self._pos
+        while pos < len(self._buffer) and self._buffer[pos] in chars:
+            pos += 1
+        return pos
+
+    def _next_member(self):
+        pos = self._skip(_WHITESPACE + ",")
+        if pos >= len(self._buffer):
+            return None
+        if self._buffer[pos] == "}":
+            self._pos = pos + 1
+            self._done = True
+            return None
+        if self._buffer[pos] != '"':
+            self.failed = True
+            return None
+
+        try:
+            key, after_key = self._decoder.raw_decode(self._buffer, pos)
+        except json.JSONDecodeError:
+            return None  # key still streaming
+
+        colon = after_key
+        while colon < len(self._buffer) and self._buffer[colon] in _WHITESPACE:
+            colon += 1
+        if colon >= len(self._buffer):
+            return None
+        if self._buffer[colon] != ":":
+            self.failed = True
+            return None
+
+        value_start = colon + 1
+        while value_start < len(self._buffer) and self._buffer[value_start] in _WHITESPACE:
+            value_start += 1
+        if value_start >= len(self._buffer):
+            return None
+
+        try:
+            value, value_end = self._decoder.raw_decode(self._buffer, value_start)
+        except json.JSONDecodeError:
+            return None  # value still streaming
+
+        # A bare number at the end of the buffer may still be growing ("12" -> "125")
+        if value_end >= len(self._buffer) and not isinstance(value, (dict, list, str)):
+            return None
+
+        self._pos = value_end
+        return key, value
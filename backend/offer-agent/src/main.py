@@ -8,6 +8,7 @@ This replaces the 2,359-line main.py with a slim, maintainable implementation.
 
 import asyncio
 import logging
+import os
 import sys
 from datetime import datetime
 from pathlib import Path
@@ -19,12 +20,28 @@ sys.path.insert(0, str(project_root))
 sys.path.insert(0, str(project_root / 'src'))
 
 from src.core.orchestrator import OfferOrchestrator
-from src.core.workflow import WorkflowResult
+from src.core.workflow import WorkflowResult, WorkflowDefinition
 from src.config.settings import get_settings
 from src.utils.logger import setup_logging, get_logger
+from src.email_processing.attachment_store import get_attachment_store, release_attachments, spooling_enabled
 from src.email_processing.gmail_service_account_processor import GmailServiceAccountProcessor
+from src.email_processing.label_buffer import (
+    TRANSITION_FAILED,
+    TRANSITION_PROCESSED,
+    TRANSITION_READ,
+    LabelUpdateBuffer,
+)
+from src.email_processing.mailbox_sync import MailboxSync
 from src.notifications.gmail_service_account_sender import GmailServiceAccountSender
 from src.email_processing.LLM_services.email_classifier import EmailClassifier, EmailAction
+from src.health import STATE_UNHEALTHY, get_health_monitor, intake_dependencies
+from src.llm import PRIORITY_BATCH, get_llm_cache, get_llm_gateway, get_rate_limiter, use_llm_priority
+from src.scheduler import (
+    OfferWorkerPool,
+    PersistentPriorityQueue,
+    get_stage_limiter,
+    parse_express_customers,
+)
 
 
 class OfferAutomationV2:
@@ -35,13 +52,15 @@ class OfferAutomationV2:
     Supports multiple ERP systems through configuration.
     """
 
-    def __init__(self, erp_type: Optional[str] = None, max_concurrent_offers: int = 2):
+    def __init__(self, erp_type: Optional[str] = None, max_concurrent_offers: Optional[int] = None):
         """
         Initialize the automation system.
 
         Args:
             erp_type: ERP system type (defaults to environment variable)
-            max_concurrent_offers: Maximum number of offers to process concurrently (default: 2)
+            max_concurrent_offers: Number of offer workers (defaults to OFFER_WORKERS or 2).
+                LLM, ERP and OCR work is additionally bounded per stage
+                (STAGE_LIMIT_LLM / STAGE_LIMIT_ERP / STAGE_LIMIT_OCR).
         """
         self.logger = get_logger(__name__)
         self.settings = get_settings()
@@ -52,13 +71,23 @@ class OfferAutomationV2:
 
         # Email processing
         self.gmail_processor: Optional[GmailServiceAccountProcessor] = None
+        self.mailbox_sync: Optional[MailboxSync] = None
+        self.label_updates: Optional[LabelUpdateBuffer] = None
         self.gmail_sender: Optional[GmailServiceAccountSender] = None
         self.email_classifier: Optional[EmailClassifier] = None
 
-        # Concurrency control
-        self.max_concurrent_offers = max_concurrent_offers
-        self.semaphore: Optional[asyncio.Semaphore] = None
-        self._active_tasks: List[asyncio.Task] = []
+        # Concurrency control: persistent priority queue + worker pool
+        self.max_concurrent_offers = max_concurrent_offers or int(os.getenv('OFFER_WORKERS', '2'))
+        self.offer_queue: Optional[PersistentPriorityQueue] = None
+        self.worker_pool: Optional[OfferWorkerPool] = None
+
+        # Resume-from-checkpoint retries for transient step failures
+        self.resume_attempts = int(os.getenv('WORKFLOW_RESUME_ATTEMPTS', '2'))
+        self.resume_delay_seconds = float(os.getenv('WORKFLOW_RESUME_DELAY_SECONDS', '5'))
+
+        # Cached dependency health; intake pauses while the ERP is slow or down
+        self.health_monitor = get_health_monitor()
+        self.intake_dependencies = intake_dependencies()
 
         # System state
         self.is_initialized = False
@@ -72,7 +101,7 @@ class OfferAutomationV2:
 
         self.logger.info(
             f"Offer Automation V2 initialized for ERP: {erp_name} "
-            f"(max concurrent: {max_concurrent_offers})"
+            f"(workers: {self.max_concurrent_offers})"
         )
 
     async def initialize(self) -> None:
@@ -87,19 +116,44 @@ class OfferAutomationV2:
             self.gmail_processor = GmailServiceAccountProcessor()
             await self.gmail_processor.initialize()
 
+            # Incremental sync: poll Gmail history deltas, remember processed messages locally
+            if os.getenv('MAILBOX_SYNC_ENABLED', 'true').lower() == 'true':
+                self.mailbox_sync = MailboxSync(
+                    self.gmail_processor.fetcher,
+                    mailbox=self.gmail_processor.delegated_email or 'me',
+                )
+
+            # Read/processed/failed label changes, applied in bulk with batchModify
+            if os.getenv('GMAIL_LABEL_BUFFER_ENABLED', 'true').lower() == 'true':
+                self.label_updates = LabelUpdateBuffer(self.gmail_processor.fetcher)
+                self.label_updates.start()
+
             # Initialize Gmail sender
             self.gmail_sender = GmailServiceAccountSender()
 
             # Initialize email classifier
             self.email_classifier = EmailClassifier()
 
-            # Initialize semaphore for concurrency control
-            self.semaphore = asyncio.Semaphore(self.max_concurrent_offers)
+            # Background dependency probes (results cached for health checks)
+            self.health_monitor.start()
+
+            # Initialize work queue and worker pool; queued jobs wait while the ERP is down
+            self.offer_queue = PersistentPriorityQueue()
+            self.worker_pool = OfferWorkerPool(
+                queue=self.offer_queue,
+                handler=self.process_single_email,
+                num_workers=self.max_concurrent_offers,
+                express_customers=parse_express_customers(),
+                pause_check=lambda: self.health_monitor.should_pause(
+                    self.intake_dependencies, states=(STATE_UNHEALTHY,)
+                ),
+            )
+            await self.worker_pool.start()
 
             self.is_initialized = True
             self.logger.info(
                 f"✅ Email processing components initialized "
-                f"(concurrency limit: {self.max_concurrent_offers})"
+                f"(workers: {self.max_concurrent_offers}, stage limits: {get_stage_limiter().limits})"
             )
 
         except Exception as e:
@@ -109,27 +163,15 @@ class OfferAutomationV2:
     async def close(self) -> None:
         """Clean up resources."""
         self.logger.info("Closing Offer Automation V2...")
-        # Add any cleanup needed
-
-    async def _process_with_semaphore(self, email_data: Dict[str, Any]) -> WorkflowResult:
-        """
-        Process a single email with semaphore-controlled concurrency.
-
-        Args:
-            email_data: Email data to process
-
-        Returns:
-            WorkflowResult
-        """
-        async with self.semaphore:
-            email_id = email_data.get('id', 'unknown')
-            self.logger.info(f"🔒 Acquired semaphore slot for email {email_id}")
-
-            try:
-                result = await self.process_single_email(email_data)
-                return result
-            finally:
-                self.logger.info(f"🔓 Released semaphore slot for email {email_id}")
+        if self.worker_pool:
+            await self.worker_pool.stop()
+        if self.label_updates:
+            await self.label_updates.stop()
+        if self.offer_queue:
+            self.offer_queue.close()
+        if self.mailbox_sync:
+            self.mailbox_sync.close()
+        await self.health_monitor.stop()
 
     async def process_single_email(self, email_data: Dict[str, Any]) -> WorkflowResult:
         """
@@ -165,7 +207,26 @@ class OfferAutomationV2:
 
         try:
             # Use the orchestrator to process the offer
-            result = await self.orchestrator.process_offer_request(email_data)
+            request_id = email_data.get('id')
+            result = await self.orchestrator.process_offer_request(email_data, request_id=request_id)
+
+            # Transient failures (e.g. Lemonsoft errors) resume from the failed step;
+            # checkpointed extraction and matching results are not recomputed
+            attempt = 0
+            while (
+                not result.success
+                and attempt < self.resume_attempts
+                and result.context is not None
+                and WorkflowDefinition.is_retriable_step(result.context.current_step)
+            ):
+                attempt += 1
+                failed_step = result.context.current_step.value
+                self.logger.warning(
+                    f"🔁 Step {failed_step} failed, resuming from checkpoint "
+                    f"(attempt {attempt}/{self.resume_attempts})"
+                )
+                await asyncio.sleep(self.resume_delay_seconds * attempt)
+                result = await self.orchestrator.process_offer_request(email_data, request_id=request_id)
 
             processing_time = (datetime.now() - start_time).total_seconds()
 
@@ -191,56 +252,84 @@ class OfferAutomationV2:
                 if self.gmail_sender and email_data.get('sender'):
                     await self._send_failure_notification(email_data, result)
 
+            self._label_outcome(email_data, result.success)
+            release_attachments(email_data)
             return result
 
         except Exception as e:
             self.logger.error(f"Unexpected error processing email: {e}", exc_info=True)
+            self._label_outcome(email_data, False)
+            # Not on cancellation: an interrupted job is requeued and still needs its files
+            release_attachments(email_data)
             return WorkflowResult(
                 success=False,
                 errors=[str(e)]
             )
 
-    async def process_incoming_emails(self, max_emails: int = 10) -> List[WorkflowResult]:
+    def _label_outcome(self, email_data: Dict[str, Any], success: bool) -> None:
+        """Queue the processed or failed status label for an email."""
+        if self.label_updates and email_data.get('id'):
+            self.label_updates.add([email_data['id']], TRANSITION_PROCESSED if success else TRANSITION_FAILED)
+
+    async def process_incoming_emails(self, max_emails: int = 10) -> List[str]:
         """
-        Poll and process incoming offer request emails concurrently.
+        Poll incoming offer request emails and queue them for the worker pool.
 
-        Processes up to max_concurrent_offers emails in parallel, controlled by semaphore.
+        Offer requests are persisted in the priority queue (small requests and
+        express customers first) and processed by the workers as slots free up,
+        so a large tender no longer holds back the rest of its poll batch.
 
         Args:
-            max_emails: Maximum number of emails to process in one batch
+            max_emails: Maximum number of emails to fetch in one poll
 
         Returns:
-            List of WorkflowResult objects
+            List of queued job IDs
         """
         if not self.is_initialized:
             await self.initialize()
 
+        # Shed load: leave new mail unread while the ERP is slow or down
+        paused_on = self.health_monitor.should_pause(self.intake_dependencies)
+        if paused_on:
+            self.logger.warning(f"⏸️ Skipping email poll: {', '.join(paused_on)} degraded or unavailable")
+            return []
 
         try:
-            # Fetch unread emails
-            emails = await self.gmail_processor.get_recent_emails(
-                max_results=max_emails
-            )
+            if self.mailbox_sync:
+                # Only mail added since the last poll, plus anything not yet processed
+                message_ids = await self.mailbox_sync.next_batch(max_emails)
+                if not message_ids:
+                    return []
+                emails = await self.gmail_processor.get_emails_by_id(message_ids)
+                fetched = {email_data.get('id') for email_data in emails}
+                await self.mailbox_sync.mark_failed([message_id for message_id in message_ids if message_id not in fetched])
+            else:
+                # Fetch unread emails
+                emails = await self.gmail_processor.get_recent_emails(
+                    max_results=max_emails
+                )
 
             if not emails:
                 return []
 
-            self.logger.info(
-                f"Found {len(emails)} new offer request(s) - "
-                f"processing up to {self.max_concurrent_offers} concurrently"
-            )
+            self.logger.info(f"Found {len(emails)} new email(s)")
 
             # Classify and filter emails first
             emails_to_process = []
+            skipped_ids = []
             for email_data in emails:
                 if self.email_classifier:
                     try:
-                        classification = await self.email_classifier.classify_email(email_data)
+                        # Classification of polled mail is background work
+                        with use_llm_priority(PRIORITY_BATCH):
+                            classification = await self.email_classifier.classify_email(email_data)
                         if classification['action'] != EmailAction.START_OFFER_AUTOMATION:
                             self.logger.info(
                                 f"Email {email_data.get('id', 'unknown')} classified as "
                                 f"{classification['action'].value}, skipping"
                             )
+                            skipped_ids.append(email_data.get('id'))
+                            release_attachments(email_data)
                             continue
                     except Exception as e:
                         self.logger.error(f"Email classification failed: {e}")
@@ -248,53 +337,29 @@ class OfferAutomationV2:
 
                 emails_to_process.append(email_data)
 
-            if not emails_to_process:
-                self.logger.info("No emails to process after classification")
-                # Still mark all fetched emails as read to prevent re-classification
-                if self.gmail_processor:
-                    for email_data in emails:
-                        email_id = email_data.get('id')
-                        if email_id:
-                            try:
-                                await self.gmail_processor.mark_email_as_read(email_id)
-                                self.logger.debug(f"✅ Marked skipped email {email_id} as read")
-                            except Exception as e:
-                                self.logger.warning(f"Failed to mark email {email_id} as read: {e}")
-                    self.logger.info(f"✅ Marked {len(emails)} skipped emails as read")
-                return []
-
-            self.logger.info(f"Processing {len(emails_to_process)} emails concurrently...")
-
-            # Process emails concurrently with semaphore control
-            tasks = [
-                self._process_with_semaphore(email_data)
-                for email_data in emails_to_process
-            ]
-
-            # Wait for all tasks to complete
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-
-            # Handle results
-            processed_results = []
-            for i, result in enumerate(results):
-                email_data = emails_to_process[i]
-                email_id = email_data.get('id', 'unknown')
-
-                # Handle exceptions from tasks
-                if isinstance(result, Exception):
-                    self.logger.error(
-                        f"Email {email_id} processing failed with exception: {result}",
-                        exc_info=result
-                    )
-                    processed_results.append(
-                        WorkflowResult(success=False, errors=[str(result)])
-                    )
-                else:
-                    processed_results.append(result)
-
-            # Mark ALL fetched emails as read (regardless of classification or processing result)
-            # This prevents infinite loops of re-processing failing or skipped emails
-            if self.gmail_processor:
+            # Queue offer requests; the queue is persistent, so marking the
+            # emails read below cannot lose a request
+            queued_ids = []
+            for email_data in emails_to_process:
+                job_id = await self.worker_pool.submit(email_data, job_id=email_data.get('id'))
+                if job_id:
+                    queued_ids.append(job_id)
+
+            # The ledger, not the read state, keeps queued and skipped emails from coming back
+            if self.mailbox_sync:
+                await self.mailbox_sync.mark_processed(email_data.get('id') for email_data in emails)
+
+            # Mark ALL fetched emails as read (regardless of classification)
+            # This prevents re-classification of skipped emails
+            if self.label_updates:
+                # Applied by the buffer's next batchModify flush; queued emails get
+                # their processed/failed label when their offer job finishes
+                self.label_updates.add(skipped_ids, TRANSITION_PROCESSED)
+                self.label_updates.add(
+                    (email_data.get('id') for email_data in emails if email_data.get('id') not in skipped_ids),
+                    TRANSITION_READ,
+                )
+            elif self.gmail_processor:
                 for email_data in emails:
                     email_id = email_data.get('id')
                     if email_id:
@@ -305,15 +370,11 @@ class OfferAutomationV2:
                             self.logger.warning(f"Failed to mark email {email_id} as read: {e}")
                 self.logger.info(f"✅ Marked {len(emails)} emails as read")
 
-            # Summary
-            successful = sum(1 for r in processed_results if r.success)
-            failed = len(processed_results) - successful
-
-            self.logger.info("=" * 80)
-            self.logger.info(f"📊 Batch complete: {successful} successful, {failed} failed")
-            self.logger.info("=" * 80)
-
-            return processed_results
+            self.logger.info(
+                f"📥 Queued {len(queued_ids)} offer request(s); "
+                f"queue: {self.offer_queue.counts()}"
+            )
+            return queued_ids
 
         except Exception as e:
             self.logger.error(f"Error processing incoming emails: {e}", exc_info=True)
@@ -333,14 +394,8 @@ class OfferAutomationV2:
             # Check email connectivity
             email_healthy = self.gmail_processor is not None
 
-            # Check ERP connectivity
-            erp_healthy = True
-            try:
-                # You can add a ping method to repositories if needed
-                pass
-            except Exception as e:
-                self.logger.error(f"ERP health check failed: {e}")
-                erp_healthy = False
+            # ERP connectivity from the cached background probes (no request to the ERP here)
+            erp_healthy = not self.health_monitor.should_pause(self.intake_dependencies, states=(STATE_UNHEALTHY,))
 
             overall_healthy = email_healthy and erp_healthy
 
@@ -348,7 +403,16 @@ class OfferAutomationV2:
                 'status': 'healthy' if overall_healthy else 'degraded',
                 'email_processor': 'healthy' if email_healthy else 'unavailable',
                 'erp_system': 'healthy' if erp_healthy else 'unavailable',
+                'dependencies': self.health_monitor.snapshot(),
+                'intake_paused_on': self.health_monitor.should_pause(self.intake_dependencies),
                 'erp_type': getattr(self.orchestrator, 'erp_type', 'unknown'),
+                'scheduler': self.worker_pool.stats() if self.worker_pool else None,
+                'mailbox_sync': self.mailbox_sync.stats() if self.mailbox_sync else None,
+                'gmail_label_updates': self.label_updates.stats() if self.label_updates else None,
+                'attachment_spool': get_attachment_store().stats() if spooling_enabled() else None,
+                'llm_gateway': get_llm_gateway().stats(),
+                'llm_rate_limits': get_rate_limiter().stats(),
+                'llm_cache': get_llm_cache().stats(),
                 'timestamp': datetime.now().isoformat()
             }
 
@@ -507,14 +571,10 @@ async def main():
                 # Check for new emails every 30 seconds
                 await asyncio.sleep(30)
 
-                results = await automation.process_incoming_emails(max_emails=5)
+                queued = await automation.process_incoming_emails(max_emails=5)
 
-                if results:
-                    successful = sum(1 for r in results if r.success)
-                    logger.info(
-                        f"📊 Processed {len(results)} emails: "
-                        f"{successful} successful, {len(results) - successful} failed"
-                    )
+                if queued:
+                    logger.info(f"📊 Queued {len(queued)} offer requests")
 
             except KeyboardInterrupt:
                 break
@@ -21,6 +21,7 @@ from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaIoBaseUpload
 import io
 
+from src.llm.gateway import get_llm_gateway
 from src.utils.logger import get_logger
 from src.utils.exceptions import EmailSenderError
 
@@ -628,10 +629,12 @@ Vastaa JSON-muodossa:
                 candidate_count=1,
             )
 
-            response = gemini_client.models.generate_content(
+            response = await get_llm_gateway().generate_content(
                 model=model,
                 contents=prompt,
                 config=config,
+                client=gemini_client,
+                label="confirmation_email",
             )
 
             # Extract response text
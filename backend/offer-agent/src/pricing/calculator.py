@@ -7,6 +7,7 @@ discounts, product group pricing, and sophisticated pricelist integration.
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 from dataclasses import dataclass
+import asyncio
 import math
 
 from src.config.settings import get_settings
@@ -15,7 +16,12 @@ from src.utils.logger import get_logger
 from src.utils.exceptions import ValidationError
 from src.product_matching.matcher_class import ProductMatch
 from src.lemonsoft.api_client import LemonsoftAPIClient
-from src.lemonsoft.database_connection import LemonsoftDatabaseClient
+from src.pricing.rule_engine import (
+    PricingRuleEngine,
+    PricingSnapshot,
+    normalize_group_id,
+    normalize_group_key,
+)
 import os
 import httpx
 import json
@@ -117,6 +123,9 @@ class PricingCalculator:
         
         # HTTP client for Function App proxy (only in docker mode)
         self.http_client = None
+        
+        # Vectorised discount resolution for whole offers
+        self.rule_engine = PricingRuleEngine()
     
     def _initialize_default_pricing_rules(self) -> List[PricingRule]:
         """Initialize default pricing rules."""
@@ -162,6 +171,8 @@ class PricingCalculator:
             # Direct database mode
             try:
                 if self.database_client is None:
+                    # Imported here: pyodbc needs the unixODBC driver manager, which only direct mode uses
+                    from src.lemonsoft.database_connection import LemonsoftDatabaseClient
                     self.database_client = LemonsoftDatabaseClient()
                 
                 # Test database connection
@@ -307,6 +318,22 @@ class PricingCalculator:
             if customer_id:
                 customer_data = await self.lemonsoft_client.get_customer(customer_id)
             
+            # Price all catalogue lines in one rule-engine pass
+            catalogue_matches = [m for m in product_matches if m.product_code != "9000"]
+            catalogue_items: List[LineItemPricing] = []
+            if catalogue_matches:
+                try:
+                    catalogue_items = await self._calculate_lines_with_rule_engine(
+                        catalogue_matches, customer_id
+                    )
+                except Exception as e:
+                    self.logger.warning(f"Rule engine pricing failed, falling back to per-line pricing: {e}")
+                    catalogue_items = [
+                        await self._calculate_line_pricing(match, customer_id, customer_data, pricing_context)
+                        for match in catalogue_matches
+                    ]
+            catalogue_iter = iter(catalogue_items)
+            
             # Calculate line item pricing
             line_items = []
             for match in product_matches:
@@ -355,10 +382,7 @@ class PricingCalculator:
                     
                     line_items.append(line_pricing)
                 else:
-                    line_pricing = await self._calculate_line_pricing(
-                        match, customer_id, customer_data, pricing_context
-                    )
-                    line_items.append(line_pricing)
+                    line_items.append(next(catalogue_iter))
             
             # Calculate offer totals
             offer_pricing = self._calculate_offer_totals(line_items, customer_data, pricing_context)
@@ -461,6 +485,392 @@ class PricingCalculator:
     
 
     
+    async def _calculate_lines_with_rule_engine(
+        self,
+        matches: List[ProductMatch],
+        customer_id: str
+    ) -> List[LineItemPricing]:
+        """
+        Price catalogue lines in one pass using the declarative rule engine.
+        
+        Product info is fetched concurrently per unique code and all SQL lookups are
+        batched per offer into a PricingSnapshot, so a 500-line tender costs a handful
+        of queries plus a few vector operations. Results are identical to running
+        _calculate_line_pricing for each line.
+        """
+        if not self.lemonsoft_client or not self.lemonsoft_client.client:
+            raise Exception("Lemonsoft client not initialized")
+        
+        codes = list(dict.fromkeys(match.product_code for match in matches))
+        product_results = await asyncio.gather(
+            *(self.lemonsoft_client.get_product(code) for code in codes),
+            return_exceptions=True
+        )
+        products = dict(zip(codes, product_results))
+        
+        lines = []
+        for match in matches:
+            product_info = products.get(match.product_code)
+            row = {
+                'product_code': match.product_code,
+                'quantity': match.quantity_requested,
+                'found': False,
+                'vat_rate': BusinessConstants.DEFAULT_VAT_RATE,
+            }
+            if isinstance(product_info, Exception):
+                # Same as _calculate_line_pricing when the product lookup fails: the match price
+                fallback_price = match.price if match.price is not None else 0.0
+                row.update({
+                    'list_price': fallback_price,
+                    'fallback_net_price': fallback_price,
+                    'fallback_discount_percent': BusinessConstants.DEFAULT_DISCOUNT_PERCENT,
+                    'fallback_type': 'error_fallback',
+                    'fallback_rule': "Fallback pricing",
+                })
+            elif not product_info:
+                row.update({'list_price': 0.0, 'fallback_type': 'none', 'fallback_rule': ''})
+            else:
+                row.update({
+                    'found': True,
+                    'list_price': getattr(product_info, 'list_price', 0.0),
+                    'product_group': getattr(product_info, 'product_group', None),
+                    'product_price': getattr(product_info, 'product_price', None),
+                    'vat_rate': product_info.vat_rate,
+                })
+            lines.append(row)
+        
+        frame = self.rule_engine.build_frame(lines)
+        found_codes = [code for code in codes if products.get(code) and not isinstance(products[code], Exception)]
+        snapshot = await self._build_pricing_snapshot(customer_id, found_codes, frame)
+        priced = self.rule_engine.evaluate(frame, snapshot)
+        
+        extra_names = await self._get_product_extra_names(found_codes)
+        default_units = await self._get_product_default_units(found_codes)
+        
+        line_items = []
+        for match, row in zip(matches, priced.itertuples(index=False)):
+            line_items.append(LineItemPricing(
+                product_code=match.product_code,
+                product_name=getattr(match, 'product_name', ''),
+                extra_name=extra_names.get(match.product_code, ""),
+                unit=default_units.get(match.product_code, BusinessConstants.DEFAULT_UNIT),
+                quantity=match.quantity_requested,
+                unit_price=float(row.unit_price),
+                list_price=float(row.list_price),
+                net_price=float(row.net_price),
+                vat_rate=float(row.vat_rate),
+                discount_percent=float(row.discount_percent),
+                line_total=float(row.line_total),
+                vat_amount=float(row.vat_amount),
+                applied_rules=[row.applied_rule] if row.applied_rule else []
+            ))
+        
+        self.logger.info(f"Rule engine priced {len(line_items)} lines ({len(codes)} unique products)")
+        return line_items
+    
+    def _sql_available(self) -> bool:
+        """Whether any SQL execution path is configured."""
+        return self.database_client is not None or (self.deployment_mode == 'docker' and self.http_client is not None)
+    
+    @staticmethod
+    def _chunks(values: List[Any], size: int = TechnicalConstants.SQL_IN_CLAUSE_BATCH_SIZE):
+        """Yield successive chunks of values for IN (...) clauses."""
+        for i in range(0, len(values), size):
+            yield values[i:i + size]
+    
+    async def _build_pricing_snapshot(
+        self,
+        customer_id: str,
+        product_codes: List[str],
+        frame: Any
+    ) -> PricingSnapshot:
+        """
+        Fetch all customer-scoped pricing lookup tables for an offer in batched queries.
+        
+        Follows the same preconditions as _get_lemonsoft_pricing: product-specific
+        pricing needs a customer number, PRIMARY group discounts the internal customer
+        ID, and general group discounts a customer ID and product group.
+        """
+        sql_available = self._sql_available()
+        snapshot = PricingSnapshot(sql_available=sql_available)
+        if not product_codes:
+            return snapshot
+        
+        if sql_available:
+            customer_info = await self._get_customer_info(customer_id)
+            customer_number = None
+            if customer_info:
+                customer_number = customer_info.get('customer_number') or customer_info.get('number')
+                self.logger.info(f"Customer {customer_id} resolved to customer number: {customer_number}")
+            else:
+                self.logger.warning(f"Could not resolve customer {customer_id} to customer number")
+            
+            # Normalise the raw values: Series.map would store None as NaN in string columns
+            groups = frame['product_group'].tolist()
+            group_keys = sorted({k for k in map(normalize_group_key, groups) if k})
+            group_ids = sorted({k for k in map(normalize_group_id, groups) if k})
+            
+            if customer_number:
+                snapshot.product_percent, snapshot.product_fixed = await self._get_product_specific_pricing_batch(
+                    product_codes, customer_number
+                )
+            
+            if customer_info and customer_info.get('id') and group_ids:
+                snapshot.primary_group = await self._get_primary_customer_product_group_discounts_batch(
+                    customer_info.get('id'), group_ids
+                )
+            
+            if customer_id and customer_number and group_keys:
+                snapshot.general_group = await self._get_general_product_group_discounts_batch(
+                    customer_number, group_keys
+                )
+        
+        snapshot.exp_prices = await self._get_product_exp_prices(product_codes)
+        return snapshot
+    
+    async def _get_product_specific_pricing_batch(
+        self,
+        product_codes: List[str],
+        customer_number: str
+    ) -> tuple:
+        """
+        Batched v_pricelist_products lookup for all offer products.
+        
+        Returns:
+            (percent_table, fixed_table) keyed by product code with
+            (discount_value, pricelist_id) entries; highest pricelist_id wins.
+        """
+        percent_table: Dict[str, tuple] = {}
+        fixed_table: Dict[str, tuple] = {}
+        
+        pricelist_ids = await self._get_customer_pricelist_ids(customer_number)
+        if not pricelist_ids:
+            self.logger.info(f"No pricelists found for customer {customer_number}")
+            return percent_table, fixed_table
+        
+        list_placeholders = ','.join(['?'] * len(pricelist_ids))
+        for chunk in self._chunks(product_codes):
+            code_placeholders = ','.join(['?'] * len(chunk))
+            query = f"""
+            SELECT 
+                vpp.pricelist_id,
+                p.product_code,
+                CASE WHEN vpp.pricelist_product_discount > 0 THEN 'percent' ELSE 'fixedprice' END as discount_type,
+                CAST((CASE WHEN vpp.pricelist_product_discount > 0 THEN vpp.pricelist_product_discount ELSE vpp.pricelist_product_price END) AS DECIMAL(12,4)) as discount_value
+            FROM v_pricelist_products as vpp
+            JOIN products as p ON p.product_code = vpp.pricelist_product_code
+            WHERE vpp.pricelist_id IN ({list_placeholders})
+            AND p.product_code IN ({code_placeholders})
+            AND vpp.pricelist_product_group = 0
+            ORDER BY vpp.pricelist_id DESC
+            """
+            try:
+                rows = await self._execute_sql_query(query, pricelist_ids + chunk)
+            except Exception as e:
+                self.logger.warning(f"Batched product-specific pricing query failed: {e}")
+                continue
+            
+            for row in rows or []:
+                code = str(row['product_code'])
+                if code in percent_table or code in fixed_table:
+                    continue
+                entry = (row['discount_value'], row['pricelist_id'])
+                if row['discount_type'] == 'percent':
+                    percent_table[code] = entry
+                else:
+                    fixed_table[code] = entry
+        
+        self.logger.info(
+            f"Product-specific pricing: {len(percent_table)} percent, {len(fixed_table)} fixed "
+            f"for customer {customer_number}"
+        )
+        return percent_table, fixed_table
+    
+    async def _get_primary_customer_product_group_discounts_batch(
+        self,
+        customer_id: str,
+        group_ids: List[str]
+    ) -> Dict[str, tuple]:
+        """Batched customer_product_group_pricelist lookup keyed by integer group ID."""
+        try:
+            customer_id_int = int(str(customer_id).replace(' ', '').strip())
+        except (ValueError, TypeError):
+            self.logger.warning(f"Invalid customer_id format: {customer_id}")
+            return {}
+        
+        table: Dict[str, tuple] = {}
+        for chunk in self._chunks(group_ids):
+            placeholders = ','.join(['?'] * len(chunk))
+            query = f"""
+            SELECT 
+                CAST(cpgp.group_id as varchar) as tuoteryhma,
+                CAST(cpgp.discount_percent AS DECIMAL(12,4)) as alepros
+            FROM [dbo].[customer_product_group_pricelist] as cpgp 
+            JOIN [dbo].[customers] as c ON (cpgp.customer_id = c.customer_id)
+            WHERE cpgp.customer_id = ?
+            AND cpgp.group_id IN ({placeholders})
+            AND cpgp.discount_percent > 0
+            """
+            try:
+                rows = await self._execute_sql_query(query, [customer_id_int] + [int(g) for g in chunk])
+            except Exception as e:
+                self.logger.warning(f"Batched PRIMARY customer product group query failed: {e}")
+                continue
+            
+            for row in rows or []:
+                group = normalize_group_id(row['tuoteryhma'])
+                if group and group not in table:
+                    table[group] = (float(row['alepros']), group)
+        
+        self.logger.info(f"PRIMARY customer product group discounts: {len(table)} groups for customer {customer_id_int}")
+        return table
+    
+    async def _get_general_product_group_discounts_batch(
+        self,
+        customer_number: str,
+        group_keys: List[str]
+    ) -> Dict[str, tuple]:
+        """
+        Batched general product group discount lookup.
+        
+        Same hybrid approach as _get_general_product_group_discount: the
+        cross-pricelist validated query first, then the simple query for groups
+        it did not cover. Highest discount per group wins.
+        """
+        table: Dict[str, tuple] = {}
+        
+        for query_type in ('sophisticated', 'simple'):
+            remaining = [g for g in group_keys if g not in table]
+            for chunk in self._chunks(remaining):
+                placeholders = ','.join(['?'] * len(chunk))
+                cross_pricelist_filter = """
+                AND EXISTS (
+                    SELECT pp2.pricelist_product_code  
+                    FROM [dbo].[pricelist_products] as pp2 
+                    JOIN [dbo].[pricelist_customers] as pc2 ON (pp2.pricelist_id = pc2.pricelist_id) 
+                    WHERE pp2.pricelist_product_code = pp.pricelist_product_code 
+                    AND pp.pricelist_id <> pp2.pricelist_id 
+                    AND pc2.pricelist_customer_number = c.customer_number
+                    AND pp2.pricelist_product_group = 1 
+                    AND ISNUMERIC(REPLACE(pp2.pricelist_product_code, ' ', '')) = 1
+                    AND LEN(REPLACE(pp2.pricelist_product_code, ' ', '')) > 0
+                )""" if query_type == 'sophisticated' else ""
+                query = f"""
+                SELECT 
+                    pp.pricelist_product_code as tuoteryhma, 
+                    CAST(pp.pricelist_product_discount AS DECIMAL(12,4)) as alepros
+                FROM [dbo].[pricelist_products] as pp 
+                JOIN [dbo].[pricelist_customers] as pc ON (pp.pricelist_id = pc.pricelist_id) 
+                JOIN [dbo].[customers] as c ON (pc.pricelist_customer_number = c.customer_number)  
+                JOIN [dbo].[pricelists] p ON p.pricelist_id = pc.pricelist_id
+                WHERE pp.pricelist_product_group = 1 
+                AND c.customer_number = ?
+                AND pp.pricelist_product_code IN ({placeholders})
+                AND pp.pricelist_product_discount > 0{cross_pricelist_filter}
+                ORDER BY pp.pricelist_product_discount DESC
+                """
+                try:
+                    rows = await self._execute_sql_query(query, [customer_number] + chunk)
+                except Exception as e:
+                    self.logger.warning(f"Batched {query_type} general group discount query failed: {e}")
+                    continue
+                
+                for row in rows or []:
+                    group = normalize_group_key(row['tuoteryhma'])
+                    if group and group not in table:
+                        table[group] = (float(row['alepros']), group)
+        
+        self.logger.info(f"General group discounts: {len(table)} groups for customer {customer_number}")
+        return table
+    
+    async def _get_product_exp_prices(self, product_codes: List[str]) -> Dict[str, float]:
+        """Batched product_pricing.product_exp_price lookup keyed by product code."""
+        if not self._sql_available():
+            return {}
+        
+        prices: Dict[str, float] = {}
+        for chunk in self._chunks(product_codes):
+            placeholders = ','.join(['?'] * len(chunk))
+            query = f"""
+            SELECT p.product_code, pp.product_exp_price as net_price
+            FROM product_pricing pp
+            JOIN products p ON pp.product_id = p.product_id
+            WHERE p.product_code IN ({placeholders})
+            """
+            try:
+                rows = await self._execute_sql_query(query, chunk)
+            except Exception as e:
+                self.logger.warning(f"Batched product_exp_price lookup failed: {e}")
+                continue
+            for row in rows or []:
+                if row['net_price'] is not None:
+                    prices.setdefault(str(row['product_code']), float(row['net_price']))
+        return prices
+    
+    async def _get_product_extra_names(self, product_codes: List[str]) -> Dict[str, str]:
+        """Batched products.product_description2 lookup keyed by product code."""
+        if not product_codes or not self._sql_available():
+            return {}
+        
+        extra_names: Dict[str, str] = {}
+        for chunk in self._chunks(product_codes):
+            placeholders = ','.join(['?'] * len(chunk))
+            query = f"""
+            SELECT p.product_code, p.product_description2 as extra_name
+            FROM products p
+            WHERE p.product_code IN ({placeholders})
+            """
+            try:
+                rows = await self._execute_sql_query(query, chunk)
+            except Exception as e:
+                self.logger.warning(f"Batched product extra_name lookup failed: {e}")
+                continue
+            for row in rows or []:
+                extra_names.setdefault(str(row['product_code']), str(row['extra_name'] or ""))
+        return extra_names
+    
+    async def _get_product_default_units(self, product_codes: List[str]) -> Dict[str, str]:
+        """Batched default purchase unit lookup, same priority as _get_product_default_unit."""
+        if not product_codes or not self._sql_available():
+            return {}
+        
+        units: Dict[str, str] = {}
+        for chunk in self._chunks(product_codes):
+            placeholders = ','.join(['?'] * len(chunk))
+            query = f"""
+            SELECT p.product_code, pu.product_unit as default_unit
+            FROM products p
+            LEFT JOIN (
+                SELECT 
+                    product_id,
+                    product_unit,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY product_id 
+                        ORDER BY 
+                            CASE 
+                                WHEN product_unit = 'KPL' THEN 1
+                                WHEN product_unit = 'M' THEN 2
+                                WHEN product_unit = '1' THEN 3
+                                ELSE 4
+                            END,
+                            product_unit
+                    ) as priority_rank
+                FROM [product_units]
+                WHERE product_unit_use_purchase_bit = 1
+                    AND product_unit NOT LIKE 'BOX%'
+            ) pu ON p.[product_id] = pu.[product_id] AND pu.priority_rank = 1
+            WHERE p.product_code IN ({placeholders})
+            """
+            try:
+                rows = await self._execute_sql_query(query, chunk)
+            except Exception as e:
+                self.logger.warning(f"Batched product default_unit lookup failed: {e}")
+                continue
+            for row in rows or []:
+                if row['default_unit']:
+                    units.setdefault(str(row['product_code']), str(row['default_unit']))
+        return units
+    
     def _calculate_offer_totals(
         self,
         line_items: List[LineItemPricing],
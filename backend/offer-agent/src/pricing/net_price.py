@@ -13,6 +13,7 @@ from src.config.settings import get_settings
 from src.utils.logger import get_logger
 from src.utils.exceptions import ValidationError
 from src.product_matching.matcher_class import ProductMatch
+from src.scheduler.batch_scope import batch_memoize
 from src.lemonsoft.api_client import LemonsoftAPIClient
 from src.lemonsoft.database_connection import LemonsoftDatabaseClient
 import os
@@ -212,6 +213,9 @@ class PricingCalculator:
         """
         Execute SQL query using the appropriate method based on deployment mode.
         
+        Pricing queries are read-only, so within a bulk batch each distinct
+        query runs once and its rows are shared by the batch's requests.
+        
         Args:
             query: SQL query string
             params: Query parameters
@@ -219,6 +223,13 @@ class PricingCalculator:
         Returns:
             List of result rows as dictionaries
         """
+        return await batch_memoize(
+            "pricing_sql", (query, tuple(params or ())),
+            lambda: self._run_sql_query(query, params)
+        )
+    
+    async def _run_sql_query(self, query: str, params: list = None) -> list:
+        """Execute SQL query without batch sharing."""
         if self.deployment_mode == 'docker' and self.http_client:
             return await self._execute_sql_via_function_app(query, params)
         elif self.database_client:
@@ -299,7 +310,10 @@ class PricingCalculator:
             # Get customer information for pricing
             customer_data = None
             if customer_id:
-                customer_data = await self.lemonsoft_client.get_customer(customer_id)
+                customer_data = await batch_memoize(
+                    "pricing_customer", str(customer_id),
+                    lambda: self.lemonsoft_client.get_customer(customer_id)
+                )
             
             # Calculate line item pricing
             line_items = []
@@ -393,7 +407,7 @@ class PricingCalculator:
             )
             
             # Get product info for VAT rate and other details
-            product_info = await self.lemonsoft_client.get_product(match.product_code)
+            product_info = await self._get_product(match.product_code)
             
             list_price = pricing_info.get('list_price', match.price)
             unit_price = pricing_info.get('unit_price', match.price)
@@ -624,7 +638,7 @@ class PricingCalculator:
         
         try:
             # Get product information first (for product group and OVH price)
-            product_info = await self.lemonsoft_client.get_product(product_code)
+            product_info = await self._get_product(product_code)
             if not product_info:
                 self.logger.warning(f"Product {product_code} not found in Lemonsoft")
                 return {"unit_price": 0.0, "list_price": 0.0, "discount_type": "none"}
@@ -825,12 +839,27 @@ class PricingCalculator:
             self.logger.error(f"Traceback: {traceback.format_exc()}")
             return []
     
+    async def _get_product(self, product_code: str) -> Optional[Dict[str, Any]]:
+        """Product from the Lemonsoft API, shared by the requests of a bulk batch."""
+        return await batch_memoize(
+            "pricing_product", str(product_code),
+            lambda: self.lemonsoft_client.get_product(product_code)
+        )
+    
     async def _get_customer_info(self, customer_id: str) -> Optional[Dict[str, Any]]:
         """
         Get customer information using the correct API approach from integration test.
         This method accepts either customer ID or customer number and finds the customer.
         Returns customer data including both id and number fields.
+        Shared by the requests of a bulk batch.
         """
+        return await batch_memoize(
+            "pricing_customer_info", str(customer_id),
+            lambda: self._fetch_customer_info(customer_id)
+        )
+    
+    async def _fetch_customer_info(self, customer_id: str) -> Optional[Dict[str, Any]]:
+        """Look up customer information in Lemonsoft (see _get_customer_info)."""
         # Debug: Check client state at start of method
         print(f"DEBUG: _get_customer_info - lemonsoft_client: {self.lemonsoft_client is not None}")
         if self.lemonsoft_client:
@@ -985,7 +1014,7 @@ class PricingCalculator:
                 
                 if pricing_data['discount_type'] == 'percent':
                     # Get product OVH price to calculate discounted price
-                    product_info = await self.lemonsoft_client.get_product(product_code)
+                    product_info = await self._get_product(product_code)
                     ovh_price = getattr(product_info, 'list_price', 0.0)
                     discounted_price = ovh_price * (1 - pricing_data['discount_value'] / 100)
                     
@@ -0,0 +1,272 @@
+"""
+Pricing Rule Engine
+Declarative, prioritised discount resolution evaluated over a whole offer at once.
+
+Each offer line is a row of a pandas DataFrame (code, group, quantity, base price).
+Rules are applied in priority order and the first rule that matches a row wins,
+mirroring the Lemonsoft hierarchy in PricingCalculator._get_lemonsoft_pricing:
+
+    product-specific price -> PRIMARY customer group discount ->
+    general group discount -> list price (OVH)
+
+Net price resolves independently of the discount: product_exp_price ->
+product_price -> OVH. All lookup data comes from a PricingSnapshot that the
+caller fetches once per offer (batched SQL for Lemonsoft, static for CSV).
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.config.constants import BusinessConstants
+
+
+# Frame columns the engine reads; missing columns and missing cells get these defaults.
+LINE_COLUMNS: Dict[str, Any] = {
+    'product_code': '',
+    'product_group': '',
+    'quantity': 0.0,
+    'list_price': BusinessConstants.DEFAULT_PRODUCT_PRICE,
+    'product_price': np.nan,  # NaN = product has no product_price attribute
+    'vat_rate': BusinessConstants.DEFAULT_VAT_RATE,
+    'found': True,
+    'manual_discount_percent': np.nan,
+    'fallback_type': 'none',
+    'fallback_rule': '',
+    # Unfound lines only: discount and net price (NaN = 0) of the caller's fallback pricing
+    'fallback_discount_percent': 0.0,
+    'fallback_net_price': np.nan,
+}
+
+
+def normalize_group_key(product_group: Any) -> Optional[str]:
+    """Clean a product group the same way the SQL lookups do (strip all spaces)."""
+    if product_group is None or (isinstance(product_group, float) and np.isnan(product_group)):
+        return None
+    clean = str(product_group).replace(' ', '').strip()
+    return clean or None
+
+
+def normalize_group_id(product_group: Any) -> Optional[str]:
+    """Integer form of a product group, as compared by customer_product_group_pricelist."""
+    clean = normalize_group_key(product_group)
+    if clean is None:
+        return None
+    try:
+        return str(int(clean))
+    except (ValueError, TypeError):
+        return None
+
+
+@dataclass(frozen=True)
+class DiscountRule:
+    """
+    Declarative discount rule.
+
+    A rule looks up `key_column` of each line in the snapshot table named `table`
+    (entries are (value, reference) tuples). When key_column is None the value is
+    read directly from the frame column named `table` instead.
+    """
+    discount_type: str
+    priority: int
+    table: str
+    key_column: Optional[str]
+    rule_template: str
+    apply_discount: bool = True  # False = rule sets a price marker, not a discount
+    requires_sql: bool = True
+
+
+@dataclass
+class PricingSnapshot:
+    """Customer-scoped pricing lookup tables, fetched once per offer."""
+    product_percent: Dict[str, Tuple[Any, Any]] = field(default_factory=dict)
+    product_fixed: Dict[str, Tuple[Any, Any]] = field(default_factory=dict)
+    primary_group: Dict[str, Tuple[Any, Any]] = field(default_factory=dict)
+    general_group: Dict[str, Tuple[Any, Any]] = field(default_factory=dict)
+    exp_prices: Dict[str, float] = field(default_factory=dict)
+    sql_available: bool = True
+
+
+# Lemonsoft hierarchy. Lower priority number = evaluated first.
+DEFAULT_RULES: List[DiscountRule] = [
+    DiscountRule(
+        discount_type="manual",
+        priority=0,
+        table="manual_discount_percent",
+        key_column=None,
+        rule_template="Manual line discount {percent}%",
+        requires_sql=False,
+    ),
+    DiscountRule(
+        discount_type="product_specific_percent",
+        priority=10,
+        table="product_percent",
+        key_column="product_code",
+        rule_template="Product-specific discount {value}% (Pricelist {ref})",
+    ),
+    DiscountRule(
+        discount_type="product_specific_fixed",
+        priority=20,
+        table="product_fixed",
+        key_column="product_code",
+        rule_template="Product-specific fixed price €{value} (Pricelist {ref})",
+        apply_discount=False,
+    ),
+    DiscountRule(
+        discount_type="primary_customer_product_group",
+        priority=30,
+        table="primary_group",
+        key_column="group_id",
+        rule_template="PRIMARY Customer Product Group Discount {percent}% for group {product_group}",
+    ),
+    DiscountRule(
+        discount_type="general_group",
+        priority=40,
+        table="general_group",
+        key_column="group_key",
+        rule_template="General group discount for group {product_group}",
+    ),
+]
+
+
+class PricingRuleEngine:
+    """
+    Evaluates prioritised discount rules over a DataFrame of offer lines.
+
+    Usage:
+        engine = PricingRuleEngine()
+        priced = engine.evaluate(lines_df, snapshot)
+
+    The returned frame has one row per input line with columns:
+    list_price, unit_price, discount_type, discount_percent, applied_rule,
+    discounted_price, net_price, line_total, vat_amount.
+    """
+
+    def __init__(self, rules: Optional[List[DiscountRule]] = None):
+        self.rules = sorted(rules if rules is not None else DEFAULT_RULES, key=lambda r: r.priority)
+
+    @staticmethod
+    def build_frame(lines: List[Dict[str, Any]]) -> pd.DataFrame:
+        """Build a line frame from dicts, filling missing columns and cells with defaults."""
+        df = pd.DataFrame(lines)
+        for column, default in LINE_COLUMNS.items():
+            if column not in df.columns:
+                df[column] = default
+            elif not (isinstance(default, float) and np.isnan(default)):
+                # Rows of unfound products lack some keys; NaN cells would poison the totals
+                df[column] = df[column].where(df[column].notna(), default)
+        return df
+
+    def evaluate(self, lines: pd.DataFrame, snapshot: PricingSnapshot) -> pd.DataFrame:
+        """
+        Resolve discounts and totals for every line.
+
+        Args:
+            lines: Frame with LINE_COLUMNS (see build_frame)
+            snapshot: Customer-scoped lookup tables
+
+        Returns:
+            Copy of the frame with pricing result columns added
+        """
+        df = lines.copy()
+        if df.empty:
+            for column in ('unit_price', 'discount_type', 'discount_percent', 'applied_rule',
+                           'discounted_price', 'net_price', 'line_total', 'vat_amount'):
+                df[column] = pd.Series(dtype=object)
+            return df
+
+        groups = df['product_group'].tolist()
+        df['group_key'] = pd.Series([normalize_group_key(g) for g in groups], index=df.index, dtype=object)
+        df['group_id'] = pd.Series([normalize_group_id(g) for g in groups], index=df.index, dtype=object)
+        df['list_price'] = df['list_price'].astype(float)
+        df['quantity'] = df['quantity'].astype(float)
+
+        n = len(df)
+        found = df['found'].to_numpy(dtype=bool)
+        resolved = ~found
+        discount_percent = np.zeros(n, dtype=float)
+
+        if snapshot.sql_available:
+            default_type, default_rule = "none", "List price (OVH)"
+        else:
+            default_type, default_rule = "api_only", "API-only pricing (List price from product info)"
+        discount_type = np.where(found, default_type, df['fallback_type'].to_numpy(dtype=object)).astype(object)
+        applied_rule = np.where(found, default_rule, df['fallback_rule'].to_numpy(dtype=object)).astype(object)
+
+        for rule in self.rules:
+            if rule.requires_sql and not snapshot.sql_available:
+                continue
+
+            values, raw_values, refs = self._lookup(rule, df, snapshot)
+            mask = ~resolved & values.notna().to_numpy()
+            if not mask.any():
+                continue
+
+            discount_type[mask] = rule.discount_type
+            if rule.apply_discount:
+                discount_percent[mask] = values.to_numpy(dtype=float)[mask]
+
+            rows = np.flatnonzero(mask)
+            applied_rule[mask] = [
+                rule.rule_template.format(
+                    value=raw_values.iat[i],
+                    percent=values.iat[i],
+                    ref=refs.iat[i],
+                    product_code=df['product_code'].iat[i],
+                    product_group=df['product_group'].iat[i],
+                )
+                for i in rows
+            ]
+            resolved |= mask
+
+        list_price = df['list_price'].to_numpy(dtype=float)
+        quantity = df['quantity'].to_numpy(dtype=float)
+        vat_rate = df['vat_rate'].astype(float).to_numpy()
+
+        # Net price: product_exp_price -> product_price -> OVH; unfound products use the
+        # caller's fallback net price (0 if none), and its fallback discount
+        exp_prices = df['product_code'].map(pd.Series(snapshot.exp_prices, dtype=float)) \
+            if snapshot.exp_prices else pd.Series(np.nan, index=df.index)
+        net_price = exp_prices.fillna(df['product_price'].astype(float)).fillna(df['list_price'])
+        fallback_net = df['fallback_net_price'].astype(float).fillna(0.0).to_numpy()
+        net_price = np.where(found, net_price.to_numpy(dtype=float), fallback_net)
+        discount_percent = np.where(found, discount_percent, df['fallback_discount_percent'].astype(float).to_numpy())
+
+        discounted_price = list_price * (1 - discount_percent / 100)
+        line_total = discounted_price * quantity
+
+        df['unit_price'] = list_price
+        df['discount_type'] = discount_type
+        df['discount_percent'] = discount_percent
+        df['applied_rule'] = applied_rule
+        df['discounted_price'] = discounted_price
+        df['net_price'] = net_price
+        df['line_total'] = line_total
+        df['vat_amount'] = line_total * (vat_rate / 100)
+        return df
+
+    @staticmethod
+    def _lookup(
+        rule: DiscountRule,
+        df: pd.DataFrame,
+        snapshot: PricingSnapshot
+    ) -> Tuple[pd.Series, pd.Series, pd.Series]:
+        """Return (numeric value, raw value, reference) series for a rule; NaN = no match."""
+        if rule.key_column is None:
+            values = pd.to_numeric(df[rule.table], errors='coerce')
+            values = values.where(values > 0)
+            return values, values, pd.Series(None, index=df.index, dtype=object)
+
+        table: Dict[str, Tuple[Any, Any]] = getattr(snapshot, rule.table, {}) or {}
+        if not table:
+            empty = pd.Series(np.nan, index=df.index)
+            return empty, empty, empty
+
+        # Object series keep raw values and references as fetched (a pricelist id 7 must not print as 7.0)
+        matched = [table.get(k) for k in df[rule.key_column].tolist()]
+        raw_values = pd.Series([m[0] if m else None for m in matched], index=df.index, dtype=object)
+        refs = pd.Series([m[1] if m else None for m in matched], index=df.index, dtype=object)
+        values = pd.to_numeric(raw_values, errors='coerce')
+        return values, raw_values, refs
@@ -1,13 +1,14 @@
 """
 AI analyzer module for identifying unclear Finnish HVAC product terms using Gemini
 """
+import asyncio
 import logging
-import time
 import json
 import os
 import sys
 import re
-from typing import List, Dict, Optional, Set
+import time
+from typing import Callable, List, Dict, Optional, Set
 from google import genai
 from google.genai import types
 import io
@@ -29,62 +30,28 @@ except ImportError:
             OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
             # Container analysis preference: 'gemini' or 'openai'
             CONTAINER_ANALYSIS_PREFERENCE = os.getenv('CONTAINER_ANALYSIS_PREFERENCE', 'gemini')
+            OPENAI_CODE_INTERPRETER_MODEL = os.getenv('OPENAI_CODE_INTERPRETER_MODEL', 'gpt-4.1')
+
+from src.llm.cache import get_llm_cache, make_cache_key
+from src.llm.gateway import get_llm_gateway
+from src.llm.rate_limiter import estimate_tokens, get_rate_limiter
+from src.llm.streaming_json import IncrementalJSONObjectParser
+from src.product_matching.matching_pipeline import StreamingMatchPipeline
+from src.product_matching.model_router import ModelRouter
+from src.product_matching.sharded_matcher import ShardedMatcher
+from src.product_matching.shared_matcher import SharedTermMatcher
+from src.scheduler.batch_scope import current_batch_scope
 
 class AIAnalyzer:
     """Handles AI analysis of product names and company information using Gemini API"""
     
-    def _retry_llm_request(self, request_func, *args, **kwargs):
-        """Wrapper to retry LLM requests with appropriate wait times based on error type.
-        
-        - 503 errors: immediate retry (up to 3 times)
-        - Rate limit errors (429): wait 10 seconds before retry
-        - Other errors: exponential backoff
-        """
-        max_retries = 5
-        base_wait = 1  # Base wait time in seconds
-        
-        for attempt in range(max_retries):
-            try:
-                # Call the wrapped function
-                return request_func(*args, **kwargs)
-                
-            except Exception as e:
-                error_str = str(e).lower()
-                self.logger.warning(f"LLM request failed (attempt {attempt + 1}/{max_retries}): {e}")
-                
-                # Check if it's the last attempt
-                if attempt == max_retries - 1:
-                    self.logger.error(f"LLM request failed after {max_retries} attempts")
-                    raise
-                
-                # Determine wait time based on error type
-                wait_time = base_wait
-                
-                if "503" in error_str or "service unavailable" in error_str:
-                    # 503 errors: immediate retry (very short wait)
-                    wait_time = 2
-                    self.logger.info(f"503 error detected, retrying immediately (wait {wait_time}s)")
-                    
-                elif "429" in error_str or "rate limit" in error_str or "quota" in error_str:
-                    # Rate limit errors: wait 10 seconds
-                    wait_time = 10
-                    self.logger.info(f"Rate limit error detected, waiting {wait_time} seconds before retry")
-                    
-                elif "500" in error_str or "internal" in error_str:
-                    # Internal server errors: exponential backoff
-                    wait_time = base_wait * (2 ** attempt)
-                    self.logger.info(f"Server error detected, waiting {wait_time} seconds (exponential backoff)")
-                    
-                else:
-                    # Other errors: exponential backoff
-                    wait_time = base_wait * (2 ** attempt)
-                    self.logger.info(f"Unknown error, waiting {wait_time} seconds (exponential backoff)")
-                
-                # Wait before retrying
-                time.sleep(wait_time)
-        
-        # This should never be reached due to the raise in the last attempt
-        raise Exception(f"Failed to complete LLM request after {max_retries} attempts")
+    async def _generate_content(self, **kwargs):
+        """Call Gemini through the async LLM gateway (timeouts, backoff, model fallback)."""
+        return await get_llm_gateway().generate_content(
+            client=self.gemini_client,
+            label="ai_analyzer",
+            **kwargs,
+        )
     
     def __init__(self):
         self.logger = logging.getLogger(__name__)
@@ -102,6 +69,9 @@ class AIAnalyzer:
         
         # User instructions extracted from email content (passed to product matcher)
         self.user_instructions: str = ""
+        
+        # Short plain emails are extracted with the fast model
+        self.model_router = ModelRouter()
 
         # Initialize OpenAI client
         self._init_openai_client()
@@ -182,8 +152,7 @@ If no clear company name is found, extract the most likely company name from ava
                 candidate_count=1,
             )
 
-            response = self._retry_llm_request(
-                self.gemini_client.models.generate_content,
+            response = await self._generate_content(
                 model=Config.GEMINI_MODEL,
                 contents=prompt,
                 config=config,
@@ -291,8 +260,43 @@ If no clear company name is found, extract the most likely company name from ava
         matched_products: List[Dict] = []
         unclear_terms: List[Dict] = []
         
-        # Collect all terms for batch processing
-        terms_to_process: List[Dict] = []
+        # Extracted terms are queued for batch matching. With streaming extraction
+        # the matcher starts on the first products while the rest are generated;
+        # otherwise everything is matched in one batch once extraction is done.
+        # With sharding, each batch is split across concurrent agents, so a batch
+        # may take everything that is queued.
+        MAX_BATCH_SIZE = getattr(Config, 'MAX_MATCH_TERMS', 100)
+        streaming_max_batch = getattr(Config, 'STREAMING_MATCH_MAX_BATCH', 25)
+        batch_matcher = matcher
+        if getattr(Config, 'SHARDED_MATCHING', False):
+            batch_matcher = ShardedMatcher(
+                matcher,
+                shard_size=getattr(Config, 'SHARD_SIZE', 20),
+                max_concurrency=getattr(Config, 'SHARD_CONCURRENCY', 4),
+                clustering=getattr(Config, 'SHARD_CLUSTERING', 'keyword'),
+            )
+            streaming_max_batch = MAX_BATCH_SIZE
+        # In a bulk batch, terms already matched for another request are reused
+        batch_scope = current_batch_scope()
+        if batch_scope is not None:
+            batch_matcher = SharedTermMatcher(batch_matcher, batch_scope)
+        streaming = getattr(Config, 'STREAMING_EXTRACTION', False)
+        if streaming:
+            pipeline = StreamingMatchPipeline(
+                batch_matcher,
+                min_batch=getattr(Config, 'STREAMING_MATCH_MIN_BATCH', 5),
+                max_batch=streaming_max_batch,
+                max_terms=MAX_BATCH_SIZE,
+                get_user_instructions=lambda: self.user_instructions,
+            )
+        else:
+            pipeline = StreamingMatchPipeline(
+                batch_matcher,
+                min_batch=MAX_BATCH_SIZE,
+                max_batch=MAX_BATCH_SIZE,
+                max_terms=MAX_BATCH_SIZE,
+                get_user_instructions=lambda: self.user_instructions,
+            )
 
         pdf_map = {}
         for pdf_info in pdf_data:
@@ -330,7 +334,7 @@ If no clear company name is found, extract the most likely company name from ava
         except ImportError:
             from image_analyzer import ImageAnalyzer
         image_analyzer = ImageAnalyzer()
-        image_analyzer.analyze_inline_images(filtered_emails)
+        await image_analyzer.analyze_inline_images(filtered_emails)
 
         # Gather image extraction stats
         image_stats = image_analyzer.get_analysis_stats()
@@ -396,23 +400,23 @@ If no clear company name is found, extract the most likely company name from ava
                 if preference == 'openai' and self.openai_client:
                     # Try OpenAI first, fallback to Gemini
                     self.logger.info("📋 Using OpenAI container analyzer (preferred)")
-                    products_dict = self._openai_container_excel_analysis(excel_rows)
+                    products_dict = await self._openai_container_excel_analysis(excel_rows)
                     
                     if not products_dict:
                         self.logger.info("🔄 OpenAI container failed, falling back to Gemini container analyzer.")
-                        products_dict = self._gemini_container_excel_analysis(excel_rows, content_for_excel_analysis)
+                        products_dict = await self._gemini_container_excel_analysis(excel_rows, content_for_excel_analysis)
                 else:
                     # Try Gemini first, fallback to OpenAI if available
                     self.logger.info("📋 Using Gemini container analyzer (preferred)")
-                    products_dict = self._gemini_container_excel_analysis(excel_rows, content_for_excel_analysis)
+                    products_dict = await self._gemini_container_excel_analysis(excel_rows, content_for_excel_analysis)
                     
                     if not products_dict and self.openai_client:
                         self.logger.info("🔄 Gemini container failed, falling back to OpenAI container analyzer.")
-                        products_dict = self._openai_container_excel_analysis(excel_rows)
+                        products_dict = await self._openai_container_excel_analysis(excel_rows)
 
                 # Note: Container analysis doesn't use _extract_product_terms, so we still need additional search here
                 excel_text_for_additional_search = self._combine_excel_rows(excel_rows)
-                additional_products = self._find_additional_products(products_dict, excel_text_for_additional_search)
+                additional_products = await self._find_additional_products(products_dict, excel_text_for_additional_search)
                 
                 # Merge additional products
                 if additional_products:
@@ -431,8 +435,8 @@ If no clear company name is found, extract the most likely company name from ava
                         continue
                     processed_terms.add(product_name.lower())
 
-                    # Collect term for batch processing
-                    terms_to_process.append({
+                    # Queue term for batch matching
+                    pipeline.submit({
                         'unclear_term': product_name,
                         'email_subject': base_context['subject'],
                         'email_date': base_context['date'],
@@ -462,84 +466,96 @@ If no clear company name is found, extract the most likely company name from ava
         # --------------------------------------------------------------
         # 3. Process each email with combined content (body + images + excel + pdf)
         # --------------------------------------------------------------
-        combined_content = ""
-        for email in filtered_emails:
-            body = email.get('body', '').strip()
+        pipeline.start()
+        try:
+            combined_content = ""
+            for email in filtered_emails:
+                body = email.get('body', '').strip()
 
-            # Retrieve image texts that were attached by ImageAnalyzer
-            image_texts = email.get('image_texts', [])
+                # Retrieve image texts that were attached by ImageAnalyzer
+                image_texts = email.get('image_texts', [])
 
-            # Retrieve excel texts for this email
-            key = (email.get('subject'), email.get('date'))
-            excel_items = excel_map.get(key, [])
+                # Retrieve excel texts for this email
+                key = (email.get('subject'), email.get('date'))
+                excel_items = excel_map.get(key, [])
 
-            # Retrieve PDF texts for this email
-            pdf_items = pdf_map.get(key, [])
+                # Retrieve PDF texts for this email
+                pdf_items = pdf_map.get(key, [])
 
-            # Skip emails that have no analyzable content
-            if not body and not image_texts and not excel_items and not pdf_items:
-                continue
+                # Skip emails that have no analyzable content
+                if not body and not image_texts and not excel_items and not pdf_items:
+                    continue
 
-            # Build combined content with clear headings
-            sections = []
-            if body:
-                sections.append("# EMAIL CONTENT:\n" + body)
+                # Build combined content with clear headings
+                sections = []
+                if body:
+                    sections.append("# EMAIL CONTENT:\n" + body)
 
-            for idx, img_text in enumerate(image_texts, start=1):
-                sections.append(f"# IMAGE {idx} CONTENT:\n" + img_text)
+                for idx, img_text in enumerate(image_texts, start=1):
+                    sections.append(f"# IMAGE {idx} CONTENT:\n" + img_text)
 
-            for idx, excel_item in enumerate(excel_items, start=1):
-                sections.append(f"# EXCEL {idx} CONTENT ({excel_item['filename']}):\n" + excel_item['text'])
+                for idx, excel_item in enumerate(excel_items, start=1):
+                    sections.append(f"# EXCEL {idx} CONTENT ({excel_item['filename']}):\n" + excel_item['text'])
 
-            for idx, pdf_item in enumerate(pdf_items, start=1):
-                sections.append(f"# PDF {idx} CONTENT ({pdf_item['filename']}, {pdf_item['page_count']} pages):\n" + pdf_item['text'])
+                for idx, pdf_item in enumerate(pdf_items, start=1):
+                    sections.append(f"# PDF {idx} CONTENT ({pdf_item['filename']}, {pdf_item['page_count']} pages):\n" + pdf_item['text'])
 
-            combined_content = "\n\n".join(sections)
+                combined_content = "\n\n".join(sections)
 
 
-            self.logger.info(f"📧 Processing combined content for email '{email.get('subject', '')[:50]}...' (len={len(combined_content)})")
+                self.logger.info(f"📧 Processing combined content for email '{email.get('subject', '')[:50]}...' (len={len(combined_content)})")
 
-            product_terms_dict = self._extract_product_terms(combined_content)
+                def queue_term(product_name: str, product_data: Dict, email: Dict = email) -> None:
+                    if product_name.lower() in processed_terms:
+                        self.logger.debug(f"⏭️ Skipping duplicate term: '{product_name}'")
+                        return
+                    processed_terms.add(product_name.lower())
 
-            for product_name, product_data in product_terms_dict.items():
-                if product_name.lower() in processed_terms:
-                    self.logger.debug(f"⏭️ Skipping duplicate term: '{product_name}'")
-                    continue
-                processed_terms.add(product_name.lower())
-
-                # Collect term for batch processing
-                terms_to_process.append({
-                    'unclear_term': product_name,
-                    'email_subject': email.get('subject', ''),
-                    'email_date': email.get('date', ''),
-                    'quantity': product_data.get('quantity', '1'),
-                    'explanation': product_data.get('explanation', ''),
-                    'source': 'combined'
-                })
+                    # Queue term for batch matching
+                    pipeline.submit({
+                        'unclear_term': product_name,
+                        'email_subject': email.get('subject', ''),
+                        'email_date': email.get('date', ''),
+                        'quantity': product_data.get('quantity', '1'),
+                        'explanation': product_data.get('explanation', ''),
+                        'source': 'combined'
+                    })
 
-        # --------------------------------------------------------------
-        # BATCH PROCESSING: Process all collected terms at once
-        # --------------------------------------------------------------
-        if terms_to_process:
-            # Restrict to first 200 products to prevent overwhelming the system
-            original_count = len(terms_to_process)
-            MAX_BATCH_SIZE = 100
-            
-            if original_count > MAX_BATCH_SIZE:
-                self.logger.warning(f"⚠️ Found {original_count} products, restricting to first {MAX_BATCH_SIZE} for batch processing")
-                terms_to_process = terms_to_process[:MAX_BATCH_SIZE]
-                skipped_count = original_count - MAX_BATCH_SIZE
-                self.logger.warning(f"⚠️ Skipping {skipped_count} products (items {MAX_BATCH_SIZE+1}-{original_count})")
-            
-            self.logger.info(f"🚀 Starting batch processing for {len(terms_to_process)} terms")
-            
-            # Pass user instructions to the matcher if available
-            if self.user_instructions:
-                self.logger.info(f"📝 Passing user instructions to matcher: {self.user_instructions[:100]}...")
-            
-            # Use batch matching function with user instructions
-            batch_results = await matcher.match_terms_batch(terms_to_process, user_instructions=self.user_instructions)
-            
+                extraction_model = Config.GEMINI_MODEL_THINKING
+                if getattr(Config, 'MODEL_ROUTING', False):
+                    extraction_model = self.model_router.route_extraction(
+                        combined_content,
+                        has_attachments=bool(image_texts or excel_items or pdf_items),
+                        default_model=Config.GEMINI_MODEL_THINKING,
+                    )
+
+                if streaming:
+                    await self._stream_product_terms(
+                        combined_content,
+                        on_product=queue_term,
+                        on_instructions=lambda _instructions: pipeline.set_ready(),
+                        model=extraction_model,
+                    )
+                else:
+                    product_terms_dict = await self._extract_product_terms(combined_content, model=extraction_model)
+                    for product_name, product_data in product_terms_dict.items():
+                        queue_term(product_name, product_data)
+
+            # --------------------------------------------------------------
+            # BATCH PROCESSING: Wait for the remaining queued terms
+            # --------------------------------------------------------------
+            if pipeline.accepted:
+                self.logger.info(f"🚀 Finishing batch processing for {pipeline.accepted} terms")
+
+                # Pass user instructions to the matcher if available
+                if self.user_instructions:
+                    self.logger.info(f"📝 Passing user instructions to matcher: {self.user_instructions[:100]}...")
+
+            batch_results = await pipeline.finish()
+        finally:
+            pipeline.cancel()
+
+        if batch_results:
             # Process batch results
             for result in batch_results:
                 if result.get('matched_product_code') and result.get('matched_product_code') != 'NO_MATCH':
@@ -607,7 +623,7 @@ If no clear company name is found, extract the most likely company name from ava
 
         return unique_unclear
     
-    def _analyze_email_content(self, email: Dict) -> List[Dict]:
+    async def _analyze_email_content(self, email: Dict) -> List[Dict]:
         """
         Analyze email body for unclear product terms
         
@@ -622,14 +638,14 @@ If no clear company name is found, extract the most likely company name from ava
             return []
         
         # Analyze the email content
-        unclear_terms_text = self._call_gemini_api(email_body, 'email')
+        unclear_terms_text = await self._call_gemini_api(email_body, 'email')
         
         if unclear_terms_text:
             return self._parse_unclear_terms_response(unclear_terms_text, email, 'email')
         
         return []
     
-    def _analyze_excel_content(self, excel_info: Dict) -> List[Dict]:
+    async def _analyze_excel_content(self, excel_info: Dict) -> List[Dict]:
         """
         Analyze Excel content for unclear product terms
         
@@ -650,7 +666,7 @@ If no clear company name is found, extract the most likely company name from ava
             return []
         
         # Analyze the Excel content
-        unclear_terms_text = self._call_gemini_api(excel_text, 'excel')
+        unclear_terms_text = await self._call_gemini_api(excel_text, 'excel')
         
         if unclear_terms_text:
             # Create email-like context from Excel info
@@ -730,16 +746,8 @@ If no clear company name is found, extract the most likely company name from ava
 
         return "\n".join(table_lines)
 
-    def _extract_product_terms(self, content: str) -> Dict[str, Dict[str, str]]:
-        """Extract ALL HVAC products from the given text using Gemini with improved accuracy.
-
-        Returns a dictionary: {"product_name": {"quantity": "qty", "explanation": "explanation"}}"""
-        if not content or len(content.strip()) < 5:
-            self.logger.debug("Content too short or empty, skipping extraction")
-            return {}
-
-        self.logger.debug(f"Extracting products from content ({len(content)} chars): {content[:100]}...")
-
+    def _build_extraction_prompt(self, content: str) -> str:
+        """Product extraction prompt for the given content (JSON object contract)."""
         # Format existing products context
         existing_products_context = ""
         if self.existing_products:
@@ -856,7 +864,116 @@ If NO products wanted: {{"NO_PRODUCTS_FOUND": {{"quantity": "0", "explanation":
 CONTENT TO ANALYZE:
 {content}"""
 
-        self.logger.info(f"🤖 Calling Gemini model: {Config.GEMINI_MODEL_THINKING}")
+        return prompt
+
+    def _parse_product_terms_text(self, text: str) -> Dict[str, Dict[str, str]]:
+        """Parse the extraction JSON into {"product_name": {"quantity", "explanation"}}.
+
+        Stores _user_instructions on the analyzer. Raises json.JSONDecodeError or
+        ValueError when the text is not a valid extraction result."""
+        # Clean up response text in case there are markdown code blocks
+        json_text = text.strip()
+        if json_text.startswith("```json"):
+            json_text = json_text[7:]
+        if json_text.endswith("```"):
+            json_text = json_text[:-3]
+        json_text = json_text.strip()
+
+        # Handle Unicode characters that might cause JSON parsing issues
+        # Various Unicode symbols in HVAC product names can cause "Invalid control character" errors
+        try:
+            # First attempt: try parsing with strict=False to be more permissive
+            products_dict = json.loads(json_text, strict=False)
+        except json.JSONDecodeError as unicode_error:
+            # If strict=False doesn't work, sanitize problematic Unicode characters
+            self.logger.warning(f"⚠️ JSON parsing failed due to Unicode chars in _extract_product_terms, attempting to sanitize: {unicode_error}")
+
+            sanitized_json = json_text
+
+            # Common problematic Unicode characters in HVAC product names:
+            unicode_replacements = {
+                # Degree symbols and related
+                'º': '°',      # U+00BA (masculine ordinal indicator) → U+00B0 (degree symbol)
+                '\u00ba': '°', # Same as above, explicit Unicode
+                '°': 'deg',    # U+00B0 (degree symbol) → text
+
+                # Mathematical symbols that might appear
+                '±': '+/-',    # U+00B1 (plus-minus sign)
+                '²': '2',      # U+00B2 (superscript two)
+                '³': '3',      # U+00B3 (superscript three)
+                '¼': '1/4',    # U+00BC (vulgar fraction one quarter)
+                '½': '1/2',    # U+00BD (vulgar fraction one half)
+                '¾': '3/4',    # U+00BE (vulgar fraction three quarters)
+
+                # Measurement symbols
+                'µ': 'u',      # U+00B5 (micro sign)
+
+                # Other potentially problematic characters
+                '\u2013': '-', # En dash
+                '\u2014': '-', # Em dash
+                '\u2018': "'", # Left single quotation mark
+                '\u2019': "'", # Right single quotation mark
+                '\u201c': '"', # Left double quotation mark
+                '\u201d': '"', # Right double quotation mark
+            }
+
+            # Apply all replacements
+            for unicode_char, replacement in unicode_replacements.items():
+                if unicode_char in sanitized_json:
+                    sanitized_json = sanitized_json.replace(unicode_char, replacement)
+                    self.logger.debug(f"🔧 Replaced '{unicode_char}' with '{replacement}' in _extract_product_terms")
+
+            try:
+                products_dict = json.loads(sanitized_json, strict=False)
+                self.logger.info("✅ Successfully parsed JSON after Unicode sanitization in _extract_product_terms")
+            except json.JSONDecodeError as final_error:
+                # Last resort: log detailed error and fall back
+                self.logger.error(f"❌ Final JSON parsing failed even after sanitization in _extract_product_terms: {final_error}")
+                self.logger.error(f"Problematic JSON (first 500 chars): {sanitized_json[:500]}")
+                raise final_error  # Re-raise to trigger the outer exception handler
+
+        # Check if no products found
+        if "NO_PRODUCTS_FOUND" in products_dict:
+            self.logger.info("✅ Gemini found no HVAC products in text")
+            return {}
+
+        # Validate format
+        if not isinstance(products_dict, dict):
+            raise ValueError("Response is not a dictionary")
+
+        # Extract and store user instructions (special key starting with _)
+        user_instructions = products_dict.pop('_user_instructions', '')
+        if user_instructions:
+            self.user_instructions = user_instructions
+            self.logger.info(f"📝 Extracted user instructions: {user_instructions[:100]}...")
+
+        for product_name, product_data in products_dict.items():
+            # Skip any remaining underscore-prefixed metadata keys
+            if product_name.startswith('_'):
+                continue
+            if not isinstance(product_data, dict) or 'quantity' not in product_data or 'explanation' not in product_data:
+                raise ValueError(f"Invalid format for product: {product_name}")
+        
+        if not products_dict:
+            self.logger.warning(f"❌ No valid products parsed from response!")
+        return products_dict
+
+    async def _extract_product_terms(self, content: str, model: Optional[str] = None) -> Dict[str, Dict[str, str]]:
+        """Extract ALL HVAC products from the given text using Gemini with improved accuracy.
+
+        model overrides the thinking model (see ModelRouter.route_extraction).
+
+        Returns a dictionary: {"product_name": {"quantity": "qty", "explanation": "explanation"}}"""
+        if not content or len(content.strip()) < 5:
+            self.logger.debug("Content too short or empty, skipping extraction")
+            return {}
+
+        self.logger.debug(f"Extracting products from content ({len(content)} chars): {content[:100]}...")
+
+        prompt = self._build_extraction_prompt(content)
+        model = model or Config.GEMINI_MODEL_THINKING
+
+        self.logger.info(f"🤖 Calling Gemini model: {model}")
 
         try:
             self.api_calls_made += 1
@@ -867,9 +984,8 @@ CONTENT TO ANALYZE:
                 candidate_count=1,
             )
 
-            response = self._retry_llm_request(
-                self.gemini_client.models.generate_content,
-                model=Config.GEMINI_MODEL_THINKING,
+            response = await self._generate_content(
+                model=model,
                 contents=prompt,  # Pass the prompt directly as string
                 config=config,
             )
@@ -964,90 +1080,10 @@ CONTENT TO ANALYZE:
             
             # Parse JSON response
             try:
-                import json
-                # Clean up response text in case there are markdown code blocks
-                json_text = text.strip()
-                if json_text.startswith("```json"):
-                    json_text = json_text[7:]
-                if json_text.endswith("```"):
-                    json_text = json_text[:-3]
-                json_text = json_text.strip()
-                
-                # Handle Unicode characters that might cause JSON parsing issues
-                # Various Unicode symbols in HVAC product names can cause "Invalid control character" errors
-                try:
-                    # First attempt: try parsing with strict=False to be more permissive
-                    products_dict = json.loads(json_text, strict=False)
-                except json.JSONDecodeError as unicode_error:
-                    # If strict=False doesn't work, sanitize problematic Unicode characters
-                    self.logger.warning(f"⚠️ JSON parsing failed due to Unicode chars in _extract_product_terms, attempting to sanitize: {unicode_error}")
-                    
-                    sanitized_json = json_text
-                    
-                    # Common problematic Unicode characters in HVAC product names:
-                    unicode_replacements = {
-                        # Degree symbols and related
-                        'º': '°',      # U+00BA (masculine ordinal indicator) → U+00B0 (degree symbol)
-                        '\u00ba': '°', # Same as above, explicit Unicode
-                        '°': 'deg',    # U+00B0 (degree symbol) → text
-                        
-                        # Mathematical symbols that might appear
-                        '±': '+/-',    # U+00B1 (plus-minus sign)
-                        '²': '2',      # U+00B2 (superscript two)
-                        '³': '3',      # U+00B3 (superscript three)
-                        '¼': '1/4',    # U+00BC (vulgar fraction one quarter)
-                        '½': '1/2',    # U+00BD (vulgar fraction one half)
-                        '¾': '3/4',    # U+00BE (vulgar fraction three quarters)
-                        
-                        # Measurement symbols
-                        'µ': 'u',      # U+00B5 (micro sign)
-                        
-                        # Other potentially problematic characters
-                        '\u2013': '-', # En dash
-                        '\u2014': '-', # Em dash
-                        '\u2018': "'", # Left single quotation mark
-                        '\u2019': "'", # Right single quotation mark
-                        '\u201c': '"', # Left double quotation mark
-                        '\u201d': '"', # Right double quotation mark
-                    }
-                    
-                    # Apply all replacements
-                    for unicode_char, replacement in unicode_replacements.items():
-                        if unicode_char in sanitized_json:
-                            sanitized_json = sanitized_json.replace(unicode_char, replacement)
-                            self.logger.debug(f"🔧 Replaced '{unicode_char}' with '{replacement}' in _extract_product_terms")
-                    
-                    try:
-                        products_dict = json.loads(sanitized_json, strict=False)
-                        self.logger.info("✅ Successfully parsed JSON after Unicode sanitization in _extract_product_terms")
-                    except json.JSONDecodeError as final_error:
-                        # Last resort: log detailed error and fall back
-                        self.logger.error(f"❌ Final JSON parsing failed even after sanitization in _extract_product_terms: {final_error}")
-                        self.logger.error(f"Problematic JSON (first 500 chars): {sanitized_json[:500]}")
-                        raise final_error  # Re-raise to trigger the outer exception handler
-                
-                # Check if no products found
-                if "NO_PRODUCTS_FOUND" in products_dict:
-                    self.logger.info("✅ Gemini found no HVAC products in text")
+                products_dict = self._parse_product_terms_text(text)
+                if not products_dict:
                     return {}
                 
-                # Validate format
-                if not isinstance(products_dict, dict):
-                    raise ValueError("Response is not a dictionary")
-                
-                # Extract and store user instructions (special key starting with _)
-                user_instructions = products_dict.pop('_user_instructions', '')
-                if user_instructions:
-                    self.user_instructions = user_instructions
-                    self.logger.info(f"📝 Extracted user instructions: {user_instructions[:100]}...")
-                
-                for product_name, product_data in products_dict.items():
-                    # Skip any remaining underscore-prefixed metadata keys
-                    if product_name.startswith('_'):
-                        continue
-                    if not isinstance(product_data, dict) or 'quantity' not in product_data or 'explanation' not in product_data:
-                        raise ValueError(f"Invalid format for product: {product_name}")
-                
                 self.logger.info(f"🔍 Parsed {len(products_dict)} product terms from JSON response: {list(products_dict.keys())}")
                 
                 if products_dict:
@@ -1056,7 +1092,7 @@ CONTENT TO ANALYZE:
                     if len(products_dict) > 30:
                         try:
                             # Search for additional products that might have been missed
-                            additional_products = self._find_additional_products(products_dict, content)
+                            additional_products = await self._find_additional_products(products_dict, content)
                         except Exception as e:
                             self.logger.warning(f"❌ Error searching for additional products: {e}")
                         # Merge additional products
@@ -1064,8 +1100,6 @@ CONTENT TO ANALYZE:
                             self.logger.info(f"🔍 Found {len(additional_products)} additional products in _extract_product_terms, merging with initial {len(products_dict)}")
                             products_dict.update(additional_products)
                             self.logger.info(f"✅ Final product count after additional search: {len(products_dict)}")
-                else:
-                    self.logger.warning(f"❌ No valid products parsed from response!")
                     
                 return products_dict
                 
@@ -1082,7 +1116,128 @@ CONTENT TO ANALYZE:
             self.logger.error(f"❌ Full traceback: {traceback.format_exc()}")
             return {}
 
-    def _find_additional_products(self, initial_products: Dict[str, Dict[str, str]], content: str) -> Dict[str, Dict[str, str]]:
+    async def _stream_product_terms(
+        self,
+        content: str,
+        on_product: Callable[[str, Dict[str, str]], None],
+        on_instructions: Optional[Callable[[str], None]] = None,
+        model: Optional[str] = None
+    ) -> Dict[str, Dict[str, str]]:
+        """Extract products like _extract_product_terms, announcing each one as it streams in.
+
+        on_product(name, data) is called as soon as a product's JSON entry is
+        complete, so matching can start on the first lines of a long tender
+        while the model is still writing the rest. on_instructions is called
+        once the _user_instructions entry (first in the prompt contract) has
+        arrived, or when it turns out to be missing. Products that only appear
+        in the final parse or the additional search are announced at the end.
+
+        Returns the complete products dictionary."""
+        if not content or len(content.strip()) < 5:
+            self.logger.debug("Content too short or empty, skipping extraction")
+            return {}
+
+        prompt = self._build_extraction_prompt(content)
+        config = types.GenerateContentConfig(
+            temperature=0.3,
+            candidate_count=1,
+        )
+        parser = IncrementalJSONObjectParser()
+        emitted: Dict[str, Dict[str, str]] = {}
+        instructions_announced = False
+        no_products = False
+
+        def announce_instructions() -> None:
+            nonlocal instructions_announced
+            if not instructions_announced:
+                instructions_announced = True
+                if on_instructions:
+                    on_instructions(self.user_instructions)
+
+        def announce(product_name: str, product_data) -> None:
+            if product_name in emitted or product_name.startswith('_'):
+                return
+            if not isinstance(product_data, dict) or 'quantity' not in product_data or 'explanation' not in product_data:
+                return
+            emitted[product_name] = product_data
+            on_product(product_name, product_data)
+
+        model = model or Config.GEMINI_MODEL_THINKING
+        self.logger.info(f"🤖 Streaming extraction from Gemini model: {model}")
+        self.api_calls_made += 1
+        self.processed_texts += 1
+        started = time.monotonic()
+
+        try:
+            async for chunk in get_llm_gateway().stream_content(
+                model=model,
+                contents=prompt,
+                config=config,
+                client=self.gemini_client,
+                label="ai_analyzer_stream",
+            ):
+                for key, value in parser.feed(chunk):
+                    if key == '_user_instructions':
+                        if isinstance(value, str) and value:
+                            self.user_instructions = value
+                            self.logger.info(f"📝 Extracted user instructions: {value[:100]}...")
+                        announce_instructions()
+                    elif key == 'NO_PRODUCTS_FOUND':
+                        no_products = True
+                    else:
+                        if not emitted:
+                            self.logger.info(f"⚡ First product streamed after {time.monotonic() - started:.1f}s: '{key}'")
+                        # Do not hold matching back if the model skipped the instructions entry
+                        announce_instructions()
+                        announce(key, value)
+        except Exception as e:
+            self.api_errors += 1
+            self.logger.warning(
+                f"⚠️ Streaming extraction failed after {len(emitted)} products: {e}. Falling back to a regular extraction call"
+            )
+            products_dict = await self._extract_product_terms(content, model=model)
+            announce_instructions()
+            for product_name, product_data in products_dict.items():
+                announce(product_name, product_data)
+            return products_dict
+
+        text = parser.text
+        self.logger.info(
+            f"🤖 Streamed Gemini response ({len(text)} chars, {len(emitted)} products) in {time.monotonic() - started:.1f}s"
+        )
+
+        if parser.complete and not parser.failed:
+            # Every member was parsed while streaming
+            products_dict = {} if no_products else dict(emitted)
+            if no_products:
+                self.logger.info("✅ Gemini found no HVAC products in text")
+        else:
+            try:
+                products_dict = self._parse_product_terms_text(text)
+            except (json.JSONDecodeError, ValueError, KeyError) as e:
+                self.logger.error(f"❌ Failed to parse JSON response: {e}")
+                self.logger.error(f"📄 Raw response: {text}")
+                products_dict = dict(emitted)
+        announce_instructions()
+        for product_name, product_data in products_dict.items():
+            announce(product_name, product_data)
+
+        if len(products_dict) > 30:
+            try:
+                # Search for additional products that might have been missed
+                additional_products = await self._find_additional_products(products_dict, content)
+            except Exception as e:
+                self.logger.warning(f"❌ Error searching for additional products: {e}")
+                additional_products = {}
+            if additional_products:
+                self.logger.info(f"🔍 Found {len(additional_products)} additional products in _stream_product_terms, merging with initial {len(products_dict)}")
+                products_dict.update(additional_products)
+                for product_name, product_data in additional_products.items():
+                    announce(product_name, product_data)
+
+        return products_dict
+
+    async def _find_additional_products(self, initial_products: Dict[str, Dict[str, str]], content: str) -> Dict[str, Dict[str, str]]:
         """
         Find any additional products that might have been missed in the initial extraction.
         This function can only ADD products, never remove them.
@@ -1153,8 +1308,7 @@ CONTENT TO SCAN FOR MISSED PRODUCTS:
                 candidate_count=1,
             )
 
-            response = self._retry_llm_request(
-                self.gemini_client.models.generate_content,
+            response = await self._generate_content(
                 model=Config.GEMINI_MODEL_THINKING,
                 contents=prompt,
                 config=config,
@@ -1284,7 +1438,7 @@ CONTENT TO SCAN FOR MISSED PRODUCTS:
             self.logger.error(f"❌ Additional products search error: {e}")
             return {}
     
-    def _call_gemini_api(self, content: str, content_type: str) -> Optional[str]:
+    async def _call_gemini_api(self, content: str, content_type: str) -> Optional[str]:
         """
         Call Gemini API to analyze content for unclear terms
         
@@ -1296,7 +1450,7 @@ CONTENT TO SCAN FOR MISSED PRODUCTS:
             API response text or None if failed
         """
         # Use the simplified product extraction approach
-        products = self._extract_product_terms(content)
+        products = await self._extract_product_terms(content)
         if products:
             return "\n".join(products)
         return None
@@ -1392,7 +1546,7 @@ CONTENT TO SCAN FOR MISSED PRODUCTS:
             'api_errors': self.api_errors
         }
 
-    def _openai_container_excel_analysis(self, excel_rows: List[Dict]) -> Dict[str, Dict[str, str]]:
+    async def _openai_container_excel_analysis(self, excel_rows: List[Dict]) -> Dict[str, Dict[str, str]]:
         """
         Extract products from Excel data using OpenAI container-based analysis
         
@@ -1406,7 +1560,7 @@ CONTENT TO SCAN FOR MISSED PRODUCTS:
         if not self.openai_client:
             self.logger.warning("OpenAI client not configured. Falling back to Gemini extraction for Excel data.")
             table_text = self._combine_excel_rows(excel_rows)
-            return self._extract_product_terms(table_text)
+            return await self._extract_product_terms(table_text)
 
         try:
             import json as _json
@@ -1479,9 +1633,14 @@ If no HVAC products found, return: {{"NO_PRODUCTS_FOUND": {{"quantity": "0", "ex
 MOST IMPORTANTLY; DO NOT HALLUCINATE. ONLY PROVIDE PRODUCT NAMES AND QUANTITIES PROVIDED IN THE FILE.
 ALWAYS INCLUDE PRODUCT CODES FROM THE FILE IN YOUR OUTPUT KEYS!"""
 
+            # Count the prompt and the uploaded table against the shared OpenAI quota for this model
+            code_model = Config.OPENAI_CODE_INTERPRETER_MODEL
+            await get_rate_limiter().acquire('openai', code_model, estimate_tokens(prompt) + len(csv_bytes) // 4)
+
             # Call the Responses API with the code interpreter tool and auto container
-            response = self.openai_client.responses.create(
-                model="gpt-4.1",  # Lightweight but code-capable model
+            response = await asyncio.to_thread(
+                self.openai_client.responses.create,
+                model=code_model,  # Lightweight but code-capable model
                 tools=[{
                     "type": "code_interpreter",
                     "container": {
@@ -1530,7 +1689,7 @@ ALWAYS INCLUDE PRODUCT CODES FROM THE FILE IN YOUR OUTPUT KEYS!"""
         # This is a placeholder and should be replaced with the actual implementation
         return {}
 
-    def _gemini_container_excel_analysis(self, excel_rows: List[Dict], customer_email: str) -> Dict[str, Dict[str, str]]:
+    async def _gemini_container_excel_analysis(self, excel_rows: List[Dict], customer_email: str) -> Dict[str, Dict[str, str]]:
         """
         Extract products from Excel data using Gemini container-based analysis with file inputs
         
@@ -1574,6 +1733,21 @@ ALWAYS INCLUDE PRODUCT CODES FROM THE FILE IN YOUR OUTPUT KEYS!"""
                 temp_file_path = temp_file.name
 
             try:
+                # Identical table + context -> identical extraction; the upload URI
+                # changes per call, so key on the CSV content instead
+                with open(temp_file_path, 'rb') as csv_file:
+                    cache_key = make_cache_key(
+                        Config.GEMINI_MODEL_THINKING,
+                        csv_file.read(),
+                        self.existing_products,
+                        customer_email,
+                        namespace="gemini_container_excel_analysis",
+                    )
+                cached_products = await asyncio.to_thread(get_llm_cache().get_json, cache_key, "excel_container")
+                if cached_products:
+                    self.logger.info(f"♻️ Reusing cached Excel container analysis ({len(cached_products)} products)")
+                    return cached_products
+
                 # Upload the CSV file using Gemini Files API with explicit MIME type
                 uploaded_file = self.gemini_client.files.upload(
                     file=temp_file_path,
@@ -1663,8 +1837,7 @@ Customer's email:
                     ))
                 ]
                 
-                response = self._retry_llm_request(
-                    self.gemini_client.models.generate_content,
+                response = await self._generate_content(
                     model=Config.GEMINI_MODEL_THINKING,
                     contents=[types.Content(parts=content_parts, role="user")],
                     config=config,
@@ -1800,6 +1973,7 @@ Customer's email:
                         raise ValueError("Unexpected format")
 
                     self.logger.info(f"🗂️ Gemini container extracted {len(products_dict)} products from Excel.")
+                    await asyncio.to_thread(get_llm_cache().put_json, cache_key, products_dict, "excel_container")
                     return products_dict
                     
                 except (_json.JSONDecodeError, ValueError) as json_error:
@@ -1822,7 +1996,7 @@ Customer's email:
         except Exception as exc:
             self.logger.error(f"Gemini container analysis failed: {exc}")
             self.api_errors += 1
-            time.sleep(10)
+            await asyncio.sleep(10)
             # Fallback to regular Gemini extraction
             table_text = self._combine_excel_rows(excel_rows)
-            return self._extract_product_terms(table_text)
+            return await self._extract_product_terms(table_text)
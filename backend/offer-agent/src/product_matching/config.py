@@ -63,6 +63,7 @@ class Config:
     OPENAI_RATE_LIMIT_PER_MINUTE = int(os.getenv('OPENAI_RATE_LIMIT_PER_MINUTE', '100'))
     OPENAI_RATE_LIMIT_PER_DAY = int(os.getenv('OPENAI_RATE_LIMIT_PER_DAY', '2000'))
     OPENAI_TPM_LIMIT = int(os.getenv('OPENAI_TPM_LIMIT', '150000'))  # Tokens Per Minute limit (free tier)
+    OPENAI_CODE_INTERPRETER_MODEL = os.getenv('OPENAI_CODE_INTERPRETER_MODEL', 'gpt-4.1')  # Large Excel container analysis
     
     # RAG Pipeline Mode (set to True for single mega-batch processing)
     RAG_SINGLE_BATCH_MODE = os.getenv('RAG_SINGLE_BATCH_MODE', 'False').lower() == 'true'
@@ -70,6 +71,29 @@ class Config:
     # Context Management for Batch Agent
     MAX_CONTEXT_TOKENS = 7000  # Max tokens for Gemini conversation context
     
+    # Iteration budget for the batch agent
+    ADAPTIVE_ITERATION_BUDGET = os.getenv('ADAPTIVE_ITERATION_BUDGET', 'true').lower() == 'true'
+    ITERATION_BUDGET_PER_TERM = int(os.getenv('ITERATION_BUDGET_PER_TERM', '7'))  # Calls per term (and iteration ceiling)
+    ITERATION_PATIENCE = int(os.getenv('ITERATION_PATIENCE', '4'))                # Calls without progress before retiring
+    ITERATION_EXTENSION = int(os.getenv('ITERATION_EXTENSION', '3'))              # Extra calls for improving terms
+    
+    # Streaming extraction pipelined into matching
+    STREAMING_EXTRACTION = os.getenv('STREAMING_EXTRACTION', 'true').lower() == 'true'
+    STREAMING_MATCH_MIN_BATCH = int(os.getenv('STREAMING_MATCH_MIN_BATCH', '5'))    # Terms before a mid-extraction batch starts
+    STREAMING_MATCH_MAX_BATCH = int(os.getenv('STREAMING_MATCH_MAX_BATCH', '25'))   # Largest batch per matching agent run
+    
+    # Sharded matching: large batches are split across concurrent agents.
+    # Off until src.benchmark.matching_benchmark shows no accuracy loss.
+    SHARDED_MATCHING = os.getenv('SHARDED_MATCHING', 'false').lower() == 'true'
+    SHARD_SIZE = int(os.getenv('SHARD_SIZE', '20'))                         # Most terms per agent
+    SHARD_CONCURRENCY = int(os.getenv('SHARD_CONCURRENCY', '4'))            # Agents running at once
+    SHARD_CLUSTERING = os.getenv('SHARD_CLUSTERING', 'keyword').lower()     # 'keyword' or 'embedding'
+    MAX_MATCH_TERMS = int(os.getenv('MAX_MATCH_TERMS', '100'))              # Products matched per offer
+    
+    # Complexity-based model routing (presets in model_router.POLICIES).
+    # Off until src.benchmark.routing_eval has scored the policies on training_dataset.csv.
+    MODEL_ROUTING = os.getenv('MODEL_ROUTING', 'false').lower() == 'true'
+    
     # Output Configuration
     OUTPUT_CSV_NAME = f"unclear_hvac_terms_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
     CSV_COLUMNS = ['unclear_term', 'quantity', 'explanation', 'email_subject', 'email_date', 'source_type', 'source_file']
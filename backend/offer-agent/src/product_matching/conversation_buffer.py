@@ -0,0 +1,111 @@
+"""
+Conversation buffer for the agentic matching loop.
+
+Holds the messages sent on every turn with a running token total, so the
+loop no longer re-estimates the whole history before each LLM call. Each
+message is estimated once when it is appended; trimming drops the oldest
+turns from the left of a deque, and the message list handed to the LLM
+call is only rebuilt after a trim.
+
+The pinned messages (the initial user trigger) are never evicted. A model
+message with function calls and the function responses that follow it form
+one turn and are evicted together - Claude rejects a tool_result whose
+tool_use was dropped.
+"""
+from collections import deque
+from typing import Any, Callable, List, Optional
+
+from src.llm.rate_limiter import estimate_tokens
+
+
+def _has_part(message: Any, attribute: str) -> bool:
+    parts = getattr(message, 'parts', None)
+    return bool(parts) and any(getattr(part, attribute, None) for part in parts)
+
+
+class _Turn:
+    __slots__ = ('messages', 'tokens', 'open')
+
+    def __init__(self, message: Any, tokens: int, open_turn: bool):
+        self.messages = [message]
+        self.tokens = tokens
+        # A function-call turn stays open for the function responses that follow
+        self.open = open_turn
+
+
+class ConversationBuffer:
+    """Pinned prefix plus a deque of turns, with a running token total."""
+
+    def __init__(self, pinned: Optional[List[Any]] = None, estimate: Optional[Callable[[Any], int]] = None):
+        """
+        Args:
+            pinned: Messages always kept at the start of the conversation
+            estimate: Token estimate for one message (defaults to the rate limiter's estimate)
+        """
+        self._estimate = estimate or estimate_tokens
+        self._pinned = list(pinned or [])
+        self._pinned_tokens = sum(self._estimate(message) for message in self._pinned)
+        self._turns = deque()
+        self._turn_tokens = 0
+        self._message_count = 0
+        self._snapshot: Optional[List[Any]] = None
+        self.evicted_messages = 0
+
+    @property
+    def total_tokens(self) -> int:
+        """Estimated tokens of everything currently in the buffer."""
+        return self._pinned_tokens + self._turn_tokens
+
+    def __len__(self) -> int:
+        return len(self._pinned) + self._message_count
+
+    def append(self, message: Any) -> None:
+        """Add a message; function responses join the preceding function-call turn."""
+        tokens = self._estimate(message)
+        last = self._turns[-1] if self._turns else None
+        if last is not None and last.open and _has_part(message, 'function_response'):
+            last.messages.append(message)
+            last.tokens += tokens
+        else:
+            self._turns.append(_Turn(message, tokens, _has_part(message, 'function_call')))
+        self._turn_tokens += tokens
+        self._message_count += 1
+        if self._snapshot is not None:
+            self._snapshot.append(message)
+
+    def extend(self, messages: List[Any]) -> None:
+        for message in messages:
+            self.append(message)
+
+    def trim(self, max_tokens: int, target_ratio: float = 0.9) -> int:
+        """
+        Evict the oldest turns once the buffer exceeds max_tokens.
+
+        Evicts down to target_ratio * max_tokens so trimming does not
+        happen again on the very next turn. Returns the number of messages removed.
+        """
+        if self.total_tokens <= max_tokens:
+            return 0
+        target = max_tokens * target_ratio
+        removed = 0
+        while self._turns and self.total_tokens > target:
+            turn = self._turns.popleft()
+            self._turn_tokens -= turn.tokens
+            self._message_count -= len(turn.messages)
+            removed += len(turn.messages)
+        self.evicted_messages += removed
+        self._snapshot = None
+        return removed
+
+    def recent(self, count: int) -> List[Any]:
+        """Last count messages, oldest first."""
+        return self.messages()[-count:] if count > 0 else []
+
+    def messages(self) -> List[Any]:
+        """The conversation as a list for the next LLM call (do not modify it)."""
+        if self._snapshot is None:
+            snapshot = list(self._pinned)
+            for turn in self._turns:
+                snapshot.extend(turn.messages)
+            self._snapshot = snapshot
+        return self._snapshot
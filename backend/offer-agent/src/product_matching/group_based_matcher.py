@@ -1,21 +1,16 @@
 import logging
 import os
 import sys
-import json
 import httpx
-from datetime import datetime
 from typing import List, Dict, Optional
 from pathlib import Path
 
-import pandas as pd
-from google import genai
-from google.genai import types
-
 # Add both src and emails directories to path for imports (same as main.py)
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.lemonsoft.api_client import LemonsoftAPIClient
 from src.lemonsoft.database_connection import create_database_client
+from src.product_matching import shared_resources
 
 try:
     from .config import Config
@@ -62,8 +57,8 @@ class GroupBasedMatcher:
         else:
             self.http_client = None
         
-        # Initialize Gemini client
-        self.gemini_client = genai.Client(api_key=Config.GEMINI_API_KEY)
+        # Gemini client shared by all matchers in the process
+        self.gemini_client = shared_resources.get_gemini_client(Config.GEMINI_API_KEY)
         
         # Load product groups from JSON
         self.product_groups = self._load_product_groups()
@@ -80,8 +75,9 @@ class GroupBasedMatcher:
         groups_file = script_dir / "product_groups.json"
         
         try:
-            with open(groups_file, 'r', encoding='utf-8') as f:
-                groups = json.load(f)
+            groups = shared_resources.load_product_groups(str(groups_file))
+            if groups is None:
+                raise FileNotFoundError(groups_file)
             
             self.logger.info(f"Loaded {len(groups)} main product groups from {groups_file}")
             
@@ -1,16 +1,18 @@
 """
 Image analyzer module for processing inline images from emails using Gemini Vision API
 """
+import asyncio
 import logging
 import tempfile
 import os
 from typing import List, Dict, Optional
 from pathlib import Path
-import time
 
 from google import genai
 from google.genai import types
 from .config import Config
+from src.email_processing.attachment_store import attachment_path
+from src.llm.gateway import get_llm_gateway
 
 class ImageAnalyzer:
     """Handles inline image extraction and analysis using Gemini Vision API"""
@@ -24,7 +26,7 @@ class ImageAnalyzer:
         self.unclear_terms_found = 0
         self.temp_files_created = []
     
-    def analyze_inline_images(self, filtered_emails: List[Dict]) -> List[Dict]:
+    async def analyze_inline_images(self, filtered_emails: List[Dict]) -> List[Dict]:
         """
         Analyze inline images and image attachments from filtered emails **for full textual content only**.
 
@@ -67,8 +69,8 @@ class ImageAnalyzer:
                     for i, att in enumerate(attachments):
                         att_filename = att.get('filename', 'unknown')
                         att_mime = att.get('mime_type', 'unknown')
-                        has_data = 'data' in att and att.get('data') is not None
-                        data_size = len(att.get('data', b'')) if has_data else 0
+                        has_data = ('data' in att and att.get('data') is not None) or bool(att.get('path'))
+                        data_size = len(att.get('data') or b'') or att.get('size', 0)
                         self.logger.debug(f"   Attachment {i}: filename='{att_filename}', mime_type='{att_mime}', has_data={has_data}, size={data_size}")
                     
                     image_attachments = [att for att in attachments if self._is_image_attachment(att)]
@@ -87,7 +89,7 @@ class ImageAnalyzer:
                 
                 # Process all found images
                 for image_info in all_images:
-                    extracted_text = self._analyze_single_image(image_info, email)
+                    extracted_text = await self._analyze_single_image(image_info, email)
 
                     # If we managed to read some text, attach it to the parent email
                     if extracted_text:
@@ -112,7 +114,7 @@ class ImageAnalyzer:
         
         return image_text_entries
     
-    def _analyze_single_image(self, image_info: Dict, email: Dict) -> Optional[str]:
+    async def _analyze_single_image(self, image_info: Dict, email: Dict) -> Optional[str]:
         """
         Analyze a single inline image and return the **raw extracted text** found in
         the image. No product-level parsing is performed here.
@@ -131,12 +133,14 @@ class ImageAnalyzer:
                 return None
 
             # Step 2: upload to Gemini
-            uploaded_file = self._upload_image_to_gemini(temp_image_path)
+            uploaded_file = await asyncio.to_thread(
+                self._upload_image_to_gemini, temp_image_path, image_info.get('mime_type')
+            )
             if not uploaded_file:
                 return None
 
             # Step 3: call Gemini Vision to perform OCR / text extraction
-            extracted_text = self._call_gemini_vision_api(uploaded_file)
+            extracted_text = await self._call_gemini_vision_api(uploaded_file)
 
             # Simple stat for how many successful extractions we did
             if extracted_text:
@@ -172,6 +176,13 @@ class ImageAnalyzer:
                 self.logger.debug(f"Using pre-extracted multipart image: {temp_path}")
                 return temp_path
             
+            # Spooled attachments are already files (released with their email, not here)
+            spool_path = attachment_path(image_info)
+            if spool_path:
+                self.processed_images += 1
+                self.logger.debug(f"Using spooled image attachment: {spool_path}")
+                return spool_path
+            
             # Check for Gmail API format first (source == 'gmail' and raw bytes in 'data')
             gmail_source = image_info.get('source') == 'gmail'
             gmail_bytes = image_info.get('data') if isinstance(image_info.get('data'), (bytes, bytearray)) else None
@@ -258,12 +269,13 @@ class ImageAnalyzer:
             self.logger.error(f"Error extracting image to temp file: {str(e)}")
             return None
     
-    def _upload_image_to_gemini(self, image_path: str) -> Optional[object]:
+    def _upload_image_to_gemini(self, image_path: str, mime_type: Optional[str] = None) -> Optional[object]:
         """
         Upload image file to Gemini for analysis
         
         Args:
             image_path: Path to the image file
+            mime_type: Attachment MIME type, used when the path has no extension (spooled files)
             
         Returns:
             Uploaded file object or None if failed
@@ -284,6 +296,8 @@ class ImageAnalyzer:
                 mime = 'image/tiff'
             elif ext in ['.webp']:
                 mime = 'image/webp'
+            elif not ext and mime_type and mime_type.startswith('image/'):
+                mime = mime_type
 
             uploaded_file = self.gemini_client.files.upload(
                 file=image_path,
@@ -297,7 +311,7 @@ class ImageAnalyzer:
             self.api_errors += 1
             return None
     
-    def _call_gemini_vision_api(self, uploaded_file) -> Optional[str]:
+    async def _call_gemini_vision_api(self, uploaded_file) -> Optional[str]:
         """
         Call Gemini Vision API to analyze image for unclear HVAC terms
         
@@ -309,73 +323,68 @@ class ImageAnalyzer:
         """
         prompt = self._create_image_analysis_prompt()
         
-        for attempt in range(Config.MAX_RETRIES):
-            try:
-                self.api_calls_made += 1
-                
-                # Configure API call
-                config = types.GenerateContentConfig(
-                    temperature=0.1,  # Low temperature for consistent results
-                    candidate_count=1
-                )
-                
-                # Build proper content parts with file_data and text
-                parts = [
-                    types.Part(text=prompt),
-                    types.Part(file_data=types.FileData(
-                        mime_type=getattr(uploaded_file, 'mime_type', 'image/jpeg'),
-                        file_uri=getattr(uploaded_file, 'uri', None)
-                    ))
-                ]
+        self.api_calls_made += 1
 
-                response = self.gemini_client.models.generate_content(
-                    model=Config.GEMINI_MODEL,
-                    contents=[types.Content(parts=parts, role="user")],
-                    config=config
-                )
+        # Configure API call
+        config = types.GenerateContentConfig(
+            temperature=0.1,  # Low temperature for consistent results
+            candidate_count=1
+        )
 
-                # Try multiple ways to extract text from response
-                response_text = None
-                if response:
-                    # Check if response was truncated due to MAX_TOKENS
-                    if hasattr(response, 'candidates') and response.candidates:
-                        candidate = response.candidates[0]
-                        if hasattr(candidate, 'finish_reason') and candidate.finish_reason:
-                            finish_reason_str = str(candidate.finish_reason)
-                            if 'MAX_TOKENS' in finish_reason_str:
-                                self.logger.error(f"⚠️ Image text extraction hit MAX_TOKENS limit! The image likely contains more text than could be extracted. Consider increasing max_output_tokens.")
-                                # Still try to get partial content
-                    
-                    # Method 1: Direct .text attribute
-                    if hasattr(response, 'text') and response.text:
-                        response_text = response.text.strip()
-                    # Method 2: Through candidates
-                    elif hasattr(response, 'candidates') and response.candidates:
-                        candidate = response.candidates[0]
-                        if hasattr(candidate, 'content') and candidate.content:
-                            if hasattr(candidate.content, 'parts') and candidate.content.parts:
-                                for part in candidate.content.parts:
-                                    if hasattr(part, 'text') and part.text:
-                                        response_text = part.text.strip()
-                                        break
+        # Build proper content parts with file_data and text
+        parts = [
+            types.Part(text=prompt),
+            types.Part(file_data=types.FileData(
+                mime_type=getattr(uploaded_file, 'mime_type', 'image/jpeg'),
+                file_uri=getattr(uploaded_file, 'uri', None)
+            ))
+        ]
 
-                if response_text:
-                    self.logger.debug(f"Successfully analyzed image with Gemini Vision API (extracted {len(response_text)} chars)")
-                    return response_text
-                else:
-                    self.logger.warning(f"Empty response from Gemini Vision API. Response object: {response}")
-                    return None
-                
-            except Exception as e:
-                self.api_errors += 1
-                self.logger.error(f"Gemini Vision API error (attempt {attempt + 1}): {str(e)}")
-                
-                if attempt < Config.MAX_RETRIES - 1:
-                    time.sleep(Config.API_RETRY_DELAY * (attempt + 1))  # Exponential backoff
-                else:
-                    self.logger.error(f"Failed to analyze image after {Config.MAX_RETRIES} attempts")
-        
-        return None
+        try:
+            response = await get_llm_gateway().generate_content(
+                model=Config.GEMINI_MODEL,
+                contents=[types.Content(parts=parts, role="user")],
+                config=config,
+                client=self.gemini_client,
+                max_attempts=Config.MAX_RETRIES,
+                label="image_analyzer",
+            )
+        except Exception as e:
+            self.api_errors += 1
+            self.logger.error(f"Failed to analyze image after {Config.MAX_RETRIES} attempts: {str(e)}")
+            return None
+
+        # Try multiple ways to extract text from response
+        response_text = None
+        if response:
+            # Check if response was truncated due to MAX_TOKENS
+            if hasattr(response, 'candidates') and response.candidates:
+                candidate = response.candidates[0]
+                if hasattr(candidate, 'finish_reason') and candidate.finish_reason:
+                    finish_reason_str = str(candidate.finish_reason)
+                    if 'MAX_TOKENS' in finish_reason_str:
+                        self.logger.error(f"⚠️ Image text extraction hit MAX_TOKENS limit! The image likely contains more text than could be extracted. Consider increasing max_output_tokens.")
+                        # Still try to get partial content
+
+            # Method 1: Direct .text attribute
+            if hasattr(response, 'text') and response.text:
+                response_text = response.text.strip()
+            # Method 2: Through candidates
+            elif hasattr(response, 'candidates') and response.candidates:
+                candidate = response.candidates[0]
+                if hasattr(candidate, 'content') and candidate.content:
+                    if hasattr(candidate.content, 'parts') and candidate.content.parts:
+                        for part in candidate.content.parts:
+                            if hasattr(part, 'text') and part.text:
+                                response_text = part.text.strip()
+                                break
+
+        if response_text:
+            self.logger.debug(f"Successfully analyzed image with Gemini Vision API (extracted {len(response_text)} chars)")
+            return response_text
+        else:
+            self.logger.warning(f"Empty response from Gemini Vision API. Response object: {response}")
+            return None
     
     def _create_image_analysis_prompt(self) -> str:
         """
@@ -0,0 +1,197 @@
+"""
+Iteration budget for the agentic batch matcher.
+
+The batch loop used to stop only when every term was matched or when
+num_products * 7 iterations were spent, so unmatchable lines (services,
+freight, obscure brands) burned the whole budget on search variants.
+
+IterationBudget attributes each tool call to the terms it was made for and
+tracks three progress signals per term:
+- new candidates: product codes not seen before for the term
+- score improvement: a better lexical overlap between the term and a candidate name
+- repetition: the same call repeated back to back (see _execute_batch_function)
+
+Every term starts with the same allowance of calls. A term that uses up its
+allowance while still improving gets an extension from the shared pool, or
+from the iterations left under the ceiling when the pool is empty; it is
+never retired. A term that stops improving is retired to the 9000 fallback,
+unless it already has a strong candidate, and whatever it did not use goes
+back to the pool. The overall iteration ceiling is unchanged.
+"""
+import re
+import time
+from typing import Dict, Iterable, List, Set
+
+
+_CODE_RE = re.compile(r"^- (\S+) \| (.*)$", re.MULTILINE)
+_WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+SEARCH_FUNCTIONS = (
+    "search_by_product_codes",
+    "wildcard_search",
+    "semantic_search",
+    "google_search",
+    "search_products_in_group",
+    "sort_products_in_group",
+    "select_product_group",
+)
+
+
+def _words(text: str) -> Set[str]:
+    return {word for word in _WORD_RE.findall(str(text).lower()) if len(word) > 1}
+
+
+def parse_candidates(result_text: str) -> Dict[str, str]:
+    """Product code -> name from a formatted search result ('- code | name ...' lines)."""
+    return {code: name for code, name in _CODE_RE.findall(result_text or "") if code != "N/A"}
+
+
+class _TermProgress:
+    __slots__ = ('words', 'calls', 'allowance', 'candidates', 'best_score', 'calls_since_progress', 'repeats')
+
+    def __init__(self, term: str, allowance: int):
+        self.words = _words(term)
+        self.calls = 0
+        self.allowance = allowance
+        self.candidates: Set[str] = set()
+        self.best_score = 0.0
+        self.calls_since_progress = 0
+        self.repeats = 0
+
+
+class IterationBudget:
+    """Per-term call allowances, progress tracking and early retirement."""
+
+    def __init__(
+        self,
+        terms: Iterable[str],
+        calls_per_term: int = 7,
+        patience: int = 4,
+        extension: int = 3,
+        min_searches: int = 3,
+        min_search_types: int = 2,
+        strong_score: float = 0.6
+    ):
+        """
+        Args:
+            terms: Unclear terms of the batch
+            calls_per_term: Initial allowance per term (also sets the iteration ceiling)
+            patience: Calls without progress before a term counts as stalled
+            extension: Extra calls granted to a term that is still improving
+            min_searches: Searches required before a stalled term may be retired
+            min_search_types: Distinct search functions required before retiring
+            strong_score: Best candidate score above which a stalled term is left to the agent
+        """
+        self.terms: Dict[str, _TermProgress] = {term: _TermProgress(term, calls_per_term) for term in terms}
+        self.max_iterations = max(len(self.terms) * calls_per_term, 1)
+        self.patience = patience
+        self.extension = extension
+        self.min_searches = min_searches
+        self.min_search_types = min_search_types
+        self.strong_score = strong_score
+        self.pool = 0
+        self.iterations = 0
+        self.retired: List[str] = []
+        self.extended = 0
+        self.started_at = time.monotonic()
+
+    def attribute(self, function_args: Dict, pending: Iterable[str]) -> List[str]:
+        """Terms a call was made for: explicit for_terms, else pending terms sharing a query word."""
+        explicit = [term for term in (function_args or {}).get("for_terms", []) or [] if term in self.terms]
+        if explicit:
+            return explicit
+        query = " ".join(
+            str(function_args.get(key, "")) for key in ("query", "search_term", "name_filter", "sku_filter")
+        ) if function_args else ""
+        query_words = _words(query.replace("%", " "))
+        if not query_words:
+            return []
+        return [term for term in pending if self.terms[term].words & query_words]
+
+    def observe(self, function_name: str, terms: List[str], result_text: str, repeated: bool) -> None:
+        """Record one tool call and its result for the given terms."""
+        if function_name not in SEARCH_FUNCTIONS:
+            return
+        candidates = parse_candidates(result_text)
+        for term in terms:
+            progress = self.terms[term]
+            progress.calls += 1
+            improved = False
+            new_codes = set(candidates) - progress.candidates
+            if new_codes:
+                progress.candidates |= new_codes
+                improved = True
+            for code in new_codes:
+                name_words = _words(candidates[code])
+                if progress.words and name_words:
+                    score = len(progress.words & name_words) / len(progress.words)
+                    if score > progress.best_score:
+                        progress.best_score = score
+            if repeated:
+                progress.repeats += 1
+                improved = False
+            progress.calls_since_progress = 0 if improved else progress.calls_since_progress + 1
+
+    def release(self, term: str) -> None:
+        """A term was matched (or given up) by the agent: return its unused allowance."""
+        progress = self.terms.get(term)
+        if progress is not None and progress.allowance > progress.calls:
+            self.pool += progress.allowance - progress.calls
+            progress.allowance = progress.calls
+
+    def stalled_terms(self, pending: Iterable[str], usage_tracker: Dict[str, Dict]) -> List[str]:
+        """Pending terms to retire now; extends the allowance of terms that are still improving."""
+        to_retire = []
+        for term in pending:
+            progress = self.terms.get(term)
+            if progress is None:
+                continue
+            if progress.best_score >= self.strong_score:
+                # Good candidates are already on the table; the agent should pick one
+                continue
+            stalled = progress.calls_since_progress >= self.patience or progress.repeats >= 2
+            overrun = progress.calls >= progress.allowance + self.patience
+            if not stalled and not overrun:
+                # Still finding new candidates: never retired, extended once out of allowance
+                if progress.calls >= progress.allowance:
+                    self._extend(progress)
+                continue
+            tracker = usage_tracker.get(term, {})
+            searched_enough = (
+                len(tracker.get("searches", [])) >= self.min_searches
+                and len(tracker.get("search_types", [])) >= self.min_search_types
+            )
+            # Hopeless repetition retires even without the full search quota
+            if searched_enough or progress.repeats >= 2 or overrun:
+                to_retire.append(term)
+        for term in to_retire:
+            self.release(term)
+            self.retired.append(term)
+        return to_retire
+
+    def _extend(self, progress: _TermProgress) -> None:
+        """Grant extra calls from the shared pool, or else from the unused iteration headroom."""
+        grant = min(self.extension, self.pool)
+        if grant:
+            self.pool -= grant
+        else:
+            grant = min(self.extension, max(self.max_iterations - self.iterations, 0))
+        progress.allowance += grant
+        self.extended += grant
+
+    def tick(self) -> None:
+        """Count one loop iteration (one LLM call)."""
+        self.iterations += 1
+
+    def summary(self, matched: int) -> Dict:
+        """Iterations, retirements and seconds per matched line."""
+        seconds = time.monotonic() - self.started_at
+        return {
+            'iterations': self.iterations,
+            'max_iterations': self.max_iterations,
+            'retired': len(self.retired),
+            'extended_calls': self.extended,
+            'matched': matched,
+            'seconds': round(seconds, 2),
+            'seconds_per_matched_line': round(seconds / matched, 2) if matched else None,
+        }
@@ -0,0 +1,137 @@
+"""
+Streaming match pipeline.
+
+Queues extracted product terms and feeds them to ProductMatcher.match_terms_batch
+in batches while extraction is still running, so matching of the first lines
+of a long tender overlaps with the model generating the rest.
+
+A batch is dispatched once at least min_batch terms are waiting (and the
+user instructions are known), or when extraction has finished. Each batch
+takes up to max_batch terms; terms that arrive while a batch is being matched
+go into the next one.
+"""
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, List, Optional
+
+
+class StreamingMatchPipeline:
+    """Producer/consumer queue between product extraction and batch matching."""
+
+    def __init__(
+        self,
+        matcher,
+        min_batch: int = 5,
+        max_batch: int = 25,
+        max_terms: int = 100,
+        get_user_instructions: Optional[Callable[[], str]] = None
+    ):
+        """
+        Args:
+            matcher: ProductMatcher (or anything with async match_terms_batch)
+            min_batch: Terms to wait for before dispatching a batch mid-extraction
+            max_batch: Largest batch handed to the matching agent
+            max_terms: Total terms accepted; later ones are dropped with a warning
+            get_user_instructions: Returns the current user instructions at dispatch time
+        """
+        self.logger = logging.getLogger(__name__)
+        self.matcher = matcher
+        self.min_batch = max(1, min_batch)
+        self.max_batch = max(self.min_batch, max_batch)
+        self.max_terms = max_terms
+        self.get_user_instructions = get_user_instructions or (lambda: "")
+
+        self.results: List[Dict] = []
+        self.accepted = 0
+        self.dropped = 0
+        self.batches = 0
+
+        self._pending: List[Dict] = []
+        self._ready = False
+        self._closed = False
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._started_at = 0.0
+        self._first_dispatch_at: Optional[float] = None
+        self._closed_at: Optional[float] = None
+
+    def start(self) -> None:
+        """Start the matching consumer."""
+        if self._task is None:
+            self._started_at = time.monotonic()
+            self._task = asyncio.create_task(self._run())
+
+    def submit(self, term_dict: Dict) -> bool:
+        """Queue a term for matching; returns False once max_terms is reached."""
+        if self.accepted >= self.max_terms:
+            self.dropped += 1
+            if self.dropped == 1:
+                self.logger.warning(
+                    f"⚠️ Matching limited to the first {self.max_terms} products, skipping the rest"
+                )
+            return False
+        self.accepted += 1
+        self._pending.append(term_dict)
+        self._changed.set()
+        return True
+
+    def set_ready(self) -> None:
+        """User instructions are known; batches may be dispatched before extraction ends."""
+        self._ready = True
+        self._changed.set()
+
+    async def finish(self) -> List[Dict]:
+        """Close the queue, wait for the remaining batches and return all match results."""
+        self._closed = True
+        self._closed_at = time.monotonic()
+        self._changed.set()
+        if self._task is None:
+            self.start()
+        await self._task
+
+        if self.dropped:
+            self.logger.warning(f"⚠️ Skipped {self.dropped} products beyond the first {self.max_terms}")
+        if self._first_dispatch_at is not None and self.batches > 1:
+            overlap = max(self._closed_at - self._first_dispatch_at, 0.0)
+            self.logger.info(
+                f"⚡ Matching overlapped extraction by {overlap:.1f}s "
+                f"({self.batches} batches, {len(self.results)} results)"
+            )
+        return self.results
+
+    def cancel(self) -> None:
+        """Stop the consumer (extraction failed)."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    def _can_dispatch(self) -> bool:
+        if not self._pending:
+            return False
+        if self._closed:
+            return True
+        return self._ready and len(self._pending) >= self.min_batch
+
+    async def _run(self) -> None:
+        while True:
+            if self._can_dispatch():
+                batch = self._pending[:self.max_batch]
+                del self._pending[:len(batch)]
+                self.batches += 1
+                if self._first_dispatch_at is None:
+                    self._first_dispatch_at = time.monotonic()
+                state = "extraction finished" if self._closed else "extraction still running"
+                self.logger.info(
+                    f"🚀 Matching batch {self.batches}: {len(batch)} terms "
+                    f"({len(self._pending)} queued, {state})"
+                )
+                results = await self.matcher.match_terms_batch(
+                    batch, user_instructions=self.get_user_instructions()
+                )
+                self.results.extend(results or [])
+                continue
+
+            if self._closed and not self._pending:
+                return
+            self._changed.clear()
+            await self._changed.wait()
@@ -0,0 +1,149 @@
+"""
+Complexity-based model routing.
+
+Not every line needs the strong agentic model. Before the batch agent starts,
+each term is routed on cheap features:
+- a product code in the term that the catalogue knows (exactly one hit)
+- the number of semantic search candidates
+- the top-1 score and the gap to the top-2 candidate
+
+Tiers:
+- none: the code lookup already identifies the product, no LLM call
+- fast: one clear semantic candidate; a small model confirms or rejects it
+  (all fast terms of a batch in one call)
+- strong: everything else, and anything the fast model rejects, goes to the
+  agentic loop as before
+
+Extraction is routed by input size: short plain emails go to the fast model,
+long ones and attachments to the thinking model.
+
+Policies are named presets so offline evaluation (src.benchmark.routing_eval)
+can compare them; MODEL_ROUTING_POLICY selects the one used in production.
+The default is strong_only, the behaviour without routing, until the
+evaluation has been run on training_dataset.csv.
+"""
+import logging
+import os
+import re
+from collections import defaultdict
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional
+
+
+TIER_NONE = "none"
+TIER_FAST = "fast"
+TIER_STRONG = "strong"
+
+# Catalogue codes are 5-8 digits; sizes such as 63x4 or DN100 are not codes
+_CODE_RE = re.compile(r"(?<![\w,.])(\d{5,8})(?!\w|[,.]\d|\s*(?:mm|m|kpl|pcs)\b)", re.IGNORECASE)
+
+
+def extract_codes(term: str) -> List[str]:
+    """Product-code-like numbers in a term, in order, without duplicates."""
+    codes = []
+    for code in _CODE_RE.findall(str(term)):
+        if code not in codes:
+            codes.append(code)
+    return codes
+
+
+@dataclass
+class RouteFeatures:
+    """Cheap per-term signals collected before any LLM call."""
+    has_code: bool = False
+    code_hits: int = 0
+    candidate_count: int = 0
+    top1: float = 0.0
+    top2: float = 0.0
+
+    @property
+    def gap(self) -> float:
+        return self.top1 - self.top2
+
+
+@dataclass
+class RouteDecision:
+    tier: str
+    model: Optional[str]
+    reason: str
+
+
+@dataclass
+class RoutingPolicy:
+    """Thresholds and models for one routing policy."""
+    name: str
+    allow_no_model: bool = True
+    allow_fast: bool = True
+    fast_min_top1: float = 0.75
+    fast_min_gap: float = 0.08
+    fast_model: str = "gemini-2.5-flash"
+    strong_model: str = "grok-4-1-fast-reasoning"
+    extraction_fast_max_chars: int = 3000
+
+
+POLICIES: Dict[str, RoutingPolicy] = {
+    # Baseline: every line goes through the agentic loop
+    "strong_only": RoutingPolicy(name="strong_only", allow_no_model=False, allow_fast=False, extraction_fast_max_chars=0),
+    # Exact code hits skip the LLM, nothing else changes
+    "codes_only": RoutingPolicy(name="codes_only", allow_fast=False, extraction_fast_max_chars=0),
+    "balanced": RoutingPolicy(name="balanced"),
+    "aggressive": RoutingPolicy(name="aggressive", fast_min_top1=0.65, fast_min_gap=0.04, extraction_fast_max_chars=8000),
+}
+
+
+def policy_from_env() -> RoutingPolicy:
+    """MODEL_ROUTING_POLICY preset with model overrides from the environment."""
+    name = os.getenv('MODEL_ROUTING_POLICY', 'strong_only').lower()
+    policy = POLICIES.get(name)
+    if policy is None:
+        logging.getLogger(__name__).warning(f"Unknown MODEL_ROUTING_POLICY '{name}', using 'strong_only'")
+        policy = POLICIES["strong_only"]
+    return replace(
+        policy,
+        fast_model=os.getenv('ROUTER_FAST_MODEL', policy.fast_model),
+        strong_model=os.getenv('ROUTER_STRONG_MODEL', policy.strong_model),
+    )
+
+
+class ModelRouter:
+    """Routes matching decisions and extraction calls to the cheapest adequate model."""
+
+    def __init__(self, policy: Optional[RoutingPolicy] = None):
+        self.logger = logging.getLogger(__name__)
+        self.policy = policy or policy_from_env()
+        self.decisions: Dict[str, int] = defaultdict(int)
+
+    def route(self, features: RouteFeatures) -> RouteDecision:
+        """Tier for one term."""
+        policy = self.policy
+        if policy.allow_no_model and features.has_code and features.code_hits == 1:
+            decision = RouteDecision(TIER_NONE, None, "product code found in catalogue")
+        elif (
+            policy.allow_fast
+            and features.candidate_count > 0
+            and features.top1 >= policy.fast_min_top1
+            and (features.candidate_count == 1 or features.gap >= policy.fast_min_gap)
+        ):
+            decision = RouteDecision(
+                TIER_FAST, policy.fast_model,
+                f"clear semantic candidate (top1 {features.top1:.2f}, gap {features.gap:.2f})"
+            )
+        else:
+            decision = RouteDecision(TIER_STRONG, policy.strong_model, "ambiguous")
+        self.decisions[decision.tier] += 1
+        return decision
+
+    def escalate(self, count: int = 1) -> None:
+        """Fast-tier terms the small model could not confirm."""
+        self.decisions["escalated"] += count
+
+    def route_extraction(self, content: str, has_attachments: bool, default_model: str) -> str:
+        """Model for product extraction: short plain emails go to the fast model."""
+        if not has_attachments and 0 < len(content or "") <= self.policy.extraction_fast_max_chars:
+            self.decisions["extraction_fast"] += 1
+            return self.policy.fast_model
+        self.decisions["extraction_default"] += 1
+        return default_model
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.decisions)
@@ -95,6 +95,10 @@ TOOL_CAPABLE_MODELS = {
     # This is used to skip tool conversion for models that don't support it
 }
 
+# Anthropic models only cache a prompt prefix when it is marked with cache_control
+# (other providers behind OpenRouter cache repeated prefixes automatically)
+PROMPT_CACHE_ENABLED = os.getenv("OPENROUTER_PROMPT_CACHE", "true").lower() == "true"
+
 
 class OpenRouterHandler:
     """Handler for OpenRouter API requests"""
@@ -176,6 +180,29 @@ class OpenRouterHandler:
             # Gemini/Claude style: max_tokens budget
             return {"reasoning": {"max_tokens": thinking_budget}}
     
+    def _apply_prompt_cache(self, model: str, messages: List[Dict]) -> List[Dict]:
+        """Mark the system prompt as a cache breakpoint for Anthropic models.
+
+        Anthropic caches tools + system up to the breakpoint, so the static
+        prefix of an agentic loop is billed at the cached rate on later turns.
+        """
+        if not PROMPT_CACHE_ENABLED or not messages:
+            return messages
+        mapped = self._get_openrouter_model_id(model)
+        if not (mapped.startswith("anthropic/") or "claude" in model.lower()):
+            return messages
+        first = messages[0]
+        if first.get("role") == "system" and isinstance(first.get("content"), str):
+            messages[0] = {
+                "role": "system",
+                "content": [{
+                    "type": "text",
+                    "text": first["content"],
+                    "cache_control": {"type": "ephemeral"}
+                }]
+            }
+        return messages
+    
     def _convert_messages_to_openrouter(
         self, 
         prompt: Any, 
@@ -828,6 +855,7 @@ class OpenRouterHandler:
         openrouter_messages = self._convert_messages_to_openrouter(
             prompt, messages, system_prompt, images
         )
+        openrouter_messages = self._apply_prompt_cache(model, openrouter_messages)
         
         # Convert tools (pass model to handle OpenAI-specific schema requirements)
         openrouter_tools = self._convert_tools_to_openrouter(tools, model)
@@ -948,6 +976,7 @@ class OpenRouterHandler:
         openrouter_messages = self._convert_messages_to_openrouter(
             prompt, messages, system_prompt, images
         )
+        openrouter_messages = self._apply_prompt_cache(model, openrouter_messages)
         
         # Convert tools (pass model to handle OpenAI-specific schema requirements)
         openrouter_tools = self._convert_tools_to_openrouter(tools, model)
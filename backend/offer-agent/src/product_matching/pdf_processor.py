@@ -2,6 +2,7 @@
 PDF processor module for extracting and filtering PDF attachments in HVAC offer analysis
 Uses Mistral OCR as primary method with standard PDF extraction as fallback
 """
+import asyncio
 import logging
 import os
 from typing import List, Dict, Optional
@@ -12,6 +13,8 @@ import base64
 from google import genai
 from google.genai import types
 from .config import Config
+from src.email_processing.attachment_store import attachment_bytes, attachment_path
+from src.llm.gateway import get_llm_gateway
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -81,7 +84,7 @@ class PDFProcessor:
         self.ocr_fallback_used = 0
         self.ocr_success_count = 0
     
-    def extract_pdf_content(self, filtered_emails: List[Dict]) -> List[Dict]:
+    async def extract_pdf_content(self, filtered_emails: List[Dict]) -> List[Dict]:
         """
         Extract and filter PDF content from email attachments
         
@@ -120,11 +123,12 @@ class PDFProcessor:
             self.logger.info(f"Processing {len(pdf_attachments)} PDF attachments for email: {email.get('subject', '')[:50]}")
             
             # Extract content from PDFs
-            pdf_contents = self._extract_pdf_attachments(pdf_attachments, email)
+            # Text extraction / OCR is blocking - keep it off the event loop
+            pdf_contents = await asyncio.to_thread(self._extract_pdf_attachments, pdf_attachments, email)
             
             if pdf_contents:
                 # Filter PDFs that contain product lists
-                relevant_pdfs = self._filter_relevant_pdfs(pdf_contents, email)
+                relevant_pdfs = await self._filter_relevant_pdfs(pdf_contents, email)
                 
                 if relevant_pdfs:
                     pdf_data.append({
@@ -162,18 +166,11 @@ class PDFProcessor:
                 filename = attachment.get('filename', 'unknown.pdf')
                 self.logger.info(f"🐛 DEBUG: Processing PDF filename: {filename}")
                 
-                content_data = self._get_attachment_binary_content(attachment)
+                temp_path, content_data = self._pdf_file_for(attachment)
                 
-                if not content_data:
+                if not temp_path:
                     self.logger.warning(f"🐛 DEBUG: No content data for PDF: {filename}")
                     continue
-                else:
-                    self.logger.info(f"🐛 DEBUG: Successfully got content data for {filename}, size: {len(content_data)} bytes")
-                
-                # Save to temporary file for processing
-                with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_file:
-                    temp_file.write(content_data)
-                    temp_path = temp_file.name
                 
                 try:
                     # Check page count and extract content
@@ -203,11 +200,12 @@ class PDFProcessor:
                                    f"{len(truncated_content)} chars{truncation_note})")
                 
                 finally:
-                    # Clean up temporary file
-                    try:
-                        os.unlink(temp_path)
-                    except:
-                        pass
+                    # Clean up temporary file (spooled attachments are released with their email)
+                    if temp_path != attachment_path(attachment):
+                        try:
+                            os.unlink(temp_path)
+                        except:
+                            pass
                         
             except Exception as e:
                 self.logger.error(f"Error processing PDF {attachment.get('filename', 'unknown')}: {e}")
@@ -215,6 +213,28 @@ class PDFProcessor:
         
         return pdf_contents
     
+    def _pdf_file_for(self, attachment: Dict) -> tuple:
+        """
+        File to process a PDF attachment from, and its bytes for Mistral OCR.
+        
+        Spooled attachments are used in place, and read only when Mistral OCR
+        will send them; others are written to a temporary file.
+        
+        Returns:
+            Tuple of (path, content bytes or None); (None, None) if there is no content
+        """
+        spool_path = attachment_path(attachment)
+        if spool_path:
+            return spool_path, attachment_bytes(attachment) if self.mistral_client else None
+        
+        content_data = self._get_attachment_binary_content(attachment)
+        if not content_data:
+            return None, None
+        
+        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_file:
+            temp_file.write(content_data)
+            return temp_file.name, content_data
+    
     def _get_attachment_binary_content(self, attachment: Dict) -> Optional[bytes]:
         """Extract binary content from the attachment"""
         try:
@@ -534,7 +554,7 @@ class PDFProcessor:
             self.logger.error(f"🐛 DEBUG: Full traceback: {traceback.format_exc()}")
             return None
     
-    def _filter_relevant_pdfs(self, pdf_contents: List[Dict], email: Dict) -> List[Dict]:
+    async def _filter_relevant_pdfs(self, pdf_contents: List[Dict], email: Dict) -> List[Dict]:
         """
         Use LLM to filter PDFs that contain clear product lists
         
@@ -569,10 +589,13 @@ class PDFProcessor:
                 candidate_count=1,
             )
             
-            response = self.gemini_client.models.generate_content(
+            response = await get_llm_gateway().generate_content(
                 model=Config.GEMINI_MODEL,
                 contents=prompt,
                 config=config,
+                client=self.gemini_client,
+                label="pdf_processor",
+                cache=True,
             )
             
             if not response:
@@ -705,16 +728,19 @@ class PDFProcessor:
         temp_path = None
         
         try:
-            # Get binary content from attachment
-            content_data = self._get_attachment_binary_content(attachment)
-            if not content_data:
-                self.logger.warning(f"❌ No content data for PDF: {filename}")
-                return []
-            
-            # Save to temporary file
-            with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_file:
-                temp_file.write(content_data)
-                temp_path = temp_file.name
+            # Spooled attachments are converted in place, others via a temporary file
+            if attachment_path(attachment):
+                pdf_path = attachment_path(attachment)
+            else:
+                content_data = self._get_attachment_binary_content(attachment)
+                if not content_data:
+                    self.logger.warning(f"❌ No content data for PDF: {filename}")
+                    return []
+                
+                with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_file:
+                    temp_file.write(content_data)
+                    temp_path = temp_file.name
+                pdf_path = temp_path
             
             # Try to use pdf2image for conversion
             try:
@@ -723,7 +749,7 @@ class PDFProcessor:
                 # Convert first N pages to images
                 self.logger.info(f"📄 Converting {filename} pages to PNG images...")
                 pil_images = convert_from_path(
-                    temp_path,
+                    pdf_path,
                     first_page=1,
                     last_page=max_pages,
                     dpi=150,  # Good balance between quality and size
@@ -757,7 +783,7 @@ class PDFProcessor:
                 try:
                     import fitz  # PyMuPDF
                     
-                    doc = fitz.open(temp_path)
+                    doc = fitz.open(pdf_path)
                     pages_to_process = min(max_pages, len(doc))
                     
                     for page_num in range(pages_to_process):
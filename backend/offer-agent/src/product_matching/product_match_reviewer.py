@@ -11,6 +11,8 @@ from typing import List, Dict, Optional
 from google import genai
 from google.genai import types
 
+from src.llm.gateway import get_llm_gateway
+
 
 class ProductMatchReviewer:
     """
@@ -113,7 +115,7 @@ Are there any consistency issues that need re-evaluation?"""
 
         try:
             # Make LLM call with tool calling capability
-            response = self.gemini_client.models.generate_content(
+            response = await get_llm_gateway().generate_content(
                 model=self.model_name,
                 contents=[
                     types.Content(
@@ -121,12 +123,17 @@ Are there any consistency issues that need re-evaluation?"""
                         parts=[types.Part(text=f"{system_prompt}\n\n{user_prompt}")]
                     )
                 ],
-                tools=[self.re_evaluate_tool],
-                tool_config=types.ToolConfig(
-                    function_calling_config=types.FunctionCallingConfig(
-                        mode=types.FunctionCallingConfig.Mode.AUTO
+                config=types.GenerateContentConfig(
+                    tools=[self.re_evaluate_tool],
+                    tool_config=types.ToolConfig(
+                        function_calling_config=types.FunctionCallingConfig(
+                            mode=types.FunctionCallingConfig.Mode.AUTO
+                        )
                     )
-                )
+                ),
+                client=self.gemini_client,
+                label="match_reviewer",
+                cache=True,
             )
             
             # Process the response and handle any tool calls
@@ -271,7 +278,7 @@ Please find the most appropriate product match considering the instructions abov
                     
             else:
                 # Multiple candidates - use Gemini selection
-                selected_row = self.parent_matcher._gemini_select_best(
+                selected_row = await self.parent_matcher._gemini_select_best(
                     unclear_term, new_candidates_df, enhanced_context
                 )
                 if selected_row is not None:
@@ -1,8 +1,8 @@
+import copy
 import logging
 import os
 import re
 import numpy as np  # Added for semantic vector operations
-import time
 import sys
 import http.client
 import json
@@ -13,8 +13,6 @@ from typing import List, Dict, Optional
 from pathlib import Path
 
 import pandas as pd
-from google import genai
-from openai import OpenAI
 from google.genai import types
 
 # Import OpenRouter handler for routing LLM requests
@@ -40,6 +38,20 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.lemonsoft.api_client import LemonsoftAPIClient
 from src.lemonsoft.database_connection import create_database_client
+from src.benchmark.recorder import KIND_EMBEDDING, get_interaction_recorder
+from src.llm.context_cache import get_context_cache
+from src.llm.gateway import get_llm_gateway
+from src.llm.rate_limiter import estimate_tokens, get_rate_limiter
+from src.product_matching.conversation_buffer import ConversationBuffer
+from src.product_matching import shared_resources
+from src.product_matching.iteration_budget import IterationBudget
+from src.product_matching.model_router import (
+    TIER_FAST,
+    TIER_NONE,
+    ModelRouter,
+    RouteFeatures,
+    extract_codes,
+)
 
 # Import the new GroupBasedMatcher for primary matching strategy
 try:
@@ -188,143 +200,51 @@ class ProductMatcher:
     3. Agentic search with Gemini for complex fuzzy situations (final fallback)
     """
 
-    def _retry_llm_request(self, request_func, *args, **kwargs):
-        """Wrapper to retry LLM requests with exponential backoff and model fallback.
+    async def _retry_llm_request(self, model: Optional[str] = None, contents=None, config=None, label: str = "product_matcher"):
+        """Send an LLM request through the async gateway with retries and model fallback.
         
-        - Routes through OpenRouter if USE_OPENROUTER=True environment variable is set
-        - Uses exponential backoff for all retry attempts
+        - Uses exponential backoff with jitter for all retry attempts (never blocks the event loop)
         - Falls back to alternative models after 3 failures with primary model
         - Model fallback order: Uses passed model -> gemini-2.5-flash -> gemini-2.0-flash
-        - Special handling for thought_signature errors (Gemini 3+ models)
+        - Each attempt is routed by _route_llm_call (xAI, OpenRouter or Gemini SDK)
+        - Thought_signature errors (Gemini 3+ models) do not trigger a model switch
         """
-        max_retries = 5
-        base_wait = 1  # Base wait time in seconds
-        primary_model_failures = 3  # Number of failures before trying fallback models
-        
-        # Get the initially requested model (preserve it for fallback chain)
-        initial_model = kwargs.get('model', Config.GEMINI_MODEL)
-        
-        # Define model fallback chain - start with requested model
-        fallback_models = [
-            initial_model,        # Use whatever model was requested
-            'gemini-2.5-flash',   # First fallback
-            'gemini-2.0-flash',   # Second fallback
-        ]
-        
-        current_model_index = 0
-        total_attempts = 0
-        thought_signature_errors = 0  # Track thought_signature specific errors
-        
-        for attempt in range(max_retries):
-            total_attempts += 1
-            current_model = fallback_models[current_model_index]
-            
-            # Switch to fallback model if primary has failed enough times
-            # BUT don't switch if the error is thought_signature related (it needs fixing, not model change)
-            if attempt >= primary_model_failures and current_model_index < len(fallback_models) - 1 and thought_signature_errors == 0:
-                current_model_index += 1
-                current_model = fallback_models[current_model_index]
-                self.logger.info(f"Switching to fallback model: {current_model}")
-                
-                # Update the model in kwargs if it exists
-                if 'model' in kwargs:
-                    kwargs['model'] = current_model
-                # Also check if model is passed in args (for some API calls)
-                args_list = list(args)
-                for i, arg in enumerate(args_list):
-                    if isinstance(arg, str) and 'gemini' in arg.lower():
-                        args_list[i] = current_model
-                        args = tuple(args_list)
-                        break
-            
-            try:
-                # ============================================================
-                # GROK ROUTING: Route directly to xAI API for Grok models
-                # This takes priority over OpenRouter for direct xAI access
-                # ============================================================
-                is_grok_model = self._is_grok_model(current_model) and get_grok_handler
-
-                if is_grok_model:
-                    self.logger.info(f"[GROK] Grok model '{current_model}' - routing via xAI API")
-                    result = self._call_via_grok(current_model, kwargs)
-
-                    # Log success if we had to use a fallback model
-                    if current_model_index > 0:
-                        self.logger.info(f"Request succeeded with fallback model via xAI: {current_model}")
-
-                    return result
-                # ============================================================
-                # END GROK ROUTING
-                # ============================================================
-
-                # ============================================================
-                # OPENROUTER ROUTING: Route through OpenRouter if:
-                # 1. USE_OPENROUTER=True (explicit opt-in for all models), OR
-                # 2. Model is NOT a Gemini model (non-Gemini must use OpenRouter)
-                # ============================================================
-                is_gemini_model = self._is_gemini_model(current_model)
-                should_use_openrouter = (USE_OPENROUTER or not is_gemini_model) and get_openrouter_handler
-
-                if should_use_openrouter:
-                    if not is_gemini_model:
-                        self.logger.info(f"[OPENROUTER] Non-Gemini model '{current_model}' - routing via OpenRouter")
-                    result = self._call_via_openrouter(current_model, kwargs)
-
-                    # Log success if we had to use a fallback model
-                    if current_model_index > 0:
-                        self.logger.info(f"Request succeeded with fallback model via OpenRouter: {current_model}")
-
-                    return result
-                # ============================================================
-                # END OPENROUTER ROUTING
-                # ============================================================
-
-                # Call the wrapped function (direct Gemini SDK call)
-                result = request_func(*args, **kwargs)
-
-                # Log success if we had to use a fallback model
-                if current_model_index > 0:
-                    self.logger.info(f"Request succeeded with fallback model: {fallback_models[current_model_index]}")
+        return await get_llm_gateway().generate_content(
+            model=model or Config.GEMINI_MODEL,
+            contents=contents,
+            config=config,
+            client=self.gemini_client,
+            transport=self._route_llm_call,
+            label=label,
+        )
 
-                return result
-                
-            except Exception as e:
-                error_str = str(e).lower()
-                self.logger.warning(f"LLM request failed with {current_model} (attempt {total_attempts}/{max_retries}): {e}")
-                
-                # Check if this is a thought_signature error (Gemini 3+ models)
-                if "thought_signature" in error_str or "thoughtsignature" in error_str:
-                    thought_signature_errors += 1
-                    self.logger.warning(f"⚠️ Thought signature error detected ({thought_signature_errors}x). This requires conversation history fix, not model change.")
-                
-                # Check if it's the last attempt
-                if attempt == max_retries - 1:
-                    self.logger.error(f"LLM request failed after {max_retries} attempts across {current_model_index + 1} models")
-                    raise
-                
-                # Use exponential backoff for all error types
-                wait_time = base_wait * (2 ** (attempt % 3))  # Cap exponential growth by resetting every 3 attempts
-                
-                # Special handling for specific error types (but still use exponential backoff)
-                if "503" in error_str or "service unavailable" in error_str:
-                    self.logger.info(f"503 error detected, waiting {wait_time}s (exponential backoff)")
-                    
-                elif "429" in error_str or "rate limit" in error_str or "quota" in error_str:
-                    # Rate limit errors might need longer wait
-                    wait_time = max(wait_time, 10)  # Minimum 10 seconds for rate limits
-                    self.logger.info(f"Rate limit error detected, waiting {wait_time} seconds (exponential backoff)")
-                    
-                elif "500" in error_str or "internal" in error_str:
-                    self.logger.info(f"Server error detected, waiting {wait_time} seconds (exponential backoff)")
-                    
-                else:
-                    self.logger.info(f"Error occurred, waiting {wait_time} seconds (exponential backoff)")
-                
-                # Wait before retrying
-                time.sleep(wait_time)
+    async def _route_llm_call(self, model: str, contents, config):
+        """Gateway transport: pick the provider for a single attempt.
         
-        # This should never be reached due to the raise in the last attempt
-        raise Exception(f"Failed to complete LLM request after {max_retries} attempts")
+        - Grok models go directly to the xAI API
+        - Non-Gemini models (or all models when USE_OPENROUTER=True) go through OpenRouter
+        - Everything else uses the async Gemini SDK client
+        """
+        kwargs = {'contents': contents, 'config': config}
+
+        if self._is_grok_model(model) and get_grok_handler:
+            self.logger.info(f"[GROK] Grok model '{model}' - routing via xAI API")
+            # GrokHandler is synchronous - keep it off the event loop
+            return await asyncio.to_thread(self._call_via_grok, model, kwargs)
+
+        is_gemini_model = self._is_gemini_model(model)
+        if (USE_OPENROUTER or not is_gemini_model) and get_openrouter_handler:
+            if not is_gemini_model:
+                self.logger.info(f"[OPENROUTER] Non-Gemini model '{model}' - routing via OpenRouter")
+            return await self._call_via_openrouter(model, kwargs)
+
+        # Static prefix (system instruction + tools) is served from Gemini cached content
+        config = await get_context_cache().apply(self.gemini_client, model, config)
+        return await self.gemini_client.aio.models.generate_content(
+            model=model,
+            contents=contents,
+            config=config,
+        )
 
     def _is_gemini_model(self, model: str) -> bool:
         """Check if the model is a Gemini model (can be handled by direct Gemini SDK).
@@ -425,7 +345,7 @@ class ProductMatcher:
         # Wrap result in Gemini-compatible response object
         return OpenRouterGeminiResponse(result)
 
-    def _call_via_openrouter(self, model: str, kwargs: Dict) -> OpenRouterGeminiResponse:
+    async def _call_via_openrouter(self, model: str, kwargs: Dict) -> OpenRouterGeminiResponse:
         """Route LLM request through OpenRouter and return Gemini-compatible response.
 
         Handles conversion between Gemini SDK format and OpenRouter format.
@@ -481,32 +401,17 @@ class ProductMatcher:
         else:
             prompt = str(contents) if contents else ""
         
-        # Run async OpenRouter generate in sync context
         # thinking=None means auto-detect based on model capability
-        async def _run_openrouter():
-            return await openrouter.generate(
-                model=model,
-                prompt=prompt,
-                messages=messages,
-                system_prompt=system_prompt,
-                tools=tools,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                thinking=None,  # Auto-detect thinking capability based on model
-            )
-        
-        # Execute async call - handle both sync and async contexts
-        try:
-            # Try to get existing event loop (if we're already in async context)
-            loop = asyncio.get_running_loop()
-            # We're in an async context, use run_coroutine_threadsafe or similar
-            import concurrent.futures
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(asyncio.run, _run_openrouter())
-                result = future.result(timeout=120)
-        except RuntimeError:
-            # No running event loop, safe to use asyncio.run()
-            result = asyncio.run(_run_openrouter())
+        result = await openrouter.generate(
+            model=model,
+            prompt=prompt,
+            messages=messages,
+            system_prompt=system_prompt,
+            tools=tools,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            thinking=None,  # Auto-detect thinking capability based on model
+        )
         
         self.logger.info(f"[OPENROUTER] Request completed successfully for model: {model}")
         
@@ -530,6 +435,10 @@ class ProductMatcher:
         self.current_mode = "GLOBAL"  # Track current search mode (GLOBAL or GROUP_xxx)
         self.current_group = None  # Track currently selected group
         self.user_instructions = ""  # User instructions/context from email
+        
+        # Routes easy lines to a code lookup or a small model before the batch agent
+        self.model_router = ModelRouter()
+        self.routing_enabled = getattr(Config, 'MODEL_ROUTING', False)
 
         # Use provided product repository or create default Lemonsoft client for backward compatibility
         self.product_repository = product_repository
@@ -566,26 +475,13 @@ class ProductMatcher:
         else:
             self.http_client = None
 
-        # Keep CSV loading as fallback for semantic search embeddings
+        # Keep CSV loading as fallback for semantic search embeddings (shared by all matchers in the process)
         if os.path.exists(self.products_csv_path):
             try:
-                # Load product catalogue (keep only code + Finnish name to save RAM/tokens)
-                self.products_df = pd.read_csv(self.products_csv_path, encoding="utf-8", on_bad_lines='skip', delimiter=';')
-                
-                # Check if required columns exist
-                required_columns = ['Tuotekoodi', 'Tuotenimi']
-                missing_columns = [col for col in required_columns if col not in self.products_df.columns]
-                if missing_columns:
-                    self.logger.warning(f"Missing required columns in products CSV: {missing_columns}. Available columns: {list(self.products_df.columns)}")
-                    self.products_df = None
-                else:
-                    # Clean the data and create lowercase column
-                    self.products_df = self.products_df.dropna(subset=['Tuotenimi'])
-                    self.products_df['Tuotenimi'] = self.products_df['Tuotenimi'].astype(str)
-                    self.products_df["Tuotenimi_lower"] = self.products_df["Tuotenimi"].str.lower()
-                    
-                    self.logger.info(f"Successfully loaded {len(self.products_df)} products from {self.products_csv_path} as fallback")
-                
+                # Product catalogue: only code + Finnish name to save RAM/tokens
+                self.products_df = shared_resources.load_product_catalogue(self.products_csv_path)
+                if self.products_df is not None:
+                    self.logger.info(f"Using {len(self.products_df)} products from {self.products_csv_path} as fallback")
             except Exception as e:
                 self.logger.warning(f"Error loading products CSV from {self.products_csv_path}: {e}")
                 self.products_df = None
@@ -594,13 +490,10 @@ class ProductMatcher:
             self.products_df = None
 
         # Gemini setup (for agentic search)
-        self.gemini_client = genai.Client(api_key=Config.GEMINI_API_KEY)
+        self.gemini_client = shared_resources.get_gemini_client(Config.GEMINI_API_KEY)
         
-        # OpenAI setup (for embeddings)
-        self.openai_client = OpenAI(
-            api_key=Config.OPENAI_API_KEY,
-            base_url="https://api.openai.com/v1"  # Force real OpenAI endpoint
-        )
+        # OpenAI setup (for embeddings, real OpenAI endpoint)
+        self.openai_client = shared_resources.get_openai_client(Config.OPENAI_API_KEY)
         self.embedding_model = "text-embedding-3-large"  # Real OpenAI model
         self.product_embeddings: Optional[np.ndarray] = None  # Lazy-loaded
         
@@ -616,11 +509,8 @@ class ProductMatcher:
         self.api_calls_made = 0
         self.api_errors = 0
         
-        # Rate limiting tracking
+        # Daily OpenAI cap (per-minute quotas live in the shared LLM rate limiter)
         self.daily_calls = 0
-        self.minute_calls = 0
-        self.minute_tokens = 0  # Track tokens per minute (TPM limit)
-        self.last_minute_reset = datetime.now()
         self.daily_reset_time = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
         
         # Google search API key for market research
@@ -655,7 +545,7 @@ class ProductMatcher:
         else:
             self.logger.warning("⚠️ ProductMatchReviewer not available - skipping match review")
         
-        # Learning system: Download and merge S3 learnings
+        # Learning system: S3 learnings, downloaded and merged once per refresh interval
         self.s3_learnings_merged = False
         self.general_rules = []
         try:
@@ -665,100 +555,13 @@ class ProductMatcher:
         
     def _merge_s3_learnings(self):
         """
-        Download S3 learnings and merge with local training dataset.
+        Use the S3 learnings merged into the local training dataset.
         
-        This method:
-        1. Downloads product_swaps.csv from S3
-        2. Merges it with local training_dataset.csv
-        3. Loads general_rules.txt from S3
-        4. Caches the merged data for the session
+        product_swaps.csv is merged into training_dataset.csv and
+        general_rules.txt loaded by shared_resources.get_learnings, at most
+        once per LEARNINGS_REFRESH_SECONDS for the whole process.
         """
-        try:
-            import boto3
-            from botocore.exceptions import ClientError
-            
-            # Get S3 configuration
-            bucket_name = os.getenv('AWS_S3_BUCKET_LEARNING', 'offer-learning-data')
-            region = os.getenv('AWS_REGION', 'eu-north-1')
-            
-            # Initialize S3 client
-            s3_client = boto3.client('s3', region_name=region)
-            
-            # Download product swaps CSV from S3
-            try:
-                response = s3_client.get_object(
-                    Bucket=bucket_name,
-                    Key='learnings/product_swaps.csv'
-                )
-                s3_csv_content = response['Body'].read().decode('utf-8')
-                
-                # Parse S3 CSV
-                from io import StringIO
-                s3_df = pd.read_csv(StringIO(s3_csv_content))
-                
-                self.logger.info(f"✅ Downloaded {len(s3_df)} learnings from S3: learnings/product_swaps.csv")
-                
-                # Merge with local training dataset
-                local_csv_path = os.path.join(os.path.dirname(__file__), "training_dataset.csv")
-                
-                if os.path.exists(local_csv_path):
-                    local_df = pd.read_csv(local_csv_path)
-                    
-                    # Combine both datasets
-                    merged_df = pd.concat([local_df, s3_df], ignore_index=True)
-                    
-                    # Remove duplicates based on customer_term + matched_product_code
-                    merged_df = merged_df.drop_duplicates(
-                        subset=['customer_term', 'matched_product_code'],
-                        keep='last'  # Keep most recent (S3 learnings take precedence)
-                    )
-                    
-                    # Save merged dataset back to local CSV
-                    merged_df.to_csv(local_csv_path, index=False)
-                    
-                    self.logger.info(
-                        f"✅ Merged S3 learnings with local training data: "
-                        f"{len(local_df)} local + {len(s3_df)} S3 = {len(merged_df)} total (after dedup)"
-                    )
-                    self.s3_learnings_merged = True
-                else:
-                    # No local file, just save S3 data
-                    s3_df.to_csv(local_csv_path, index=False)
-                    self.logger.info(f"✅ Created training dataset from S3 learnings: {len(s3_df)} entries")
-                    self.s3_learnings_merged = True
-                    
-            except ClientError as e:
-                if e.response['Error']['Code'] == 'NoSuchKey':
-                    self.logger.info("No S3 learnings CSV found yet (learnings/product_swaps.csv)")
-                else:
-                    self.logger.warning(f"Error downloading S3 learnings CSV: {e}")
-            
-            # Download general rules from S3
-            try:
-                response = s3_client.get_object(
-                    Bucket=bucket_name,
-                    Key='learnings/general_rules.txt'
-                )
-                rules_content = response['Body'].read().decode('utf-8')
-                
-                # Parse rules (one per line)
-                self.general_rules = [
-                    line.strip() 
-                    for line in rules_content.split('\n') 
-                    if line.strip()
-                ]
-                
-                self.logger.info(f"✅ Loaded {len(self.general_rules)} general rules from S3")
-                
-            except ClientError as e:
-                if e.response['Error']['Code'] == 'NoSuchKey':
-                    self.logger.info("No S3 general rules found yet (learnings/general_rules.txt)")
-                else:
-                    self.logger.warning(f"Error downloading S3 general rules: {e}")
-                    
-        except Exception as e:
-            self.logger.warning(f"Failed to merge S3 learnings: {e}")
-            self.s3_learnings_merged = False
+        self.s3_learnings_merged, self.general_rules = shared_resources.get_learnings()
     
     def get_dynamic_iteration_limit(self, search_term: str, usage_context: Optional[str] = None) -> int:
         """Dynamically determine iteration limit based on search complexity and context."""
@@ -946,8 +749,8 @@ class ProductMatcher:
     # ------------------------------------------------------------------
     # Rate limiting helpers
     # ------------------------------------------------------------------
-    def _check_rate_limits(self):
-        """Check and enforce OpenAI API rate limits."""
+    def _check_rate_limits(self, texts: List[str]):
+        """Enforce the daily OpenAI cap and wait for the shared RPM/TPM limiter."""
         now = datetime.now()
         
         # Reset daily counter if needed
@@ -955,27 +758,27 @@ class ProductMatcher:
             self.daily_calls = 0
             self.daily_reset_time = now.replace(hour=0, minute=0, second=0, microsecond=0)
             
-        # Reset minute counter if needed
-        if now >= self.last_minute_reset + timedelta(minutes=1):
-            self.minute_calls = 0
-            self.last_minute_reset = now
-            
         # Check daily limit
         if self.daily_calls >= Config.OPENAI_RATE_LIMIT_PER_DAY:
             raise Exception(f"Daily OpenAI API limit reached ({Config.OPENAI_RATE_LIMIT_PER_DAY} calls)")
             
-        # Check minute limit
-        if self.minute_calls >= Config.OPENAI_RATE_LIMIT_PER_MINUTE:
-            sleep_time = 60 - (now - self.last_minute_reset).total_seconds()
-            if sleep_time > 0:
-                self.logger.info(f"⏳ Rate limit reached. Sleeping {sleep_time:.1f}s until next minute...")
-                time.sleep(sleep_time)
-                self.minute_calls = 0
-                self.last_minute_reset = datetime.now()
+        # Per-minute request and token quotas are shared with every other OpenAI caller
+        waited = get_rate_limiter().acquire_sync('openai', self.embedding_model, estimate_tokens(texts))
+        if waited > 1:
+            self.logger.info(f"⏳ OpenAI rate limit reached. Waited {waited:.1f}s")
     
     def _get_openai_embedding(self, texts: List[str]) -> List[List[float]]:
-        """Get embeddings from OpenAI with rate limiting."""
-        self._check_rate_limits()
+        """Get embeddings from OpenAI with rate limiting (recorded/replayed when enabled)."""
+        return get_interaction_recorder().call_sync(
+            KIND_EMBEDDING,
+            (self.embedding_model, texts),
+            lambda: self._request_openai_embedding(texts),
+            label="product_embedding",
+        )
+    
+    def _request_openai_embedding(self, texts: List[str]) -> List[List[float]]:
+        """Request embeddings from the OpenAI API."""
+        self._check_rate_limits(texts)
         
         try:
             response = self.openai_client.embeddings.create(
@@ -986,7 +789,6 @@ class ProductMatcher:
             
             # Update rate limiting counters
             self.daily_calls += 1
-            self.minute_calls += 1
             self.api_calls_made += 1
             
             # Extract embeddings
@@ -1041,11 +843,182 @@ class ProductMatcher:
         
         self.logger.info(f"🎯 Starting batch matching for {len(self.all_products_context)} products with full context")
         
+        # Easy lines are settled without the agent; the rest stay pending
+        if self.routing_enabled:
+            try:
+                await self._route_terms()
+            except Exception as e:
+                self.logger.warning(f"⚠️ Model routing failed, sending all terms to the batch agent: {e}")
+        
         # Use the enhanced agentic match with full context
         results = await self._agentic_batch_match_with_context(term_dicts)
         
         return results
         
+    async def _route_terms(self) -> None:
+        """Settle easy terms before the batch agent starts.
+        
+        - Term contains exactly one product code the catalogue knows: matched, no LLM
+        - One clear semantic candidate: confirmed by the fast model (one call for all)
+        - Everything else (and rejected fast picks) stays pending for the strong agent
+        """
+        pending = [term for term in self.all_products_context if self.usage_tracker[term]["status"] == "pending"]
+        if not pending:
+            return
+        
+        code_hits: Dict[str, Dict] = {}
+        features: Dict[str, RouteFeatures] = {}
+        for term in pending:
+            codes = extract_codes(term)
+            found = []
+            for code in codes:
+                product = await self._validate_product_code(code)
+                if product:
+                    found.append(product)
+            features[term] = RouteFeatures(has_code=bool(codes), code_hits=len(found))
+            if len(found) == 1:
+                code_hits[term] = found[0]
+        
+        candidates = await self._route_semantic_candidates([term for term in pending if term not in code_hits])
+        for term, term_candidates in candidates.items():
+            scores = [candidate["similarity"] for candidate in term_candidates]
+            features[term].candidate_count = len(scores)
+            features[term].top1 = scores[0] if scores else 0.0
+            features[term].top2 = scores[1] if len(scores) > 1 else 0.0
+        
+        fast_terms = []
+        for term in pending:
+            decision = self.model_router.route(features[term])
+            self.logger.debug(f"🧭 Route '{term}': {decision.tier} ({decision.reason})")
+            if decision.tier == TIER_NONE:
+                product = code_hits[term]
+                self._record_routed_match(term, product["sku"], product.get("name", ""), 95,
+                                          "Tuotekoodi löytyi suoraan tuoteluettelosta", TIER_NONE)
+            elif decision.tier == TIER_FAST:
+                fast_terms.append(term)
+        
+        if fast_terms:
+            await self._confirm_fast_matches({term: candidates[term][:3] for term in fast_terms})
+        
+        self.logger.info(f"🧭 Model routing: {self.model_router.stats()}")
+    
+    async def _route_semantic_candidates(self, terms: List[str], top_k: int = 5) -> Dict[str, List[Dict]]:
+        """Top semantic candidates per term, embedding all terms in one request."""
+        if not terms:
+            return {}
+        try:
+            self._ensure_embeddings_loaded()
+            vectors = await asyncio.to_thread(self._get_openai_embedding, terms)
+        except Exception as e:
+            self.logger.warning(f"Routing embeddings unavailable: {e}")
+            return {term: [] for term in terms}
+        
+        product_norms = np.linalg.norm(self.product_embeddings, axis=1)
+        threshold = max(0.30, getattr(Config, "SEMANTIC_SIMILARITY_THRESHOLD", 0.0))
+        candidates = {}
+        for term, vector in zip(terms, vectors):
+            query_vec = np.asarray(vector, dtype="float32")
+            similarities = np.dot(self.product_embeddings, query_vec) / (product_norms * (np.linalg.norm(query_vec) + 1e-8))
+            top_idx = similarities.argsort()[::-1][:top_k]
+            candidates[term] = [
+                {
+                    "product_code": str(self.products_df.iloc[i]["Tuotekoodi"]),
+                    "product_name": str(self.products_df.iloc[i]["Tuotenimi"]),
+                    "similarity": float(similarities[i]),
+                }
+                for i in top_idx if similarities[i] > threshold
+            ]
+        return candidates
+    
+    async def _confirm_fast_matches(self, candidates: Dict[str, List[Dict]]) -> None:
+        """Ask the fast model to confirm the top candidate of each clear term (one call)."""
+        lines = []
+        for term, term_candidates in candidates.items():
+            options = "; ".join(
+                f"{c['product_code']} = {c['product_name']} ({c['similarity']:.2f})" for c in term_candidates
+            )
+            lines.append(f"- {json.dumps(term, ensure_ascii=False)}: {options}")
+        prompt = (
+            "Olet LVI-tuotteiden asiantuntija. Valitse jokaiselle asiakkaan rivinimikkeelle oikea tuote "
+            "annetuista ehdokkaista. Valitse vain, jos tuote vastaa tyyppiä, kokoa ja materiaalia. "
+            "Jos mikään ehdokas ei ole varma, anna null.\n\n"
+            + "\n".join(lines)
+            + '\n\nVastaa pelkkänä JSON-objektina: {"<rivinimike>": {"product_code": "<koodi tai null>", '
+            '"confidence": <0-100>, "reasoning": "<lyhyt perustelu>"}}'
+        )
+        
+        picks = {}
+        try:
+            self.api_calls_made += 1
+            response = await self._retry_llm_request(
+                model=self.model_router.policy.fast_model,
+                contents=prompt,
+                config=types.GenerateContentConfig(temperature=0.0, response_mime_type="application/json"),
+                label="product_matcher_fast",
+            )
+            text = (response.text or "").strip() if response else ""
+            text = re.sub(r"^```(?:json)?|```$", "", text, flags=re.MULTILINE).strip()
+            picks = json.loads(text) if text else {}
+        except Exception as e:
+            self.logger.warning(f"⚠️ Fast model confirmation failed, escalating {len(candidates)} terms: {e}")
+        
+        escalated = 0
+        for term, term_candidates in candidates.items():
+            pick = picks.get(term) if isinstance(picks, dict) else None
+            code = str(pick.get("product_code")) if isinstance(pick, dict) and pick.get("product_code") else None
+            chosen = next((c for c in term_candidates if c["product_code"] == code), None)
+            if chosen is None:
+                escalated += 1
+                continue
+            try:
+                confidence = int(pick.get("confidence", 80))
+            except (TypeError, ValueError):
+                confidence = 80
+            self._record_routed_match(term, chosen["product_code"], chosen["product_name"], confidence,
+                                      pick.get("reasoning") or "Selvä semanttinen osuma, vahvistettu kevyellä mallilla",
+                                      TIER_FAST)
+        if escalated:
+            self.model_router.escalate(escalated)
+    
+    def _record_routed_match(self, term: str, product_code: str, product_name: str, confidence: int,
+                             reasoning: str, tier: str) -> None:
+        self.matched_products[term] = {
+            "product_code": product_code,
+            "product_name": product_name,
+            "reasoning": reasoning,
+            "confidence": confidence,
+            "route_tier": tier,
+        }
+        self.usage_tracker[term]["status"] = "matched"
+        self.logger.info(f"🧭 Routed match ({confidence}%): {term} → {product_code}")
+    
+    def new_match_session(self) -> "ProductMatcher":
+        """Create a match session: a matcher for one concurrent batch.
+        
+        Shares clients, catalogue data, embeddings and learned search history
+        with this matcher, but has its own batch state (products to match,
+        matches, usage tracker and search mode), so several sessions can run
+        match_terms_batch at the same time.
+        """
+        session = copy.copy(self)
+        session.all_products_context = []
+        session.matched_products = {}
+        session.usage_tracker = {}
+        session.current_mode = "GLOBAL"
+        session.current_group = None
+        session.user_instructions = ""
+        session.api_calls_made = 0
+        session.api_errors = 0
+        return session
+    
+    async def close_match_session(self, session: "ProductMatcher"):
+        """Fold a session's counters back into this matcher and close what it opened."""
+        self.api_calls_made += session.api_calls_made
+        self.api_errors += session.api_errors
+        if session.http_client is not None and session.http_client is not self.http_client:
+            await session.http_client.aclose()
+            session.http_client = None
+    
 
     # --------------------------- priority classification ---------------
     def _classify_product_priority(self, group_code):
@@ -1727,11 +1700,11 @@ class ProductMatcher:
         if self.product_embeddings is not None:
             return
 
-        emb_path = f"{os.path.splitext(self.products_csv_path)[0]}.openai_embeddings.npy"
+        emb_path = shared_resources.catalogue_embeddings_path(self.products_csv_path)
 
         if os.path.exists(emb_path):
             try:
-                self.product_embeddings = np.load(emb_path)
+                self.product_embeddings = shared_resources.load_embeddings(emb_path)
                 self.logger.info(f"✅ Loaded pre-computed OpenAI embeddings ({self.product_embeddings.shape}) from {emb_path}")
                 return
             except Exception as e:
@@ -1797,6 +1770,7 @@ class ProductMatcher:
         # Try persisting for next runs
         try:
             np.save(emb_path, self.product_embeddings)
+            shared_resources.store_embeddings(emb_path, self.product_embeddings)
             self.logger.info(f"💾 Saved OpenAI embeddings to {emb_path}")
         except Exception as e:
             self.logger.debug(f"Could not save embeddings: {e}")
@@ -1872,6 +1846,16 @@ class ProductMatcher:
         max_retries = 3
         retry_delay = 2  # seconds
         
+        # Tool declarations do not change between retries - build them once
+        try:
+            self.logger.debug("🔍 Getting batch search functions")
+            search_functions = self._get_batch_search_functions()
+            tools = types.Tool(function_declarations=search_functions)
+            self.logger.debug("✅ Batch search functions retrieved successfully")
+        except Exception as e:
+            self.logger.error(f"❌ Error getting search functions: {e}")
+            raise  # This is critical, can't continue without functions
+        
         for retry_attempt in range(max_retries):
             try:
                 self.logger.info(f"🚀 Starting batch agentic match (attempt {retry_attempt + 1}/{max_retries})")
@@ -1881,9 +1865,18 @@ class ProductMatcher:
                 self._forced_stop_due_to_repetition = False
                 
                 # Step 1: Initialize parameters
+                # The iteration budget tracks per-term progress, retires stalled terms
+                # to the 9000 fallback and lends their unused calls to improving terms
+                budget = IterationBudget(
+                    [term for term in self.all_products_context if self.usage_tracker[term]["status"] == "pending"],
+                    calls_per_term=getattr(Config, 'ITERATION_BUDGET_PER_TERM', 7),
+                    patience=getattr(Config, 'ITERATION_PATIENCE', 4),
+                    extension=getattr(Config, 'ITERATION_EXTENSION', 3),
+                )
+                adaptive_budget = getattr(Config, 'ADAPTIVE_ITERATION_BUDGET', True)
                 try:
                     num_products = len(self.all_products_context)
-                    max_iterations = num_products * 7  # 10 iterations per product term
+                    max_iterations = budget.max_iterations
                     self.logger.info(f"🔄 Batch processing with {max_iterations} max iterations for {num_products} products ({max_iterations//num_products} iterations per product)")
                 except Exception as e:
                     self.logger.error(f"❌ Error calculating max iterations: {e}. Using fallback value")
@@ -1922,28 +1915,21 @@ class ProductMatcher:
                     self.logger.error(f"❌ Error gathering historical suggestions: {e}")
                     all_historical_suggestions = []
                 
-                # Step 5: Get search functions
-                try:
-                    self.logger.debug("🔍 Getting batch search functions")
-                    search_functions = self._get_batch_search_functions()
-                    self.logger.debug("✅ Batch search functions retrieved successfully")
-                except Exception as e:
-                    self.logger.error(f"❌ Error getting search functions: {e}")
-                    raise  # This is critical, can't continue without functions
-                
-                # Step 6: Build system instruction
+                # Step 5: Build system instruction (static, cacheable) and the batch's own context
                 try:
                     self.logger.debug("📝 Building batch system instruction")
-                    system_instruction = self._build_batch_system_instruction(products_context, all_historical_suggestions)
+                    system_instruction = self._build_batch_system_instruction()
+                    batch_context = self._build_batch_context(products_context, all_historical_suggestions)
                     self.logger.debug("✅ System instruction built successfully")
                 except Exception as e:
                     self.logger.error(f"❌ Error building system instruction: {e}")
                     raise  # Critical error
                 
-                # Step 7: Configure tools and client (with system_instruction)
+                # Step 6: Configure tools and client (with system_instruction)
+                # The config is the static prefix of every turn; Gemini serves it
+                # from cached content (see _route_llm_call)
                 try:
                     self.logger.debug("⚙️ Configuring Gemini tools and client")
-                    tools = types.Tool(function_declarations=search_functions)
                     config = types.GenerateContentConfig(
                         tools=[tools],
                         temperature=0.3,
@@ -1957,17 +1943,20 @@ class ProductMatcher:
                     self.logger.error(f"❌ Error configuring Gemini tools: {e}")
                     raise  # Critical error
                 
-                # Step 8: Initialize conversation (minimal user trigger)
+                # Step 7: Initialize conversation (batch context and trigger, pinned)
                 # Use SDK types (Content/Part) - same import as gemini.py
                 try:
                     from google import genai as genai_client
                     self.logger.debug("💬 Initializing conversation")
-                    contents = [
-                        genai_client.types.Content(
-                            role="user",
-                            parts=[genai_client.types.Part(text="Begin batch matching.")]
-                        )
-                    ]
+                    conversation = ConversationBuffer(
+                        pinned=[
+                            genai_client.types.Content(
+                                role="user",
+                                parts=[genai_client.types.Part(text=f"{batch_context}\nBegin batch matching.")]
+                            )
+                        ],
+                        estimate=self._estimate_message_tokens,
+                    )
                     self.logger.debug("✅ Conversation initialized successfully (SDK types)")
                 except Exception as e:
                     self.logger.error(f"❌ Error initializing conversation: {e}")
@@ -1975,7 +1964,7 @@ class ProductMatcher:
                 
                 self.logger.info(f"🤖 Starting batch agentic search for {len(self.all_products_context)} products")
                 
-                # Step 9: Main conversation loop
+                # Step 8: Main conversation loop
                 for iteration in range(max_iterations):
                     try:
                         # Check if all products are matched
@@ -1984,17 +1973,21 @@ class ProductMatcher:
                             break
                         
                         self.logger.info(f"🔄 Iteration {iteration + 1}/{max_iterations}")
+                        budget.tick()
+                        pending_terms = [
+                            term for term in self.all_products_context
+                            if self.usage_tracker[term]["status"] == "pending"
+                        ]
                         
                         # Manage context size before API call
-                        contents = self._manage_conversation_context(contents, max_tokens=Config.MAX_CONTEXT_TOKENS)
+                        contents = self._manage_conversation_context(conversation, max_tokens=Config.MAX_CONTEXT_TOKENS)
                         
                         # Gemini API call with detailed error handling
                         try:
                             self.logger.debug(f"🧠 Making Gemini API call (iteration {iteration + 1})")
                             self.api_calls_made += 1
-                            response = self._retry_llm_request(
-                                self.gemini_client.models.generate_content,
-                                model='grok-4-1-fast-reasoning',
+                            response = await self._retry_llm_request(
+                                model=self.model_router.policy.strong_model,
                                 contents=contents,
                                 config=config,
                             )
@@ -2052,6 +2045,12 @@ class ProductMatcher:
                                         function_result = await self._execute_batch_function(
                                             function_name, function_args
                                         )
+                                        budget.observe(
+                                            function_name,
+                                            budget.attribute(function_args, pending_terms),
+                                            str((function_result.get('response') or {}).get('result', '')),
+                                            repeated=self._last_batch_function_repeat_count > 1,
+                                        )
                                         function_results.append({
                                             'function_call': function_call,
                                             'result': function_result
@@ -2070,6 +2069,16 @@ class ProductMatcher:
                                     self.logger.info("🏁 Batch processing marked as complete")
                                     break
                                 
+                                if adaptive_budget and function_results:
+                                    retired = self._apply_iteration_budget(budget)
+                                    if retired:
+                                        # Tell the agent so it stops searching for these terms
+                                        last_response = function_results[-1]['result'].setdefault('response', {})
+                                        last_response['result'] = (
+                                            f"{last_response.get('result', '')}\n\n⏹️ NO PROGRESS - moved to 9000 fallback, "
+                                            f"do not search these again: {', '.join(retired)}"
+                                        )
+                                
                                 # Add model response once (with ALL function calls)
                                 try:
                                     model_content = response.candidates[0].content
@@ -2086,13 +2095,13 @@ class ProductMatcher:
                                             model_content, 
                                             is_gemini_3=is_gemini_3
                                         )
-                                        contents.append(model_content_converted)
+                                        conversation.append(model_content_converted)
                                     else:
                                         # Non-Gemini models (Claude, etc.): use original content to preserve IDs
                                         # The _convert_content_with_signature loses function call IDs because
                                         # Gemini SDK FunctionCall doesn't have an 'id' field
                                         # Claude requires matching tool_use_id and tool_result_id
-                                        contents.append(model_content)
+                                        conversation.append(model_content)
                                         self.logger.debug(f"✅ Using original model content (preserving function call IDs for {current_model})")
                                     
                                     # Add ALL function responses - CRITICAL for Claude compatibility
@@ -2109,7 +2118,7 @@ class ProductMatcher:
                                                 result['response'],
                                                 tool_call_id=tool_call_id
                                             )
-                                            contents.append(function_response_content)
+                                            conversation.append(function_response_content)
                                             self.logger.debug(f"✅ Function response added for {fc.name} (id: {tool_call_id})")
                                     
                                     self.logger.debug(f"✅ All {len(function_results)} function responses added (model: {current_model})")
@@ -2130,7 +2139,7 @@ class ProductMatcher:
                         self.logger.error(f"❌ Error in batch iteration {iteration + 1}: {e}")
                         raise  # Re-raise to trigger retry
                 
-                # Step 10: Convert matched products to result format
+                # Step 9: Convert matched products to result format
                 try:
                     self.logger.debug("🔄 Converting matched products to result format")
                     matched_rows = []
@@ -2181,6 +2190,8 @@ class ProductMatcher:
                                     "ai_confidence": 0,
                                 })
                     
+                    matched_count = sum(1 for row in matched_rows if row["matched_product_code"] != "9000")
+                    self.logger.info(f"📊 Iteration budget: {budget.summary(matched_count)}")
                     self.logger.info(f"✅ Successfully processed {len(matched_rows)} products on attempt {retry_attempt + 1}")
                     return matched_rows
                     
@@ -2240,6 +2251,26 @@ class ProductMatcher:
                     
                     return fallback_rows
     
+    def _apply_iteration_budget(self, budget: IterationBudget) -> List[str]:
+        """Release finished terms' allowance and retire stalled terms to the 9000 fallback."""
+        pending = []
+        for term in self.all_products_context:
+            if self.usage_tracker[term]["status"] == "pending":
+                pending.append(term)
+            else:
+                budget.release(term)
+        
+        retired = budget.stalled_terms(pending, self.usage_tracker)
+        for term in retired:
+            self.matched_products[term] = {
+                "product_code": "9000",
+                "product_name": term if term else "Tuote puuttuu hinnoittelusta",
+                "reasoning": "Haku lopetettu: useat haut eivät tuottaneet uusia osumia",
+            }
+            self.usage_tracker[term]["status"] = "no_match"
+            self.logger.info(f"⏹️ Retired stalled term to 9000 fallback: {term}")
+        return retired
+    
     def _is_gemini_3_model(self, model_name: str = None) -> bool:
         """Check if using a Gemini 3.x model that requires thought signatures."""
         model = model_name or os.getenv('GEMINI_MODEL_ITERATION', '')
@@ -2364,64 +2395,43 @@ class ProductMatcher:
         """Estimate token count for a message.
         
         Uses simple heuristic: ~4 characters per token for text.
-        Handles SDK Content objects.
+        Handles SDK Content objects. Shared with the LLM rate limiter so
+        context pruning and TPM accounting agree on prompt size.
         """
         try:
-            token_count = 0
-            
-            # Handle SDK Content objects
-            if hasattr(content, 'parts') and content.parts:
-                for part in content.parts:
-                    if hasattr(part, 'text') and part.text:
-                        token_count += len(part.text) // 4
-                    elif hasattr(part, 'function_call') and part.function_call:
-                        func_str = str(part.function_call)
-                        token_count += len(func_str) // 4
-                    elif hasattr(part, 'function_response') and part.function_response:
-                        resp_str = str(part.function_response)
-                        token_count += len(resp_str) // 4
-                    else:
-                        token_count += 50
-            
-            # Add overhead for message metadata
-            token_count += 10
-            
-            return token_count
-            
+            return estimate_tokens(content)
         except Exception as e:
             self.logger.warning(f"Error estimating tokens: {e}, using default estimate")
             return 1000  # Conservative default estimate
     
-    def _manage_conversation_context(self, contents: List[types.Content], max_tokens: int = 7000) -> List[types.Content]:
+    def _manage_conversation_context(self, conversation: ConversationBuffer, max_tokens: int = 7000) -> List[types.Content]:
         """Manage conversation context to stay within token limits.
         
-        Implements a sliding window approach:
-        - Always keeps the initial message
-        - Removes oldest message pairs when approaching token limit
+        Implements a sliding window approach on the ConversationBuffer:
+        - Always keeps the initial (pinned) message
+        - Removes oldest turns when approaching token limit, keeping each
+          function call together with its function responses
         - Preserves most recent messages for context continuity
         
+        The buffer keeps a running token total, so this is O(1) per turn
+        unless something has to be evicted.
+        
         Args:
-            contents: Current conversation messages
-            max_tokens: Maximum allowed tokens (default 250k)
+            conversation: Conversation buffer of the current batch
+            max_tokens: Maximum allowed tokens
             
         Returns:
-            Pruned contents list within token limits
+            Messages to send, within token limits
         """
-        if not contents or len(contents) <= 1:
-            return contents
-        
-        # Estimate total tokens
-        total_tokens = sum(self._estimate_message_tokens(msg) for msg in contents)
-        
-        # If under limit, return as-is
+        total_tokens = conversation.total_tokens
         if total_tokens <= max_tokens:
-            return contents
+            return conversation.messages()
         
         self.logger.warning(f"⚠️ Context size ({total_tokens} tokens) exceeds limit ({max_tokens} tokens), truncating...")
         # Log previews of the latest 4 messages to aid debugging
         try:
             preview_count = 4
-            recent_messages = contents[-preview_count:] if len(contents) >= preview_count else contents[:]
+            recent_messages = conversation.recent(preview_count)
             def _snippet_from_content(msg):
                 snippets = []
                 # Handle SDK Content objects
@@ -2442,83 +2452,19 @@ class ProductMatcher:
                 summary = " ".join(snippets) if snippets else str(msg)
                 summary = summary.replace("\n", " ")
                 return summary[:100]
-            for i, msg in enumerate(recent_messages[-preview_count:], 1):
+            for i, msg in enumerate(recent_messages, 1):
                 self.logger.info(f"🧵 Truncation preview {i}/{len(recent_messages)}: {_snippet_from_content(msg)}")
         except Exception as e:
             self.logger.debug(f"Truncation preview logging failed: {e}")
         
-        # Keep first message and work backwards from most recent
-        pruned_contents = [contents[0]]  # Always keep the initial trigger message
-        pruned_tokens = self._estimate_message_tokens(contents[0])
-        
-        # Add messages from the end, working backwards
-        # CRITICAL: For Claude/batch function calls, we must keep entire "turns" together:
+        # CRITICAL: For Claude/batch function calls, whole "turns" are evicted together:
         # - One assistant message with N tool_calls
         # - Followed by N function_response messages (one per tool_call)
         # If we split these, Claude gets "unexpected tool_use_id" errors
-        i = len(contents) - 1
-        temp_blocks = []
-        
-        def _is_function_response(msg):
-            """Check if message contains a function_response"""
-            if hasattr(msg, 'parts') and msg.parts:
-                return any(getattr(p, 'function_response', None) for p in msg.parts)
-            return False
-        
-        def _is_function_call(msg):
-            """Check if message contains function_calls (tool_uses)"""
-            if hasattr(msg, 'parts') and msg.parts:
-                return any(getattr(p, 'function_call', None) for p in msg.parts)
-            return False
-        
-        while i > 0:
-            current_msg = contents[i]
-            
-            # Check if this is a function_response message
-            if _is_function_response(current_msg):
-                # Collect ALL consecutive function_response messages (they belong to one turn)
-                turn_messages = []
-                turn_tokens = 0
-                
-                # Walk backwards collecting all function_responses
-                while i > 0 and _is_function_response(contents[i]):
-                    turn_messages.insert(0, contents[i])
-                    turn_tokens += self._estimate_message_tokens(contents[i])
-                    i -= 1
-                
-                # Now i should point to the assistant message with tool_calls
-                if i > 0 and _is_function_call(contents[i]):
-                    assistant_msg = contents[i]
-                    assistant_tokens = self._estimate_message_tokens(assistant_msg)
-                    turn_messages.insert(0, assistant_msg)
-                    turn_tokens += assistant_tokens
-                    i -= 1
-                
-                # Check if adding this entire turn would exceed limit
-                if pruned_tokens + turn_tokens > max_tokens * 0.9:
-                    break
-                
-                # Add entire turn as one atomic block
-                temp_blocks.append(turn_messages)
-                pruned_tokens += turn_tokens
-            else:
-                # Single message (user message or other)
-                current_tokens = self._estimate_message_tokens(current_msg)
-                if pruned_tokens + current_tokens > max_tokens * 0.9:
-                    break
-                    
-                temp_blocks.append([current_msg])
-                pruned_tokens += current_tokens
-                i -= 1
-        
-        # Add blocks in chronological order (reverse block order, keep internal order)
-        for block in reversed(temp_blocks):
-            pruned_contents.extend(block)
-        
-        removed_count = len(contents) - len(pruned_contents)
-        self.logger.info(f"✂️ Truncated {removed_count} messages, keeping {len(pruned_contents)} messages ({pruned_tokens} tokens)")
+        removed_count = conversation.trim(max_tokens)
+        self.logger.info(f"✂️ Truncated {removed_count} messages, keeping {len(conversation)} messages ({conversation.total_tokens} tokens)")
         
-        return pruned_contents
+        return conversation.messages()
     
     def _build_products_context_prompt(self) -> str:
         """Build a context string showing all products to be matched."""
@@ -2772,8 +2718,15 @@ class ProductMatcher:
         
         return functions
     
-    def _build_batch_system_instruction(self, products_context: str, historical_suggestions: List[str]) -> str:
-        """Build modular system instruction with improved structure."""
+    def _build_batch_system_instruction(self) -> str:
+        """
+        Build the modular system instruction.
+
+        Only sections that are the same for every batch belong here: together
+        with the tools this is the prefix served from Gemini cached content, so
+        anything batch-specific would create a new cache entry per batch (see
+        _build_batch_context).
+        """
         
         # Core role and constraints
         core_section = self._build_core_instructions()
@@ -2801,16 +2754,6 @@ class ProductMatcher:
         # Search strategy and tools
         strategy_section = self._build_strategy_section()
         
-        # Mode awareness
-        mode_section = self._build_mode_awareness_section()
-        
-        # User instructions from email (if any)
-        user_instructions_section = self._build_user_instructions_section()
-        
-        # Dynamic content
-        context_section = products_context
-        historical_section = self._build_historical_section(historical_suggestions)
-        
         # Combine all sections
         instruction = "\n".join([
             core_section,
@@ -2822,14 +2765,19 @@ class ProductMatcher:
             learning_rules_section,
             groups_section,
             strategy_section,
-            mode_section,
-            user_instructions_section,
-            context_section,
-            historical_section
         ])
         
         return instruction
     
+    def _build_batch_context(self, products_context: str, historical_suggestions: List[str]) -> str:
+        """Batch-specific instructions, sent as the pinned first user message."""
+        return "\n".join([
+            self._build_mode_awareness_section(),
+            self._build_user_instructions_section(),
+            products_context,
+            self._build_historical_section(historical_suggestions),
+        ])
+    
     def _build_core_instructions(self) -> str:
         """Core role definition and critical constraints."""
         return (
@@ -3309,7 +3257,8 @@ class ProductMatcher:
             query = function_args.get("query", "")
             self.logger.info(f"🧠 Batch semantic search: '{query}'")
             
-            results_df = self._semantic_search_product_catalogue(query, top_k=15)
+            # The embedding call waits on the shared rate limiter; keep it off the event loop
+            results_df = await asyncio.to_thread(self._semantic_search_product_catalogue, query, 15)
             if results_df is not None and not results_df.empty:
                 results_text = self._format_df_results(results_df.head(10))
                 return {"response": {"result": f"Found {len(results_df)} semantic matches:\n{results_text}"}}
@@ -3758,22 +3707,18 @@ class ProductMatcher:
             self.logger.warning(f"⚠️ Filtered products CSV not found: {self.filtered_products_csv_path}")
             return
         
-        self.logger.info(f"📂 Loading fallback products from {self.filtered_products_csv_path}")
-        self.filtered_products_df = pd.read_csv(self.filtered_products_csv_path, encoding="utf-8")
-        
-        # Clean product names and add lowercase column for searching
-        self.filtered_products_df = self.filtered_products_df.dropna(subset=['product_name'])
-        self.filtered_products_df['product_name'] = self.filtered_products_df['product_name'].astype(str).str.strip()
-        self.filtered_products_df = self.filtered_products_df[self.filtered_products_df['product_name'] != '']
-        self.filtered_products_df['product_name_lower'] = self.filtered_products_df['product_name'].str.lower()
+        # Cleaned product names with a lowercase column for searching, shared by all matchers
+        self.filtered_products_df = shared_resources.load_fallback_products(self.filtered_products_csv_path)
+        if self.filtered_products_df is None:
+            return
         
         self.logger.info(f"✅ Loaded {len(self.filtered_products_df)} fallback products")
         
         # Load embeddings
-        embeddings_path = f"{self.filtered_products_csv_path.with_suffix('')}.openai_embeddings.npy"
+        embeddings_path = shared_resources.catalogue_embeddings_path(self.filtered_products_csv_path)
         if os.path.exists(embeddings_path):
             try:
-                self.filtered_product_embeddings = np.load(embeddings_path)
+                self.filtered_product_embeddings = shared_resources.load_embeddings(embeddings_path)
                 self.logger.info(f"✅ Loaded fallback embeddings with shape: {self.filtered_product_embeddings.shape}")
                 
                 # Verify alignment
@@ -3874,7 +3819,7 @@ class ProductMatcher:
                 return result
             else:
                 # Multiple candidates, ask Gemini to select best
-                best_name = self._gemini_select_best_fallback(search_term, fallback_candidates, usage_context)
+                best_name = await self._gemini_select_best_fallback(search_term, fallback_candidates, usage_context)
                 if best_name:
                     result = {
                         "matched_product_code": self.fallback_product_code,
@@ -3885,7 +3830,7 @@ class ProductMatcher:
         
         # Final fallback: generate new product name
         self.logger.info(f"🎯 Generating new product name for: '{search_term}'")
-        generated_name = self._generate_product_name(search_term, usage_context)
+        generated_name = await self._generate_product_name(search_term, usage_context)
         if generated_name:
             result = {
                 "matched_product_code": self.fallback_product_code,
@@ -3922,8 +3867,7 @@ class ProductMatcher:
             try:
                 self.api_calls_made += 1
                 config = types.GenerateContentConfig(temperature=0.4)  # Lower temperature for more conservative choices
-                response = self._retry_llm_request(
-                    self.gemini_client.models.generate_content,
+                response = await self._retry_llm_request(
                     model=Config.GEMINI_MODEL,
                     contents=conversation_history,
                     config=config,
@@ -3966,7 +3910,8 @@ class ProductMatcher:
                         continue
                     searched_queries.add(signature)
 
-                    results_df = self._fallback_semantic_search(query, top_k=8, min_similarity=0.6)
+                    # The embedding call waits on the shared rate limiter; keep it off the event loop
+                    results_df = await asyncio.to_thread(self._fallback_semantic_search, query, 8, 0.6)
                     if results_df is None or results_df.empty:
                         conversation_history += f"Agent: {agent_reply}\nUser: Ei korkean varmuuden semanttisia tuloksia '{query}'. STOP.\n"
                     else:
@@ -4007,7 +3952,7 @@ class ProductMatcher:
 
         return None
 
-    def _gemini_select_best_fallback(self, search_term: str, candidates_df, usage_context: Optional[str] = None):
+    async def _gemini_select_best_fallback(self, search_term: str, candidates_df, usage_context: Optional[str] = None):
         """Ask Gemini to pick the best product name from fallback candidates with high confidence."""
         product_list = "\n".join(f"- {row.product_name}" for _, row in candidates_df.iterrows())
 
@@ -4023,8 +3968,7 @@ class ProductMatcher:
         try:
             self.api_calls_made += 1
             config = types.GenerateContentConfig(temperature=0.1)
-            response = self._retry_llm_request(
-                self.gemini_client.models.generate_content,
+            response = await self._retry_llm_request(
                 model=Config.GEMINI_MODEL,
                 contents=prompt,
                 config=config,
@@ -4048,7 +3992,7 @@ class ProductMatcher:
             self.logger.error(f"Gemini fallback selection error: {e}")
             return None
 
-    def _generate_product_name(self, search_term: str, usage_context: Optional[str] = None):
+    async def _generate_product_name(self, search_term: str, usage_context: Optional[str] = None):
         """Generate a new product name following the style of filtered products."""
         self._load_filtered_products()
         
@@ -4072,8 +4016,7 @@ class ProductMatcher:
         try:
             self.api_calls_made += 1
             config = types.GenerateContentConfig(temperature=0.3)
-            response = self._retry_llm_request(
-                self.gemini_client.models.generate_content,
+            response = await self._retry_llm_request(
                 model=Config.GEMINI_MODEL,
                 contents=prompt,
                 config=config,
@@ -4152,7 +4095,7 @@ Jos confidence < 70%, aseta is_good_match: false."""
 
             self.api_calls_made += 1
             config = types.GenerateContentConfig(temperature=0.1)
-            response = self.gemini_client.models.generate_content(
+            response = await self._retry_llm_request(
                 model=Config.GEMINI_MODEL,
                 contents=quality_prompt,
                 config=config,
@@ -4196,7 +4139,7 @@ Jos confidence < 70%, aseta is_good_match: false."""
             return {'is_valid': True, 'confidence': 0, 'reason': f'Validation error: {str(e)}'}
 
     # ----------------------- gemini best selection --------------------
-    def _gemini_select_best(self, search_term: str, candidates_df, usage_context: Optional[str] = None):
+    async def _gemini_select_best(self, search_term: str, candidates_df, usage_context: Optional[str] = None):
         """Ask Gemini to pick the single best product code from candidates.
 
         Returns structured data with reasoning and confidence, or None."""
@@ -4226,8 +4169,7 @@ Confidence on prosenttiluku 0-100."""
         try:
             self.api_calls_made += 1
             config = types.GenerateContentConfig(temperature=0.1)
-            response = self._retry_llm_request(
-                self.gemini_client.models.generate_content,
+            response = await self._retry_llm_request(
                 model=Config.GEMINI_MODEL,
                 contents=prompt,
                 config=config,
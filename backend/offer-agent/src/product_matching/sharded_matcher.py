@@ -0,0 +1,259 @@
+"""
+Sharded parallel matching.
+
+Large tenders put every line into one agent conversation, so the context
+window churns and trimming throws away useful search history. ShardedMatcher
+sits above ProductMatcher.match_terms_batch: it clusters the terms into
+shards of related products, runs one bounded agent per shard concurrently -
+each in its own match session - and merges the results back into input order.
+
+Clustering uses term embeddings when SHARD_CLUSTERING=embedding, otherwise
+(or if embeddings fail) the product-type keyword of the term, which is a
+cheap proxy for the product group. Identical terms always land in the same
+shard; if they still end up matched differently, the most confident match
+is used for all of them.
+"""
+import asyncio
+import logging
+import math
+import re
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+_KEYWORD_RE = re.compile(r"[^\W\d_]{3,}", re.UNICODE)
+
+
+def normalize_term(term: str) -> str:
+    """Case- and whitespace-insensitive form of an unclear term."""
+    return " ".join(str(term).lower().split())
+
+
+def term_keyword(term: str) -> str:
+    """First word of the term: the product type, e.g. 'kupariputki' or 'palloventtiili'."""
+    match = _KEYWORD_RE.search(normalize_term(term))
+    return match.group(0) if match else ""
+
+
+def pack_clusters(clusters: List[List[int]], shard_size: int) -> List[List[int]]:
+    """
+    Pack clusters of term indices into shards of at most shard_size terms.
+
+    First-fit decreasing, so related terms share a shard; clusters larger
+    than a shard are split into consecutive chunks.
+    """
+    pieces = []
+    for cluster in clusters:
+        for start in range(0, len(cluster), shard_size):
+            pieces.append(cluster[start:start + shard_size])
+    pieces.sort(key=len, reverse=True)
+
+    shards: List[List[int]] = []
+    for piece in pieces:
+        for shard in shards:
+            if len(shard) + len(piece) <= shard_size:
+                shard.extend(piece)
+                break
+        else:
+            shards.append(list(piece))
+    for shard in shards:
+        shard.sort()
+    shards.sort(key=lambda shard: shard[0])
+    return shards
+
+
+def cluster_by_keyword(terms: List[str]) -> List[List[int]]:
+    """Group term indices by product-type keyword, in first-seen order."""
+    clusters: "OrderedDict[str, List[int]]" = OrderedDict()
+    for index, term in enumerate(terms):
+        clusters.setdefault(term_keyword(term), []).append(index)
+    return list(clusters.values())
+
+
+def cluster_by_embedding(vectors: np.ndarray, threshold: float) -> List[List[int]]:
+    """Greedy leader clustering: each vector joins the most similar centroid above threshold."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = vectors / np.where(norms == 0, 1, norms)
+    centroids: List[np.ndarray] = []
+    clusters: List[List[int]] = []
+    for index, vector in enumerate(unit):
+        if centroids:
+            similarities = np.array([float(np.dot(vector, centroid)) for centroid in centroids])
+            best = int(similarities.argmax())
+            if similarities[best] >= threshold:
+                clusters[best].append(index)
+                members = unit[clusters[best]]
+                centroid = members.mean(axis=0)
+                centroids[best] = centroid / (np.linalg.norm(centroid) or 1)
+                continue
+        centroids.append(vector)
+        clusters.append([index])
+    return clusters
+
+
+class ShardedMatcher:
+    """Splits a batch into shards and matches them with concurrent agents."""
+
+    def __init__(
+        self,
+        matcher,
+        shard_size: int = 20,
+        max_concurrency: int = 4,
+        clustering: str = "keyword",
+        similarity_threshold: float = 0.55,
+        embed: Optional[Callable[[List[str]], List[List[float]]]] = None
+    ):
+        """
+        Args:
+            matcher: ProductMatcher; each shard runs in matcher.new_match_session()
+            shard_size: Most terms one agent gets; smaller batches are not sharded
+            max_concurrency: Shards matched at the same time
+            clustering: 'keyword' or 'embedding'
+            similarity_threshold: Cosine similarity to join an embedding cluster
+            embed: Blocking text -> vectors function (defaults to the matcher's OpenAI embeddings)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.matcher = matcher
+        self.shard_size = max(1, shard_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.clustering = clustering
+        self.similarity_threshold = similarity_threshold
+        self.embed = embed or getattr(matcher, '_get_openai_embedding', None)
+        self.last_run: Dict = {}
+
+    async def match_terms_batch(self, term_dicts: List[Dict], user_instructions: str = "") -> List[Dict]:
+        """Drop-in for ProductMatcher.match_terms_batch."""
+        if len(term_dicts) <= self.shard_size:
+            return await self.matcher.match_terms_batch(term_dicts, user_instructions=user_instructions)
+
+        started = time.monotonic()
+        shards = await self.plan_shards(term_dicts)
+        self.logger.info(
+            f"🧩 Matching {len(term_dicts)} terms in {len(shards)} shards "
+            f"(≤{self.shard_size} terms each, {self.max_concurrency} concurrent)"
+        )
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        shard_timings: List[float] = [0.0] * len(shards)
+
+        async def run_shard(number: int, indices: List[int]) -> List[Dict]:
+            async with semaphore:
+                session = self.matcher.new_match_session()
+                shard_started = time.monotonic()
+                try:
+                    return await session.match_terms_batch(
+                        [term_dicts[i] for i in indices], user_instructions=user_instructions
+                    )
+                finally:
+                    shard_timings[number] = time.monotonic() - shard_started
+                    await self.matcher.close_match_session(session)
+
+        outcomes = await asyncio.gather(
+            *(run_shard(number, indices) for number, indices in enumerate(shards)),
+            return_exceptions=True
+        )
+
+        shard_results = []
+        for number, outcome in enumerate(outcomes):
+            if isinstance(outcome, BaseException):
+                if isinstance(outcome, asyncio.CancelledError):
+                    raise outcome
+                # One failed shard should not lose the others; its terms fall back to manual review
+                self.logger.error(f"❌ Shard {number + 1}/{len(shards)} failed: {outcome}")
+                shard_results.append([])
+            else:
+                shard_results.append(outcome or [])
+
+        results = self.merge_results(term_dicts, shard_results)
+        self.last_run = {
+            'terms': len(term_dicts),
+            'shards': len(shards),
+            'seconds': round(time.monotonic() - started, 3),
+            'slowest_shard_seconds': round(max(shard_timings), 3),
+            'failed_shards': sum(1 for outcome in outcomes if isinstance(outcome, BaseException)),
+        }
+        self.logger.info(
+            f"✅ Sharded matching finished in {self.last_run['seconds']:.1f}s "
+            f"(slowest shard {self.last_run['slowest_shard_seconds']:.1f}s, {len(results)} results)"
+        )
+        return results
+
+    async def plan_shards(self, term_dicts: List[Dict]) -> List[List[int]]:
+        """Indices of term_dicts per shard."""
+        terms = [str(term_dict.get("unclear_term", "")).strip() for term_dict in term_dicts]
+
+        # Identical terms are matched once per shard - never split them up
+        groups: "OrderedDict[str, List[int]]" = OrderedDict()
+        for index, term in enumerate(terms):
+            groups.setdefault(normalize_term(term), []).append(index)
+        unique_terms = [terms[indices[0]] for indices in groups.values()]
+
+        clusters = None
+        if self.clustering == "embedding" and self.embed is not None:
+            try:
+                vectors = await asyncio.to_thread(self.embed, unique_terms)
+                clusters = cluster_by_embedding(np.asarray(vectors, dtype=float), self.similarity_threshold)
+            except Exception as e:
+                self.logger.warning(f"Embedding clustering failed, falling back to keywords: {e}")
+        if clusters is None:
+            clusters = cluster_by_keyword(unique_terms)
+
+        # Pack weighted by duplicates so a shard never exceeds shard_size input lines
+        group_indices = list(groups.values())
+        expanded = [[i for unique in cluster for i in group_indices[unique]] for cluster in clusters]
+        shards = pack_clusters(expanded, self.shard_size)
+        # A duplicate group split across chunks would be matched twice; move it whole
+        return self._rejoin_duplicates(shards, terms)
+
+    def _rejoin_duplicates(self, shards: List[List[int]], terms: List[str]) -> List[List[int]]:
+        owner: Dict[str, int] = {}
+        rejoined: List[List[int]] = [[] for _ in shards]
+        for number, shard in enumerate(shards):
+            for index in shard:
+                key = normalize_term(terms[index])
+                rejoined[owner.setdefault(key, number)].append(index)
+        return [sorted(shard) for shard in rejoined if shard]
+
+    def merge_results(self, term_dicts: List[Dict], shard_results: List[List[Dict]]) -> List[Dict]:
+        """Concatenate shard results in input order, one product choice per distinct term."""
+        order: Dict[str, int] = {}
+        for index, term_dict in enumerate(term_dicts):
+            order.setdefault(normalize_term(term_dict.get("unclear_term", "")), index)
+
+        rows = [row for rows in shard_results for row in rows]
+
+        best: Dict[str, Dict] = {}
+        for row in rows:
+            key = normalize_term(row.get("unclear_term", ""))
+            current = best.get(key)
+            if current is None or self._rank(row) > self._rank(current):
+                best[key] = row
+
+        merged = []
+        for row in rows:
+            choice = best[normalize_term(row.get("unclear_term", ""))]
+            if choice is not row and choice.get("matched_product_code") != row.get("matched_product_code"):
+                row = {
+                    **row,
+                    "matched_product_code": choice.get("matched_product_code"),
+                    "matched_product_name": choice.get("matched_product_name"),
+                    "ai_reasoning": choice.get("ai_reasoning"),
+                    "ai_confidence": choice.get("ai_confidence", 0),
+                }
+            merged.append(row)
+
+        merged.sort(key=lambda row: order.get(normalize_term(row.get("unclear_term", "")), math.inf))
+        return merged
+
+    @staticmethod
+    def _rank(row: Dict):
+        # A real product beats the 9000 fallback, then the more confident match wins
+        is_match = str(row.get("matched_product_code", "")) != "9000"
+        try:
+            confidence = float(row.get("ai_confidence") or 0)
+        except (TypeError, ValueError):
+            confidence = 0.0
+        return (is_match, confidence)
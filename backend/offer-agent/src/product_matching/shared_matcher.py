@@ -0,0 +1,111 @@
+"""
+Cross-request term deduplication for bulk offer batches.
+
+In a bulk batch the same customer terms show up in many requests ("DN50
+palloventtiili", "kupariputki 15mm" ...). SharedTermMatcher sits above
+ProductMatcher.match_terms_batch (or ShardedMatcher) while a BatchScope is
+active: a term is sent to the matching agent by the first request that
+needs it, and every other request in the batch reuses that match - waiting
+for it if it is still running - with its own quantity and email fields.
+
+Terms are shared per (normalized term, user instructions), since brand or
+material preferences in the instructions change which product is right.
+A term whose match failed, or that the agent returned no row for, is
+matched again by the requests waiting on it.
+"""
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from src.product_matching.sharded_matcher import normalize_term
+from src.scheduler.batch_scope import BatchScope
+
+
+NAMESPACE = "term_match"
+
+# Fields that belong to the request, not to the match
+_REQUEST_FIELDS = ('unclear_term', 'quantity', 'explanation', 'email_subject', 'email_date', 'source')
+
+
+def share_match(row: Dict, term_dict: Dict) -> Dict:
+    """Another request's match row, carrying this request's term and quantity."""
+    shared = dict(row)
+    for field in _REQUEST_FIELDS:
+        if field in term_dict:
+            shared[field] = term_dict[field]
+    shared['original_customer_term'] = term_dict.get('unclear_term', row.get('original_customer_term'))
+    return shared
+
+
+class SharedTermMatcher:
+    """Drop-in for match_terms_batch that matches each distinct term once per batch."""
+
+    def __init__(self, matcher, scope: BatchScope):
+        """
+        Args:
+            matcher: ProductMatcher or ShardedMatcher doing the actual matching
+            scope: Batch scope holding the shared matches
+        """
+        self.logger = logging.getLogger(__name__)
+        self.matcher = matcher
+        self.scope = scope
+
+    async def match_terms_batch(self, term_dicts: List[Dict], user_instructions: str = "") -> List[Dict]:
+        if not term_dicts:
+            return []
+        instructions = normalize_term(user_instructions or "")
+
+        owned: List[Tuple[int, Tuple[str, str], Optional[object]]] = []
+        waiting: List[Tuple[int, object]] = []
+        for index, term_dict in enumerate(term_dicts):
+            key = (normalize_term(term_dict.get('unclear_term', '')), instructions)
+            future, owner = self.scope.claim(NAMESPACE, key)
+            if owner:
+                owned.append((index, key, future))
+            else:
+                waiting.append((index, future))
+
+        results: Dict[int, Dict] = {}
+        if owned:
+            if waiting:
+                self.logger.info(
+                    f"♻️ Matching {len(owned)} new terms, reusing {len(waiting)} "
+                    f"matched by other requests in batch {self.scope.batch_id}"
+                )
+            try:
+                rows = await self.matcher.match_terms_batch(
+                    [term_dicts[index] for index, _, _ in owned], user_instructions=user_instructions
+                )
+            except BaseException:
+                for _, key, future in owned:
+                    self.scope.resolve(NAMESPACE, key, future, None, ok=False)
+                raise
+
+            by_term: Dict[str, Dict] = {}
+            for row in rows or []:
+                by_term.setdefault(normalize_term(row.get('unclear_term', '')), row)
+            for index, key, future in owned:
+                row = by_term.get(key[0])
+                self.scope.resolve(NAMESPACE, key, future, dict(row) if row else None, ok=row is not None)
+                if row is not None:
+                    results[index] = row
+
+        retry: List[int] = []
+        for index, future in waiting:
+            ok, row = await asyncio.shield(future)
+            if ok:
+                results[index] = share_match(row, term_dicts[index])
+            else:
+                retry.append(index)
+
+        if retry:
+            # The failed entries are gone from the scope: one request claims each again
+            self.logger.info(f"🔁 Matching {len(retry)} terms whose shared match failed")
+            rows = await self.match_terms_batch([term_dicts[index] for index in retry], user_instructions)
+            by_term = {normalize_term(row.get('unclear_term', '')): row for row in rows}
+            for index in retry:
+                row = by_term.get(normalize_term(term_dicts[index].get('unclear_term', '')))
+                if row is not None:
+                    results[index] = row
+
+        return [results[index] for index in sorted(results)]
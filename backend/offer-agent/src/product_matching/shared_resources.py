@@ -0,0 +1,246 @@
+"""
+Process-wide resources of the product matcher.
+
+ProductMatcher is created for every analysed email, and each instance used
+to read the product catalogue CSV, load the embedding matrices, create new
+Gemini/OpenAI clients and download and merge the S3 learnings. These
+loaders do that once per process (catalogue files are reloaded when they
+change on disk, learnings every LEARNINGS_REFRESH_SECONDS) and are called
+by the API warm-up, so the first request does not pay for them.
+
+The returned DataFrames and arrays are shared: callers may rebind their
+attributes but must not modify them in place.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from io import StringIO
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.RLock()
+_files: Dict[Tuple[str, str], Tuple[float, Any]] = {}
+_clients: Dict[Tuple[str, str], Any] = {}
+_learnings: Dict[str, Any] = {'loaded_at': 0.0, 'merged': False, 'general_rules': []}
+_learnings_lock = threading.Lock()
+
+DEFAULT_CATALOGUE_PATH = os.path.join(os.path.dirname(__file__), "products.csv")
+DEFAULT_FALLBACK_PATH = os.path.join(os.path.dirname(__file__), "products_9000_filtered.csv")
+PRODUCT_GROUPS_PATH = os.path.join(os.path.dirname(__file__), "product_groups.json")
+TRAINING_DATASET_PATH = os.path.join(os.path.dirname(__file__), "training_dataset.csv")
+
+
+def _cached_file(kind: str, path: str, load) -> Any:
+    """load(path), cached until the file's mtime changes."""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _lock:
+        cached = _files.get((kind, path))
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        started = time.perf_counter()
+        value = load(path)
+        _files[(kind, path)] = (mtime, value)
+        logger.info(f"Loaded {kind} from {path} in {time.perf_counter() - started:.2f}s")
+        return value
+
+
+def _read_catalogue(path: str):
+    import pandas as pd
+
+    products_df = pd.read_csv(path, encoding="utf-8", on_bad_lines='skip', delimiter=';')
+    missing_columns = [col for col in ('Tuotekoodi', 'Tuotenimi') if col not in products_df.columns]
+    if missing_columns:
+        logger.warning(
+            f"Missing required columns in products CSV: {missing_columns}. "
+            f"Available columns: {list(products_df.columns)}"
+        )
+        return None
+    products_df = products_df.dropna(subset=['Tuotenimi'])
+    products_df['Tuotenimi'] = products_df['Tuotenimi'].astype(str)
+    products_df["Tuotenimi_lower"] = products_df["Tuotenimi"].str.lower()
+    return products_df
+
+
+def _read_fallback_products(path: str):
+    import pandas as pd
+
+    products_df = pd.read_csv(path, encoding="utf-8")
+    products_df = products_df.dropna(subset=['product_name'])
+    products_df['product_name'] = products_df['product_name'].astype(str).str.strip()
+    products_df = products_df[products_df['product_name'] != ''].copy()
+    products_df['product_name_lower'] = products_df['product_name'].str.lower()
+    return products_df
+
+
+def _read_json(path: str):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _read_embeddings(path: str):
+    import numpy as np
+
+    return np.load(path)
+
+
+def load_product_catalogue(path: Optional[str] = None):
+    """Cleaned product catalogue DataFrame (code, name, lowercase name), or None if missing/invalid."""
+    return _cached_file("product catalogue", path or DEFAULT_CATALOGUE_PATH, _read_catalogue)
+
+
+def load_fallback_products(path: Optional[str] = None):
+    """Cleaned 9000-fallback product DataFrame, or None if the CSV is missing."""
+    return _cached_file("fallback products", str(path or DEFAULT_FALLBACK_PATH), _read_fallback_products)
+
+
+def load_embeddings(path: str):
+    """Embedding matrix saved next to a catalogue CSV, or None if it has not been computed."""
+    return _cached_file("embeddings", str(path), _read_embeddings)
+
+
+def load_product_groups(path: str):
+    """Product group hierarchy (product_groups.json) used by GroupBasedMatcher, or None if missing."""
+    return _cached_file("product groups", str(path), _read_json)
+
+
+def catalogue_embeddings_path(csv_path: str) -> str:
+    """Where the embeddings of a catalogue CSV are stored."""
+    return f"{os.path.splitext(str(csv_path))[0]}.openai_embeddings.npy"
+
+
+def store_embeddings(path: str, embeddings) -> None:
+    """Remember freshly computed embeddings (the caller persists them with np.save)."""
+    with _lock:
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            mtime = -1.0
+        _files[("embeddings", str(path))] = (mtime, embeddings)
+
+
+def get_gemini_client(api_key: Optional[str]):
+    """Shared google-genai client for an API key."""
+    with _lock:
+        client = _clients.get(("gemini", api_key or ""))
+        if client is None:
+            from google import genai
+
+            client = genai.Client(api_key=api_key)
+            _clients[("gemini", api_key or "")] = client
+        return client
+
+
+def get_openai_client(api_key: Optional[str]):
+    """Shared OpenAI client (real OpenAI endpoint, used for embeddings)."""
+    with _lock:
+        client = _clients.get(("openai", api_key or ""))
+        if client is None:
+            from openai import OpenAI
+
+            client = OpenAI(api_key=api_key, base_url="https://api.openai.com/v1")
+            _clients[("openai", api_key or "")] = client
+        return client
+
+
+def get_learnings(refresh_seconds: Optional[float] = None) -> Tuple[bool, List[str]]:
+    """
+    S3 learnings, downloaded at most once per refresh interval.
+
+    Merges learnings/product_swaps.csv from S3 into the local training
+    dataset and loads learnings/general_rules.txt.
+
+    Returns:
+        (merged, general_rules): whether the product swaps were merged, and the rules
+    """
+    if refresh_seconds is None:
+        refresh_seconds = float(os.getenv("LEARNINGS_REFRESH_SECONDS", "21600"))
+    with _learnings_lock:
+        if _learnings['loaded_at'] and time.time() - _learnings['loaded_at'] < refresh_seconds:
+            return _learnings['merged'], list(_learnings['general_rules'])
+        merged, rules = _download_learnings()
+        _learnings.update({'loaded_at': time.time(), 'merged': merged, 'general_rules': rules})
+        return merged, list(rules)
+
+
+def _download_learnings() -> Tuple[bool, List[str]]:
+    merged = False
+    general_rules: List[str] = []
+    try:
+        import boto3
+        import pandas as pd
+        from botocore.exceptions import ClientError
+
+        bucket_name = os.getenv('AWS_S3_BUCKET_LEARNING', 'offer-learning-data')
+        region = os.getenv('AWS_REGION', 'eu-north-1')
+        s3_client = boto3.client('s3', region_name=region)
+
+        # Product swaps: merged into the local training dataset
+        try:
+            response = s3_client.get_object(Bucket=bucket_name, Key='learnings/product_swaps.csv')
+            s3_df = pd.read_csv(StringIO(response['Body'].read().decode('utf-8')))
+            logger.info(f"✅ Downloaded {len(s3_df)} learnings from S3: learnings/product_swaps.csv")
+
+            if os.path.exists(TRAINING_DATASET_PATH):
+                local_df = pd.read_csv(TRAINING_DATASET_PATH)
+                merged_df = pd.concat([local_df, s3_df], ignore_index=True)
+                # S3 learnings take precedence over older local rows
+                merged_df = merged_df.drop_duplicates(
+                    subset=['customer_term', 'matched_product_code'],
+                    keep='last'
+                )
+                merged_df.to_csv(TRAINING_DATASET_PATH, index=False)
+                logger.info(
+                    f"✅ Merged S3 learnings with local training data: "
+                    f"{len(local_df)} local + {len(s3_df)} S3 = {len(merged_df)} total (after dedup)"
+                )
+            else:
+                s3_df.to_csv(TRAINING_DATASET_PATH, index=False)
+                logger.info(f"✅ Created training dataset from S3 learnings: {len(s3_df)} entries")
+            merged = True
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'NoSuchKey':
+                logger.info("No S3 learnings CSV found yet (learnings/product_swaps.csv)")
+            else:
+                logger.warning(f"Error downloading S3 learnings CSV: {e}")
+
+        # General rules: one per line
+        try:
+            response = s3_client.get_object(Bucket=bucket_name, Key='learnings/general_rules.txt')
+            rules_content = response['Body'].read().decode('utf-8')
+            general_rules = [line.strip() for line in rules_content.split('\n') if line.strip()]
+            logger.info(f"✅ Loaded {len(general_rules)} general rules from S3")
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'NoSuchKey':
+                logger.info("No S3 general rules found yet (learnings/general_rules.txt)")
+            else:
+                logger.warning(f"Error downloading S3 general rules: {e}")
+
+    except Exception as e:
+        logger.warning(f"Failed to merge S3 learnings: {e}")
+        merged = False
+    return merged, general_rules
+
+
+def warm_up() -> Dict[str, Any]:
+    """Load the catalogue, embeddings, fallback products, product groups and learnings; returns what was loaded."""
+    catalogue = load_product_catalogue()
+    embeddings = load_embeddings(catalogue_embeddings_path(DEFAULT_CATALOGUE_PATH))
+    fallback = load_fallback_products()
+    fallback_embeddings = load_embeddings(catalogue_embeddings_path(DEFAULT_FALLBACK_PATH))
+    groups = load_product_groups(PRODUCT_GROUPS_PATH)
+    merged, rules = get_learnings()
+    return {
+        'catalogue_products': len(catalogue) if catalogue is not None else 0,
+        'catalogue_embeddings': tuple(embeddings.shape) if embeddings is not None else None,
+        'fallback_products': len(fallback) if fallback is not None else 0,
+        'fallback_embeddings': tuple(fallback_embeddings.shape) if fallback_embeddings is not None else None,
+        'product_groups': len(groups) if groups is not None else 0,
+        'learnings_merged': merged,
+        'general_rules': len(rules),
+    }
@@ -0,0 +1,39 @@
+"""
+Offer Scheduler Module
+
+Persistent priority queue, worker pool and per-stage concurrency limits for
+offer processing.
+"""
+
+from src.scheduler.batch_scope import BatchScope, batch_memoize, current_batch_scope, use_batch_scope
+from src.scheduler.job_queue import OfferJob, PersistentPriorityQueue
+from src.scheduler.metrics import SchedulerMetrics, get_scheduler_metrics
+from src.scheduler.priority import compute_priority, estimate_offer_lines, parse_express_customers
+from src.scheduler.stage_limits import (
+    STAGE_ERP,
+    STAGE_LLM,
+    STAGE_OCR,
+    StageLimiter,
+    get_stage_limiter,
+)
+from src.scheduler.worker_pool import OfferWorkerPool
+
+__all__ = [
+    "OfferJob",
+    "PersistentPriorityQueue",
+    "OfferWorkerPool",
+    "SchedulerMetrics",
+    "get_scheduler_metrics",
+    "StageLimiter",
+    "get_stage_limiter",
+    "STAGE_LLM",
+    "STAGE_ERP",
+    "STAGE_OCR",
+    "compute_priority",
+    "estimate_offer_lines",
+    "parse_express_customers",
+    "BatchScope",
+    "batch_memoize",
+    "current_batch_scope",
+    "use_batch_scope",
+]
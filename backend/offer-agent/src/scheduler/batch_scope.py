@@ -0,0 +1,120 @@
+"""
+Lookups shared across the requests of one bulk submission.
+
+Requests in a bulk batch often come from the same customers and ask for the
+same products. While a BatchScope is active (use_batch_scope), read-only
+lookups - customer resolution, Lemonsoft pricing queries, product term
+matches - go through batch_memoize, so each distinct lookup runs once per
+batch. Concurrent callers asking for a lookup that is already running wait
+for it instead of starting their own.
+
+Each caller gets its own copy of a shared result, so a request mutating its
+customer or price rows does not affect the others. Failures are not shared:
+if the call that owns a lookup fails, the callers waiting on it run the
+lookup themselves.
+"""
+import asyncio
+import contextvars
+import copy
+from collections import defaultdict
+from contextlib import contextmanager
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterator, Optional, Tuple, TypeVar
+
+
+T = TypeVar('T')
+
+_current_scope: contextvars.ContextVar[Optional["BatchScope"]] = contextvars.ContextVar('batch_scope', default=None)
+
+
+class BatchScope:
+    """Memo table of one bulk batch, keyed by (namespace, key)."""
+
+    def __init__(self, batch_id: str, max_entries: int = 20000):
+        """
+        Args:
+            batch_id: Bulk batch the scope belongs to
+            max_entries: Lookups remembered; beyond this new lookups are not shared
+        """
+        self.batch_id = batch_id
+        self.max_entries = max_entries
+        self._entries: Dict[Tuple[str, Hashable], asyncio.Future] = {}
+        self._lock = Lock()
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {'lookups': 0, 'shared': 0})
+
+    def claim(self, namespace: str, key: Hashable) -> Tuple[Optional[asyncio.Future], bool]:
+        """
+        Entry for a lookup.
+
+        Returns:
+            (future, owner): the caller that gets owner=True must resolve the
+            future (resolve(..., None) on failure); others await it. The future
+            is None when the table is full and the lookup is not shared.
+        """
+        with self._lock:
+            stats = self._stats[namespace]
+            future = self._entries.get((namespace, key))
+            if future is not None:
+                stats['shared'] += 1
+                return future, False
+            stats['lookups'] += 1
+            if len(self._entries) >= self.max_entries:
+                return None, True
+            future = asyncio.get_running_loop().create_future()
+            self._entries[(namespace, key)] = future
+            return future, True
+
+    def resolve(self, namespace: str, key: Hashable, future: Optional[asyncio.Future], value: Any, ok: bool = True) -> None:
+        """Publish the owner's result; a failed lookup is forgotten so later callers retry it."""
+        if future is None:
+            return
+        if not ok:
+            with self._lock:
+                if self._entries.get((namespace, key)) is future:
+                    del self._entries[(namespace, key)]
+        if not future.done():
+            future.set_result((ok, value))
+
+    async def memoize(self, namespace: str, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        """Result of factory(), computed once per batch for this namespace and key."""
+        future, owner = self.claim(namespace, key)
+        if not owner:
+            ok, value = await asyncio.shield(future)
+            if ok:
+                return copy.deepcopy(value)
+            return await factory()
+        try:
+            value = await factory()
+        except BaseException:
+            self.resolve(namespace, key, future, None, ok=False)
+            raise
+        self.resolve(namespace, key, future, copy.deepcopy(value) if future is not None else None)
+        return value
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Distinct lookups and lookups served from the batch, per namespace."""
+        with self._lock:
+            return {namespace: dict(counts) for namespace, counts in self._stats.items()}
+
+
+@contextmanager
+def use_batch_scope(scope: Optional[BatchScope]) -> Iterator[None]:
+    """Share lookups of the enclosed code (and tasks it creates) through the scope."""
+    token = _current_scope.set(scope)
+    try:
+        yield
+    finally:
+        _current_scope.reset(token)
+
+
+def current_batch_scope() -> Optional[BatchScope]:
+    """Batch scope of the current context, if any."""
+    return _current_scope.get()
+
+
+async def batch_memoize(namespace: str, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+    """factory() shared within the current batch scope; a plain call outside one."""
+    scope = _current_scope.get()
+    if scope is None:
+        return await factory()
+    return await scope.memoize(namespace, key, factory)
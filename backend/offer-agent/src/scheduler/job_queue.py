@@ -0,0 +1,220 @@
+"""
+Persistent Offer Queue
+
+SQLite-backed priority queue of offer requests. Jobs survive restarts: jobs
+that were running when the process stopped are put back in the queue on open.
+
+Ordering is by priority (lower first) with ageing, so a large request still
+moves forward as it waits instead of starving behind a stream of small ones.
+"""
+import asyncio
+import os
+import pickle
+import sqlite3
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Optional
+
+from src.utils.logger import get_logger
+
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+@dataclass
+class OfferJob:
+    """A queued offer request."""
+    payload: Dict[str, Any]
+    priority: float = 0.0
+    job_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    size_class: str = ""
+    status: str = JOB_QUEUED
+    attempts: int = 0
+    enqueued_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
+
+class PersistentPriorityQueue:
+    """
+    Priority queue of OfferJobs stored in a local SQLite database.
+
+    Sync methods are safe to call from any thread; the async wrappers run them
+    in a worker thread so the event loop is never blocked on disk I/O.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, aging_seconds: float = 60.0):
+        """
+        Initialize the queue.
+
+        Args:
+            db_path: SQLite file path. Defaults to OFFER_QUEUE_PATH or
+                /app/data/offer_queue.db. Use ":memory:" for tests/load tests.
+            aging_seconds: Waiting this long improves priority by 1 (one line)
+        """
+        self.logger = get_logger(__name__)
+        self._lock = Lock()
+        self.aging_seconds = aging_seconds
+
+        path = db_path or os.getenv("OFFER_QUEUE_PATH", "/app/data/offer_queue.db")
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS offer_jobs (
+                job_id TEXT PRIMARY KEY,
+                priority REAL NOT NULL,
+                size_class TEXT,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                enqueued_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                error TEXT,
+                payload BLOB NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_offer_jobs_status ON offer_jobs (status, priority, enqueued_at)"
+        )
+
+        recovered = self._requeue_running()
+        if recovered:
+            self.logger.info(f"Re-queued {recovered} offer jobs interrupted by a restart")
+
+    # ==================== SYNC API ====================
+
+    def put(self, job: OfferJob) -> bool:
+        """
+        Add a job. Jobs with an existing job_id are ignored (idempotent enqueue).
+
+        Returns:
+            True if the job was added
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                """
+                INSERT OR IGNORE INTO offer_jobs
+                    (job_id, priority, size_class, status, attempts, enqueued_at, payload)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (job.job_id, job.priority, job.size_class, JOB_QUEUED, job.attempts,
+                 job.enqueued_at, pickle.dumps(job.payload, protocol=pickle.HIGHEST_PROTOCOL))
+            )
+            return cursor.rowcount > 0
+
+    def claim(self) -> Optional[OfferJob]:
+        """Atomically take the highest-priority queued job and mark it running."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    """
+                    SELECT job_id, priority, size_class, attempts, enqueued_at, payload
+                    FROM offer_jobs
+                    WHERE status = ?
+                    ORDER BY priority - (? - enqueued_at) / ? ASC, enqueued_at ASC
+                    LIMIT 1
+                    """,
+                    (JOB_QUEUED, now, self.aging_seconds)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+
+                self._conn.execute(
+                    "UPDATE offer_jobs SET status = ?, started_at = ?, attempts = attempts + 1 WHERE job_id = ?",
+                    (JOB_RUNNING, now, row[0])
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        return OfferJob(
+            job_id=row[0],
+            priority=row[1],
+            size_class=row[2] or "",
+            attempts=row[3] + 1,
+            enqueued_at=row[4],
+            started_at=now,
+            status=JOB_RUNNING,
+            payload=pickle.loads(row[5]),
+        )
+
+    def complete(self, job_id: str) -> None:
+        """Mark a job done and drop its payload."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE offer_jobs SET status = ?, finished_at = ?, payload = ? WHERE job_id = ?",
+                (JOB_DONE, time.time(), b"", job_id)
+            )
+
+    def fail(self, job_id: str, error: str, requeue: bool = False) -> None:
+        """Mark a job failed, or put it back in the queue for another attempt."""
+        with self._lock:
+            if requeue:
+                self._conn.execute(
+                    "UPDATE offer_jobs SET status = ?, started_at = NULL, error = ? WHERE job_id = ?",
+                    (JOB_QUEUED, error, job_id)
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE offer_jobs SET status = ?, finished_at = ?, error = ? WHERE job_id = ?",
+                    (JOB_FAILED, time.time(), error, job_id)
+                )
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per status."""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM offer_jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def queued(self) -> int:
+        """Number of jobs waiting to run."""
+        return self.counts().get(JOB_QUEUED, 0)
+
+    def purge_finished(self, older_than_seconds: float = 7 * 86400) -> int:
+        """Delete done/failed jobs older than the given age."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM offer_jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (JOB_DONE, JOB_FAILED, time.time() - older_than_seconds)
+            )
+            return cursor.rowcount
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def _requeue_running(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE offer_jobs SET status = ?, started_at = NULL WHERE status = ?",
+                (JOB_QUEUED, JOB_RUNNING)
+            )
+            return cursor.rowcount
+
+    # ==================== ASYNC WRAPPERS ====================
+
+    async def put_async(self, job: OfferJob) -> bool:
+        return await asyncio.to_thread(self.put, job)
+
+    async def claim_async(self) -> Optional[OfferJob]:
+        return await asyncio.to_thread(self.claim)
+
+    async def complete_async(self, job_id: str) -> None:
+        await asyncio.to_thread(self.complete, job_id)
+
+    async def fail_async(self, job_id: str, error: str, requeue: bool = False) -> None:
+        await asyncio.to_thread(self.fail, job_id, error, requeue)
@@ -0,0 +1,179 @@
+"""
+Scheduler Load Test
+
+Drives the worker pool and stage limiters with fake LLM and ERP backends so
+queueing behaviour (priority, stage limits, worker count) can be tuned without
+Gemini or Lemonsoft.
+
+Usage:
+    python -m src.scheduler.load_test --jobs 60 --workers 4 --large-fraction 0.2
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from src.scheduler.job_queue import PersistentPriorityQueue
+from src.scheduler.metrics import SchedulerMetrics
+from src.scheduler.priority import estimate_offer_lines
+from src.scheduler.stage_limits import STAGE_ERP, STAGE_LLM, STAGE_OCR, StageLimiter
+from src.scheduler.worker_pool import OfferWorkerPool
+
+
+@dataclass
+class FakeResult:
+    """Minimal stand-in for WorkflowResult."""
+    success: bool = True
+    errors: List[str] = field(default_factory=list)
+
+
+class FakeLLMBackend:
+    """Simulated LLM: latency grows with the number of lines to extract/match."""
+
+    def __init__(self, base_latency: float = 0.2, per_line_latency: float = 0.01, failure_rate: float = 0.0):
+        self.base_latency = base_latency
+        self.per_line_latency = per_line_latency
+        self.failure_rate = failure_rate
+        self.calls = 0
+
+    async def extract(self, lines: int) -> None:
+        self.calls += 1
+        await asyncio.sleep(self.base_latency + self.per_line_latency * lines * random.uniform(0.8, 1.2))
+        if random.random() < self.failure_rate:
+            raise ConnectionError("fake LLM failure")
+
+
+class FakeERPBackend:
+    """Simulated ERP: fixed per-call latency plus a small per-line cost."""
+
+    def __init__(self, call_latency: float = 0.05, per_line_latency: float = 0.002):
+        self.call_latency = call_latency
+        self.per_line_latency = per_line_latency
+        self.calls = 0
+
+    async def call(self, lines: int = 1) -> None:
+        self.calls += 1
+        await asyncio.sleep(self.call_latency + self.per_line_latency * lines)
+
+
+class FakeOfferHandler:
+    """Offer pipeline shape: OCR for attachments, LLM extraction, ERP customer/pricing/create."""
+
+    def __init__(self, limiter: StageLimiter, llm: FakeLLMBackend, erp: FakeERPBackend):
+        self.limiter = limiter
+        self.llm = llm
+        self.erp = erp
+
+    async def __call__(self, payload: Dict[str, Any]) -> FakeResult:
+        lines = estimate_offer_lines(payload)
+        if payload.get('attachments'):
+            async with self.limiter.stage(STAGE_OCR):
+                await asyncio.sleep(0.05 * len(payload['attachments']))
+        async with self.limiter.stage(STAGE_LLM):
+            await self.llm.extract(lines)
+        for _ in range(3):  # customer lookup, pricing, create offer
+            async with self.limiter.stage(STAGE_ERP):
+                await self.erp.call(lines)
+        return FakeResult()
+
+
+def generate_payloads(
+    count: int,
+    large_fraction: float = 0.2,
+    express_fraction: float = 0.1,
+    seed: Optional[int] = 42
+) -> List[Dict[str, Any]]:
+    """Generate fake email payloads with a mix of small, large and express requests."""
+    rng = random.Random(seed)
+    payloads = []
+    for i in range(count):
+        large = rng.random() < large_fraction
+        lines = rng.randint(100, 250) if large else rng.randint(1, 15)
+        sender = "buyer@express.example" if rng.random() < express_fraction else f"buyer{i}@customer.example"
+        payloads.append({
+            'id': f"load-{i}",
+            'sender': sender,
+            'subject': f"Load test request {i}",
+            'body': "\n".join(f"Product {n} 10 kpl" for n in range(lines)),
+            'attachments': [],
+        })
+    return payloads
+
+
+async def run_load_test(
+    jobs: int = 60,
+    workers: int = 4,
+    stage_limits: Optional[Dict[str, int]] = None,
+    large_fraction: float = 0.2,
+    express_fraction: float = 0.1,
+    llm_failure_rate: float = 0.0
+) -> Dict[str, Any]:
+    """
+    Enqueue fake requests, drain them through the pool and return metrics.
+
+    Returns:
+        Dict with wall time, throughput, queue counts and metrics snapshot
+    """
+    metrics = SchedulerMetrics()
+    limiter = StageLimiter(stage_limits or {STAGE_LLM: 4, STAGE_ERP: 2, STAGE_OCR: 2}, metrics=metrics)
+    handler = FakeOfferHandler(limiter, FakeLLMBackend(failure_rate=llm_failure_rate), FakeERPBackend())
+    queue = PersistentPriorityQueue(":memory:")
+    pool = OfferWorkerPool(
+        queue,
+        handler,
+        num_workers=workers,
+        express_customers={"express.example"},
+        idle_poll_seconds=0.05,
+        metrics=metrics,
+    )
+
+    for payload in generate_payloads(jobs, large_fraction, express_fraction):
+        await pool.submit(payload, job_id=payload['id'])
+
+    started = time.monotonic()
+    await pool.start()
+    await pool.join(poll_seconds=0.05)
+    wall_time = time.monotonic() - started
+    await pool.stop()
+
+    result = {
+        'jobs': jobs,
+        'workers': workers,
+        'stage_limits': limiter.limits,
+        'wall_time_seconds': round(wall_time, 3),
+        'throughput_per_minute': round(jobs / wall_time * 60, 1) if wall_time else 0.0,
+        'queue': queue.counts(),
+        'metrics': metrics.snapshot(),
+    }
+    queue.close()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offer scheduler load test with fake backends")
+    parser.add_argument("--jobs", type=int, default=60)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--llm-limit", type=int, default=4)
+    parser.add_argument("--erp-limit", type=int, default=2)
+    parser.add_argument("--ocr-limit", type=int, default=2)
+    parser.add_argument("--large-fraction", type=float, default=0.2)
+    parser.add_argument("--express-fraction", type=float, default=0.1)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    result = asyncio.run(run_load_test(
+        jobs=args.jobs,
+        workers=args.workers,
+        stage_limits={STAGE_LLM: args.llm_limit, STAGE_ERP: args.erp_limit, STAGE_OCR: args.ocr_limit},
+        large_fraction=args.large_fraction,
+        express_fraction=args.express_fraction,
+        llm_failure_rate=args.llm_failure_rate,
+    ))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
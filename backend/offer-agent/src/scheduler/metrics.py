@@ -0,0 +1,103 @@
+"""
+Scheduler Metrics
+
+In-process queue-wait and service-time statistics for the offer worker pool
+and the per-stage limiters. Kept as bounded sample windows so percentiles
+reflect recent load.
+"""
+from collections import defaultdict, deque
+from threading import Lock
+from typing import Deque, Dict, Optional
+
+
+class LatencyWindow:
+    """Bounded window of latency samples (seconds)."""
+
+    def __init__(self, max_samples: int = 1000):
+        self.samples: Deque[float] = deque(maxlen=max_samples)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value: float) -> None:
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def percentile(self, pct: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+        return ordered[index]
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'mean': round(self.total / self.count, 3) if self.count else 0.0,
+            'p50': round(self.percentile(50), 3),
+            'p95': round(self.percentile(95), 3),
+            'max': round(max(self.samples), 3) if self.samples else 0.0,
+        }
+
+
+class SchedulerMetrics:
+    """
+    Queue-wait, service-time and stage-wait metrics.
+
+    Keys are free-form labels: size classes ("small", "large", "express") for
+    jobs and stage names ("llm", "erp", "ocr") for stage waits.
+    """
+
+    def __init__(self, max_samples: int = 1000):
+        self._lock = Lock()
+        self._max_samples = max_samples
+        self._queue_wait: Dict[str, LatencyWindow] = defaultdict(self._window)
+        self._service_time: Dict[str, LatencyWindow] = defaultdict(self._window)
+        self._stage_wait: Dict[str, LatencyWindow] = defaultdict(self._window)
+        self._outcomes: Dict[str, int] = defaultdict(int)
+
+    def _window(self) -> LatencyWindow:
+        return LatencyWindow(self._max_samples)
+
+    def record_job(
+        self,
+        label: str,
+        queue_wait: float,
+        service_time: float,
+        outcome: str
+    ) -> None:
+        """Record one finished job."""
+        with self._lock:
+            self._queue_wait[label].add(queue_wait)
+            self._service_time[label].add(service_time)
+            self._queue_wait['all'].add(queue_wait)
+            self._service_time['all'].add(service_time)
+            self._outcomes[outcome] += 1
+
+    def record_stage_wait(self, stage: str, wait: float) -> None:
+        """Record time spent waiting for a stage slot."""
+        with self._lock:
+            self._stage_wait[stage].add(wait)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Summary of all metrics."""
+        with self._lock:
+            return {
+                'queue_wait': {k: w.summary() for k, w in self._queue_wait.items()},
+                'service_time': {k: w.summary() for k, w in self._service_time.items()},
+                'stage_wait': {k: w.summary() for k, w in self._stage_wait.items()},
+                'outcomes': dict(self._outcomes),
+            }
+
+
+_metrics: Optional[SchedulerMetrics] = None
+_metrics_lock = Lock()
+
+
+def get_scheduler_metrics() -> SchedulerMetrics:
+    """Get the process-wide scheduler metrics."""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = SchedulerMetrics()
+        return _metrics
@@ -0,0 +1,99 @@
+"""
+Offer Priority
+
+Size-aware priority for queued offer requests. Lower values run first, so
+small requests and express customers are not stuck behind large tenders.
+"""
+import os
+from typing import Any, Dict, Iterable, Optional, Set
+
+
+# Attachment types that usually carry long product lists
+_LIST_ATTACHMENT_EXTENSIONS = ('.xlsx', '.xls', '.csv', '.pdf')
+_IMAGE_ATTACHMENT_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp', '.tif', '.tiff')
+
+SIZE_SMALL = "small"
+SIZE_MEDIUM = "medium"
+SIZE_LARGE = "large"
+
+
+def estimate_offer_lines(email_data: Dict[str, Any]) -> int:
+    """
+    Rough estimate of how many product lines a request contains.
+
+    Counts non-empty body lines and adds a per-attachment estimate based on
+    file type and size; good enough to rank requests before any LLM call.
+
+    Args:
+        email_data: Email data with body and attachments
+
+    Returns:
+        Estimated number of lines (>= 1)
+    """
+    body = email_data.get('body', '') or ''
+    estimate = sum(1 for line in body.splitlines() if line.strip())
+
+    for attachment in email_data.get('attachments', []) or []:
+        filename = str(attachment.get('filename', '')).lower()
+        size = attachment.get('size') or len(attachment.get('data') or b'')
+        if filename.endswith(_LIST_ATTACHMENT_EXTENSIONS):
+            # ~1 line per 200 bytes of spreadsheet/PDF text, capped per file
+            estimate += min(max(size // 200, 10), 500)
+        elif filename.endswith(_IMAGE_ATTACHMENT_EXTENSIONS):
+            estimate += 20
+
+    return max(estimate, 1)
+
+
+def size_class(estimated_lines: int) -> str:
+    """Bucket an estimated line count into small / medium / large."""
+    if estimated_lines <= 20:
+        return SIZE_SMALL
+    if estimated_lines <= 100:
+        return SIZE_MEDIUM
+    return SIZE_LARGE
+
+
+def parse_express_customers(value: Optional[str] = None) -> Set[str]:
+    """
+    Parse the express customer list.
+
+    Args:
+        value: Comma-separated email addresses or domains
+            (defaults to EXPRESS_CUSTOMERS environment variable)
+
+    Returns:
+        Lowercased set of addresses/domains
+    """
+    raw = value if value is not None else os.getenv('EXPRESS_CUSTOMERS', '')
+    return {item.strip().lower().lstrip('@') for item in raw.split(',') if item.strip()}
+
+
+def is_express_sender(sender: Optional[str], express_customers: Iterable[str]) -> bool:
+    """Check whether a sender address or its domain is on the express list."""
+    if not sender:
+        return False
+    address = sender.split('<')[-1].rstrip('>').strip().lower()
+    domain = address.split('@')[-1]
+    express = set(express_customers)
+    return address in express or domain in express
+
+
+def compute_priority(email_data: Dict[str, Any], express_customers: Iterable[str] = ()) -> float:
+    """
+    Compute the queue priority of a request (lower runs first).
+
+    Priority is the estimated line count, with express customers moved ahead of
+    every non-express request of comparable size.
+
+    Args:
+        email_data: Email data to rank
+        express_customers: Express addresses/domains
+
+    Returns:
+        Priority value
+    """
+    priority = float(estimate_offer_lines(email_data))
+    if is_express_sender(email_data.get('sender'), express_customers):
+        priority -= 1000.0
+    return priority
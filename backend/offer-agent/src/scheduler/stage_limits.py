@@ -0,0 +1,104 @@
+"""
+Stage Concurrency Limits
+
+Per-stage concurrency limits shared by every offer in the process. Instead of
+one global "offers in flight" count, the scarce resources are bounded
+separately: LLM calls, ERP (Lemonsoft) calls and OCR/attachment processing.
+
+Usage:
+    async with get_stage_limiter().stage(STAGE_LLM):
+        ...
+"""
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from threading import Lock
+from typing import AsyncIterator, Dict, Optional
+
+from src.scheduler.metrics import SchedulerMetrics, get_scheduler_metrics
+
+
+STAGE_LLM = "llm"
+STAGE_ERP = "erp"
+STAGE_OCR = "ocr"
+
+DEFAULT_STAGE_LIMITS: Dict[str, int] = {
+    STAGE_LLM: 4,
+    STAGE_ERP: 2,
+    STAGE_OCR: 2,
+}
+
+
+def load_stage_limits() -> Dict[str, int]:
+    """Stage limits from STAGE_LIMIT_<NAME> environment variables, with defaults."""
+    return {
+        stage: int(os.getenv(f"STAGE_LIMIT_{stage.upper()}", str(default)))
+        for stage, default in DEFAULT_STAGE_LIMITS.items()
+    }
+
+
+class StageLimiter:
+    """Named semaphores with wait-time metrics."""
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, int]] = None,
+        metrics: Optional[SchedulerMetrics] = None
+    ):
+        """
+        Initialize the limiter.
+
+        Args:
+            limits: Max concurrency per stage (defaults to load_stage_limits())
+            metrics: Metrics sink (defaults to the process-wide metrics)
+        """
+        self.limits = limits or load_stage_limits()
+        self.metrics = metrics or get_scheduler_metrics()
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._in_use: Dict[str, int] = {stage: 0 for stage in self.limits}
+
+    def _semaphore(self, stage: str) -> asyncio.Semaphore:
+        # Created lazily so they bind to the running event loop
+        semaphore = self._semaphores.get(stage)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.limits.get(stage, 1))
+            self._semaphores[stage] = semaphore
+        return semaphore
+
+    @asynccontextmanager
+    async def stage(self, stage: Optional[str]) -> AsyncIterator[None]:
+        """Hold a slot of the given stage; None means unlimited."""
+        if not stage:
+            yield
+            return
+
+        semaphore = self._semaphore(stage)
+        started = time.monotonic()
+        async with semaphore:
+            self.metrics.record_stage_wait(stage, time.monotonic() - started)
+            self._in_use[stage] = self._in_use.get(stage, 0) + 1
+            try:
+                yield
+            finally:
+                self._in_use[stage] -= 1
+
+    def utilisation(self) -> Dict[str, Dict[str, int]]:
+        """Current in-use slots and limit per stage."""
+        return {
+            stage: {'in_use': self._in_use.get(stage, 0), 'limit': limit}
+            for stage, limit in self.limits.items()
+        }
+
+
+_limiter: Optional[StageLimiter] = None
+_limiter_lock = Lock()
+
+
+def get_stage_limiter() -> StageLimiter:
+    """Get the process-wide stage limiter."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = StageLimiter()
+        return _limiter
@@ -0,0 +1,224 @@
+"""
+Offer Worker Pool
+
+Long-running workers that pull offer jobs from the persistent priority queue.
+Replaces per-batch gather + semaphore: new requests are picked up as soon as
+any worker is free, in priority order, regardless of which poll fetched them.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from src.scheduler.job_queue import OfferJob, PersistentPriorityQueue
+from src.scheduler.metrics import SchedulerMetrics, get_scheduler_metrics
+from src.scheduler.priority import (
+    compute_priority,
+    estimate_offer_lines,
+    is_express_sender,
+    size_class,
+)
+from src.utils.logger import get_logger
+
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+class OfferWorkerPool:
+    """
+    Pool of asyncio workers consuming a PersistentPriorityQueue.
+
+    The handler's return value decides the outcome: objects with a falsy
+    `success` attribute count as failures; exceptions are failures that are
+    re-queued until max_attempts is reached.
+    """
+
+    def __init__(
+        self,
+        queue: PersistentPriorityQueue,
+        handler: JobHandler,
+        num_workers: int = 2,
+        express_customers: Iterable[str] = (),
+        max_attempts: int = 2,
+        idle_poll_seconds: float = 1.0,
+        metrics: Optional[SchedulerMetrics] = None,
+        pause_check: Optional[Callable[[], List[str]]] = None,
+        pause_poll_seconds: float = 5.0
+    ):
+        """
+        Initialize the pool.
+
+        Args:
+            queue: Job queue
+            handler: Coroutine called with each job's payload
+            num_workers: Number of concurrent workers (offers in flight)
+            express_customers: Sender addresses/domains that get priority
+            max_attempts: Attempts before a crashing job is marked failed
+            idle_poll_seconds: Sleep between queue checks when idle
+            metrics: Metrics sink (defaults to the process-wide metrics)
+            pause_check: Returns the dependencies that are down; while it returns any,
+                workers leave queued jobs in the queue instead of failing them
+            pause_poll_seconds: How often a paused worker checks again
+        """
+        self.logger = get_logger(__name__)
+        self.queue = queue
+        self.handler = handler
+        self.num_workers = num_workers
+        self.express_customers = set(express_customers)
+        self.max_attempts = max_attempts
+        self.idle_poll_seconds = idle_poll_seconds
+        self.metrics = metrics or get_scheduler_metrics()
+        self.pause_check = pause_check
+        self.pause_poll_seconds = pause_poll_seconds
+        self._paused_on: List[str] = []
+
+        self._workers: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers) and not self._stopping
+
+    async def submit(self, payload: Dict[str, Any], job_id: Optional[str] = None) -> Optional[str]:
+        """
+        Enqueue an offer request.
+
+        Args:
+            payload: Email data
+            job_id: Stable ID for idempotent enqueue (e.g. Gmail message ID)
+
+        Returns:
+            The job ID, or None if a job with this ID already exists
+        """
+        lines = estimate_offer_lines(payload)
+        label = "express" if is_express_sender(payload.get('sender'), self.express_customers) else size_class(lines)
+        job = OfferJob(
+            payload=payload,
+            priority=compute_priority(payload, self.express_customers),
+            size_class=label,
+        )
+        if job_id:
+            job.job_id = job_id
+
+        added = await self.queue.put_async(job)
+        if not added:
+            self.logger.info(f"Job {job.job_id} already queued, skipping")
+            return None
+
+        self.logger.info(f"📥 Queued job {job.job_id} ({label}, ~{lines} lines, priority {job.priority:.0f})")
+        if self._wakeup:
+            self._wakeup.set()
+        return job.job_id
+
+    async def start(self) -> None:
+        """Start the workers."""
+        if self._workers:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"offer-worker-{i}")
+            for i in range(self.num_workers)
+        ]
+        self.logger.info(f"Started {self.num_workers} offer workers")
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        """Stop the workers, letting in-flight jobs finish up to timeout."""
+        self._stopping = True
+        if self._wakeup:
+            self._wakeup.set()
+        if not self._workers:
+            return
+        _, pending = await asyncio.wait(self._workers, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self.logger.info("Offer workers stopped")
+
+    async def join(self, poll_seconds: float = 0.1) -> None:
+        """Wait until no jobs are queued or running (load tests, shutdown)."""
+        while True:
+            counts = await asyncio.to_thread(self.queue.counts)
+            if not counts.get('queued') and not counts.get('running'):
+                return
+            await asyncio.sleep(poll_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and metrics snapshot."""
+        return {
+            'workers': self.num_workers,
+            'paused_on': list(self._paused_on),
+            'queue': self.queue.counts(),
+            'metrics': self.metrics.snapshot(),
+        }
+
+    def _check_pause(self) -> List[str]:
+        try:
+            blocked = list(self.pause_check()) if self.pause_check else []
+        except Exception as e:
+            self.logger.error(f"Pause check failed: {e}")
+            blocked = []
+        if blocked != self._paused_on:
+            if blocked:
+                self.logger.warning(f"⏸️ Offer workers paused: {', '.join(blocked)} unavailable")
+            else:
+                self.logger.info("▶️ Offer workers resumed")
+            self._paused_on = blocked
+        return blocked
+
+    async def _worker(self, index: int) -> None:
+        while not self._stopping:
+            if self._check_pause():
+                await asyncio.sleep(self.pause_poll_seconds)
+                continue
+
+            try:
+                job = await self.queue.claim_async()
+            except Exception as e:
+                self.logger.error(f"Worker {index} failed to claim job: {e}")
+                await asyncio.sleep(self.idle_poll_seconds)
+                continue
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.idle_poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._run_job(index, job)
+
+    async def _run_job(self, index: int, job: OfferJob) -> None:
+        queue_wait = job.started_at - job.enqueued_at
+        started = time.monotonic()
+        self.logger.info(
+            f"🔧 Worker {index} started job {job.job_id} ({job.size_class}, "
+            f"waited {queue_wait:.1f}s, attempt {job.attempts})"
+        )
+
+        outcome = "success"
+        try:
+            result = await self.handler(job.payload)
+            if getattr(result, 'success', True):
+                await self.queue.complete_async(job.job_id)
+            else:
+                outcome = "failed"
+                errors = getattr(result, 'errors', None) or []
+                await self.queue.fail_async(job.job_id, "; ".join(map(str, errors)) or "failed")
+        except asyncio.CancelledError:
+            # Shutdown: leave the job for the next process
+            outcome = "interrupted"
+            await self.queue.fail_async(job.job_id, "interrupted", requeue=True)
+            raise
+        except Exception as e:
+            outcome = "error"
+            requeue = job.attempts < self.max_attempts
+            self.logger.error(f"Job {job.job_id} raised: {e}", exc_info=True)
+            await self.queue.fail_async(job.job_id, str(e), requeue=requeue)
+        finally:
+            service_time = time.monotonic() - started
+            self.metrics.record_job(job.size_class or "unknown", queue_wait, service_time, outcome)
+
+        self.logger.info(f"✅ Worker {index} finished job {job.job_id} ({outcome}) in {service_time:.1f}s")
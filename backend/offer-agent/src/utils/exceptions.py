@@ -102,6 +102,11 @@ class AttachmentProcessingError(EmailProcessingError):
         )
 
 
+class AttachmentSpoolError(AttachmentProcessingError):
+    """Attachment could not be written to the attachment spool (too large, spool full or bad encoding)."""
+    pass
+
+
 # Customer Identification Exceptions
 class CustomerIdentificationError(BaseOfferAutomationError):
     """Base exception for customer identification errors."""
@@ -434,6 +439,29 @@ class ExternalServiceError(BaseOfferAutomationError):
         )
 
 
+class WorkflowStepTimeoutError(BaseOfferAutomationError):
+    """A workflow step exceeded its time budget."""
+    
+    def __init__(self, message: str, step_name: str = None, timeout_seconds: float = None, **kwargs):
+        context = kwargs.pop('context', {})
+        if step_name:
+            context['step_name'] = step_name
+        if timeout_seconds is not None:
+            context['timeout_seconds'] = timeout_seconds
+        
+        super().__init__(
+            message=message,
+            error_code="WORKFLOW_STEP_TIMEOUT",
+            context=context,
+            recovery_suggestions=[
+                "Check the latency of the external service used by the step",
+                "Retry the request",
+                "Increase the step timeout if the workload is legitimately large"
+            ],
+            **kwargs
+        )
+
+
 class ValidationError(BaseOfferAutomationError):
     """Data validation error."""
     
@@ -0,0 +1,23 @@
+"""
+Shared test setup.
+
+src.config.settings builds Settings at import time and requires credentials;
+tests never reach the real services, so placeholders are enough.
+"""
+import os
+
+for _name in (
+    'GEMINI_API_KEY',
+    'OPENAI_API_KEY',
+    'LEMONSOFT_USERNAME',
+    'LEMONSOFT_PASSWORD',
+    'LEMONSOFT_DATABASE',
+    'LEMONSOFT_API_KEY',
+    'SMTP_USERNAME',
+    'SMTP_PASSWORD',
+    'EMAIL_REPLY_TO',
+    'EMAIL_USERNAME',
+    'EMAIL_PASSWORD',
+    'SESSION_SECRET_KEY',
+):
+    os.environ.setdefault(_name, 'test')
@@ -0,0 +1,36 @@
+"""
+Checkpoint keys and the retriable steps used by the resume loop.
+
+    python -m pytest tests/test_checkpoint.py
+"""
+from src.core.checkpoint import CheckpointStore, make_checkpoint_key
+from src.core.workflow import WorkflowContext, WorkflowDefinition, WorkflowStep
+
+EMAIL = {'sender': 'buyer@example.com', 'subject': 'Tarjouspyyntö', 'body': '10 kpl kuulaventtiili DN20'}
+
+
+def test_identical_submissions_without_ids_get_separate_checkpoints():
+    assert make_checkpoint_key(dict(EMAIL)) != make_checkpoint_key(dict(EMAIL))
+
+
+def test_request_id_keeps_the_key_stable():
+    assert make_checkpoint_key(EMAIL, 'job-1') == make_checkpoint_key(dict(EMAIL), 'job-1')
+    assert make_checkpoint_key({**EMAIL, 'id': 'gmail-1'}) == make_checkpoint_key({**EMAIL, 'id': 'gmail-1'})
+
+
+def test_deleting_one_submission_keeps_the_other(tmp_path):
+    store = CheckpointStore(base_dir=str(tmp_path))
+    first, second = make_checkpoint_key(dict(EMAIL)), make_checkpoint_key(dict(EMAIL))
+    context = WorkflowContext(email_data=EMAIL, sender_email=EMAIL['sender'])
+    store.save_step(first, WorkflowStep.PARSE_EMAIL, context)
+    store.save_step(second, WorkflowStep.PARSE_EMAIL, context)
+
+    store.delete(first)
+
+    assert not store.has_checkpoint(first)
+    assert store.has_checkpoint(second)
+
+
+def test_offer_creation_is_not_resumed_automatically():
+    assert not WorkflowDefinition.is_retriable_step(WorkflowStep.CREATE_OFFER)
+    assert WorkflowDefinition.is_retriable_step(WorkflowStep.VERIFY_OFFER)
@@ -0,0 +1,60 @@
+"""
+IterationBudget retirement rules: only stalled or overrun terms without a
+strong candidate go to the 9000 fallback.
+
+    python -m pytest tests/test_iteration_budget.py
+"""
+from src.product_matching.iteration_budget import IterationBudget
+
+TERMS = ['kuulaventtiili dn20', 'painemittari 0-10 bar', 'rahti', 'asennus', 'tiiviste']
+SEARCHED = {term: {'searches': ['a', 'b', 'c'], 'search_types': ['wildcard', 'semantic']} for term in TERMS}
+
+
+def _result(*rows):
+    return "\n".join(f"- {code} | {name}" for code, name in rows)
+
+
+def _improving_calls(budget, term, calls, start=0):
+    for i in range(start, start + calls):
+        budget.observe('wildcard_search', [term], _result((f"C{i}", f"unrelated part {i}")), repeated=False)
+
+
+def test_improving_term_out_of_allowance_with_empty_pool_continues():
+    budget = IterationBudget(TERMS)
+    term = TERMS[0]
+    for _ in range(7):
+        budget.tick()
+    _improving_calls(budget, term, 7)
+
+    assert budget.pool == 0
+    assert budget.stalled_terms([term], SEARCHED) == []
+    assert budget.terms[term].allowance > 7
+    assert budget.extended > 0
+
+    # It keeps going past the first extension as long as it improves
+    _improving_calls(budget, term, budget.terms[term].allowance - 7, start=7)
+    assert budget.stalled_terms([term], SEARCHED) == []
+
+
+def test_stalled_term_is_retired_and_returns_its_allowance():
+    budget = IterationBudget(TERMS)
+    term = TERMS[2]
+    budget.observe('wildcard_search', [term], _result(('X1', 'kuljetus')), repeated=False)
+    for _ in range(4):
+        budget.observe('semantic_search', [term], _result(('X1', 'kuljetus')), repeated=False)
+
+    assert budget.stalled_terms([term], SEARCHED) == [term]
+    assert budget.pool == 7 - 5
+
+
+def test_strong_candidate_is_never_retired():
+    budget = IterationBudget(TERMS)
+    term = TERMS[0]
+    budget.observe('wildcard_search', [term], _result(('K20', 'Kuulaventtiili DN20 messinki')), repeated=False)
+    # Stalled, repeated and overrun at once
+    for _ in range(12):
+        budget.observe('wildcard_search', [term], _result(('K20', 'Kuulaventtiili DN20 messinki')), repeated=True)
+
+    assert budget.terms[term].best_score == 1.0
+    assert budget.stalled_terms([term], SEARCHED) == []
+    assert budget.retired == []
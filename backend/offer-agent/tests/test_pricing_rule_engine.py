@@ -0,0 +1,214 @@
+"""
+Golden tests: the vectorised rule engine must price offers exactly like the
+per-line Lemonsoft hierarchy it replaced (PricingCalculator._calculate_line_pricing).
+
+Both paths run against the same fake Lemonsoft products and the same pricing
+tables, once in API-only mode and once with SQL lookups. Offers mix found,
+unknown and failing products.
+
+    python -m pytest tests/test_pricing_rule_engine.py
+"""
+import asyncio
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from src.pricing.calculator import PricingCalculator
+from src.pricing.rule_engine import normalize_group_id, normalize_group_key
+from src.product_matching.matcher_class import ProductMatch
+
+
+@dataclass
+class FakeProduct:
+    list_price: float
+    product_group: Optional[str]
+    product_price: Optional[float]
+    vat_rate: float
+
+
+PRODUCTS = {
+    'A1': FakeProduct(list_price=50.0, product_group='110', product_price=35.0, vat_rate=25.5),
+    'B2': FakeProduct(list_price=120.0, product_group='120', product_price=None, vat_rate=25.5),
+    'C3': FakeProduct(list_price=19.9, product_group=' 1 20 ', product_price=14.0, vat_rate=14.0),
+    'D4': FakeProduct(list_price=7.5, product_group='130', product_price=None, vat_rate=25.5),
+    'E5': FakeProduct(list_price=3.2, product_group=None, product_price=2.0, vat_rate=25.5),
+}
+FAILING = {'ERR1'}  # get_product raises (Lemonsoft client error)
+
+CUSTOMER = {'id': '42', 'customer_number': '1001'}
+# code -> (discount type, value, pricelist id)
+PRODUCT_SPECIFIC = {'A1': ('percent', 12.5, 7), 'B2': ('fixedprice', 99.0, 5)}
+PRIMARY_GROUP = {'110': 20.0, '130': 15.0}
+GENERAL_GROUP = {'120': 8.0, '130': 30.0}
+EXP_PRICES = {'A1': 40.0, 'C3': 11.0}
+EXTRA_NAMES = {'A1': 'DN20', 'C3': 'PN16'}
+UNITS = {'B2': 'M'}
+
+OFFERS = [
+    # Catalogue lines only
+    [('A1', 3), ('B2', 1), ('C3', 10), ('D4', 2), ('E5', 100)],
+    # Mixed: unknown product and a Lemonsoft error between found ones
+    [('A1', 1), ('MISSING', 4), ('C3', 2), ('ERR1', 5), ('D4', 1)],
+    # Nothing found
+    [('MISSING', 1), ('ERR1', 2)],
+]
+
+
+class FakeLemonsoftClient:
+    client = object()
+
+    async def get_product(self, code: str) -> Optional[FakeProduct]:
+        if code in FAILING:
+            raise RuntimeError(f"Lemonsoft timeout for {code}")
+        return PRODUCTS.get(code)
+
+
+def _matches(offer) -> List[ProductMatch]:
+    return [
+        ProductMatch(
+            product_code=code,
+            product_name=f"Product {code}",
+            description='',
+            price=9.99,
+            quantity_requested=quantity,
+            confidence_score=1.0,
+            match_method='test',
+        )
+        for code, quantity in offer
+    ]
+
+
+def _calculator(sql: bool) -> PricingCalculator:
+    calculator = PricingCalculator()
+    calculator.deployment_mode = 'direct'
+    calculator.lemonsoft_client = FakeLemonsoftClient()
+    calculator.database_client = object() if sql else None
+
+    async def customer_info(customer_id):
+        return CUSTOMER
+
+    async def product_specific(product_code, customer_id, customer_number=None):
+        if product_code not in PRODUCT_SPECIFIC:
+            return None
+        kind, value, pricelist_id = PRODUCT_SPECIFIC[product_code]
+        ovh = PRODUCTS[product_code].list_price
+        if kind == 'percent':
+            return {
+                'unit_price': ovh, 'list_price': ovh, 'discount_type': 'product_specific_percent',
+                'discount_percent': value,
+                'applied_rule': f"Product-specific discount {value}% (Pricelist {pricelist_id})",
+            }
+        return {
+            'unit_price': ovh, 'list_price': ovh, 'discount_type': 'product_specific_fixed',
+            'discount_percent': 0.0,
+            'applied_rule': f"Product-specific fixed price €{value} (Pricelist {pricelist_id})",
+        }
+
+    async def primary_group(customer_id, product_group):
+        value = PRIMARY_GROUP.get(normalize_group_id(product_group))
+        return {'discount_percent': value} if value is not None else None
+
+    async def general_group(customer_id, product_group):
+        value = GENERAL_GROUP.get(normalize_group_key(product_group))
+        return {'discount_percent': value} if value is not None else None
+
+    async def exp_price(product_code):
+        return EXP_PRICES.get(product_code) if sql else None
+
+    async def extra_name(product_code):
+        return EXTRA_NAMES.get(product_code, '') if sql else ''
+
+    async def default_unit(product_code):
+        return UNITS.get(product_code, 'KPL') if sql else 'KPL'
+
+    async def product_specific_batch(product_codes, customer_number):
+        percent, fixed = {}, {}
+        for code in product_codes:
+            if code in PRODUCT_SPECIFIC:
+                kind, value, pricelist_id = PRODUCT_SPECIFIC[code]
+                (percent if kind == 'percent' else fixed)[code] = (value, pricelist_id)
+        return percent, fixed
+
+    async def primary_group_batch(customer_id, group_ids):
+        return {g: (PRIMARY_GROUP[g], g) for g in group_ids if g in PRIMARY_GROUP}
+
+    async def general_group_batch(customer_number, group_keys):
+        return {g: (GENERAL_GROUP[g], g) for g in group_keys if g in GENERAL_GROUP}
+
+    async def exp_prices(product_codes):
+        return {c: EXP_PRICES[c] for c in product_codes if c in EXP_PRICES} if sql else {}
+
+    async def extra_names(product_codes):
+        return {c: EXTRA_NAMES[c] for c in product_codes if c in EXTRA_NAMES} if sql else {}
+
+    async def default_units(product_codes):
+        return {c: UNITS[c] for c in product_codes if c in UNITS} if sql else {}
+
+    # The SQL layer, in its per-line and batched forms, over the same tables
+    calculator._get_customer_info = customer_info
+    calculator._get_product_specific_pricing = product_specific
+    calculator._get_primary_customer_product_group_discount = primary_group
+    calculator._get_general_product_group_discount = general_group
+    calculator._get_product_exp_price = exp_price
+    calculator._get_product_extra_name = extra_name
+    calculator._get_product_default_unit = default_unit
+    calculator._get_product_specific_pricing_batch = product_specific_batch
+    calculator._get_primary_customer_product_group_discounts_batch = primary_group_batch
+    calculator._get_general_product_group_discounts_batch = general_group_batch
+    calculator._get_product_exp_prices = exp_prices
+    calculator._get_product_extra_names = extra_names
+    calculator._get_product_default_units = default_units
+    return calculator
+
+
+async def _price_both(calculator: PricingCalculator, matches: List[ProductMatch]):
+    per_line = [await calculator._calculate_line_pricing(match, '42', None, {}) for match in matches]
+    vectorised = await calculator._calculate_lines_with_rule_engine(matches, '42')
+    return per_line, vectorised
+
+
+def _fields(line) -> Dict[str, Any]:
+    return {
+        'product_code': line.product_code,
+        'quantity': line.quantity,
+        'unit_price': line.unit_price,
+        'list_price': line.list_price,
+        'net_price': line.net_price,
+        'vat_rate': line.vat_rate,
+        'discount_percent': line.discount_percent,
+        'line_total': line.line_total,
+        'vat_amount': line.vat_amount,
+        'applied_rules': line.applied_rules,
+        'extra_name': line.extra_name,
+        'unit': line.unit,
+    }
+
+
+@pytest.mark.parametrize('sql', [False, True], ids=['api_only', 'sql'])
+@pytest.mark.parametrize('offer', OFFERS, ids=['catalogue', 'mixed', 'unfound'])
+def test_rule_engine_matches_per_line_pricing(offer, sql):
+    calculator = _calculator(sql)
+    per_line, vectorised = asyncio.run(_price_both(calculator, _matches(offer)))
+
+    assert len(vectorised) == len(per_line)
+    for expected, actual in zip(per_line, vectorised):
+        expected, actual = _fields(expected), _fields(actual)
+        for key, value in expected.items():
+            if isinstance(value, float):
+                assert actual[key] == pytest.approx(value), (expected['product_code'], key)
+            else:
+                assert actual[key] == value, (expected['product_code'], key)
+
+
+@pytest.mark.parametrize('sql', [False, True], ids=['api_only', 'sql'])
+def test_mixed_offer_totals_are_finite(sql):
+    calculator = _calculator(sql)
+    per_line, vectorised = asyncio.run(_price_both(calculator, _matches(OFFERS[1])))
+
+    expected = calculator._calculate_offer_totals(per_line, None, {})
+    actual = calculator._calculate_offer_totals(vectorised, None, {})
+    for key in ('subtotal', 'vat_amount', 'total_amount'):
+        assert math.isfinite(getattr(actual, key)), key
+        assert getattr(actual, key) == pytest.approx(getattr(expected, key)), key